@@ -2,6 +2,7 @@
 The Bookkeeper class.
 """
 import sys, types, inspect, weakref
+from collections import OrderedDict
 
 from pypy.objspace.flow.model import Constant
 from pypy.annotation.model import SomeString, SomeChar, SomeFloat, \
@@ -17,7 +18,7 @@ from pypy.annotation.dictdef import DictDef
 from pypy.annotation import description
 from pypy.annotation.signature import annotationoftype
 from pypy.interpreter.argument import ArgumentsForTranslation
-from pypy.rlib.objectmodel import r_dict, Symbolic
+from pypy.rlib.objectmodel import r_dict, r_ordereddict, Symbolic
 from pypy.tool.algo.unionfind import UnionFind
 from pypy.rpython.lltypesystem import lltype, llmemory
 from pypy.rpython.ootypesystem import ootype
@@ -299,13 +300,15 @@ class Bookkeeper(object):
             listdef.generalize_range_step(flags['range_step'])
         return SomeList(listdef)
 
-    def getdictdef(self, is_r_dict=False, force_non_null=False):
+    def getdictdef(self, is_r_dict=False, force_non_null=False,
+                   is_ordered=False):
         """Get the DictDef associated with the current position."""
         try:
             dictdef = self.dictdefs[self.position_key]
         except KeyError:
             dictdef = DictDef(self, is_r_dict=is_r_dict,
-                              force_non_null=force_non_null)
+                              force_non_null=force_non_null,
+                              is_ordered=is_ordered)
             self.dictdefs[self.position_key] = dictdef
         return dictdef
 
@@ -372,7 +375,10 @@ class Bookkeeper(object):
                 for e in x:
                     listdef.generalize(self.immutablevalue(e, False))
                 result = SomeList(listdef)    
-        elif tp is dict or tp is r_dict:
+        elif (tp is dict or tp is r_dict or
+              tp is OrderedDict or tp is r_ordereddict):
+            is_r_dict = tp is r_dict or tp is r_ordereddict
+            is_ordered = tp is OrderedDict or tp is r_ordereddict
             if need_const:
                 key = Constant(x)
                 try:
@@ -381,9 +387,10 @@ class Bookkeeper(object):
                     result = SomeDict(DictDef(self, 
                                               s_ImpossibleValue,
                                               s_ImpossibleValue,
-                                              is_r_dict = tp is r_dict))
+                                              is_r_dict = is_r_dict,
+                                              is_ordered = is_ordered))
                     self.immutable_cache[key] = result
-                    if tp is r_dict:
+                    if is_r_dict:
                         s_eqfn = self.immutablevalue(x.key_eq)
                         s_hashfn = self.immutablevalue(x.key_hash)
                         result.dictdef.dictkey.update_rdict_annotations(s_eqfn,
@@ -404,8 +411,9 @@ class Bookkeeper(object):
                 dictdef = DictDef(self, 
                 s_ImpossibleValue,
                 s_ImpossibleValue,
-                is_r_dict = tp is r_dict)
-                if tp is r_dict:
+                is_r_dict = is_r_dict,
+                is_ordered = is_ordered)
+                if is_r_dict:
                     s_eqfn = self.immutablevalue(x.key_eq)
                     s_hashfn = self.immutablevalue(x.key_hash)
                     dictdef.dictkey.update_rdict_annotations(s_eqfn,
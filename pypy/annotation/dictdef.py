@@ -9,9 +9,10 @@ class DictKey(ListItem):
     s_rdict_eqfn = s_ImpossibleValue
     s_rdict_hashfn = s_ImpossibleValue
 
-    def __init__(self, bookkeeper, s_value, is_r_dict=False):
+    def __init__(self, bookkeeper, s_value, is_r_dict=False, is_ordered=False):
         ListItem.__init__(self, bookkeeper, s_value)
         self.custom_eq_hash = is_r_dict
+        self.is_ordered = is_ordered
 
     def patch(self):
         for dictdef in self.itemof:
@@ -21,6 +22,8 @@ class DictKey(ListItem):
         if self is not other:
             assert self.custom_eq_hash == other.custom_eq_hash, (
                 "mixing plain dictionaries with r_dict()")
+            assert self.is_ordered == other.is_ordered, (
+                "mixing ordered and unordered dictionaries")
             ListItem.merge(self, other)
             if self.custom_eq_hash:
                 self.update_rdict_annotations(other.s_rdict_eqfn,
@@ -86,8 +89,9 @@ class DictDef(object):
     def __init__(self, bookkeeper, s_key = s_ImpossibleValue,
                                  s_value = s_ImpossibleValue,
                                is_r_dict = False,
-                           force_non_null = False):
-        self.dictkey = DictKey(bookkeeper, s_key, is_r_dict)
+                           force_non_null = False,
+                               is_ordered = False):
+        self.dictkey = DictKey(bookkeeper, s_key, is_r_dict, is_ordered)
         self.dictkey.itemof[self] = True
         self.dictvalue = DictValue(bookkeeper, s_value)
         self.dictvalue.itemof[self] = True
@@ -166,6 +166,12 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
               cmdline="--ext",
               default=None),
 
+    StrOption("preimport",
+              "Comma-separated list of app-level modules to import while "
+              "translating, to store them in the executable",
+              cmdline="--preimport",
+              default=None),
+
     BoolOption("translationmodules",
           "use only those modules that are needed to run translate.py on pypy",
                default=False,
@@ -186,6 +192,15 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                default=False,
                requires=[("objspace.usepycfiles", True)]),
 
+    BoolOption("lazycodeloading",
+               "Unmarshal the functions of .pyc files when first called",
+               default=False,
+               requires=[("objspace.usepycfiles", True)]),
+
+    BoolOption("cacheimportdirs",
+               "Cache the listings of the directories searched by imports",
+               default=True),
+
     StrOption("soabi",
               "Tag to differentiate extension modules built for different Python interpreters",
               cmdline="--soabi",
@@ -199,6 +214,16 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                "make sure that all calls go through space.call_args",
                default=False),
 
+    BoolOption("superinstructions",
+               "run common pairs of bytecodes as a single instruction "
+               "in the interpreter",
+               default=False),
+
+    BoolOption("recycle_frames",
+               "reuse the frames of finished calls that did not escape",
+               default=False,
+               requires=[("translation.jit", False)]),
+
     BoolOption("timing",
                "timing of various parts of the interpreter (simple profiling)",
                default=False),
@@ -248,6 +273,10 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                    "use small tuples",
                    default=False),
 
+        BoolOption("withspecialisedtuple",
+                   "use specialised tuples that store ints and floats unboxed",
+                   default=False),
+
         BoolOption("withrope", "use ropes as the string implementation",
                    default=False,
                    requires=[("objspace.std.withstrslice", False),
@@ -265,6 +294,13 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                    default=False,
                    requires=[("objspace.honor__builtins__", False)]),
 
+        BoolOption("withcellcache",
+                   "cache the module dict cells used by global lookups and "
+                   "module attribute lookups in the code objects",
+                   default=False,
+                   requires=[("objspace.std.withcelldict", True),
+                             ("objspace.std.withmethodcache", True)]),
+
         BoolOption("withmapdict",
                    "make instances really small but slow without the JIT",
                    default=False,
@@ -272,12 +308,27 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                              ("objspace.std.withmethodcache", True),
                        ]),
 
+        BoolOption("withunboxedattrs",
+                   "store int and float attributes of instances unboxed",
+                   default=False,
+                   requires=[("objspace.std.withmapdict", True),
+                             ("objspace.std.withsmallint", False)]),
+
         BoolOption("withrangelist",
                    "enable special range list implementation that does not "
                    "actually create the full list until the resulting "
                    "list is mutated",
                    default=False),
 
+        BoolOption("withcompactdicts",
+                   "use the compact, insertion-ordered RPython dict layout "
+                   "for the storage of object- and string-keyed dicts",
+                   default=False),
+
+        BoolOption("withliststrategies",
+                   "enable optimized ways to store lists of primitives ",
+                   default=True),
+
         BoolOption("withtypeversion",
                    "version type objects when changing them",
                    cmdline=None,
@@ -351,6 +402,7 @@ def set_pypy_opt_level(config, level):
     # all the good optimizations for PyPy should be listed here
     if level in ['2', '3', 'jit']:
         config.objspace.opcodes.suggest(CALL_METHOD=True)
+        config.objspace.suggest(superinstructions=True)
         config.objspace.std.suggest(withrangelist=True)
         config.objspace.std.suggest(withmethodcache=True)
         config.objspace.std.suggest(withprebuiltchar=True)
@@ -390,6 +442,7 @@ def set_pypy_opt_level(config, level):
     # extra optimizations with the JIT
     if level == 'jit':
         config.objspace.std.suggest(withcelldict=True)
+        config.objspace.std.suggest(withcellcache=True)
         config.objspace.std.suggest(withmapdict=True)
 
 
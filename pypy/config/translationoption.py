@@ -119,7 +119,7 @@ translation_optiondescription = OptionDescription(
                  ["auto", "x86", "x86-without-sse2", "llvm"],
                  default="auto", cmdline="--jit-backend"),
     ChoiceOption("jit_profiler", "integrate profiler support into the JIT",
-                 ["off", "oprofile"],
+                 ["off", "oprofile", "perfmap", "jitdump"],
                  default="off"),
     # jit_ffi is automatically turned on by withmod-_ffi (which is enabled by default)
     BoolOption("jit_ffi", "optimize libffi calls", default=False, cmdline=None),
@@ -192,6 +192,11 @@ translation_optiondescription = OptionDescription(
     IntOption("withsmallfuncsets",
               "Represent groups of less funtions than this as indices into an array",
                default=0),
+    BoolOption("compactdicts",
+               "Use the compact, insertion-ordered layout for all RPython "
+               "dictionaries, not only for the ordered ones",
+               default=False,
+               requires=[("translation.type_system", "lltype")]),
     BoolOption("taggedpointers",
                "When true, enable the use of tagged pointers. "
                "If false, use normal boxing",
@@ -616,6 +616,55 @@ def rawshape(args, nextra=0):
     return args._rawshape(nextra)
 
 
+#
+# Precomputed matching of the keyword arguments of a call site, used by the
+# interpreter to write the arguments directly into the frame of the callee
+# without building an Arguments object.  See PyFrame.call_function().
+#
+
+class KeywordsMapping(object):
+    _immutable_ = True
+    _immutable_fields_ = ["keys_w[*]", "slots[*]", "missing[*]"]
+
+    def __init__(self, signature, nargs, keys_w, slots, missing):
+        self.signature = signature
+        self.nargs = nargs        # number of positional arguments
+        self.keys_w = keys_w      # the wrapped keywords of the call site
+        self.slots = slots        # the position of each keyword in the scope
+        self.missing = missing    # the positions left for the defaults
+
+    def __repr__(self):
+        """ NOT_RPYTHON """
+        return '<KeywordsMapping %r %d %r>' % (self.signature, self.nargs,
+                                               self.slots)
+
+def match_keywords(space, signature, nargs, keys_w):
+    """Compute the KeywordsMapping of a call with 'nargs' positional
+    arguments and the keywords 'keys_w' to a code with this signature.
+    Returns None if the call needs the general argument parsing, which
+    is also where all the errors are reported."""
+    if signature.has_vararg() or signature.has_kwarg():
+        return None
+    co_argcount = signature.num_argnames()
+    if nargs > co_argcount:
+        return None
+    filled = [False] * co_argcount
+    for i in range(nargs):
+        filled[i] = True
+    slots = [0] * len(keys_w)
+    for i in range(len(keys_w)):
+        w_key = keys_w[i]
+        if not space.is_w(space.type(w_key), space.w_str):
+            return None
+        j = signature.find_argname(space.str_w(w_key))
+        if j < 0 or filled[j]:
+            return None
+        filled[j] = True
+        slots[i] = j
+    missing = [j for j in range(nargs, co_argcount) if not filled[j]]
+    return KeywordsMapping(signature, nargs, keys_w, slots, missing)
+
+
 #
 # ArgErr family of exceptions raised in case of argument mismatch.
 # We try to give error messages following CPython's, which are very informative.
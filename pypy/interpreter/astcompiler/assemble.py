@@ -64,6 +64,12 @@ class Block(object):
         self.next_block = None
         self.marked = False
         self.have_return = False
+        self.index = -1
+
+    def ends_unconditionally(self):
+        """Return True if control flow never reaches the end of this block."""
+        return (len(self.instructions) > 0 and
+                _is_unconditional_exit(self.instructions[-1].opcode))
 
     def _post_order(self, blocks):
         if self.marked:
@@ -112,6 +118,22 @@ class Block(object):
         return ''.join(code)
 
 
+def _is_unconditional_exit(op):
+    return (op == ops.RETURN_VALUE or op == ops.JUMP_ABSOLUTE or
+            op == ops.JUMP_FORWARD or op == ops.BREAK_LOOP or
+            op == ops.CONTINUE_LOOP or op == ops.RAISE_VARARGS)
+
+def _is_threadable_jump(op):
+    return (op == ops.JUMP_ABSOLUTE or op == ops.JUMP_FORWARD or
+            op == ops.POP_JUMP_IF_FALSE or op == ops.POP_JUMP_IF_TRUE or
+            op == ops.JUMP_IF_FALSE_OR_POP or op == ops.JUMP_IF_TRUE_OR_POP)
+
+def _skip_empty_blocks(block):
+    """Return the first block with instructions reached from block."""
+    while not block.instructions and block.next_block is not None:
+        block = block.next_block
+    return block
+
 def _make_index_dict_filter(syms, flag):
     i = 0
     result = {}
@@ -275,6 +297,103 @@ class PythonCodeMaker(ast.ASTVisitor):
             self.lineno = lineno
             self.lineno_set = False
 
+    def _optimize_blocks(self, blocks):
+        """Peephole optimizations on the control flow graph.
+
+        Remove the instructions following an unconditional exit, thread
+        jumps going to other unconditional jumps, remove the blocks that
+        cannot be reached and the jumps to the block that follows anyway.
+        Return the list of the remaining blocks.
+        """
+        for i in range(len(blocks)):
+            block = blocks[i]
+            block.index = i
+            instrs = block.instructions
+            for j in range(len(instrs)):
+                if _is_unconditional_exit(instrs[j].opcode):
+                    del instrs[j + 1:]
+                    break
+        for block in blocks:
+            for instr in block.instructions:
+                if instr.has_jump and _is_threadable_jump(instr.opcode):
+                    self._thread_jump(block, instr)
+        # Only keep the blocks that are reachable from the first one.
+        for block in blocks:
+            block.marked = False
+        blocks[0].marked = True
+        pending = [blocks[0]]
+        while pending:
+            block = pending.pop()
+            reached = []
+            for instr in block.instructions:
+                if instr.has_jump:
+                    reached.append(instr.jump[0])
+            if not block.ends_unconditionally():
+                if block.next_block is not None:
+                    reached.append(block.next_block)
+            for target in reached:
+                if not target.marked:
+                    target.marked = True
+                    pending.append(target)
+        live = []
+        for block in blocks:
+            if block.marked:
+                block.marked = False
+                block.index = len(live)
+                live.append(block)
+                if block.ends_unconditionally():
+                    block.next_block = None
+        # Remove the jumps to the next block with instructions.
+        for i in range(len(live) - 1):
+            block = live[i]
+            if not block.ends_unconditionally():
+                continue
+            instr = block.instructions[-1]
+            if ((instr.opcode != ops.JUMP_FORWARD and
+                 instr.opcode != ops.JUMP_ABSOLUTE) or instr.lineno):
+                continue
+            target_index = instr.jump[0].index
+            if target_index <= i:
+                continue
+            for j in range(i + 1, target_index):
+                if live[j].instructions:
+                    break
+            else:
+                block.instructions.pop()
+                block.next_block = live[i + 1]
+        return live
+
+    def _thread_jump(self, block, instr):
+        """Make a jump go directly to the final target of a chain of
+        unconditional jumps.  Jumps carrying a line number are not
+        skipped, to keep the 'line' events of sys.settrace().  Only
+        forward targets are used: the backward JUMP_ABSOLUTE closing a
+        loop must stay, because the JIT counts and traces the loops at
+        this opcode (see jump_absolute() in module/pypyjit)."""
+        target, absolute = instr.jump
+        op = instr.opcode
+        for i in range(10):
+            first_block = _skip_empty_blocks(target)
+            if not first_block.instructions:
+                break
+            first = first_block.instructions[0]
+            if first.lineno or not first.has_jump:
+                break
+            target_op = first.opcode
+            if not (target_op == ops.JUMP_ABSOLUTE or
+                    target_op == ops.JUMP_FORWARD or
+                    (target_op == op and (op == ops.JUMP_IF_FALSE_OR_POP or
+                                          op == ops.JUMP_IF_TRUE_OR_POP))):
+                break
+            new_target = first.jump[0]
+            if new_target is target or new_target is first_block:
+                break
+            if new_target.index <= block.index:
+                break
+            target = new_target
+        instr.opcode = op
+        instr.jump = (target, absolute)
+
     def _resolve_block_targets(self, blocks):
         """Compute the arguments of jump instructions."""
         last_extended_arg_count = 0
@@ -447,6 +566,7 @@ class PythonCodeMaker(ast.ASTVisitor):
             else:
                 self.first_lineno = 1
         blocks = self.first_block.post_order()
+        blocks = self._optimize_blocks(blocks)
         self._resolve_block_targets(blocks)
         lnotab = self._build_lnotab(blocks)
         stack_depth = self._stacksize(blocks)
@@ -779,6 +779,13 @@ class ASTBuilder(object):
                 return self.handle_factor(expr_node)
             elif expr_node_type == syms.power:
                 return self.handle_power(expr_node)
+            # the parser of the compiler leaves out the nodes of the
+            # expression rules with a single child, see pyparse.py
+            elif expr_node_type == syms.atom:
+                return self.handle_atom(expr_node)
+            elif expr_node_type == syms.lambdef or \
+                    expr_node_type == syms.old_lambdef:
+                return self.handle_lambdef(expr_node)
             else:
                 raise AssertionError("unknown expr")
 
@@ -849,16 +856,16 @@ class ASTBuilder(object):
         # Fold '-' on constant numbers.
         if factor_node.children[0].type == tokens.MINUS and \
                 len(factor_node.children) == 2:
-            factor = factor_node.children[1]
-            if factor.type == syms.factor and len(factor.children) == 1:
-                power = factor.children[0]
-                if power.type == syms.power and len(power.children) == 1:
-                    atom = power.children[0]
-                    if atom.type == syms.atom and \
-                            atom.children[0].type == tokens.NUMBER:
-                        num = atom.children[0]
-                        num.value = "-" + num.value
-                        return self.handle_atom(atom)
+            atom = factor_node.children[1]
+            if atom.type == syms.factor and len(atom.children) == 1:
+                atom = atom.children[0]
+            if atom.type == syms.power and len(atom.children) == 1:
+                atom = atom.children[0]
+            if atom.type == syms.atom and \
+                    atom.children[0].type == tokens.NUMBER:
+                num = atom.children[0]
+                num.value = "-" + num.value
+                return self.handle_atom(atom)
         expr = self.handle_expr(factor_node.children[1])
         op_type = factor_node.children[0].type
         if op_type == tokens.PLUS:
@@ -883,7 +890,7 @@ class ASTBuilder(object):
             tmp_atom_expr.lineno = atom_expr.lineno
             tmp_atom_expr.col_offset = atom_expr.col_offset
             atom_expr = tmp_atom_expr
-        if power_node.children[-1].type == syms.factor:
+        if power_node.children[-2].type == tokens.DOUBLESTAR:
             right = self.handle_expr(power_node.children[-1])
             atom_expr = ast.BinOp(atom_expr, ast.Pow, right, power_node.lineno,
                                   power_node.column)
@@ -893,22 +900,23 @@ class ASTBuilder(object):
         first_child = slice_node.children[0]
         if first_child.type == tokens.DOT:
             return ast.Ellipsis()
-        if len(slice_node.children) == 1 and first_child.type == syms.test:
+        # the expressions are not always 'test' nodes, see handle_expr()
+        if len(slice_node.children) == 1 and first_child.type != tokens.COLON:
             index = self.handle_expr(first_child)
             return ast.Index(index)
         lower = None
         upper = None
         step = None
-        if first_child.type == syms.test:
+        if first_child.type != tokens.COLON:
             lower = self.handle_expr(first_child)
         if first_child.type == tokens.COLON:
             if len(slice_node.children) > 1:
                 second_child = slice_node.children[1]
-                if second_child.type == syms.test:
+                if second_child.type != syms.sliceop:
                     upper = self.handle_expr(second_child)
         elif len(slice_node.children) > 2:
             third_child = slice_node.children[2]
-            if third_child.type == syms.test:
+            if third_child.type != syms.sliceop:
                 upper = self.handle_expr(third_child)
         last_child = slice_node.children[-1]
         if last_child.type == syms.sliceop:
@@ -916,9 +924,7 @@ class ASTBuilder(object):
                 step = ast.Name("None", ast.Load, last_child.lineno,
                                 last_child.column)
             else:
-                step_child = last_child.children[1]
-                if step_child.type == syms.test:
-                    step = self.handle_expr(step_child)
+                step = self.handle_expr(last_child.children[1])
         return ast.Slice(lower, upper, step)
 
     def handle_trailer(self, trailer_node, left_expr):
@@ -254,6 +254,43 @@ class OptimizingVisitor(ast.ASTVisitor):
             return values[0]
         return bop
 
+    def visit_Compare(self, comp):
+        """Turn the lists or sets of constants used in 'in' tests into a
+        constant tuple or frozenset, instead of building them every time."""
+        for i in range(len(comp.ops)):
+            op = comp.ops[i]
+            if op == ast.In or op == ast.NotIn:
+                node = comp.comparators[i]
+                w_const = None
+                if isinstance(node, ast.List):
+                    consts_w = self._constant_elements(node.elts)
+                    if consts_w is not None:
+                        w_const = self.space.newtuple(consts_w)
+                elif isinstance(node, ast.Set):
+                    consts_w = self._constant_elements(node.elts)
+                    if consts_w is not None:
+                        space = self.space
+                        try:
+                            w_const = space.call_function(
+                                space.w_frozenset, space.newtuple(consts_w))
+                        except OperationError:
+                            pass
+                if w_const is not None:
+                    comp.comparators[i] = ast.Const(w_const, node.lineno,
+                                                    node.col_offset)
+        return comp
+
+    def _constant_elements(self, elts):
+        if not elts:
+            return []
+        consts_w = [None] * len(elts)
+        for i in range(len(elts)):
+            w_const = elts[i].as_constant()
+            if w_const is None:
+                return None
+            consts_w[i] = w_const
+        return consts_w
+
     def visit_Repr(self, rep):
         w_const = rep.value.as_constant()
         if w_const is not None:
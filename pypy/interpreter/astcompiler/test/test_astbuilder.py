@@ -1239,3 +1239,9 @@ class TestAstBuilder:
         if1, if2 = comps[0].ifs
         assert isinstance(if1, ast.Name)
         assert isinstance(if2, ast.Name)
+
+
+class TestAstBuilderCollapsedExpressions(TestAstBuilder):
+
+    def setup_class(cls):
+        cls.parser = pyparse.PythonParser(cls.space, collapse_expressions=True)
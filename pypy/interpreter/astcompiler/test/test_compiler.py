@@ -1,5 +1,6 @@
 import py
 from pypy.interpreter.astcompiler import codegen, astbuilder, symtable, optimize
+from pypy.interpreter.astcompiler import assemble
 from pypy.interpreter.pyparser import pyparse
 from pypy.interpreter.pyparser.test import expressions
 from pypy.interpreter.pycode import PyCode
@@ -24,6 +25,7 @@ def generate_function_code(expr, space):
     generator = codegen.FunctionCodeGenerator(
         space, 'function', function_ast, 1, symbols, info)
     blocks = generator.first_block.post_order()
+    blocks = generator._optimize_blocks(blocks)
     generator._resolve_block_targets(blocks)
     return generator, blocks
 
@@ -876,3 +878,114 @@ class TestOptimizations:
             return d['f'](5)
         """)
         assert 'generator' in space.str_w(space.repr(w_generator))
+
+    def test_remove_jump_to_next_block(self):
+        source = """def f(x, y):
+            if x:
+                y += 1
+            return y
+        """
+        counts = self.count_instructions(source)
+        assert ops.JUMP_FORWARD not in counts
+        assert ops.JUMP_ABSOLUTE not in counts
+
+    def test_remove_dead_code_after_break_continue(self):
+        source = """def f(l):
+            for x in l:
+                if x:
+                    continue
+                    x += 1
+                break
+                x -= 1
+        """
+        counts = self.count_instructions(source)
+        assert ops.INPLACE_ADD not in counts
+        assert ops.INPLACE_SUBTRACT not in counts
+        assert counts[ops.BREAK_LOOP] == 1
+
+    def test_remove_unreachable_blocks(self):
+        source = """def f(l):
+            return 5
+            for x in l:
+                pass
+        """
+        counts = self.count_instructions(source)
+        assert counts == {ops.LOAD_CONST: 1, ops.RETURN_VALUE: 1}
+
+    def test_thread_jumps(self):
+        source = """def f(x, y):
+            while x:
+                if y:
+                    x -= 1
+                else:
+                    y -= 1
+        """
+        code, blocks = generate_function_code(source, self.space)
+        for block in blocks:
+            for instr in block.instructions:
+                if instr.has_jump and instr.opcode != ops.SETUP_LOOP:
+                    target = assemble._skip_empty_blocks(instr.jump[0])
+                    # no jump goes to another unconditional jump, apart
+                    # from the jump back to the start of the loop
+                    first = target.instructions[0]
+                    if first.opcode == ops.JUMP_FORWARD:
+                        assert 0, "jump to a JUMP_FORWARD"
+                    if first.opcode == ops.JUMP_ABSOLUTE:
+                        assert first.jump[0].offset < target.offset
+
+    def test_keep_loop_back_edges(self):
+        source = """def f(x, n):
+            i = 0
+            while i < n:
+                if x:
+                    i += 1
+            j = 0
+            for k in x:
+                if k:
+                    j += 1
+                else:
+                    j -= 1
+            return i + j
+        """
+        code, blocks = generate_function_code(source, self.space)
+        backward = []
+        for block in blocks:
+            offset = block.offset
+            for instr in block.instructions:
+                offset += instr.size()
+                if instr.has_jump:
+                    target_offset = instr.jump[0].offset
+                    if target_offset <= offset:
+                        backward.append(instr.opcode)
+        # the JIT counts the loops at their backward JUMP_ABSOLUTE: the
+        # conditional jumps must not go back to the start of the loop
+        assert backward == [ops.JUMP_ABSOLUTE] * 2
+
+    def test_thread_jump_if_or_pop(self):
+        source = """def f(x, y, z):
+            return (x and y) and z
+        """
+        code, blocks = generate_function_code(source, self.space)
+        jumps = []
+        for block in blocks:
+            for instr in block.instructions:
+                if instr.opcode == ops.JUMP_IF_FALSE_OR_POP:
+                    jumps.append(instr)
+        assert len(jumps) == 2
+        assert jumps[0].jump[0] is jumps[1].jump[0]
+
+    def test_const_list_in(self):
+        source = """def f(x):
+            return x in [1, 2, 3]
+        """
+        counts = self.count_instructions(source)
+        assert ops.BUILD_LIST not in counts
+        assert counts[ops.LOAD_CONST] == 1
+
+    def test_const_set_not_in(self):
+        source = """def f(x):
+            return x not in {1, 2, 3}
+        """
+        counts = self.count_instructions(source)
+        assert ops.BUILD_SET not in counts
+        assert counts[ops.LOAD_CONST] == 1
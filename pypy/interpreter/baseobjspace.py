@@ -628,6 +628,11 @@ class ObjSpace(object):
 
     def createframe(self, code, w_globals, closure=None):
         "Create an empty PyFrame suitable for this code object."
+        if self.config.objspace.recycle_frames:
+            frame = self.getexecutioncontext().get_free_frame(code)
+            if frame is not None:
+                frame.reinit(code, w_globals)
+                return frame
         return self.FrameClass(self, code, w_globals, closure)
 
     def allocate_lock(self):
@@ -802,6 +807,20 @@ class ObjSpace(object):
         """
         return self.unpackiterable(w_iterable, expected_length)
 
+    def listview_str(self, w_list):
+        """ Return a list of unwrapped strings out of a list of strings. If the
+        argument is not a list or does not contain only strings, return None.
+        May return None anyway.
+        """
+        return None
+
+    def listview_int(self, w_list):
+        """ Return a list of unwrapped int out of a list of int. If the
+        argument is not a list or does not contain only int, return None.
+        May return None anyway.
+        """
+        return None
+
     @jit.unroll_safe
     def exception_match(self, w_exc_type, w_check_class):
         """Checks if the given exception type matches 'w_check_class'."""
@@ -14,11 +14,15 @@ class OperationError(Exception):
     OperationError instances have three attributes (and no .args),
     w_type, _w_value and _application_traceback, which contain the wrapped
     type and value describing the exception, and a chained list of
-    PyTraceback objects making the application-level traceback.
+    PyTraceback objects making the application-level traceback.  The
+    entry of the innermost frame is only turned into a PyTraceback when
+    needed: see record_traceback().
     """
 
     _w_value = None
     _application_traceback = None
+    _tb_frame = None     # the frame of the entry not yet in the traceback
+    _tb_lasti = -1
 
     def __init__(self, w_type, w_value, tb=None):
         if not we_are_translated() and w_type is None:
@@ -38,6 +42,7 @@ class OperationError(Exception):
         self.w_type = space.w_None
         self._w_value = space.w_None
         self._application_traceback = None
+        self._tb_frame = None
         if not we_are_translated():
             del self.debug_excs[:]
 
@@ -103,6 +108,7 @@ class OperationError(Exception):
 
     def print_app_tb_only(self, file):
         "NOT_RPYTHON"
+        self._materialize_traceback()
         tb = self._application_traceback
         if tb:
             import linecache
@@ -263,11 +269,32 @@ class OperationError(Exception):
         got_exception=True.
         """
         from pypy.interpreter.pytraceback import PyTraceback
+        self._materialize_traceback()
         tb = self._application_traceback
         if tb is not None and isinstance(tb, PyTraceback):
             tb.frame.mark_as_escaped()
         return tb
 
+    def record_traceback(self, frame, lasti):
+        """Add the entry of 'frame' in front of the traceback.  To make
+        exceptions that are caught in the frame that raised them cheap,
+        the entry is only recorded here; it becomes a PyTraceback when the
+        exception propagates to the next frame, or when get_traceback() is
+        called, e.g. by sys.exc_info().
+        """
+        self._materialize_traceback()
+        self._tb_frame = frame
+        self._tb_lasti = lasti
+
+    def _materialize_traceback(self):
+        frame = self._tb_frame
+        if frame is not None:
+            from pypy.interpreter.pytraceback import PyTraceback
+            self._application_traceback = PyTraceback(
+                frame.space, frame, self._tb_lasti,
+                self._application_traceback)
+            self._tb_frame = None
+
     def set_traceback(self, traceback):
         """Set the current traceback.  It should either be a traceback
         pointing to some already-escaped frame, or a traceback for the
@@ -277,6 +304,7 @@ class OperationError(Exception):
         executioncontext.leave() being called with got_exception=True.
         """
         self._application_traceback = traceback
+        self._tb_frame = None
 
 # ____________________________________________________________
 # optimization only: avoid the slowest operation -- the string
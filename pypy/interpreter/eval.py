@@ -10,7 +10,7 @@ from pypy.interpreter.baseobjspace import Wrappable
 class Code(Wrappable):
     """A code is a compiled version of some source code.
     Abstract base class."""
-    _immutable_ = True
+    _immutable_fields_ = ['co_name', 'fast_natural_arity', 'hidden_applevel']
     hidden_applevel = False
 
     # n >= 0 : arity
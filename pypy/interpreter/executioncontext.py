@@ -7,6 +7,12 @@ from pypy.rlib import jit
 
 TICK_COUNTER_STEP = 100
 
+# with objspace.recycle_frames, only the frames with less than this number
+# of locals and stack items are recycled
+FREE_FRAMES_SIZES = 32
+# the maximum number of frames kept by an ExecutionContext
+FREE_FRAMES_MAX = 64
+
 def app_profile_call(space, w_callable, frame, event, w_arg):
     space.call_function(w_callable,
                         space.wrap(frame),
@@ -37,6 +43,10 @@ class ExecutionContext(object):
         self.compiler = space.createcompiler()
         self.profilefunc = None        # if not None, no JIT
         self.w_profilefuncarg = None
+        if space.config.objspace.recycle_frames:
+            # free lists of frames, indexed by len(frame.locals_stack_w)
+            self.free_frames = [None] * FREE_FRAMES_SIZES
+            self.n_free_frames = 0
 
     def gettopframe(self):
         return self.topframeref()
@@ -79,6 +89,41 @@ class ExecutionContext(object):
         if self.w_tracefunc is not None and not frame.hide():
             self.space.frame_trace_action.fire()
 
+    def recycle_frame(self, frame):
+        """Called with objspace.recycle_frames when 'frame' returned
+        normally.  If nothing can see the frame any more, it is kept to be
+        reused by space.createframe(): this is the case if it was never
+        exposed to applevel (see PyFrame.mark_as_escaped()), because the
+        interpreter itself only keeps references to running frames."""
+        if frame.escaped or self.n_free_frames >= FREE_FRAMES_MAX:
+            return
+        if not isinstance(frame, self.space.FrameClass):
+            return
+        if not frame.getcode().frames_can_be_recycled:
+            return
+        size = len(frame.locals_stack_w)
+        if size >= FREE_FRAMES_SIZES:
+            return
+        frame.clear_for_recycling()
+        frame.next_free_frame = self.free_frames[size]
+        self.free_frames[size] = frame
+        self.n_free_frames += 1
+
+    def get_free_frame(self, code):
+        """Return a recycled frame that can run 'code', or None."""
+        from pypy.interpreter.pycode import PyCode
+        if not isinstance(code, PyCode) or not code.frames_can_be_recycled:
+            return None
+        size = code.co_nlocals + code.co_stacksize
+        if size >= FREE_FRAMES_SIZES:
+            return None
+        frame = self.free_frames[size]
+        if frame is not None:
+            self.free_frames[size] = frame.next_free_frame
+            frame.next_free_frame = None
+            self.n_free_frames -= 1
+        return frame
+
     # ________________________________________________________________
 
 
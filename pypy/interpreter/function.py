@@ -180,6 +180,33 @@ class Function(Wrappable):
             i += 1
         return new_frame.run()
 
+    def _flat_pycall_keywords(self, code, mapping, w_self, frame):
+        # code is a PyCode.  The value stack of 'frame' contains the
+        # positional arguments (not including w_self) and the keyword
+        # arguments of a call site that was matched by 'mapping'.
+        # Returns None if some arguments are missing.
+        missing = mapping.missing
+        defs_w = self.defs_w
+        def_first = code.co_argcount - len(defs_w)
+        if len(missing) > 0 and missing[0] < def_first:
+            return None
+        new_frame = self.space.createframe(code, self.w_func_globals,
+                                                   self.closure)
+        locals_w = new_frame.locals_stack_w
+        nkwds = len(mapping.slots)
+        start = 0
+        if w_self is not None:
+            locals_w[0] = w_self
+            start = 1
+        nstack = mapping.nargs - start
+        for i in xrange(nstack):
+            locals_w[start + i] = frame.peekvalue(2 * nkwds + nstack - 1 - i)
+        for i in xrange(nkwds):
+            locals_w[mapping.slots[i]] = frame.peekvalue(2 * (nkwds - 1 - i))
+        for j in missing:
+            locals_w[j] = defs_w[j - def_first]
+        return new_frame.run()
+
     def getdict(self, space):
         if self.w_func_dict is None:
             self.w_func_dict = space.newdict(instance=True)
@@ -259,7 +286,7 @@ class Function(Wrappable):
         from pypy.interpreter.mixedmodule import MixedModule
         w_mod    = space.getbuiltinmodule('_pickle_support')
         mod      = space.interp_w(MixedModule, w_mod)
-        code = self.code
+        code = self.load_code()
         if isinstance(code, BuiltinCode):
             new_inst = mod.get('builtin_function')
             return space.newtuple([new_inst,
@@ -289,7 +316,7 @@ class Function(Wrappable):
         tup_state = [
             w(self.name),
             w_doc,
-            w(self.code),
+            w(code),
             w_func_globals,
             w_closure,
             nt(self.defs_w),
@@ -389,8 +416,18 @@ class Function(Wrappable):
     def fdel___module__(self, space):
         self.w_module = space.w_None
 
+    def load_code(self):
+        """Return the code, after replacing a LazyCode with the code
+        object it loads: app-level code never sees LazyCodes."""
+        from pypy.interpreter.pycode import LazyCode
+        code = self.code
+        if isinstance(code, LazyCode):
+            code = code.load()
+            self.code = code
+        return code
+
     def fget_func_code(self, space):
-        return space.wrap(self.code)
+        return space.wrap(self.load_code())
 
     def fset_func_code(self, space, w_code):
         from pypy.interpreter.pycode import PyCode
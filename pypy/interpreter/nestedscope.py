@@ -215,13 +215,20 @@ class __extend__(pyframe.PyFrame):
     @jit.unroll_safe
     def MAKE_CLOSURE(self, numdefaults, next_instr):
         w_codeobj = self.popvalue()
-        codeobj = self.space.interp_w(pycode.PyCode, w_codeobj)
-        if codeobj.magic >= 0xa0df281:    # CPython 2.5 AST branch merge
+        codeobj = self.space.interpclass_w(w_codeobj)
+        if isinstance(codeobj, pycode.LazyCode):
+            magic = codeobj.magic
+            nfreevars = codeobj.nfreevars
+        else:
+            codeobj = self.space.interp_w(pycode.PyCode, w_codeobj)
+            magic = codeobj.magic
+            nfreevars = len(codeobj.co_freevars)
+        if magic >= 0xa0df281:    # CPython 2.5 AST branch merge
             w_freevarstuple = self.popvalue()
             freevars = [self.space.interp_w(Cell, cell)
                         for cell in self.space.fixedview(w_freevarstuple)]
         else:
-            n = len(codeobj.co_freevars)
+            n = nfreevars
             freevars = [None] * n
             while True:
                 n -= 1
@@ -116,10 +116,19 @@ class PyCode(eval.Code):
                         self._args_as_cellvars[i] = j
 
         self._compute_flatcall()
+        # only the frames of plain functions without cells can be recycled,
+        # see ExecutionContext.recycle_frame()
+        self.frames_can_be_recycled = (
+            self.co_flags & (CO_OPTIMIZED | CO_NEWLOCALS | CO_GENERATOR) ==
+                (CO_OPTIMIZED | CO_NEWLOCALS) and
+            len(self.co_cellvars) == 0 and len(self.co_freevars) == 0)
 
         if self.space.config.objspace.std.withmapdict:
             from pypy.objspace.std.mapdict import init_mapdict_cache
             init_mapdict_cache(self)
+        if self.space.config.objspace.std.withcellcache:
+            from pypy.objspace.std.celldict import init_cell_caches
+            init_cell_caches(self)
 
     def _freeze_(self):
         if (self.magic == cpython_magic and
@@ -145,6 +154,30 @@ class PyCode(eval.Code):
 
     co_names = property(lambda self: [self.space.unwrap(w_name) for w_name in self.co_names_w]) # for trace
 
+    # the KeywordsMapping of the call sites with keyword arguments, by
+    # offset in co_code; only used by the interpreter
+    _keywords_mappings = None
+
+    # the copy of co_code with superinstructions, built the first time the
+    # code runs in the interpreter; never used by the JIT
+    _quickened_code = None
+
+    def get_quickened_code(self):
+        code = self._quickened_code
+        if code is None:
+            from pypy.interpreter.quickening import quicken
+            code = quicken(self.co_code, self.co_firstlineno, self.co_lnotab)
+            self._quickened_code = code
+        return code
+
+    def get_code_to_dispatch(self):
+        """The bytecode run by the interpreter: the quickened one with
+        superinstructions, unless logbytecodes wants the real opcodes."""
+        config = self.space.config.objspace
+        if config.superinstructions and not config.logbytecodes:
+            return self.get_quickened_code()
+        return self.co_code
+
     def signature(self):
         return self._signature
 
@@ -232,11 +265,21 @@ class PyCode(eval.Code):
                 return w_first
         return space.w_None
 
+    def get_loaded_consts_w(self):
+        """The constants, with the LazyCodes replaced by the code objects
+        they load.  The interpreter itself uses co_consts_w directly."""
+        consts_w = self.co_consts_w[:]
+        for i in range(len(consts_w)):
+            w_const = consts_w[i]
+            if isinstance(w_const, LazyCode):
+                consts_w[i] = w_const.load()
+        return consts_w
+
     def _to_code(self):
         """For debugging only."""
         consts = [None] * len(self.co_consts_w)
         num = 0
-        for w in self.co_consts_w:
+        for w in self.get_loaded_consts_w():
             if isinstance(w, PyCode):
                 consts[num] = w._to_code()
             else:
@@ -269,7 +312,7 @@ class PyCode(eval.Code):
         dis.dis(co)
 
     def fget_co_consts(self, space):
-        return space.newtuple(self.co_consts_w)
+        return space.newtuple(self.get_loaded_consts_w())
 
     def fget_co_names(self, space):
         return space.newtuple(self.co_names_w)
@@ -306,8 +349,10 @@ class PyCode(eval.Code):
             if not space.eq_w(self.co_names_w[i], other.co_names_w[i]):
                 return space.w_False
 
-        for i in range(len(self.co_consts_w)):
-            if not space.eq_w(self.co_consts_w[i], other.co_consts_w[i]):
+        consts_w = self.get_loaded_consts_w()
+        other_consts_w = other.get_loaded_consts_w()
+        for i in range(len(consts_w)):
+            if not space.eq_w(consts_w[i], other_consts_w[i]):
                 return space.w_False
 
         return space.w_True
@@ -326,7 +371,7 @@ class PyCode(eval.Code):
         w_result = space.wrap(intmask(result))
         for w_name in self.co_names_w:
             w_result = space.xor(w_result, space.hash(w_name))
-        for w_const in self.co_consts_w:
+        for w_const in self.get_loaded_consts_w():
             w_result = space.xor(w_result, space.hash(w_const))
         return w_result
 
@@ -378,7 +423,7 @@ class PyCode(eval.Code):
             w(self.co_stacksize),
             w(self.co_flags),
             w(self.co_code),
-            space.newtuple(self.co_consts_w),
+            space.newtuple(self.get_loaded_consts_w()),
             space.newtuple(self.co_names_w),
             space.newtuple([w(v) for v in self.co_varnames]),
             w(self.co_filename),
@@ -397,3 +442,69 @@ class PyCode(eval.Code):
 
     def repr(self, space):
         return space.wrap(self.get_repr())
+
+
+class LazyCode(eval.Code):
+    """The code object of a function from a .pyc file, whose marshal data
+    is only unmarshalled when the function is first called.  It is found
+    in the co_consts_w of the enclosing PyCode; app-level code never sees
+    it, as func_code and co_consts return the loaded PyCode instead.
+    See interp_marshal.loads_lazy_code() and the objspace.lazycodeloading
+    option."""
+    _immutable_fields_ = ["space", "position", "stringindex", "nfreevars",
+                          "magic", "loaded_code?"]
+
+    def __init__(self, space, state, position, stringindex, nfreevars,
+                 filename, name):
+        eval.Code.__init__(self, name)
+        self.space = space
+        self.state = state              # the LazyCodeState of the .pyc
+        self.position = position        # where the code starts in its data
+        self.stringindex = stringindex  # index of its first interned string
+        self.nfreevars = nfreevars      # len(co_freevars), for MAKE_CLOSURE
+        self.co_filename = filename
+        self.magic = default_magic
+        self.loaded_code = None
+
+    @jit.dont_look_inside
+    def load(self):
+        pycode = self.loaded_code
+        if pycode is None:
+            from pypy.module.marshal.interp_marshal import LazyCodeUnmarshaller
+            space = self.space
+            u = LazyCodeUnmarshaller(space, self.state, self.position,
+                                     self.stringindex)
+            pycode = space.interp_w(PyCode, u.load_w_obj(False))
+            oldname = pycode.co_filename
+            if oldname != self.co_filename:
+                # the .pyc file was moved, see update_code_filenames()
+                pycode.co_filename = self.co_filename
+                for w_const in pycode.co_consts_w:
+                    if (isinstance(w_const, LazyCode) and
+                            w_const.co_filename == oldname):
+                        w_const.co_filename = self.co_filename
+            self.loaded_code = pycode
+            self.state = None
+        return pycode
+
+    def signature(self):
+        return self.load().signature()
+
+    def getvarnames(self):
+        return self.load().getvarnames()
+
+    def getdocstring(self, space):
+        return self.load().getdocstring(space)
+
+    def exec_code(self, space, w_globals, w_locals):
+        return self.load().exec_code(space, w_globals, w_locals)
+
+    def funcrun(self, func, args):
+        pycode = self.load()
+        func.code = pycode     # the next calls take the fast paths
+        return pycode.funcrun(func, args)
+
+    def funcrun_obj(self, func, w_obj, args):
+        pycode = self.load()
+        func.code = pycode
+        return pycode.funcrun_obj(func, w_obj, args)
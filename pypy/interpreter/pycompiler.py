@@ -102,7 +102,8 @@ class PythonAstCompiler(PyCodeCompiler):
     def __init__(self, space, override_version=None):
         PyCodeCompiler.__init__(self, space)
         self.future_flags = future.futureFlags_2_7
-        self.parser = pyparse.PythonParser(space, self.future_flags)
+        self.parser = pyparse.PythonParser(space, self.future_flags,
+                                           collapse_expressions=True)
         self.additional_rules = {}
         self.compiler_flags = self.future_flags.allowed_flags
 
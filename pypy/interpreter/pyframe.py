@@ -50,6 +50,7 @@ class PyFrame(eval.Frame):
     instr_prev_plus_one      = 0
     is_being_profiled        = False
     escaped                  = False  # see mark_as_escaped()
+    next_free_frame          = None   # see ExecutionContext.recycle_frame()
 
     def __init__(self, space, code, w_globals, closure):
         if not we_are_translated():
@@ -82,6 +83,46 @@ class PyFrame(eval.Frame):
         """
         self.escaped = True
 
+    def __spacebind__(self, space):
+        if space.config.objspace.recycle_frames:
+            # wrapping a frame exposes it to applevel: it must not be reused
+            self.mark_as_escaped()
+        return self
+
+    def clear_for_recycling(self):
+        """Drop the references to the objects used by the finished
+        execution of this frame, before it is kept in the free list of the
+        ExecutionContext."""
+        for i in range(len(self.locals_stack_w)):
+            self.locals_stack_w[i] = None
+        self.w_globals = None
+        self.w_locals = None
+        self.lastblock = None
+        self.last_exception = None
+        self.w_f_trace = None
+
+    def reinit(self, code, w_globals):
+        """Prepare a frame taken from the free list of the ExecutionContext
+        to run 'code', like a fresh frame.  'code' must have the same
+        number of locals and stack items as the previous code of the frame,
+        and no cells."""
+        assert isinstance(code, pycode.PyCode)
+        assert len(self.locals_stack_w) == code.co_nlocals + code.co_stacksize
+        self.pycode = code
+        self.w_globals = w_globals
+        self.nlocals = code.co_nlocals
+        self.valuestackdepth = code.co_nlocals
+        if self.space.config.objspace.honor__builtins__:
+            self.builtin = self.space.builtin.pick_builtin(w_globals)
+        self.f_lineno = code.co_firstlineno
+        self.frame_finished_execution = False
+        self.last_instr = -1
+        self.f_backref = jit.vref_None
+        self.instr_lb = 0
+        self.instr_ub = 0
+        self.instr_prev_plus_one = 0
+        self.is_being_profiled = False
+
     def append_block(self, block):
         assert block.previous is self.lastblock
         self.lastblock = block
@@ -184,6 +225,8 @@ class PyFrame(eval.Frame):
             got_exception = False
         finally:
             executioncontext.leave(self, w_exitvalue, got_exception)
+        if self.space.config.objspace.recycle_frames:
+            executioncontext.recycle_frame(self)
         return w_exitvalue
     execute_frame.insert_stack_check_here = True
 
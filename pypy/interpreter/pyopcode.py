@@ -8,7 +8,9 @@ import sys
 from pypy.interpreter.error import OperationError, operationerrfmt
 from pypy.interpreter.baseobjspace import Wrappable
 from pypy.interpreter import gateway, function, eval, pyframe, pytraceback
-from pypy.interpreter.pycode import PyCode
+from pypy.interpreter import quickening
+from pypy.interpreter.pycode import PyCode, LazyCode
+from pypy.interpreter.module import Module
 from pypy.tool.sourcetools import func_with_new_name
 from pypy.rlib.objectmodel import we_are_translated
 from pypy.rlib import jit, rstackovf
@@ -78,7 +80,7 @@ class __extend__(pyframe.PyFrame):
     def dispatch(self, pycode, next_instr, ec):
         # For the sequel, force 'next_instr' to be unsigned for performance
         next_instr = r_uint(next_instr)
-        co_code = pycode.co_code
+        co_code = pycode.get_code_to_dispatch()
 
         try:
             while True:
@@ -228,7 +230,13 @@ class __extend__(pyframe.PyFrame):
             if opcode == self.opcodedesc.JUMP_ABSOLUTE.index:
                 return self.jump_absolute(oparg, next_instr, ec)
 
-            if we_are_translated():
+            if (space.config.objspace.superinstructions and
+                    opcode >= quickening.FIRST_SUPERINSTRUCTION):
+                # only found in the quickened copy of co_code
+                next_instr = self.dispatch_superinstruction(opcode, oparg,
+                                                            next_instr,
+                                                            co_code)
+            elif we_are_translated():
                 for opdesc in unrolling_all_opcode_descs:
                     # static checks to skip this whole case if necessary
                     if opdesc.bytecode_spec is not self.bytecode_spec:
@@ -281,6 +289,35 @@ class __extend__(pyframe.PyFrame):
             if jit.we_are_jitted():
                 return next_instr
 
+    def dispatch_superinstruction(self, opcode, oparg, next_instr, co_code):
+        # execute the two instructions of a pair, see quickening.py.  The
+        # second instruction has an argument and no EXTENDED_ARG
+        lo = ord(co_code[next_instr+1])
+        hi = ord(co_code[next_instr+2])
+        oparg2 = (hi * 256) | lo
+        if opcode == quickening.LOAD_FAST_LOAD_FAST:
+            self.LOAD_FAST(oparg, next_instr)
+            self.last_instr = intmask(next_instr)
+            self.LOAD_FAST(oparg2, next_instr + 3)
+        elif opcode == quickening.LOAD_FAST_LOAD_ATTR:
+            self.LOAD_FAST(oparg, next_instr)
+            self.last_instr = intmask(next_instr)
+            self.LOAD_ATTR(oparg2, next_instr + 3)
+        elif opcode == quickening.LOAD_FAST_LOAD_CONST:
+            self.LOAD_FAST(oparg, next_instr)
+            self.last_instr = intmask(next_instr)
+            self.LOAD_CONST(oparg2, next_instr + 3)
+        elif opcode == quickening.STORE_FAST_LOAD_FAST:
+            self.STORE_FAST(oparg, next_instr)
+            self.last_instr = intmask(next_instr)
+            self.LOAD_FAST(oparg2, next_instr + 3)
+        elif opcode == quickening.COMPARE_OP_POP_JUMP_IF_FALSE:
+            return self.COMPARE_OP_POP_JUMP_IF_FALSE(oparg, oparg2,
+                                                     next_instr)
+        else:
+            raise BytecodeCorruption("bad superinstruction")
+        return next_instr + 3
+
     @jit.unroll_safe
     def unrollstack(self, unroller_kind):
         while self.blockstack_non_empty():
@@ -692,7 +729,13 @@ class __extend__(pyframe.PyFrame):
     _load_global_failed._dont_inline_ = True
 
     def LOAD_GLOBAL(self, nameindex, next_instr):
-        self.pushvalue(self._load_global(self.getname_u(nameindex)))
+        if (self.space.config.objspace.std.withcellcache
+            and not jit.we_are_jitted()):
+            from pypy.objspace.std.celldict import LOAD_GLOBAL_caching
+            w_value = LOAD_GLOBAL_caching(self, nameindex)
+        else:
+            w_value = self._load_global(self.getname_u(nameindex))
+        self.pushvalue(w_value)
     LOAD_GLOBAL._always_inline_ = True
 
     def DELETE_FAST(self, varindex, next_instr):
@@ -716,7 +759,12 @@ class __extend__(pyframe.PyFrame):
     def LOAD_ATTR(self, nameindex, next_instr):
         "obj.attributename"
         w_obj = self.popvalue()
-        if (self.space.config.objspace.std.withmapdict
+        if (self.space.config.objspace.std.withcellcache
+            and not jit.we_are_jitted() and isinstance(w_obj, Module)):
+            from pypy.objspace.std.celldict import LOAD_ATTR_module_caching
+            w_value = LOAD_ATTR_module_caching(self.getcode(), w_obj,
+                                               nameindex)
+        elif (self.space.config.objspace.std.withmapdict
             and not jit.we_are_jitted()):
             from pypy.objspace.std.mapdict import LOAD_ATTR_caching
             w_value = LOAD_ATTR_caching(self.getcode(), w_obj, nameindex)
@@ -782,6 +830,11 @@ class __extend__(pyframe.PyFrame):
             raise BytecodeCorruption, "bad COMPARE_OP oparg"
         self.pushvalue(w_result)
 
+    def COMPARE_OP_POP_JUMP_IF_FALSE(self, testnum, target, next_instr):
+        self.COMPARE_OP(testnum, next_instr)
+        self.last_instr = intmask(next_instr)
+        return self.POP_JUMP_IF_FALSE(target, next_instr + 3)
+
     def IMPORT_NAME(self, nameindex, next_instr):
         space = self.space
         w_modulename = self.getname_w(nameindex)
@@ -961,10 +1014,66 @@ class __extend__(pyframe.PyFrame):
                 self.space.w_None,
                 self.space.w_None)
 
+    def call_keywords_fast(self, w_function, w_self, n_arguments, n_keywords):
+        """Call w_function with the positional and keyword arguments that
+        are on the value stack, and w_self as first argument if it is not
+        None, by writing them directly into the new frame.  The matching of
+        the keywords is computed once per call site.  Returns None if this
+        is not possible; the caller must then do a regular call."""
+        if w_self is None and isinstance(w_function, function.Method):
+            w_self = w_function.w_instance
+            if w_self is None:
+                return None
+            w_function = w_function.w_function
+        if not isinstance(w_function, function.Function):
+            return None
+        code = w_function.getcode()
+        if not (code.fast_natural_arity & eval.Code.FLATPYCALL):
+            return None
+        assert isinstance(code, PyCode)
+        nargs = n_arguments + (w_self is not None)
+        mapping = self._get_keywords_mapping(code, nargs, n_keywords)
+        if mapping is None:
+            return None
+        return w_function._flat_pycall_keywords(code, mapping, w_self, self)
+
+    @jit.dont_look_inside
+    def _get_keywords_mapping(self, code, nargs, n_keywords):
+        from pypy.interpreter.argument import match_keywords
+        pycode = self.getcode()
+        mappings = pycode._keywords_mappings
+        if mappings is None:
+            mappings = pycode._keywords_mappings = {}
+        mapping = mappings.get(self.last_instr, None)
+        if (mapping is not None and mapping.signature is code.signature() and
+                mapping.nargs == nargs and len(mapping.keys_w) == n_keywords):
+            for i in range(n_keywords):
+                w_key = self.peekvalue(2 * (n_keywords - 1 - i) + 1)
+                if w_key is not mapping.keys_w[i]:
+                    break
+            else:
+                return mapping
+        keys_w = [self.peekvalue(2 * (n_keywords - 1 - i) + 1)
+                      for i in range(n_keywords)]
+        mapping = match_keywords(self.space, code.signature(), nargs, keys_w)
+        if mapping is not None:
+            mappings[self.last_instr] = mapping
+        return mapping
+
     @jit.unroll_safe
     def call_function(self, oparg, w_star=None, w_starstar=None):
         n_arguments = oparg & 0xff
         n_keywords = (oparg>>8) & 0xff
+        if (n_keywords and w_star is None and w_starstar is None and
+                not self.space.config.objspace.disable_call_speedhacks and
+                not jit.we_are_jitted()):
+            w_function = self.peekvalue(n_arguments + 2 * n_keywords)
+            w_result = self.call_keywords_fast(w_function, None, n_arguments,
+                                               n_keywords)
+            if w_result is not None:
+                self.dropvalues(n_arguments + 2 * n_keywords + 1)
+                self.pushvalue(w_result)
+                return
         if n_keywords:
             keywords = [None] * n_keywords
             keywords_w = [None] * n_keywords
@@ -1022,7 +1131,9 @@ class __extend__(pyframe.PyFrame):
 
     def MAKE_FUNCTION(self, numdefaults, next_instr):
         w_codeobj = self.popvalue()
-        codeobj = self.space.interp_w(PyCode, w_codeobj)
+        codeobj = self.space.interpclass_w(w_codeobj)
+        if not isinstance(codeobj, LazyCode):
+            codeobj = self.space.interp_w(PyCode, w_codeobj)
         defaultarguments = self.popvalues(numdefaults)
         fn = function.Function(self.space, codeobj, self.w_globals,
                                defaultarguments)
@@ -22,27 +22,43 @@ DEFAULT = "\00default" # XXX hack, the rtyper does not support dict of with str|
 # PYPY Modification : removed all automata functions (any, maybe,
 #                     newArcPair, etc.)
 
+# PYPY Modification: the arcs of all the states are stored in a single
+#                    string, indexed by 'state * 256 + ord(char)' and
+#                    giving the next state, or NO_ARC.  This makes every
+#                    step of recognize() a couple of string lookups,
+#                    instead of dictionary lookups.
+NO_ARC = 255
+
+def build_table(states):
+    """NOT_RPYTHON: the transition table of a list of arc dicts"""
+    assert len(states) < NO_ARC
+    table = []
+    for arcMap in states:
+        default = arcMap.get(DEFAULT, NO_ARC)
+        for i in range(256):
+            table.append(chr(arcMap.get(chr(i), default)))
+    return ''.join(table)
+
 class DFA:
     # ____________________________________________________________
     def __init__(self, states, accepts, start = 0):
+        """NOT_RPYTHON"""
         self.states = states
         self.accepts = accepts
         self.start = start
+        self.table = build_table(states)
 
     # ____________________________________________________________
     def recognize (self, inVec, pos = 0): # greedy = True
         crntState = self.start
         lastAccept = False
         i = pos
+        table = self.table
         for i in range(pos, len(inVec)):
-            item = inVec[i]
-            # arcMap, accept = self.states[crntState]
-            arcMap = self.states[crntState]
             accept = self.accepts[crntState]
-            if item in arcMap:
-                crntState = arcMap[item]
-            elif DEFAULT in arcMap:
-                crntState = arcMap[DEFAULT]
+            nextState = ord(table[crntState * 256 + ord(inVec[i])])
+            if nextState != NO_ARC:
+                crntState = nextState
             elif accept:
                 return i
             elif lastAccept:
@@ -66,17 +82,12 @@ class NonGreedyDFA (DFA):
     def recognize (self, inVec, pos = 0):
         crntState = self.start
         i = pos
-        for item in inVec[pos:]:
-            # arcMap, accept = self.states[crntState]
-            arcMap = self.states[crntState]
-            accept = self.accepts[crntState]
-            if accept:
+        table = self.table
+        while i < len(inVec):
+            if self.accepts[crntState]:
                 return i
-            elif item in arcMap:
-                crntState = arcMap[item]
-            elif DEFAULT in arcMap:
-                crntState = arcMap[DEFAULT]
-            else:
+            crntState = ord(table[crntState * 256 + ord(inVec[i])])
+            if crntState == NO_ARC:
                 return -1
             i += 1
         # if self.states[crntState][1]:
@@ -150,8 +150,32 @@ class ParserGenerator(object):
             gram.dfas.append((states, self.make_first(gram, name)))
             assert len(gram.dfas) - 1 == gram.symbol_ids[name] - 256
         gram.start = gram.symbol_ids[self.start_symbol]
+        gram.transitions = self.make_transitions(gram)
         return gram
 
+    def make_transitions(self, gram):
+        """For each state of each DFA, map the label of every token that
+        can come next to the index of the arc to follow: either the arc of
+        the token itself, or the arc of the non-terminal that it starts.
+        This saves the parser from trying all the arcs for every token."""
+        all_transitions = []
+        for states, first in gram.dfas:
+            dfa_transitions = []
+            for arcs, is_final in states:
+                transitions = {}
+                for arc_index in range(len(arcs)):
+                    label, next = arcs[arc_index]
+                    sym_id = gram.labels[label]
+                    if sym_id >= 256:
+                        sub_first = gram.dfas[sym_id - 256][1]
+                        for sub_label in sub_first:
+                            transitions.setdefault(sub_label, arc_index)
+                    else:
+                        transitions.setdefault(label, arc_index)
+                dfa_transitions.append(transitions)
+            all_transitions.append(dfa_transitions)
+        return all_transitions
+
     def make_label(self, gram, label):
         label_index = len(gram.labels)
         if label[0].isalpha():
@@ -17,6 +17,7 @@ class Grammar(object):
         self.symbol_to_label = {}
         self.keyword_ids = {}
         self.dfas = []
+        self.transitions = []
         self.labels = [0]
         self.token_ids = {}
         self.start = -1
@@ -27,6 +28,7 @@ class Grammar(object):
         new.symbols_names = self.symbol_names
         new.keyword_ids = self.keyword_ids
         new.dfas = self.dfas
+        new.transitions = self.transitions
         new.labels = self.labels
         new.token_ids = self.token_ids
         return new
@@ -84,6 +86,11 @@ class ParseError(Exception):
 
 class Parser(object):
 
+    # if not None, a list of flags, indexed by the symbol ids minus 256:
+    # the nodes of the flagged non-terminals that have a single child are
+    # replaced with this child in the tree (see pop())
+    collapsible = None
+
     def __init__(self, grammar):
         self.grammar = grammar
         self.root = None
@@ -103,13 +110,14 @@ class Parser(object):
 
     def add_token(self, token_type, value, lineno, column, line):
         label_index = self.classify(token_type, value, lineno, column, line)
-        sym_id = 0 # for the annotator
         while True:
             dfa, state_index, node = self.stack[-1]
             states, first = dfa
             arcs, is_accepting = states[state_index]
-            for i, next_state in arcs:
-                sym_id = self.grammar.labels[i]
+            transitions = self.grammar.transitions[node.type - 256]
+            arc_index = transitions[state_index].get(label_index, -1)
+            if arc_index >= 0:
+                i, next_state = arcs[arc_index]
                 if label_index == i:
                     # We matched a non-terminal.
                     self.shift(next_state, token_type, value, lineno, column)
@@ -124,13 +132,12 @@ class Parser(object):
                         dfa, state_index, node = self.stack[-1]
                         state = dfa[0][state_index]
                     return False
-                elif sym_id >= 256:
+                else:
+                    # This token starts a child node.
+                    sym_id = self.grammar.labels[i]
                     sub_node_dfa = self.grammar.dfas[sym_id - 256]
-                    # Check if this token can start a child node.
-                    if label_index in sub_node_dfa[1]:
-                        self.push(sub_node_dfa, next_state, sym_id, lineno,
-                                  column)
-                        break
+                    self.push(sub_node_dfa, next_state, sym_id, lineno,
+                              column)
             else:
                 # We failed to find any arcs to another state, so unless this
                 # state is accepting, it's invalid input.
@@ -143,7 +150,7 @@ class Parser(object):
                     # If only one possible input would satisfy, attach it to the
                     # error.
                     if len(arcs) == 1:
-                        expected = sym_id
+                        expected = self.grammar.labels[arcs[0][0]]
                     else:
                         expected = -1
                     raise ParseError("bad input", token_type, value, lineno,
@@ -179,6 +186,10 @@ class Parser(object):
         """Pop an entry off the stack and make its node a child of the last."""
         dfa, state, node = self.stack.pop()
         if self.stack:
+            collapsible = self.collapsible
+            if (collapsible is not None and len(node.children) == 1 and
+                    collapsible[node.type - 256]):
+                node = node.children[0]
             self.stack[-1][2].children.append(node)
         else:
             self.root = node
@@ -86,13 +86,35 @@ _targets = {
 'exec' : pygram.syms.file_input,
 }
 
+def _make_collapsible(grammar):
+    """NOT_RPYTHON"""
+    # the rules of the chain that leads from 'test' down to 'atom': most
+    # expressions only use one alternative of each of them, which gives
+    # nodes with a single child that the astbuilder just walks through
+    names = ["test", "old_test", "or_test", "and_test", "not_test",
+             "comparison", "expr", "xor_expr", "and_expr", "shift_expr",
+             "arith_expr", "term", "factor", "power"]
+    collapsible = [False] * len(grammar.dfas)
+    for name in names:
+        collapsible[grammar.symbol_ids[name] - 256] = True
+    return collapsible
+
+_collapsible = _make_collapsible(pygram.python_grammar)
+
+
 class PythonParser(parser.Parser):
 
     def __init__(self, space, future_flags=future.futureFlags_2_7,
-                 grammar=pygram.python_grammar):
+                 grammar=pygram.python_grammar, collapse_expressions=False):
+        """If collapse_expressions is True, the parse tree leaves out the
+        nodes of the expression rules that have a single child.  The
+        astbuilder accepts such trees, but the parser module does not."""
         parser.Parser.__init__(self, grammar)
         self.space = space
         self.future_flags = future_flags
+        if collapse_expressions:
+            assert grammar is pygram.python_grammar
+            self.collapsible = _collapsible
 
     def parse_source(self, textsrc, compile_info):
         """Main entry point for parsing Python source.
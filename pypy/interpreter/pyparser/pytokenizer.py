@@ -43,6 +43,16 @@ def match_encoding_declaration(comment):
         return encoding
     return None
 
+def starts_string(line, start, end):
+    """Check if the token line[start:end] is (the start of) a string
+    literal, i.e. if there is a quote after at most two prefix letters."""
+    i = start
+    while i < end and i < start + 3:
+        if line[i] == "'" or line[i] == '"':
+            return True
+        i += 1
+    return False
+
 
 def generate_tokens(lines, flags):
     """
@@ -80,8 +90,7 @@ def generate_tokens(lines, flags):
     last_comment = ''
     parenlevstart = (0, 0, "")
 
-    # make the annotator happy
-    endDFA = automata.DFA([], [])
+    endDFA = None
     # make the annotator happy
     line = ''
     pos = 0
@@ -171,9 +180,12 @@ def generate_tokens(lines, flags):
                                      lnum, start + 1, token_list)
 
                 pos = end
-                token, initial = line[start:end], line[start]
+                # the token itself is only sliced out of the line when
+                # it is needed
+                initial = line[start]
                 if initial in numchars or \
-                   (initial == '.' and token != '.'):      # ordinary number
+                   (initial == '.' and end - start > 1):  # ordinary number
+                    token = line[start:end]
                     token_list.append((tokens.NUMBER, token, lnum, start, line))
                     last_comment = ''
                 elif initial in '\r\n':
@@ -183,25 +195,24 @@ def generate_tokens(lines, flags):
                     last_comment = ''
                 elif initial == '#':
                     # skip comment
-                    last_comment = token
-                elif token in triple_quoted:
-                    endDFA = endDFAs[token]
-                    endmatch = endDFA.recognize(line, pos)
-                    if endmatch >= 0:                     # all on one line
-                        pos = endmatch
-                        token = line[start:pos]
-                        tok = (tokens.STRING, token, lnum, start, line)
-                        token_list.append(tok)
-                        last_comment = ''
-                    else:
-                        strstart = (lnum, start, line)
-                        contstr = line[start:]
-                        contline = line
-                        break
-                elif initial in single_quoted or \
-                    token[:2] in single_quoted or \
-                    token[:3] in single_quoted:
-                    if token[-1] == '\n':                  # continued string
+                    last_comment = line[start:end]
+                elif starts_string(line, start, end):
+                    token = line[start:end]
+                    if token in triple_quoted:
+                        endDFA = endDFAs[token]
+                        endmatch = endDFA.recognize(line, pos)
+                        if endmatch >= 0:                 # all on one line
+                            pos = endmatch
+                            token = line[start:pos]
+                            tok = (tokens.STRING, token, lnum, start, line)
+                            token_list.append(tok)
+                            last_comment = ''
+                        else:
+                            strstart = (lnum, start, line)
+                            contstr = line[start:]
+                            contline = line
+                            break
+                    elif token[-1] == '\n':                # continued string
                         strstart = (lnum, start, line)
                         endDFA = (endDFAs[initial] or endDFAs[token[1]] or
                                    endDFAs[token[2]])
@@ -213,11 +224,13 @@ def generate_tokens(lines, flags):
                         token_list.append(tok)
                         last_comment = ''
                 elif initial in namechars:                 # ordinary name
+                    token = line[start:end]
                     token_list.append((tokens.NAME, token, lnum, start, line))
                     last_comment = ''
                 elif initial == '\\':                      # continued stmt
                     continued = 1
                 else:
+                    token = line[start:end]
                     if initial in '([{':
                         if parenlev == 0:
                             parenlevstart = (lnum, start, line)
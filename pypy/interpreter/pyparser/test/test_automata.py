@@ -0,0 +1,29 @@
+from pypy.interpreter.pyparser.automata import DFA, NonGreedyDFA, DEFAULT
+from pypy.interpreter.pyparser import pytokenizer
+
+
+def test_states():
+    d = DFA([{"a": 1}, {"b": 1}], [False, True])
+    assert d.recognize("abbbc") == 4
+    assert d.recognize("ab") == 2
+    assert d.recognize("c") == -1
+    assert d.recognize("xab", 1) == 3
+
+def test_default():
+    d = DFA([{"a": 1}, {DEFAULT: 1, "\n": 2}, {}], [False, False, True])
+    assert d.recognize("axy\n") == 4
+    assert d.recognize("a\xff\x00\n") == 4
+    assert d.recognize("axy") == -1
+
+def test_nongreedy():
+    d = NonGreedyDFA([{"a": 1}, {"b": 1}], [False, True])
+    assert d.recognize("abbbc") == 1
+    assert d.recognize("c") == -1
+    assert d.recognize("xab", 1) == 2
+
+def test_starts_string():
+    line = "x = ur'abc' + b\"\" + bar"
+    assert pytokenizer.starts_string(line, 4, 11)
+    assert pytokenizer.starts_string(line, 14, 17)
+    assert not pytokenizer.starts_string(line, 0, 1)
+    assert not pytokenizer.starts_string(line, 20, 23)
@@ -92,6 +92,21 @@ class TestParserGenerator:
         exc = py.test.raises(PgenError, self.gram_for, "foo: no_rule").value
         assert str(exc) == "no such rule: 'no_rule'"
 
+    def test_transitions(self):
+        g = self.gram_for("foo: bar | NUMBER\nbar: NAME | STRING")
+        foo_states, foo_first = g.dfas[g.symbol_ids["foo"] - 256]
+        name = g.token_ids[token.NAME]
+        string = g.token_ids[token.STRING]
+        number = g.token_ids[token.NUMBER]
+        transitions = g.transitions[g.symbol_ids["foo"] - 256][0]
+        assert sorted(transitions.keys()) == sorted([name, string, number])
+        arcs = foo_states[0][0]
+        assert arcs[transitions[name]][0] == g.symbol_to_label["bar"]
+        assert arcs[transitions[string]][0] == g.symbol_to_label["bar"]
+        assert arcs[transitions[number]][0] == number
+        # no transitions out of the final state
+        assert g.transitions[g.symbol_ids["foo"] - 256][1] == {}
+
     def test_repeaters(self):
         g1 = self.gram_for("foo: NAME+")
         g2 = self.gram_for("foo: NAME*")
@@ -144,3 +144,23 @@ pass"""
         self.parse('0b1101')
         self.parse('0b0l')
         py.test.raises(SyntaxError, self.parse, "0b112")
+
+    def test_collapse_expressions(self):
+        parser = pyparse.PythonParser(self.space, collapse_expressions=True)
+        info = pyparse.CompileInfo("<test>", "eval")
+        tree = parser.parse_source("x", info)
+        testlist = tree.children[0]
+        assert testlist.type == syms.testlist
+        assert testlist.children[0].type == syms.atom
+        tree = parser.parse_source("a + b * -c ** d", info)
+        arith_expr = tree.children[0].children[0]
+        assert arith_expr.type == syms.arith_expr
+        a, plus, term = arith_expr.children
+        assert a.type == syms.atom
+        assert term.type == syms.term
+        b, star, factor = term.children
+        assert factor.type == syms.factor
+        assert factor.children[1].type == syms.power
+        # the full tree is still the default
+        tree = self.parse("x", "eval")
+        assert tree.children[0].children[0].type == syms.test
@@ -0,0 +1,90 @@
+"""
+Superinstructions for the interpreter.
+
+A quickened copy of co_code is made lazily for every code object that is
+run by the interpreter (see PyCode.get_quickened_code()).  It has exactly
+the same layout as co_code, so that all the offsets (jump targets,
+f_lasti, the line number table) stay valid; only the opcode byte of the
+first instruction of some common pairs is replaced by one of the internal
+opcodes below.  When the interpreter finds such an opcode, it executes
+both instructions of the pair without going through the main dispatch
+loop in between.  co_code itself is never changed, and the JIT always
+traces the original co_code.
+
+The second instruction of a pair is left untouched, so jumping to it
+still works.  Pairs are not formed if the second instruction starts a new
+line, to keep the 'line' events of sys.settrace() unchanged.
+"""
+
+from pypy.tool.stdlib_opcode import bytecode_spec
+
+opmap = bytecode_spec.opmap
+HAVE_ARGUMENT = bytecode_spec.HAVE_ARGUMENT
+EXTENDED_ARG = opmap['EXTENDED_ARG']
+
+# the internal opcodes; they are not used by CPython 2.7 nor by the opcodes
+# specific to PyPy, and are all >= HAVE_ARGUMENT
+FIRST_SUPERINSTRUCTION = 240
+LOAD_FAST_LOAD_FAST = 240
+LOAD_FAST_LOAD_ATTR = 241
+LOAD_FAST_LOAD_CONST = 242
+STORE_FAST_LOAD_FAST = 243
+COMPARE_OP_POP_JUMP_IF_FALSE = 244
+
+superinstructions = {
+    (opmap['LOAD_FAST'], opmap['LOAD_FAST']): LOAD_FAST_LOAD_FAST,
+    (opmap['LOAD_FAST'], opmap['LOAD_ATTR']): LOAD_FAST_LOAD_ATTR,
+    (opmap['LOAD_FAST'], opmap['LOAD_CONST']): LOAD_FAST_LOAD_CONST,
+    (opmap['STORE_FAST'], opmap['LOAD_FAST']): STORE_FAST_LOAD_FAST,
+    (opmap['COMPARE_OP'], opmap['POP_JUMP_IF_FALSE']):
+        COMPARE_OP_POP_JUMP_IF_FALSE,
+    }
+
+assert min(opmap.values() + [HAVE_ARGUMENT]) >= 0
+assert max(opmap.values()) < FIRST_SUPERINSTRUCTION
+for (_op1, _op2) in superinstructions:
+    # both instructions of every pair have an argument
+    assert _op1 >= HAVE_ARGUMENT and _op2 >= HAVE_ARGUMENT
+
+
+def find_linestarts(co_code, firstlineno, lnotab):
+    """Return a list of booleans telling, for every offset in co_code,
+    if an instruction starting a new line is at this offset (like
+    dis.findlinestarts())."""
+    linestarts = [False] * (len(co_code) + 1)
+    lastlineno = -1
+    lineno = firstlineno
+    addr = 0
+    for i in range(0, len(lnotab) - 1, 2):
+        byte_incr = ord(lnotab[i])
+        line_incr = ord(lnotab[i + 1])
+        if byte_incr:
+            if lineno != lastlineno and addr < len(linestarts):
+                linestarts[addr] = True
+                lastlineno = lineno
+            addr += byte_incr
+        lineno += line_incr
+    if lineno != lastlineno and addr < len(linestarts):
+        linestarts[addr] = True
+    return linestarts
+
+def quicken(co_code, firstlineno, lnotab):
+    """Return the quickened copy of co_code."""
+    linestarts = find_linestarts(co_code, firstlineno, lnotab)
+    result = [co_code[i] for i in range(len(co_code))]
+    after_extended_arg = False
+    i = 0
+    while i < len(co_code):
+        opcode = ord(co_code[i])
+        if opcode >= HAVE_ARGUMENT:
+            next_i = i + 3
+        else:
+            next_i = i + 1
+        if (not after_extended_arg and next_i + 3 <= len(co_code) and
+                not linestarts[next_i]):
+            key = (opcode, ord(co_code[next_i]))
+            if key in superinstructions:
+                result[i] = chr(superinstructions[key])
+        after_extended_arg = opcode == EXTENDED_ARG
+        i = next_i
+    return ''.join(result)
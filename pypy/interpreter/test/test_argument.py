@@ -2,7 +2,7 @@
 import py
 from pypy.interpreter.argument import (Arguments, ArgumentsForTranslation,
     ArgErr, ArgErrUnknownKwds, ArgErrMultipleValues, ArgErrCount, rawshape,
-    Signature)
+    Signature, match_keywords)
 from pypy.interpreter.error import OperationError
 
 
@@ -566,7 +566,112 @@ class TestErrorHandling(object):
         s = err.getmsg('foo')
         assert s == "foo() got multiple values for keyword argument 'bla'"
 
+class KeywordsDummySpace(DummySpace):
+    def type(self, obj):
+        return type(obj)
+
+    def is_w(self, w_one, w_two):
+        return w_one is w_two
+
+
+class TestMatchKeywords(object):
+    def setup_class(cls):
+        cls.kwspace = KeywordsDummySpace()
+
+    def test_match(self):
+        sig = Signature(["a", "b", "c", "d"], None, None)
+        mapping = match_keywords(self.kwspace, sig, 1, ["d", "b"])
+        assert mapping.signature is sig
+        assert mapping.nargs == 1
+        assert mapping.keys_w == ["d", "b"]
+        assert mapping.slots == [3, 1]
+        assert mapping.missing == [2]
+        mapping = match_keywords(self.kwspace, sig, 0, ["d", "c", "b", "a"])
+        assert mapping.slots == [3, 2, 1, 0]
+        assert mapping.missing == []
+
+    def test_no_match(self):
+        sig = Signature(["a", "b"], None, None)
+        assert match_keywords(self.kwspace, sig, 1, ["a"]) is None
+        assert match_keywords(self.kwspace, sig, 0, ["b", "b"]) is None
+        assert match_keywords(self.kwspace, sig, 0, ["x"]) is None
+        assert match_keywords(self.kwspace, sig, 3, ["b"]) is None
+        assert match_keywords(self.kwspace, sig, 0, [u"b"]) is None
+        sig = Signature(["a", "b"], "args", None)
+        assert match_keywords(self.kwspace, sig, 0, ["b"]) is None
+        sig = Signature(["a", "b"], None, "kwargs")
+        assert match_keywords(self.kwspace, sig, 0, ["b"]) is None
+
+
 class AppTestArgument:
+    def test_keywords_call_site(self):
+        def f(a, b, c=3, d=4):
+            return (a, b, c, d)
+        def g(a, b, c=5, d=6):
+            return (d, c, b, a)
+        def call(func, x):
+            return func(x, d=x * 2, b=7)
+        for i in range(3):
+            assert call(f, i) == (i, 7, 3, i * 2)
+            assert call(g, i) == (i * 2, 5, 7, i)
+        f.func_defaults = (8, 9)
+        assert call(f, 1) == (1, 7, 8, 2)
+        f.func_defaults = (8,)
+        raises(TypeError, call, f, 1)
+        def h(a, d):
+            return a - d
+        assert call(lambda a, b, d: (a, b, d), 1) == (1, 7, 2)
+        raises(TypeError, call, h, 1)
+        raises(TypeError, call, lambda a, b, d, e: 0, 1)
+        raises(TypeError, "call(lambda b, d: 0, 1)")
+
+    def test_keywords_method_call(self):
+        class A(object):
+            def m(self, a, b=2, c=3):
+                return (self, a, b, c)
+        a = A()
+        for i in range(3):
+            assert a.m(c=i, a=5) == (a, 5, 2, i)
+            m = a.m
+            assert m(1, c=i) == (a, 1, 2, i)
+            assert A.m(a, 1, c=i) == (a, 1, 2, i)
+        raises(TypeError, "a.m(1, a=2)")
+        raises(TypeError, "a.m(1, self=2)")
+        raises(TypeError, "A.m(a=1, self=a)")
+
+    def test_keywords_closure_args(self):
+        def f(a, b):
+            def g():
+                return a + b
+            return g
+        assert f(b=2, a=1)() == 3
+
+    def test_starstar_forwarding(self):
+        def f(a, b, c=3, d=4):
+            return (a, b, c, d)
+        def wrapper(*args, **kwargs):
+            return f(*args, **kwargs)
+        def wrapper2(x, **kwargs):
+            return f(x, **kwargs)
+        for i in range(3):
+            assert wrapper(1, 2, d=i) == (1, 2, 3, i)
+            assert wrapper(b=i, a=5) == (5, i, 3, 4)
+            assert wrapper2(1, b=2) == (1, 2, 3, 4)
+            assert wrapper2(1, **{'b': 2, 'c': i}) == (1, 2, i, 4)
+        raises(TypeError, wrapper, 1, a=2)
+        raises(TypeError, wrapper, 1, e=2)
+        raises(TypeError, "wrapper(1, **{5: 6})")
+        raises(TypeError, wrapper2, 1)
+        raises(TypeError, wrapper, 1, 2, 3, 4, 5)
+        class D(dict):
+            pass
+        assert f(1, **D(b=2)) == (1, 2, 3, 4)
+        class A(object):
+            def m(self, a, b=2):
+                return (a, b)
+        assert A().m(**{'a': 5}) == (5, 2)
+        raises(TypeError, A.m, **{'a': 5})
+
     def test_error_message(self):
         exc = raises(TypeError, (lambda a, b=2: 0), b=3)
         assert exc.value.message == "<lambda>() takes at least 1 non-keyword argument (0 given)"
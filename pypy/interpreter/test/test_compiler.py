@@ -910,6 +910,40 @@ class AppTestOptimizer:
         output = s.getvalue()
         assert "LOAD_GLOBAL" not in output
 
+    def test_in_constant_folding(self):
+        co = compile("x in [1, 2, 3]", "<test>", "eval")
+        assert (1, 2, 3) in co.co_consts
+        co = compile("x not in {1, 2, 3}", "<test>", "eval")
+        assert frozenset([1, 2, 3]) in co.co_consts
+        co = compile("x in [1, y]", "<test>", "eval")
+        assert not [w for w in co.co_consts if isinstance(w, tuple)]
+        assert eval("3 in [1, 2, 3]") is True
+        assert eval("3 not in {1, 2, 3}") is False
+        assert eval("[] in [(), 1]") is False
+        assert eval("1 < 2 in [2, 3]") is True
+
+    def test_jumps_and_dead_code(self):
+        def f(l):
+            result = []
+            for x in l:
+                if x < 0:
+                    continue
+                    result.append('dead')
+                elif x > 10:
+                    break
+                    result.append('dead')
+                else:
+                    if x % 2:
+                        result.append(x)
+            else:
+                result.append('else')
+            while l:
+                if l.pop() and l:
+                    result.append(len(l))
+            return result
+        assert f([1, -2, 3, 4]) == [1, 3, 'else', 3, 2, 1]
+        assert f([5, 12, 7]) == [5, 2, 1]
+
 class AppTestCallMethod(object):
     def setup_class(cls):
         cls.space = gettestobjspace(**{'objspace.opcodes.CALL_METHOD': True})
@@ -97,3 +97,30 @@ def test_new_exception(space):
     assert operr.match(space, space.w_ValueError)
     assert operr.match(space, space.w_TypeError)
 
+
+def test_record_traceback(space):
+    from pypy.interpreter.pytraceback import PyTraceback
+    class FakeFrame:
+        escaped = False
+        def __init__(self, space):
+            self.space = space
+        def mark_as_escaped(self):
+            self.escaped = True
+    frame1 = FakeFrame(space)
+    frame2 = FakeFrame(space)
+    operr = OperationError(space.w_ValueError, space.wrap("message"))
+    operr.record_traceback(frame1, 5)
+    # the entry of the innermost frame is not a PyTraceback yet
+    assert operr._application_traceback is None
+    operr.record_traceback(frame2, 7)
+    tb = operr._application_traceback
+    assert isinstance(tb, PyTraceback)
+    assert tb.frame is frame1 and tb.next is None
+    tb = operr.get_traceback()
+    assert tb.frame is frame2 and tb.lasti == 7
+    assert tb.next.frame is frame1 and tb.next.lasti == 5
+    assert frame2.escaped
+    assert operr.get_traceback() is tb
+    operr.record_traceback(frame1, 9)
+    operr.set_traceback(None)
+    assert operr.get_traceback() is None
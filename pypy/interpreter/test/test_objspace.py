@@ -65,8 +65,9 @@ class TestObjSpace:
         w = space.wrap
         l = [w(1), w(2), w(3), w(4)]
         w_l = space.newlist(l)
-        assert space.unpackiterable(w_l) == l
-        assert space.unpackiterable(w_l, 4) == l
+        # the list may store the ints unwrapped, so compare by value
+        assert [space.int_w(w_x) for w_x in space.unpackiterable(w_l)] == [1, 2, 3, 4]
+        assert [space.int_w(w_x) for w_x in space.unpackiterable(w_l, 4)] == [1, 2, 3, 4]
         err = raises(OperationError, space.unpackiterable, w_l, 3)
         assert err.value.match(space, space.w_ValueError)
         err = raises(OperationError, space.unpackiterable, w_l, 5)
@@ -1,4 +1,6 @@
 from pypy.tool import udir
+from pypy.conftest import gettestobjspace
+from pypy.interpreter.error import OperationError
 
 
 class AppTestPyFrame:
@@ -146,6 +148,29 @@ class AppTestPyFrame:
         assert tb.tb_frame.f_code.co_name == 'g'
         assert tb.tb_frame.f_back.f_code.co_name == 'f'
 
+    def test_traceback_chain(self):
+        import sys
+        def f(x):
+            return 1 / x
+        def g(x):
+            return f(x)
+        def h():
+            try:
+                g(0)
+            except ZeroDivisionError:
+                pass
+            try:
+                g(0)
+            except ZeroDivisionError:
+                return sys.exc_info()[2]
+        tb = h()
+        names = []
+        while tb is not None:
+            names.append((tb.tb_frame.f_code.co_name,
+                          tb.tb_lineno - tb.tb_frame.f_code.co_firstlineno))
+            tb = tb.tb_next
+        assert names == [('h', 6), ('g', 1), ('f', 1)]
+
     def test_trace_basic(self):
         import sys
         l = []
@@ -489,3 +514,133 @@ class AppTestPyFrame:
         assert seen == [(1, f, firstline + 6, 'line', None),
                         (1, f, firstline + 7, 'line', None),
                         (1, f, firstline + 8, 'line', None)]
+
+
+class TestFrameRecycling:
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.recycle_frames": True})
+
+    def test_reuse(self):
+        space = self.space
+        w_f = space.appexec([], """():
+            def f(x):
+                y = x + 1
+                return y
+            return f""")
+        code = w_f.code
+        size = code.co_nlocals + code.co_stacksize
+        ec = space.getexecutioncontext()
+        space.call_function(w_f, space.wrap(1))
+        frame = ec.free_frames[size]
+        assert frame is not None
+        assert frame.getcode() is code
+        assert frame.locals_stack_w == [None] * size
+        w_res = space.call_function(w_f, space.wrap(41))
+        assert space.int_w(w_res) == 42
+        assert ec.free_frames[size] is frame
+        assert frame.w_globals is None
+
+    def test_not_recycled(self):
+        space = self.space
+        ec = space.getexecutioncontext()
+        for source in ["""():
+                def f(x):
+                    yield x
+                return f""", """():
+                def f(x):
+                    return lambda: x
+                return f""", """():
+                import sys
+                def f(x):
+                    return sys._getframe()
+                return f""", """():
+                def f(x):
+                    return 1 / x
+                return f"""]:
+            w_f = space.appexec([], source)
+            code = w_f.code
+            size = code.co_nlocals + code.co_stacksize
+            ec.free_frames[size] = None
+            try:
+                space.call_function(w_f, space.wrap(0))
+            except OperationError:
+                pass
+            assert ec.free_frames[size] is None
+
+
+class AppTestPyFrameRecycling(AppTestPyFrame):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.recycle_frames": True})
+        AppTestPyFrame.setup_class.im_func(cls)
+
+    def test_escaped_frames_not_reused(self):
+        import sys
+        # no free variables in the functions, or they would not be recycled
+        def f(x, getframe=sys._getframe):
+            return getframe()
+        def g(x, y=None):
+            return x
+        frames = [f(i) for i in range(5)]
+        for i in range(10):
+            g(i)
+        assert len(set([id(frame) for frame in frames])) == 5
+        for i in range(5):
+            assert frames[i].f_code is f.func_code
+            assert frames[i].f_locals['x'] == i
+
+    def test_f_back_not_reused(self):
+        import sys
+        def g(b, getframe=sys._getframe):
+            return getframe()
+        def f(a, g=g):
+            return g(a)
+        def h(c, d=None):
+            return c
+        frame = f(5)
+        for i in range(10):
+            h(i)
+        assert frame.f_back.f_code is f.func_code
+        assert frame.f_back.f_locals['a'] == 5
+
+    def test_traceback_frames_not_reused(self):
+        import sys
+        def f(x, exc_info=sys.exc_info):
+            try:
+                1 / x
+            except ZeroDivisionError:
+                return exc_info()[2]
+        def g(x, y=None):
+            return x
+        tb = f(0)
+        for i in range(10):
+            g(i)
+        assert tb.tb_frame.f_code is f.func_code
+        assert tb.tb_frame.f_locals['x'] == 0
+
+    def test_traced_frames_not_reused(self):
+        import sys
+        frames = []
+        def trace(frame, event, arg):
+            if event == 'call':
+                frames.append((frame, frame.f_code))
+        def f(x):
+            return x
+        sys.settrace(trace)
+        try:
+            f(1)
+            f(2)
+        finally:
+            sys.settrace(None)
+        for i in range(10):
+            f(i)
+        assert frames[0][0] is not frames[1][0]
+        for frame, code in frames:
+            assert frame.f_code is code
+
+    def test_locals_not_shared(self):
+        def f(x):
+            return locals()
+        d1 = f(1)
+        d2 = f(2)
+        assert d1 == {'x': 1}
+        assert d2 == {'x': 2}
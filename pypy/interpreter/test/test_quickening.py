@@ -0,0 +1,195 @@
+from pypy.conftest import gettestobjspace
+from pypy.interpreter import quickening
+from pypy.tool.stdlib_opcode import host_bytecode_spec
+
+opmap = host_bytecode_spec.opmap
+
+
+def quicken_func(func):
+    co = func.func_code
+    return co.co_code, quickening.quicken(co.co_code, co.co_firstlineno,
+                                          co.co_lnotab)
+
+def changed_offsets(co_code, quickened):
+    assert len(co_code) == len(quickened)
+    return [(i, ord(quickened[i])) for i in range(len(co_code))
+                                   if co_code[i] != quickened[i]]
+
+
+class TestQuicken:
+    def test_pairs(self):
+        def f(a, b):
+            if a < b:
+                return a.x
+            return b
+        co_code, quickened = quicken_func(f)
+        assert changed_offsets(co_code, quickened) == [
+            (0, quickening.LOAD_FAST_LOAD_FAST),
+            (6, quickening.COMPARE_OP_POP_JUMP_IF_FALSE),
+            (12, quickening.LOAD_FAST_LOAD_ATTR)]
+
+    def test_not_across_lines(self):
+        def f(a):
+            x = a
+            return x
+        co_code, quickened = quicken_func(f)
+        assert ord(co_code[3]) == opmap['STORE_FAST']
+        assert ord(co_code[6]) == opmap['LOAD_FAST']
+        assert changed_offsets(co_code, quickened) == []
+
+    def test_same_line(self):
+        def f(a):
+            x = a; return x
+        co_code, quickened = quicken_func(f)
+        assert changed_offsets(co_code, quickened) == [
+            (3, quickening.STORE_FAST_LOAD_FAST)]
+
+    def test_overlapping_pairs(self):
+        def f(a, b):
+            return a + b.x
+        co_code, quickened = quicken_func(f)
+        assert changed_offsets(co_code, quickened) == [
+            (0, quickening.LOAD_FAST_LOAD_FAST),
+            (3, quickening.LOAD_FAST_LOAD_ATTR)]
+
+    def test_extended_arg(self):
+        EXTENDED_ARG = chr(opmap['EXTENDED_ARG'])
+        LOAD_FAST = chr(opmap['LOAD_FAST'])
+        co_code = (EXTENDED_ARG + '\x01\x00' + LOAD_FAST + '\x00\x00' +
+                   LOAD_FAST + '\x01\x00')
+        quickened = quickening.quicken(co_code, 1, '')
+        assert quickened == co_code
+
+    def test_find_linestarts(self):
+        def f(a):
+            x = a
+
+            return x
+        co = f.func_code
+        linestarts = quickening.find_linestarts(co.co_code, co.co_firstlineno,
+                                                co.co_lnotab)
+        assert [i for i in range(len(linestarts)) if linestarts[i]] == [0, 6]
+
+
+class AppTestSuperinstructions:
+    def setup_class(cls):
+        cls.space = gettestobjspace(
+            **{"objspace.superinstructions": True,
+               "objspace.std.optimized_comparison_op": True})
+
+    def test_compare_and_jump(self):
+        import sys
+        def f(a, b):
+            if a < b:
+                return 1
+            return 2
+        assert f(1, 2) == 1
+        assert f(2, 1) == 2
+        assert f(1.5, 2) == 1
+        assert f('b', 'a') == 2
+        assert f(sys.maxint, -sys.maxint-1) == 2
+        raises(TypeError, "f(1, 2j)")
+        l = []
+        i = 0
+        while i < 10:
+            l.append(i)
+            i += 1
+        assert l == range(10)
+
+    def test_load_fast_load_attr(self):
+        class A(object):
+            x = 42
+        def f(a):
+            return a.x
+        assert f(A()) == 42
+        raises(AttributeError, f, 5)
+
+    def test_unbound_local(self):
+        def f():
+            y = 1; return x + y
+            x = 5
+        raises(UnboundLocalError, f)
+        def g(a):
+            if a:
+                x = 1
+            return a.real, x
+        raises(UnboundLocalError, g, 0)
+
+    def test_traceback_lasti(self):
+        import sys
+        def f(a, b):
+            return a.x
+        try:
+            f(5, 6)
+        except AttributeError:
+            tb = sys.exc_info()[2].tb_next
+        # the position of the LOAD_ATTR, the 2nd instruction of the pair
+        assert tb.tb_lasti == 3
+        assert tb.tb_lineno == f.func_code.co_firstlineno + 1
+
+    def test_settrace_lines(self):
+        import sys
+        def f(a):
+            x = a
+            y = x; z = y
+            return z
+        lines = []
+        def trace(frame, event, arg):
+            if frame.f_code is f.func_code:
+                lines.append((event, frame.f_lineno -
+                                     f.func_code.co_firstlineno))
+            return trace
+        sys.settrace(trace)
+        try:
+            f(5)
+        finally:
+            sys.settrace(None)
+        assert lines == [('call', 0), ('line', 1), ('line', 2), ('line', 3),
+                         ('return', 3)]
+
+    def test_generator(self):
+        def g(n):
+            i = 0
+            while i < n:
+                yield i
+                i += 1
+        assert list(g(5)) == range(5)
+
+    def test_co_code_unchanged(self):
+        def f(a, b):
+            return a.x < b
+        code = f.func_code.co_code
+        class A(object):
+            x = 1
+        assert f(A(), 2)
+        assert f.func_code.co_code == code
+
+
+class TestCodeToDispatch:
+    source = """def f(a, b):
+    return a.x < b
+"""
+
+    def get_code(self, space):
+        from pypy.interpreter.pycode import PyCode
+        w_d = space.newdict()
+        space.exec_(self.source, w_d, w_d)
+        w_f = space.getitem(w_d, space.wrap('f'))
+        return space.interp_w(PyCode, space.getattr(w_f,
+                                                    space.wrap('func_code')))
+
+    def test_superinstructions(self):
+        space = gettestobjspace(**{"objspace.superinstructions": True})
+        code = self.get_code(space)
+        assert code.get_code_to_dispatch() == code.get_quickened_code()
+        assert code.get_code_to_dispatch() != code.co_code
+
+    def test_logbytecodes(self):
+        space = gettestobjspace(**{"objspace.superinstructions": True,
+                                   "objspace.logbytecodes": True})
+        code = self.get_code(space)
+        assert code.get_code_to_dispatch() == code.co_code
+
+    def test_no_superinstructions(self):
+        code = self.get_code(self.space)
+        assert code.get_code_to_dispatch() == code.co_code
@@ -126,7 +126,7 @@ class BaseCPU(model.AbstractCPU):
             return descr
 
     def compile_bridge(self, faildescr, inputargs, operations,
-                       original_loop_token, log=True):
+                       original_loop_token, log=True, name=''):
         c = llimpl.compile_start()
         clt = original_loop_token.compiled_loop_token
         clt.loop_and_bridges.append(c)
@@ -23,6 +23,7 @@ class AsmMemoryManager(object):
         self.num_indices = num_indices
         self.free_blocks = {}      # map {start: stop}
         self.free_blocks_end = {}  # map {stop: start}
+        self.large_blocks = {}     # map {start: stop} of the mmap()ed blocks
         self.blocks_by_size = [[] for i in range(self.num_indices)]
 
     def malloc(self, minsize, maxsize):
@@ -43,7 +44,8 @@ class AsmMemoryManager(object):
     def free(self, start, stop):
         """Free a block (start, stop) returned by a previous malloc()."""
         self.total_mallocs -= (stop - start)
-        self._add_free_block(start, stop)
+        start = self._add_free_block(start, stop)
+        self._release_large_block(start)
 
     def open_malloc(self, minsize):
         """Allocate at least minsize bytes.  Returns (start, stop)."""
@@ -79,8 +81,29 @@ class AsmMemoryManager(object):
                 rmmap.hint.pos += 0x80000000 - size
         self.total_memory_allocated += size
         data = rffi.cast(lltype.Signed, data)
+        self.large_blocks[data] = data + size
         return self._add_free_block(data, data + size)
 
+    def _release_large_block(self, start):
+        # If the free block 'start' is a whole large block, give it back
+        # to the OS.  We keep the last one, to avoid calling mmap() and
+        # munmap() in turn when a single loop is freed and made again.
+        stop = self.large_blocks.get(start, 0)
+        if (stop == 0 or self.free_blocks[start] != stop or
+                len(self.large_blocks) == 1):
+            return
+        self._del_free_block(start, stop)
+        del self.large_blocks[start]
+        size = stop - start
+        self.total_memory_allocated -= size
+        data = rffi.cast(rmmap.PTR, start)
+        rmmap.free(data, size)
+        if not we_are_translated():
+            for i in range(len(self._allocated)):
+                if rffi.cast(lltype.Signed, self._allocated[i][0]) == start:
+                    del self._allocated[i]
+                    break
+
     def _get_index(self, length):
         i = 0
         while length > self.min_fragment:
@@ -91,13 +114,14 @@ class AsmMemoryManager(object):
         return i
 
     def _add_free_block(self, start, stop):
-        # Merge with the block on the left
-        if start in self.free_blocks_end:
+        # Merge with the block on the left and on the right, but not
+        # across the limit between two large blocks: this way, a large
+        # block that is entirely free is seen as a single free block
+        if start in self.free_blocks_end and start not in self.large_blocks:
             left_start = self.free_blocks_end[start]
             self._del_free_block(left_start, start)
             start = left_start
-        # Merge with the block on the right
-        if stop in self.free_blocks:
+        if stop in self.free_blocks and stop not in self.large_blocks:
             right_stop = self.free_blocks[stop]
             self._del_free_block(stop, right_stop)
             stop = right_stop
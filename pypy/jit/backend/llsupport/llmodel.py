@@ -4,6 +4,7 @@ from pypy.rpython.lltypesystem.lloperation import llop
 from pypy.rpython.llinterp import LLInterpreter, LLException
 from pypy.rpython.annlowlevel import llhelper
 from pypy.rlib.objectmodel import we_are_translated, specialize
+from pypy.rlib.rarithmetic import intmask
 from pypy.jit.metainterp.history import BoxInt, BoxPtr, set_future_values,\
      BoxFloat
 from pypy.jit.metainterp import history
@@ -190,6 +191,10 @@ class AbstractLLCPU(AbstractCPU):
         self.saved_exc_value = lltype.nullptr(llmemory.GCREF.TO)
         return exc
 
+    def get_code_memory(self):
+        return (intmask(self.asmmemmgr.total_mallocs),
+                intmask(self.asmmemmgr.total_memory_allocated))
+
     def free_loop_and_bridges(self, compiled_loop_token):
         AbstractCPU.free_loop_and_bridges(self, compiled_loop_token)
         blocks = compiled_loop_token.asmmemmgr_blocks
@@ -152,6 +152,19 @@ class TestAsmMemoryManager:
                     assert new_total <= 147456
                     prev_total = new_total
 
+    def test_free_large_block(self):
+        (start1, stop1) = self.memmgr.malloc(8192, 8192)
+        (start2, stop2) = self.memmgr.malloc(100, 100)
+        assert self.memmgr.total_memory_allocated == 16384
+        assert stop1 - start1 == 8192
+        self.memmgr.free(start1, stop1)     # the whole first large block
+        assert self.memmgr.total_memory_allocated == 8192
+        assert start1 not in self.memmgr.free_blocks
+        assert len(self.memmgr._allocated) == 1
+        self.memmgr.free(start2, stop2)     # the last one is kept
+        assert self.memmgr.total_memory_allocated == 8192
+        assert self.memmgr.free_blocks == {start2: start2 + 8192}
+
     def test_insert_gcroot_marker(self):
         puts = []
         class FakeGcRootMap:
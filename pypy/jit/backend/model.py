@@ -71,7 +71,7 @@ class AbstractCPU(object):
         raise NotImplementedError
 
     def compile_bridge(self, faildescr, inputargs, operations,
-                       original_loop_token, log=True):
+                       original_loop_token, log=True, name=''):
         """Assemble the bridge.
         The FailDescr is the descr of the original guard that failed.
 
@@ -182,6 +182,21 @@ class AbstractCPU(object):
         for n in faildescr_indices:
             lst[n] = None
         self.fail_descr_free_list.extend(faildescr_indices)
+        # The counters of the 'loop_counters' parameter belong to the
+        # jitdriver, which frees them after it sees that they are freed
+        # here (see jitprof.py).
+        loop_counters = compiled_loop_token.loop_counters
+        compiled_loop_token.loop_counters = None
+        if loop_counters is not None:
+            for counter in loop_counters:
+                counter.freed = True
+
+    def get_code_memory(self):
+        """Return a pair (used, reserved): the number of bytes allocated
+        for the machine code of the loops and bridges and for the data
+        that the backend stores with it, and the number of bytes reserved
+        from the OS for that purpose.  (0, 0) if the backend doesn't say."""
+        return (0, 0)
 
     @staticmethod
     def sizeof(S):
@@ -306,6 +321,7 @@ class AbstractCPU(object):
 class CompiledLoopToken(object):
     asmmemmgr_blocks = None
     asmmemmgr_gcroots = 0
+    loop_counters = None    # see record_loop_counter()
 
     def __init__(self, cpu, number):
         cpu.total_compiled_loops += 1
@@ -321,9 +337,24 @@ class CompiledLoopToken(object):
         debug_print("allocating Loop #", self.number)
         debug_stop("jit-mem-looptoken-alloc")
 
+    def get_code_size(self):
+        """The number of bytes of backend memory used by the loop and
+        its bridges, which free_loop_and_bridges() gives back."""
+        size = 0
+        if self.asmmemmgr_blocks is not None:
+            for rawstart, rawstop in self.asmmemmgr_blocks:
+                size += rawstop - rawstart
+        return size
+
     def record_faildescr_index(self, n):
         self.faildescr_indices.append(n)
 
+    def record_loop_counter(self, counter):
+        # a jitprof.LOOP_COUNTER of the loop, of a bridge or of a guard
+        if self.loop_counters is None:
+            self.loop_counters = []
+        self.loop_counters.append(counter)
+
     def reserve_and_record_some_faildescr_index(self):
         # like record_faildescr_index(), but invent and return a new,
         # unused faildescr index
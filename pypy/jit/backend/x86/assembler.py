@@ -491,7 +491,7 @@ class Assembler386(object):
         looptoken._x86_loop_code = rawstart + self.looppos
         looptoken._x86_direct_bootstrap_code = rawstart + directbootstrappos
         self.teardown()
-        # oprofile support
+        # oprofile and perf support
         if self.cpu.profile_agent is not None:
             name = "Loop # %s: %s" % (looptoken.number, loopname)
             self.cpu.profile_agent.native_code_written(name,
@@ -499,7 +499,7 @@ class Assembler386(object):
         return ops_offset
 
     def assemble_bridge(self, faildescr, inputargs, operations,
-                        original_loop_token, log):
+                        original_loop_token, log, name=''):
         if not we_are_translated():
             # Arguments should be unique
             assert len(set(inputargs)) == len(inputargs)
@@ -549,9 +549,9 @@ class Assembler386(object):
         self.patch_jump_for_descr(faildescr, rawstart)
         ops_offset = self.mc.ops_offset
         self.teardown()
-        # oprofile support
+        # oprofile and perf support
         if self.cpu.profile_agent is not None:
-            name = "Bridge # %s" % (descr_number,)
+            name = "Bridge # %s: %s" % (descr_number, name)
             self.cpu.profile_agent.native_code_written(name,
                                                        rawstart, fullsize)
         return ops_offset
@@ -0,0 +1,201 @@
+"""Support for the Linux 'perf' tool.  Both agents describe the
+machine code of every loop and bridge, named after the location given
+by get_printable_location(), so that 'perf top' or 'perf report' can
+show where the time goes instead of anonymous addresses.
+
+ * PerfMapAgent writes the lines 'start size name' to /tmp/perf-<pid>.map,
+   which perf reads directly.  It is cheap enough to be always enabled.
+
+ * JitDumpAgent writes the binary jitdump format to ./jit-<pid>.dump,
+   including a copy of the machine code and a timestamp for each entry.
+   After 'perf record -k mono', 'perf inject --jit' uses it to build
+   one small ELF file per loop, which allows 'perf annotate' and is
+   correct even when the memory of freed loops is reused for others.
+"""
+
+import os
+from pypy.rpython.tool import rffi_platform
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.translator.tool.cbuild import ExternalCompilationInfo
+from pypy.rlib import rmmap
+from pypy.rlib.rarithmetic import r_longlong, intmask
+from pypy.rlib.debug import debug_start, debug_stop, debug_print
+from pypy.jit.backend.x86 import profagent
+from pypy.jit.backend.x86.arch import IS_X86_32
+
+
+class PerfMapAgent(profagent.ProfileAgent):
+    """Writes /tmp/perf-<pid>.map.  The file is only created when the
+    first loop is compiled, and a new one is started after a fork()."""
+
+    fd = -1
+    pid = 0
+    disabled = False
+    open_flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+    def shutdown(self):
+        self.close()
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def disable(self, reason):
+        debug_start("jit-backend-perf")
+        debug_print("disabling", self.get_filename(self.pid), reason)
+        debug_stop("jit-backend-perf")
+        self.close()
+        self.disabled = True
+
+    def get_fd(self):
+        if self.disabled:
+            return -1
+        pid = os.getpid()
+        if pid != self.pid:
+            self.close()
+            self.pid = pid
+            filename = self.get_filename(pid)
+            try:
+                self.fd = os.open(filename, self.open_flags, 0644)
+            except OSError:
+                self.fd = -1     # profiling is not worth crashing for
+            else:
+                self.file_opened(self.fd)
+        return self.fd
+
+    def get_filename(self, pid):
+        return "/tmp/perf-%d.map" % (pid,)
+
+    def file_opened(self, fd):
+        pass
+
+    def native_code_written(self, name, address, size):
+        fd = self.get_fd()
+        if fd >= 0:
+            self.write(fd, self.make_entry(name, address, size))
+
+    def write(self, fd, data):
+        try:
+            os.write(fd, data)
+        except OSError:
+            self.close()
+
+    def make_entry(self, name, address, size):
+        # the names end at the newline: make sure that there is none inside
+        return "%x %x %s\n" % (address, size, name.replace("\n", " "))
+
+# ____________________________________________________________
+# jitdump, see tools/perf/Documentation/jitdump-specification.txt
+# in the sources of Linux
+
+JITDUMP_MAGIC = 0x4A695444
+JITDUMP_VERSION = 1
+JIT_CODE_LOAD = 0
+JIT_CODE_CLOSE = 3
+if IS_X86_32:
+    ELF_MACHINE = 3          # EM_386
+else:
+    ELF_MACHINE = 62         # EM_X86_64
+
+class CConfig:
+    _compilation_info_ = ExternalCompilationInfo(includes=['time.h'],
+                                                 libraries=['rt'])
+    TIMESPEC = rffi_platform.Struct('struct timespec',
+                                    [('tv_sec', rffi.LONG),
+                                     ('tv_nsec', rffi.LONG)])
+    CLOCK_MONOTONIC = rffi_platform.ConstantInteger('CLOCK_MONOTONIC')
+
+cconfig = rffi_platform.configure(CConfig)
+TIMESPEC = cconfig['TIMESPEC']
+CLOCK_MONOTONIC = cconfig['CLOCK_MONOTONIC']
+
+c_clock_gettime = rffi.llexternal('clock_gettime',
+                                  [rffi.INT, lltype.Ptr(TIMESPEC)], rffi.INT,
+                                  compilation_info=CConfig._compilation_info_,
+                                  threadsafe=False)
+
+def get_timestamp():
+    """The time in nanoseconds, on the clock of 'perf record -k mono'."""
+    ts = lltype.malloc(TIMESPEC, flavor='raw')
+    try:
+        c_clock_gettime(CLOCK_MONOTONIC, ts)
+        sec = r_longlong(rffi.getintfield(ts, 'c_tv_sec'))
+        nsec = r_longlong(rffi.getintfield(ts, 'c_tv_nsec'))
+    finally:
+        lltype.free(ts, flavor='raw')
+    return sec * 1000000000 + nsec
+
+def pack_int(value, size):
+    """Little-endian encoding of an unsigned integer on 'size' bytes."""
+    value = r_longlong(value)
+    chars = ['\x00'] * size
+    for i in range(size):
+        chars[i] = chr(intmask(value >> (8 * i)) & 0xFF)
+    return ''.join(chars)
+
+
+class JitDumpAgent(PerfMapAgent):
+    """Writes ./jit-<pid>.dump.  Each entry is a JIT_CODE_LOAD record with
+    a copy of the machine code; the file is mapped in memory, as this is
+    how 'perf record' finds it."""
+
+    code_index = 0
+    # mmap() needs a file opened for reading, even for PROT_READ only
+    open_flags = os.O_RDWR | os.O_CREAT | os.O_TRUNC
+    marker = lltype.nullptr(rmmap.PTR.TO)
+
+    def get_filename(self, pid):
+        return "jit-%d.dump" % (pid,)
+
+    def file_opened(self, fd):
+        header = (pack_int(JITDUMP_MAGIC, 4) +
+                  pack_int(JITDUMP_VERSION, 4) +
+                  pack_int(40, 4) +                   # size of the header
+                  pack_int(ELF_MACHINE, 4) +
+                  pack_int(0, 4) +                    # padding
+                  pack_int(self.pid, 4) +
+                  pack_int(get_timestamp(), 8) +
+                  pack_int(0, 8))                     # flags
+        self.write(fd, header)
+        # the mapping is never used, but it appears in the events that
+        # 'perf record' collects; 'perf inject' looks for it there
+        marker = rmmap.c_mmap_safe(lltype.nullptr(rmmap.PTR.TO),
+                                   rmmap.PAGESIZE,
+                                   rmmap.PROT_READ | rmmap.PROT_EXEC,
+                                   rmmap.MAP_PRIVATE, fd, 0)
+        if marker == rffi.cast(rmmap.PTR, -1):
+            # without it, 'perf inject' would never use the file
+            self.disable("(mmap failed)")
+        else:
+            self.marker = marker
+
+    def close(self):
+        if self.marker:
+            rmmap.c_munmap_safe(self.marker, rmmap.PAGESIZE)
+            self.marker = lltype.nullptr(rmmap.PTR.TO)
+        PerfMapAgent.close(self)
+
+    def make_entry(self, name, address, size):
+        name = name.replace("\x00", " ") + "\x00"
+        code = rffi.charpsize2str(rffi.cast(rffi.CCHARP, address), size)
+        record = (pack_int(self.pid, 4) +
+                  pack_int(self.pid, 4) +             # tid
+                  pack_int(address, 8) +              # vma
+                  pack_int(address, 8) +              # code_addr
+                  pack_int(size, 8) +
+                  pack_int(self.code_index, 8) +
+                  name + code)
+        self.code_index += 1
+        return (pack_int(JIT_CODE_LOAD, 4) +
+                pack_int(16 + len(record), 4) +
+                pack_int(get_timestamp(), 8) +
+                record)
+
+    def shutdown(self):
+        fd = self.fd
+        if fd >= 0 and self.pid == os.getpid():
+            self.write(fd, pack_int(JIT_CODE_CLOSE, 4) +
+                           pack_int(16, 4) +
+                           pack_int(get_timestamp(), 8))
+        self.close()
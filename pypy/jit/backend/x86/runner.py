@@ -40,6 +40,12 @@ class AbstractX86CPU(AbstractLLCPU):
                 if not oprofile.OPROFILE_AVAILABLE:
                     log.WARNING('oprofile support was explicitly enabled, but oprofile headers seem not to be available')
                 profile_agent = oprofile.OProfileAgent()
+            elif config.translation.jit_profiler == "perfmap":
+                from pypy.jit.backend.x86 import perf
+                profile_agent = perf.PerfMapAgent()
+            elif config.translation.jit_profiler == "jitdump":
+                from pypy.jit.backend.x86 import perf
+                profile_agent = perf.JitDumpAgent()
             self.with_threads = config.translation.thread
 
         self.profile_agent = profile_agent
@@ -85,11 +91,12 @@ class AbstractX86CPU(AbstractLLCPU):
                                             looptoken, log=log)
 
     def compile_bridge(self, faildescr, inputargs, operations,
-                       original_loop_token, log=True):
+                       original_loop_token, log=True, name=''):
         clt = original_loop_token.compiled_loop_token
         clt.compiling_a_bridge()
         return self.assembler.assemble_bridge(faildescr, inputargs, operations,
-                                              original_loop_token, log=log)
+                                              original_loop_token, log=log,
+                                              name=name)
 
     def set_future_value_int(self, index, intvalue):
         self.assembler.fail_boxes_int.setitem(index, intvalue)
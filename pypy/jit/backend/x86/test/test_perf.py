@@ -0,0 +1,108 @@
+import os, struct
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.jit.backend.x86 import perf
+from pypy.tool.udir import udir
+
+
+class PerfMapForTests(perf.PerfMapAgent):
+    def get_filename(self, pid):
+        return str(udir.join('perf-%d.map' % pid))
+
+class JitDumpForTests(perf.JitDumpAgent):
+    def get_filename(self, pid):
+        return str(udir.join('jit-%d.dump' % pid))
+
+
+def test_pack_int():
+    assert perf.pack_int(0x12345678, 4) == '\x78\x56\x34\x12'
+    assert perf.pack_int(1, 8) == '\x01' + '\x00' * 7
+    assert perf.pack_int(2 ** 40 + 5, 8) == struct.pack("<Q", 2 ** 40 + 5)
+
+def test_get_timestamp():
+    t1 = perf.get_timestamp()
+    t2 = perf.get_timestamp()
+    assert 0 < t1 <= t2
+
+def test_perf_map():
+    agent = PerfMapForTests()
+    agent.startup()
+    agent.native_code_written("Loop # 0: f at line 5", 0x1000, 0x80)
+    agent.native_code_written("Bridge # 3: \nf", 0x2000, 16)
+    filename = agent.get_filename(os.getpid())
+    agent.shutdown()
+    assert open(filename).read() == ("1000 80 Loop # 0: f at line 5\n"
+                                     "2000 10 Bridge # 3:  f\n")
+
+def test_perf_map_after_fork():
+    agent = PerfMapForTests()
+    agent.native_code_written("Loop # 0", 0x1000, 0x80)
+    agent.pid = -42       # as if the process had forked since
+    agent.native_code_written("Loop # 1", 0x2000, 0x80)
+    filename = agent.get_filename(os.getpid())
+    agent.shutdown()
+    assert open(filename).read() == "2000 80 Loop # 1\n"
+
+def test_jitdump():
+    code = "\x90\x90\xc3"
+    buf = lltype.malloc(rffi.CCHARP.TO, len(code), flavor='raw')
+    for i in range(len(code)):
+        buf[i] = code[i]
+    address = rffi.cast(lltype.Signed, buf)
+    agent = JitDumpForTests()
+    agent.startup()
+    agent.native_code_written("Loop # 0: f", address, len(code))
+    agent.native_code_written("Loop # 1: g", address, 2)
+    filename = agent.get_filename(os.getpid())
+    agent.shutdown()
+    lltype.free(buf, flavor='raw')
+    data = open(filename, 'rb').read()
+    #
+    magic, version, size, mach, pad, pid, t0, flags = struct.unpack(
+        "<IIIIIIQQ", data[:40])
+    assert magic == 0x4A695444
+    assert version == 1
+    assert size == 40
+    assert pid == os.getpid()
+    pos = 40
+    records = []
+    while pos < len(data):
+        kind, size, t = struct.unpack("<IIQ", data[pos:pos+16])
+        assert t >= t0
+        records.append((kind, data[pos+16:pos+size]))
+        pos += size
+    assert pos == len(data)
+    assert [kind for kind, record in records] == [0, 0, 3]
+    for (kind, record), index, name, size in [(records[0], 0, "Loop # 0: f", 3),
+                                              (records[1], 1, "Loop # 1: g", 2)]:
+        pid, tid, vma, addr, codesize, codeindex = struct.unpack(
+            "<IIQQQQ", record[:40])
+        assert pid == os.getpid()
+        assert vma == addr == address
+        assert codesize == size
+        assert codeindex == index
+        assert record[40:] == name + "\x00" + code[:size]
+
+def test_jitdump_marker_mapping():
+    agent = JitDumpForTests()
+    agent.startup()
+    agent.native_code_written("Loop # 0", 0, 0)
+    filename = agent.get_filename(os.getpid())
+    assert agent.marker
+    # this mapping is how 'perf inject' finds the file
+    maps = open('/proc/%d/maps' % os.getpid()).read()
+    assert os.path.abspath(filename) in maps
+    agent.shutdown()
+    assert not agent.marker
+    maps = open('/proc/%d/maps' % os.getpid()).read()
+    assert os.path.abspath(filename) not in maps
+
+def test_jitdump_disabled_if_no_marker():
+    class WriteOnlyJitDump(JitDumpForTests):
+        open_flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    agent = WriteOnlyJitDump()
+    agent.native_code_written("Loop # 0", 0, 0)
+    assert agent.disabled
+    assert agent.fd == -1
+    agent.native_code_written("Loop # 1", 0, 0)
+    assert agent.fd == -1
+    agent.shutdown()
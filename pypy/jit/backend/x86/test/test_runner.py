@@ -348,7 +348,6 @@ class TestX86(LLtypeBackendTest):
                         assert result != expected
 
     def test_compile_bridge_check_profile_info(self):
-        py.test.skip("does not work, reinvestigate")
         class FakeProfileAgent(object):
             def __init__(self):
                 self.functions = []
@@ -363,25 +362,18 @@ class TestX86(LLtypeBackendTest):
         faildescr2 = BasicFailDescr(2)
         looptoken = LoopToken()
         looptoken.number = 17
-        class FakeString(object):
-            def __init__(self, val):
-                self.val = val
-
-            def _get_str(self):
-                return self.val
 
         operations = [
-            ResOperation(rop.DEBUG_MERGE_POINT, [FakeString("hello"), 0], None),
             ResOperation(rop.INT_ADD, [i0, ConstInt(1)], i1),
             ResOperation(rop.INT_LE, [i1, ConstInt(9)], i2),
             ResOperation(rop.GUARD_TRUE, [i2], None, descr=faildescr1),
             ResOperation(rop.JUMP, [i1], None, descr=looptoken),
             ]
         inputargs = [i0]
-        operations[3].setfailargs([i1])
-        self.cpu.compile_loop(inputargs, operations, looptoken)
+        operations[2].setfailargs([i1])
+        self.cpu.compile_loop(inputargs, operations, looptoken, name="hello")
         name, loopaddress, loopsize = agent.functions[0]
-        assert name == "Loop # 17: hello (loop counter 0)"
+        assert name == "Loop # 17: hello"
         assert loopaddress <= looptoken._x86_loop_code
         assert loopsize >= 40 # randomish number
 
@@ -390,14 +382,15 @@ class TestX86(LLtypeBackendTest):
         bridge = [
             ResOperation(rop.INT_LE, [i1b, ConstInt(19)], i3),
             ResOperation(rop.GUARD_TRUE, [i3], None, descr=faildescr2),
-            ResOperation(rop.DEBUG_MERGE_POINT, [FakeString("bye"), 0], None),
             ResOperation(rop.JUMP, [i1b], None, descr=looptoken),
         ]
         bridge[1].setfailargs([i1b])
 
-        self.cpu.compile_bridge(faildescr1, [i1b], bridge, looptoken)
+        self.cpu.compile_bridge(faildescr1, [i1b], bridge, looptoken,
+                                name="bye")
         name, address, size = agent.functions[1]
-        assert name == "Bridge # 0: bye (loop counter 1)"
+        descr_number = self.cpu.get_fail_descr_number(faildescr1)
+        assert name == "Bridge # %d: bye" % (descr_number,)
         # Would be exactly ==, but there are some guard failure recovery
         # stubs in-between
         assert address >= loopaddress + loopsize
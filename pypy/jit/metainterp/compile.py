@@ -1,5 +1,5 @@
 import weakref
-from pypy.rpython.lltypesystem import lltype
+from pypy.rpython.lltypesystem import lltype, llmemory
 from pypy.rpython.ootypesystem import ootype
 from pypy.objspace.flow.model import Constant, Variable
 from pypy.rlib.objectmodel import we_are_translated
@@ -16,6 +16,7 @@ from pypy.jit.metainterp import history
 from pypy.jit.metainterp.typesystem import llhelper, oohelper
 from pypy.jit.metainterp.optimize import InvalidLoop
 from pypy.jit.metainterp.resume import NUMBERING, PENDINGFIELDSP
+from pypy.jit.metainterp.jitprof import LOOP_COUNTER, new_loop_counter
 from pypy.jit.codewriter import heaptracker, longlong
 
 def giveup():
@@ -172,7 +173,12 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type):
         show_loop(metainterp_sd, loop)
         loop.check_consistency()
 
-    operations = get_deep_immutable_oplist(loop.operations)
+    operations = loop.operations
+    new_counters = None
+    if jitdriver_sd.warmstate.loop_counters:
+        operations, new_counters = add_loop_counters(
+            metainterp_sd, type, n, loopname, operations)
+    operations = get_deep_immutable_oplist(operations)
     metainterp_sd.profiler.start_backend()
     debug_start("jit-backend")
     try:
@@ -181,6 +187,8 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type):
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    if new_counters is not None:
+        record_loop_counters(jitdriver_sd, loop.token, new_counters)
     metainterp_sd.stats.add_new_loop(loop)
     if not we_are_translated():
         if type != "entry bridge":
@@ -203,27 +211,105 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     n = metainterp_sd.cpu.get_fail_descr_number(faildescr)
     jitdriver_sd.on_compile_bridge(metainterp_sd.logger_ops,
                                    original_loop_token, operations, n)
+    bridgename = get_bridge_location_str(metainterp_sd, operations)
     if not we_are_translated():
         show_loop(metainterp_sd)
         TreeLoop.check_consistency_of(inputargs, operations)
     metainterp_sd.profiler.start_backend()
+    logged_operations = operations
+    new_counters = None
+    if jitdriver_sd.warmstate.loop_counters:
+        operations, new_counters = add_loop_counters(
+            metainterp_sd, "bridge", n, bridgename, operations)
     operations = get_deep_immutable_oplist(operations)
     debug_start("jit-backend")
     try:
         ops_offset = metainterp_sd.cpu.compile_bridge(faildescr, inputargs, operations,
-                                                      original_loop_token)
+                                                      original_loop_token,
+                                                      name=bridgename)
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    if new_counters is not None:
+        record_loop_counters(jitdriver_sd, original_loop_token, new_counters)
     if not we_are_translated():
         metainterp_sd.stats.compiled()
     metainterp_sd.log("compiled new bridge")
     #
-    metainterp_sd.logger_ops.log_bridge(inputargs, operations, n, ops_offset)
+    metainterp_sd.logger_ops.log_bridge(inputargs, logged_operations, n,
+                                        ops_offset)
     #
     if metainterp_sd.warmrunnerdesc is not None:    # for tests
-        metainterp_sd.warmrunnerdesc.memory_manager.keep_loop_alive(
-            original_loop_token)
+        memory_manager = metainterp_sd.warmrunnerdesc.memory_manager
+        memory_manager.keep_loop_alive_with_bridge(original_loop_token)
+
+def get_bridge_location_str(metainterp_sd, operations):
+    """The location of the first debug_merge_point of the bridge, or ''."""
+    for op in operations:
+        if op.getopnum() == rop.DEBUG_MERGE_POINT:
+            jd_sd = metainterp_sd.jitdrivers_sd[op.getarg(0).getint()]
+            return jd_sd.warmstate.get_location_str(op.getarglist()[2:])
+    return ''
+
+def add_loop_counters(metainterp_sd, kind, number, location, operations):
+    """For the 'loop_counters' parameter: make new counters for the loop
+    or bridge and for each of its guards.  Returns the operations to
+    compile, starting with the increment of the counter of the loop or
+    bridge, and the list of the new counters, to pass to
+    record_loop_counters() once the backend compiled the operations.
+    """
+    new_counters = []
+    descr = metainterp_sd.loop_counter_descr
+    if descr is None:     # ootype
+        return operations, new_counters
+    counter = new_loop_counter()
+    assert location is not None
+    new_counters.append((kind, number, location, counter))
+    #
+    # a guard gets the location of the last merge point before it
+    cpu = metainterp_sd.cpu
+    last_merge_point = None
+    guard_location = location
+    for op in operations:
+        if op.getopnum() == rop.DEBUG_MERGE_POINT:
+            last_merge_point = op
+        elif op.is_guard():
+            faildescr = op.getdescr()
+            if not isinstance(faildescr, ResumeGuardDescr):
+                continue
+            if last_merge_point is not None:
+                jd_sd = metainterp_sd.jitdrivers_sd[
+                    last_merge_point.getarg(0).getint()]
+                guard_location = jd_sd.warmstate.get_location_str(
+                    last_merge_point.getarglist()[2:])
+                assert guard_location is not None
+                last_merge_point = None
+            guard_counter = new_loop_counter()
+            faildescr._failure_counter = guard_counter
+            new_counters.append(("guard",
+                                 cpu.get_fail_descr_number(faildescr),
+                                 guard_location, guard_counter))
+    #
+    c_adr = history.ConstInt(heaptracker.adr2int(
+        llmemory.cast_ptr_to_adr(counter)))
+    box = BoxInt()
+    box2 = BoxInt()
+    operations = [
+        ResOperation(rop.GETFIELD_RAW, [c_adr], box, descr=descr),
+        ResOperation(rop.INT_ADD, [box, history.ConstInt(1)], box2),
+        ResOperation(rop.SETFIELD_RAW, [c_adr, box2], None, descr=descr),
+        ] + operations
+    return operations, new_counters
+
+def record_loop_counters(jitdriver_sd, looptoken, new_counters):
+    """Report the counters made by add_loop_counters() to the jitdriver.
+    The compiled loop keeps them too, to mark them as freed when it is
+    freed itself: see jitprof.py.
+    """
+    clt = looptoken.compiled_loop_token
+    for kind, number, location, counter in new_counters:
+        clt.record_loop_counter(counter)
+        jitdriver_sd.on_new_counter(kind, number, location, counter)
 
 # ____________________________________________________________
 
@@ -300,6 +386,7 @@ class ResumeDescr(AbstractFailDescr):
 class ResumeGuardDescr(ResumeDescr):
     _counter = 0        # if < 0, there is one counter per value;
     _counters = None    # they get stored in _counters then.
+    _failure_counter = lltype.nullptr(LOOP_COUNTER)   # see jitprof.py
 
     # this class also gets the following attributes stored by resume.py code
     rd_snapshot = None
@@ -339,6 +426,8 @@ class ResumeGuardDescr(ResumeDescr):
             self._counter = cnt | i
 
     def handle_fail(self, metainterp_sd, jitdriver_sd):
+        if self._failure_counter:
+            self._failure_counter.i += 1
         if self.must_compile(metainterp_sd, jitdriver_sd):
             return self._trace_and_compile_from_bridge(metainterp_sd,
                                                        jitdriver_sd)
@@ -446,6 +535,8 @@ class ResumeGuardForcedDescr(ResumeGuardDescr):
         # the virtualrefs and virtualizable have been forced by
         # handle_async_forcing() just a moment ago.
         from pypy.jit.metainterp.blackhole import resume_in_blackhole
+        if self._failure_counter:
+            self._failure_counter.i += 1
         token = metainterp_sd.cpu.get_latest_force_token()
         all_virtuals = self.fetch_data(token)
         if all_virtuals is None:
@@ -3,6 +3,7 @@
 """
 
 import time
+from pypy.rpython.lltypesystem import lltype
 from pypy.rlib.debug import debug_print, debug_start, debug_stop
 from pypy.rlib.debug import have_debug_prints
 from pypy.jit.metainterp.jitexc import JitException
@@ -26,6 +27,7 @@ ABORT_FORCE_QUASIIMMUT
 NVIRTUALS
 NVHOLES
 NVREUSED
+NNUMBREUSED
 TOTAL_COMPILED_LOOPS
 TOTAL_COMPILED_BRIDGES
 TOTAL_FREED_LOOPS
@@ -185,6 +187,7 @@ class Profiler(BaseProfiler):
         self._print_intline("nvirtuals", cnt[NVIRTUALS])
         self._print_intline("nvholes", cnt[NVHOLES])
         self._print_intline("nvreused", cnt[NVREUSED])
+        self._print_intline("nnumbreused", cnt[NNUMBREUSED])
         cpu = self.cpu
         if cpu is not None:   # for some tests
             self._print_intline("Total # of loops",
@@ -208,3 +211,27 @@ class Profiler(BaseProfiler):
 
 class BrokenProfilerData(JitException):
     pass
+
+# ____________________________________________________________
+# Counters of the individual loops, bridges and guards, only made when
+# the 'loop_counters' parameter is set.  The assembler of a loop or bridge
+# increments its counter every time it runs; the counter of a guard is
+# incremented every time the guard fails and is not handled by a bridge.
+#
+# The counters are given to the jitdriver, which may report them after
+# the loop itself was freed.  So the JIT does not free them: when the
+# loop is freed, it only sets their 'freed' field, and the jitdriver
+# frees them with free_loop_counter() once it does not need them any more.
+
+LOOP_COUNTER = lltype.Struct('LOOP_COUNTER', ('i', lltype.Signed),
+                                             ('freed', lltype.Bool))
+
+def new_loop_counter():
+    counter = lltype.malloc(LOOP_COUNTER, flavor='raw',
+                            track_allocation=False)
+    counter.i = 0
+    counter.freed = False
+    return counter
+
+def free_loop_counter(counter):
+    lltype.free(counter, flavor='raw', track_allocation=False)
@@ -2,6 +2,8 @@ import math
 from pypy.rlib.rarithmetic import r_int64
 from pypy.rlib.debug import debug_start, debug_print, debug_stop
 from pypy.rlib.objectmodel import we_are_translated
+from pypy.rlib.listsort import make_timsort_class
+from pypy.rpython.lltypesystem import lltype
 
 #
 # Logic to decide which loops are old and not used any more.
@@ -19,8 +21,40 @@ from pypy.rlib.objectmodel import we_are_translated
 # 'generation' field is much smaller than the current generation, and
 # removed from the set.
 #
+# Independently, if the 'memory_limit' parameter is set and the backend
+# uses more memory than that for the loops, the loops are sorted by
+# generation and the ones that were entered least recently are removed
+# from 'alive_loops', until the others use at most 3/4 of the limit.
+# The loops entered since the previous generation are always kept.
+# The memory used by the alive loops is kept in 'alive_loops_size': each
+# LoopToken remembers in 'memory_size' how much of it is counted there.
+# The evicted loops are freed by the next collection of the GC.
+#
+
+# The memory used by the JIT, as seen by pypyjit.get_memory_usage().
+# It is updated when the JIT starts tracing and when it frees loops.
+JIT_MEMORY = lltype.Struct('JIT_MEMORY',
+                           ('code_used', lltype.Signed),
+                           ('code_reserved', lltype.Signed),
+                           ('loops_alive', lltype.Signed),
+                           ('loops_evicted', lltype.Signed),
+                           ('memory_limit', lltype.Signed))
+jit_memory = lltype.malloc(JIT_MEMORY, zero=True, immortal=True)
+
+TimSort = make_timsort_class()
+
+class GenerationSort(TimSort):
+    def lt(self, a, b):
+        return a.generation < b.generation
+
+def get_loop_size(looptoken):
+    clt = looptoken.compiled_loop_token
+    if clt is None:
+        return 0
+    return clt.get_code_size()
 
 class MemoryManager(object):
+    cpu = None        # set by warmspot.py; None in some tests
 
     def __init__(self):
         self.check_frequency = -1
@@ -38,6 +72,9 @@ class MemoryManager(object):
         self.current_generation = r_int64(1)
         self.next_check = r_int64(-1)
         self.alive_loops = {}
+        self.memory_limit = 0       # in bytes, or 0 for no limit
+        self.alive_loops_size = 0   # sum of the 'memory_size' of the loops
+        self.loops_evicted = 0
 
     def set_max_age(self, max_age, check_frequency=0):
         if max_age <= 0:
@@ -49,16 +86,50 @@ class MemoryManager(object):
             self.check_frequency = check_frequency
             self.next_check = self.current_generation + 1
 
+    def set_memory_limit(self, memory_limit):
+        if memory_limit < 0:
+            memory_limit = 0
+        self.memory_limit = memory_limit
+        jit_memory.memory_limit = memory_limit
+
     def next_generation(self):
         self.current_generation += 1
         if self.current_generation == self.next_check:
             self._kill_old_loops_now()
             self.next_check = self.current_generation + self.check_frequency
+        if 0 < self.memory_limit < self.alive_loops_size:
+            self._evict_loops_now()
+        if self.cpu is not None:
+            self.update_stats()
+
+    def update_stats(self):
+        used, reserved = self.cpu.get_code_memory()
+        jit_memory.code_used = used
+        jit_memory.code_reserved = reserved
+        jit_memory.loops_alive = len(self.alive_loops)
+        jit_memory.loops_evicted = self.loops_evicted
 
     def keep_loop_alive(self, looptoken):
         if looptoken.generation != self.current_generation:
             looptoken.generation = self.current_generation
             self.alive_loops[looptoken] = None
+            self._update_loop_size(looptoken)
+
+    def keep_loop_alive_with_bridge(self, looptoken):
+        # a new bridge of the loop makes it bigger, even if it was
+        # already entered in this generation
+        self.keep_loop_alive(looptoken)
+        self._update_loop_size(looptoken)
+
+    def _update_loop_size(self, looptoken):
+        size = get_loop_size(looptoken)
+        self.alive_loops_size += size - looptoken.memory_size
+        looptoken.memory_size = size
+
+    def _forget_loop(self, looptoken):
+        del self.alive_loops[looptoken]
+        self.alive_loops_size -= looptoken.memory_size
+        looptoken.memory_size = 0
 
     def _kill_old_loops_now(self):
         debug_start("jit-mem-collect")
@@ -69,7 +140,7 @@ class MemoryManager(object):
         max_generation = self.current_generation - (self.max_age-1)
         for looptoken in self.alive_loops.keys():
             if 0 <= looptoken.generation < max_generation:
-                del self.alive_loops[looptoken]
+                self._forget_loop(looptoken)
         newtotal = len(self.alive_loops)
         debug_print("Loop tokens freed: ", oldtotal - newtotal)
         debug_print("Loop tokens left:  ", newtotal)
@@ -80,3 +151,23 @@ class MemoryManager(object):
             # a single one is not enough for all tests :-(
             rgc.collect(); rgc.collect(); rgc.collect()
         debug_stop("jit-mem-collect")
+
+    def _evict_loops_now(self):
+        debug_start("jit-mem-evict")
+        debug_print("Memory used by the alive loops:", self.alive_loops_size)
+        looptokens = self.alive_loops.keys()
+        GenerationSort(looptokens).sort()
+        target = self.memory_limit // 4 * 3
+        min_generation = self.current_generation - 1
+        count = 0
+        for looptoken in looptokens:
+            if self.alive_loops_size <= target:
+                break
+            if looptoken.generation >= min_generation:
+                break        # entered since the JIT last started tracing
+            self._forget_loop(looptoken)
+            count += 1
+        self.loops_evicted += count
+        debug_print("Loop tokens evicted:", count)
+        debug_print("Memory used by the loops left:", self.alive_loops_size)
+        debug_stop("jit-mem-evict")
@@ -13,7 +13,7 @@ from pypy.jit.metainterp.resoperation import rop, opname, ResOperation
 
 def test_store_final_boxes_in_guard():
     from pypy.jit.metainterp.compile import ResumeGuardDescr
-    from pypy.jit.metainterp.resume import tag, TAGBOX
+    from pypy.jit.metainterp.resume import tag, TAGBOX, unpack_numbering
     b0 = BoxInt()
     b1 = BoxInt()
     opt = optimizeopt.Optimizer(FakeMetaInterpStaticData(LLtypeMixin.cpu),
@@ -28,12 +28,12 @@ def test_store_final_boxes_in_guard():
     #
     opt.store_final_boxes_in_guard(op)
     if op.getfailargs() == [b0, b1]:
-        assert list(fdescr.rd_numb.nums)      == [tag(1, TAGBOX)]
-        assert list(fdescr.rd_numb.prev.nums) == [tag(0, TAGBOX)]
+        assert unpack_numbering(fdescr.rd_numb)      == [tag(1, TAGBOX)]
+        assert unpack_numbering(fdescr.rd_numb.prev) == [tag(0, TAGBOX)]
     else:
         assert op.getfailargs() == [b1, b0]
-        assert list(fdescr.rd_numb.nums)      == [tag(0, TAGBOX)]
-        assert list(fdescr.rd_numb.prev.nums) == [tag(1, TAGBOX)]
+        assert unpack_numbering(fdescr.rd_numb)      == [tag(0, TAGBOX)]
+        assert unpack_numbering(fdescr.rd_numb.prev) == [tag(1, TAGBOX)]
     assert fdescr.rd_virtuals is None
     assert fdescr.rd_consts == []
 
@@ -69,13 +69,17 @@ def test_reuse_vinfo():
     class FakeVirtualValue(virtualize.AbstractVirtualValue):
         def _make_virtual(self, *args):
             return FakeVInfo()
+    class FakeModifier(object):
+        def share_virtual_info(self, vinfo):
+            return vinfo
+    modifier = FakeModifier()
     v1 = FakeVirtualValue(None, None, None)
-    vinfo1 = v1.make_virtual_info(None, [1, 2, 4])
-    vinfo2 = v1.make_virtual_info(None, [1, 2, 4])
+    vinfo1 = v1.make_virtual_info(modifier, [1, 2, 4])
+    vinfo2 = v1.make_virtual_info(modifier, [1, 2, 4])
     assert vinfo1 is vinfo2
-    vinfo3 = v1.make_virtual_info(None, [1, 2, 6])
+    vinfo3 = v1.make_virtual_info(modifier, [1, 2, 6])
     assert vinfo3 is not vinfo2
-    vinfo4 = v1.make_virtual_info(None, [1, 2, 6])
+    vinfo4 = v1.make_virtual_info(modifier, [1, 2, 6])
     assert vinfo3 is vinfo4
 
 def test_descrlist_dict():
@@ -319,6 +319,7 @@ class FakeMetaInterpStaticData(object):
         self.globaldata = Fake()
         self.config = get_pypy_config(translating=True)
         self.config.translation.jit_ffi = True
+        self.virtual_info_cache = resume.VirtualInfoCache()
 
     class warmrunnerdesc:
         class memory_manager:
@@ -49,6 +49,7 @@ class AbstractVirtualValue(optimizer.OptValue):
             return vinfo
         vinfo = self._make_virtual(modifier)
         vinfo.set_content(fieldnums)
+        vinfo = modifier.share_virtual_info(vinfo)
         self._cached_vinfo = vinfo
         return vinfo
 
@@ -12,7 +12,7 @@ from pypy.jit.metainterp.history import Box
 from pypy.jit.metainterp.resoperation import rop
 from pypy.jit.metainterp import executor
 from pypy.jit.metainterp.logger import Logger
-from pypy.jit.metainterp.jitprof import EmptyProfiler
+from pypy.jit.metainterp.jitprof import EmptyProfiler, LOOP_COUNTER
 from pypy.jit.metainterp.jitprof import GUARDS, RECORDED_OPS, ABORT_ESCAPE
 from pypy.jit.metainterp.jitprof import ABORT_TOO_LONG, ABORT_BRIDGE, \
                                         ABORT_FORCE_QUASIIMMUT, ABORT_BAD_LOOP
@@ -1306,6 +1306,7 @@ class MIFrame(object):
 class MetaInterpStaticData(object):
     logger_noopt = None
     logger_ops = None
+    loop_counter_descr = None
 
     def __init__(self, cpu, options,
                  ProfilerClass=EmptyProfiler, warmrunnerdesc=None):
@@ -1331,6 +1332,8 @@ class MetaInterpStaticData(object):
         self._addr2name_keys = []
         self._addr2name_values = []
 
+        self.virtual_info_cache = resume.VirtualInfoCache()
+
         self.__dict__.update(compile.make_done_loop_tokens())
 
     def _freeze_(self):
@@ -1387,6 +1390,10 @@ class MetaInterpStaticData(object):
         num = self.cpu.get_fail_descr_number(exc_descr)
         self.cpu.propagate_exception_v = num
         #
+        if self.cpu.ts.name == 'lltype':
+            self.loop_counter_descr = self.cpu.fielddescrof(
+                LOOP_COUNTER, 'i')
+        #
         self.globaldata = MetaInterpGlobalData(self)
 
     def _setup_once(self):
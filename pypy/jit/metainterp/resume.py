@@ -10,6 +10,8 @@ from pypy.rpython.lltypesystem import lltype, llmemory, rffi, rstr
 from pypy.rpython import annlowlevel
 from pypy.rlib import rarithmetic, rstack
 from pypy.rlib.objectmodel import we_are_translated, specialize
+from pypy.rlib.objectmodel import compute_unique_id
+from pypy.rlib.rweakref import RWeakValueDictionary
 from pypy.rlib.debug import have_debug_prints, ll_assert
 from pypy.rlib.debug import debug_start, debug_stop, debug_print
 from pypy.jit.metainterp.optimize import InvalidLoop
@@ -62,7 +64,11 @@ def capture_resumedata(framestack, virtualizable_boxes, virtualref_boxes,
     snapshot = Snapshot(top.parent_resumedata_snapshot,
                         top.get_list_of_active_boxes(False))
     if virtualizable_boxes is not None:
-        boxes = virtualref_boxes + virtualizable_boxes
+        # the virtualizable first, and then its content in reverse order,
+        # in the order in which it is read back (see virtualizable.py)
+        n = len(virtualizable_boxes)
+        boxes = [virtualizable_boxes[n - 1 - i] for i in range(n)]
+        boxes = boxes + virtualref_boxes
     else:
         boxes = virtualref_boxes[:]
     snapshot = Snapshot(snapshot, boxes)
@@ -71,17 +77,19 @@ def capture_resumedata(framestack, virtualizable_boxes, virtualref_boxes,
 #
 # The following is equivalent to the RPython-level declaration:
 #
-#     class Numbering: __slots__ = ['prev', 'nums']
+#     class Numbering: __slots__ = ['prev', 'code']
 #
 # except that it is more compact in translated programs, because the
-# array 'nums' is inlined in the single NUMBERING object.  This is
+# array 'code' is inlined in the single NUMBERING object.  This is
 # important because this is often the biggest single consumer of memory
-# in a pypy-c-jit.
+# in a pypy-c-jit.  For the same reason, 'code' is not an array of
+# tagged numbers, but the bytes of the compact encoding of these
+# numbers made by encode_numbering().
 #
 NUMBERINGP = lltype.Ptr(lltype.GcForwardReference())
 NUMBERING = lltype.GcStruct('Numbering',
                             ('prev', NUMBERINGP),
-                            ('nums', lltype.Array(rffi.SHORT)))
+                            ('code', lltype.Array(rffi.UCHAR)))
 NUMBERINGP.TO.become(NUMBERING)
 
 PENDINGFIELDSTRUCT = lltype.Struct('PendingField',
@@ -127,6 +135,84 @@ UNASSIGNED = tag(-1<<13, TAGBOX)
 UNASSIGNEDVIRTUAL = tag(-1<<13, TAGVIRTUAL)
 NULLREF = tag(-1, TAGCONST)
 
+# The encoding of the 'code' of a NUMBERING: the number of items, and
+# then the tagged numbers, each one as a varint of 1 to 3 bytes (1 byte
+# for the numbers between -16 and 15).  The numbers of the TAGBOX items
+# are stored as the difference with the previous TAGBOX item of the
+# same numbering, because the boxes are mostly numbered in sequence.
+# The numberings are only decoded one item after the other, from the
+# first one, with numb_next_item().
+
+def _append_varint(code, value):
+    # zigzag: the small negative numbers are small too
+    if value < 0:
+        value = ((-value) << 1) - 1
+    else:
+        value = value << 1
+    while value >= 0x80:
+        code.append(value & 0x7F | 0x80)
+        value >>= 7
+    code.append(value)
+
+def encode_numbering(nums):
+    """Return the list of bytes encoding the list of tagged numbers."""
+    code = []
+    _append_varint(code, len(nums))
+    lastbox = 0
+    for tagged in nums:
+        num, tagbits = untag(tagged)
+        if tagbits == TAGBOX:
+            _append_varint(code, (num - lastbox) << 2 | TAGBOX)
+            lastbox = num
+        else:
+            _append_varint(code, num << 2 | tagbits)
+    return code
+
+def create_numbering(code, prev):
+    numb = lltype.malloc(NUMBERING, len(code))
+    for i in range(len(code)):
+        numb.code[i] = rffi.cast(rffi.UCHAR, code[i])
+    numb.prev = prev
+    return numb
+
+def numb_next_varint(numb, index):
+    value = 0
+    shift = 0
+    while True:
+        byte = rffi.cast(lltype.Signed, numb.code[index])
+        index += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    if value & 1:
+        return -((value + 1) >> 1), index
+    return value >> 1, index
+
+def numb_start(numb):
+    """Return the number of items of 'numb' and the index of the first
+    one."""
+    return numb_next_varint(numb, 0)
+
+def numb_next_item(numb, index, lastbox):
+    """Return the tagged number at 'index' in 'numb', the index of the
+    next item and the new 'lastbox', which is the number of the last
+    TAGBOX item read so far, or 0 at the start."""
+    value, index = numb_next_varint(numb, index)
+    if value & TAGMASK == TAGBOX:
+        lastbox += value >> 2
+        value = lastbox << 2 | TAGBOX
+    return rffi.r_short(value), index, lastbox
+
+def unpack_numbering(numb):
+    """Return the list of tagged numbers of 'numb', for tests and logs."""
+    length, index = numb_start(numb)
+    nums = [0] * length
+    lastbox = 0
+    for i in range(length):
+        nums[i], index, lastbox = numb_next_item(numb, index, lastbox)
+    return nums
+
 
 class ResumeDataLoopMemo(object):
 
@@ -136,13 +222,16 @@ class ResumeDataLoopMemo(object):
         self.consts = []
         self.large_ints = {}
         self.refs = self.cpu.ts.new_ref_dict_2()
+        self.virtual_info_cache = metainterp_sd.virtual_info_cache
         self.numberings = {}
+        self.shared_numberings = {}
         self.cached_boxes = {}
         self.cached_virtuals = {}
     
         self.nvirtuals = 0
         self.nvholes = 0
         self.nvreused = 0
+        self.nnumbreused = 0
 
     def getconst(self, const):
         if const.type == INT:
@@ -190,7 +279,7 @@ class ResumeDataLoopMemo(object):
         n = len(liveboxes)-v
         boxes = snapshot.boxes
         length = len(boxes)
-        numb = lltype.malloc(NUMBERING, length)
+        nums = [UNASSIGNED] * length
         for i in range(length):
             box = boxes[i]
             value = values.get(box, None)
@@ -209,12 +298,27 @@ class ResumeDataLoopMemo(object):
                     tagged = tag(n, TAGBOX)
                     n += 1
                 liveboxes[box] = tagged
-            numb.nums[i] = tagged
+            nums[i] = tagged
         #
-        numb.prev = numb1
+        numb = self._make_numbering(encode_numbering(nums), numb1)
         self.numberings[snapshot] = numb, liveboxes, v
         return numb, liveboxes.copy(), v
 
+    def _make_numbering(self, code, prev):
+        # the guards of a trace often have sections with the same items,
+        # e.g. the guards of the same bytecode: share their numberings
+        key = ''.join([chr(byte) for byte in code])
+        numbs = self.shared_numberings.get(key, None)
+        if numbs is None:
+            numbs = self.shared_numberings[key] = []
+        for numb in numbs:
+            if numb.prev == prev:
+                self.nnumbreused += 1
+                return numb
+        numb = create_numbering(code, prev)
+        numbs.append(numb)
+        return numb
+
     def forget_numberings(self, virtualbox):
         # XXX ideally clear only the affected numberings
         self.numberings.clear()
@@ -255,6 +359,7 @@ class ResumeDataLoopMemo(object):
         profiler.count(jitprof.NVIRTUALS, self.nvirtuals)
         profiler.count(jitprof.NVHOLES, self.nvholes)
         profiler.count(jitprof.NVREUSED, self.nvreused)
+        profiler.count(jitprof.NNUMBREUSED, self.nnumbreused)
 
 _frame_info_placeholder = (None, 0, 0)
 
@@ -288,6 +393,9 @@ class ResumeDataVirtualAdder(object):
             return VUniSliceInfo()
         return VStrSliceInfo()
 
+    def share_virtual_info(self, vinfo):
+        return self.memo.virtual_info_cache.share(vinfo)
+
     def register_virtual_fields(self, virtualbox, fieldboxes):
         tagged = self.liveboxes_from_env.get(virtualbox, UNASSIGNEDVIRTUAL)
         self.liveboxes[virtualbox] = tagged
@@ -445,6 +553,8 @@ class ResumeDataVirtualAdder(object):
 
 
 class AbstractVirtualInfo(object):
+    kind = '?'     # for get_sharing_key()
+
     #def allocate(self, decoder, index):
     #    raise NotImplementedError
     def equals(self, fieldnums):
@@ -453,6 +563,23 @@ class AbstractVirtualInfo(object):
     def set_content(self, fieldnums):
         self.fieldnums = fieldnums
 
+    def get_sharing_key(self):
+        # see VirtualInfoCache: the same key for the same descrs and
+        # fieldnums, and rarely for anything else
+        nums = [str(rarithmetic.widen(num)) for num in self.fieldnums]
+        return '%s%s:%s' % (self.kind, self.descrs_key(), ','.join(nums))
+
+    def descrs_key(self):
+        return ''
+
+    def same_info(self, other):
+        return (self.kind == other.kind and
+                tagged_list_eq(self.fieldnums, other.fieldnums) and
+                self.same_descrs(other))
+
+    def same_descrs(self, other):
+        return True
+
     def debug_prints(self):
         raise NotImplementedError
         
@@ -461,6 +588,19 @@ class AbstractVirtualStructInfo(AbstractVirtualInfo):
         self.fielddescrs = fielddescrs
         #self.fieldnums = ...
 
+    def descrs_key(self):
+        ids = [str(compute_unique_id(descr)) for descr in self.fielddescrs]
+        return ','.join(ids)
+
+    def same_descrs(self, other):
+        assert isinstance(other, AbstractVirtualStructInfo)
+        if len(self.fielddescrs) != len(other.fielddescrs):
+            return False
+        for i in range(len(self.fielddescrs)):
+            if self.fielddescrs[i] is not other.fielddescrs[i]:
+                return False
+        return True
+
     @specialize.argtype(1)
     def setfields(self, decoder, struct):
         for i in range(len(self.fielddescrs)):
@@ -476,10 +616,17 @@ class AbstractVirtualStructInfo(AbstractVirtualInfo):
                         str(untag(self.fieldnums[i])))
 
 class VirtualInfo(AbstractVirtualStructInfo):
+    kind = 'v'
+
     def __init__(self, known_class, fielddescrs):
         AbstractVirtualStructInfo.__init__(self, fielddescrs)
         self.known_class = known_class
 
+    def same_descrs(self, other):
+        assert isinstance(other, VirtualInfo)
+        return (self.known_class.same_constant(other.known_class) and
+                AbstractVirtualStructInfo.same_descrs(self, other))
+
     @specialize.argtype(1)
     def allocate(self, decoder, index):
         struct = decoder.allocate_with_vtable(self.known_class)
@@ -492,10 +639,17 @@ class VirtualInfo(AbstractVirtualStructInfo):
 
 
 class VStructInfo(AbstractVirtualStructInfo):
+    kind = 's'
+
     def __init__(self, typedescr, fielddescrs):
         AbstractVirtualStructInfo.__init__(self, fielddescrs)
         self.typedescr = typedescr
 
+    def same_descrs(self, other):
+        assert isinstance(other, VStructInfo)
+        return (self.typedescr is other.typedescr and
+                AbstractVirtualStructInfo.same_descrs(self, other))
+
     @specialize.argtype(1)
     def allocate(self, decoder, index):
         struct = decoder.allocate_struct(self.typedescr)
@@ -507,10 +661,19 @@ class VStructInfo(AbstractVirtualStructInfo):
         AbstractVirtualStructInfo.debug_prints(self)
 
 class VArrayInfo(AbstractVirtualInfo):
+    kind = 'a'
+
     def __init__(self, arraydescr):
         self.arraydescr = arraydescr
         #self.fieldnums = ...
 
+    def descrs_key(self):
+        return str(compute_unique_id(self.arraydescr))
+
+    def same_descrs(self, other):
+        assert isinstance(other, VArrayInfo)
+        return self.arraydescr is other.arraydescr
+
     @specialize.argtype(1)
     def allocate(self, decoder, index):
         length = len(self.fieldnums)
@@ -539,6 +702,7 @@ class VArrayInfo(AbstractVirtualInfo):
 
 class VStrPlainInfo(AbstractVirtualInfo):
     """Stands for the string made out of the characters of all fieldnums."""
+    kind = 'p'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -556,6 +720,7 @@ class VStrPlainInfo(AbstractVirtualInfo):
 class VStrConcatInfo(AbstractVirtualInfo):
     """Stands for the string made out of the concatenation of two
     other strings."""
+    kind = 'c'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -575,6 +740,7 @@ class VStrConcatInfo(AbstractVirtualInfo):
 
 class VStrSliceInfo(AbstractVirtualInfo):
     """Stands for the string made out of slicing another string."""
+    kind = 'l'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -592,6 +758,7 @@ class VStrSliceInfo(AbstractVirtualInfo):
 class VUniPlainInfo(AbstractVirtualInfo):
     """Stands for the unicode string made out of the characters of all
     fieldnums."""
+    kind = 'P'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -609,6 +776,7 @@ class VUniPlainInfo(AbstractVirtualInfo):
 class VUniConcatInfo(AbstractVirtualInfo):
     """Stands for the unicode string made out of the concatenation of two
     other unicode strings."""
+    kind = 'C'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -629,6 +797,7 @@ class VUniConcatInfo(AbstractVirtualInfo):
 class VUniSliceInfo(AbstractVirtualInfo):
     """Stands for the unicode string made out of slicing another
     unicode string."""
+    kind = 'L'
 
     @specialize.argtype(1)
     def allocate(self, decoder, index):
@@ -642,6 +811,25 @@ class VUniSliceInfo(AbstractVirtualInfo):
         for i in self.fieldnums:
             debug_print("\t\t", str(untag(i)))
 
+
+class VirtualInfoCache(object):
+    """The virtual infos of all the loops and bridges, to share the
+    ones with the same content.  This is possible because they only
+    contain descrs and tagged numbers, which are decoded with the boxes
+    and constants of each guard.  The cache does not keep the virtual
+    infos alive."""
+
+    def __init__(self):
+        self.vinfos = RWeakValueDictionary(str, AbstractVirtualInfo)
+
+    def share(self, vinfo):
+        key = vinfo.get_sharing_key()
+        other = self.vinfos.get(key)
+        if other is not None and other.same_info(vinfo):
+            return other
+        self.vinfos.set(key, vinfo)
+        return vinfo
+
 # ____________________________________________________________
 
 class AbstractResumeDataReader(object):
@@ -659,8 +847,24 @@ class AbstractResumeDataReader(object):
     def _init(self, cpu, storage):
         self.cpu = cpu
         self.cur_numb = storage.rd_numb
+        self.cur_index = 0
+        self.cur_lastbox = 0
         self.consts = storage.rd_consts
 
+    def _start_section(self):
+        # start reading the numbering 'cur_numb'; returns its length
+        length, self.cur_index = numb_start(self.cur_numb)
+        self.cur_lastbox = 0
+        return length
+
+    def next_item(self):
+        tagged, self.cur_index, self.cur_lastbox = numb_next_item(
+            self.cur_numb, self.cur_index, self.cur_lastbox)
+        return tagged
+
+    def _end_section(self):
+        self.cur_numb = self.cur_numb.prev
+
     def _prepare(self, storage):
         self._prepare_virtuals(storage.rd_virtuals)
         self._prepare_pendingfields(storage.rd_pendingfields)
@@ -717,22 +921,25 @@ class AbstractResumeDataReader(object):
     def _prepare_next_section(self, info):
         # Use info.enumerate_vars(), normally dispatching to
         # pypy.jit.codewriter.jitcode.  Some tests give a different 'info'.
+        # It enumerates the items in order, so the callbacks can decode
+        # them one after the other and ignore 'index'.
+        self._start_section()
         info.enumerate_vars(self._callback_i,
                             self._callback_r,
                             self._callback_f,
                             self.unique_id)    # <-- annotation hack
-        self.cur_numb = self.cur_numb.prev
+        self._end_section()
 
     def _callback_i(self, index, register_index):
-        value = self.decode_int(self.cur_numb.nums[index])
+        value = self.decode_int(self.next_item())
         self.write_an_int(register_index, value)
 
     def _callback_r(self, index, register_index):
-        value = self.decode_ref(self.cur_numb.nums[index])
+        value = self.decode_ref(self.next_item())
         self.write_a_ref(register_index, value)
 
     def _callback_f(self, index, register_index):
-        value = self.decode_float(self.cur_numb.nums[index])
+        value = self.decode_float(self.next_item())
         self.write_a_float(register_index, value)
 
     def done(self):
@@ -774,36 +981,35 @@ class ResumeDataBoxReader(AbstractResumeDataReader):
         self.boxes_f = boxes_f
         self._prepare_next_section(info)
 
-    def consume_virtualizable_boxes(self, vinfo, numb):
-        # we have to ignore the initial part of 'nums' (containing vrefs),
-        # find the virtualizable from nums[-1], and use it to know how many
+    def consume_virtualizable_boxes(self, vinfo):
+        # the section starts with the virtualizable, followed by the
+        # content of its fields: use the virtualizable to know how many
         # boxes of which type we have to return.  This does not write
         # anything into the virtualizable.
-        index = len(numb.nums) - 1
-        virtualizablebox = self.decode_ref(numb.nums[index])
+        virtualizablebox = self.decode_ref(self.next_item())
         virtualizable = vinfo.unwrap_virtualizable_box(virtualizablebox)
-        return vinfo.load_list_of_boxes(virtualizable, self, numb)
+        return vinfo.load_list_of_boxes(virtualizable, self,
+                                        virtualizablebox)
 
-    def consume_virtualref_boxes(self, numb, end):
+    def consume_virtualref_boxes(self, end):
         # Returns a list of boxes, assumed to be all BoxPtrs.
         # We leave up to the caller to call vrefinfo.continue_tracing().
         assert (end & 1) == 0
-        return [self.decode_ref(numb.nums[i]) for i in range(end)]
+        return [self.decode_ref(self.next_item()) for i in range(end)]
 
     def consume_vref_and_vable_boxes(self, vinfo, ginfo):
-        numb = self.cur_numb
-        self.cur_numb = numb.prev
+        length = self._start_section()
         if vinfo is not None:
-            virtualizable_boxes = self.consume_virtualizable_boxes(vinfo, numb)
-            end = len(numb.nums) - len(virtualizable_boxes)
+            virtualizable_boxes = self.consume_virtualizable_boxes(vinfo)
+            end = length - len(virtualizable_boxes)
         elif ginfo is not None:
-            index = len(numb.nums) - 1
-            virtualizable_boxes = [self.decode_ref(numb.nums[index])]
-            end = len(numb.nums) - 1
+            virtualizable_boxes = [self.decode_ref(self.next_item())]
+            end = length - 1
         else:
             virtualizable_boxes = None
-            end = len(numb.nums)
-        virtualref_boxes = self.consume_virtualref_boxes(numb, end)
+            end = length
+        virtualref_boxes = self.consume_virtualref_boxes(end)
+        self._end_section()
         return virtualizable_boxes, virtualref_boxes
 
     def allocate_with_vtable(self, known_class):
@@ -1037,24 +1243,23 @@ class ResumeDataDirectReader(AbstractResumeDataReader):
         info = blackholeinterp.get_current_position_info()
         self._prepare_next_section(info)
 
-    def consume_virtualref_info(self, vrefinfo, numb, end):
+    def consume_virtualref_info(self, vrefinfo, end):
         # we have to decode a list of references containing pairs
-        # [..., virtual, vref, ...]  stopping at 'end'
+        # [..., virtual, vref, ...]  of length 'end'
         assert (end & 1) == 0
         for i in range(0, end, 2):
-            virtual = self.decode_ref(numb.nums[i])
-            vref = self.decode_ref(numb.nums[i+1])
+            virtual = self.decode_ref(self.next_item())
+            vref = self.decode_ref(self.next_item())
             # For each pair, we store the virtual inside the vref.
             vrefinfo.continue_tracing(vref, virtual)
 
-    def consume_vable_info(self, vinfo, numb):
-        # we have to ignore the initial part of 'nums' (containing vrefs),
-        # find the virtualizable from nums[-1], load all other values
-        # from the CPU stack, and copy them into the virtualizable
+    def consume_vable_info(self, vinfo, length):
+        # the section starts with the virtualizable: find it, load all
+        # the values that follow from the CPU stack, and copy them into
+        # the virtualizable.  Returns the number of items left.
         if vinfo is None:
-            return len(numb.nums)
-        index = len(numb.nums) - 1
-        virtualizable = self.decode_ref(numb.nums[index])
+            return length
+        virtualizable = self.decode_ref(self.next_item())
         if self.resume_after_guard_not_forced == 1:
             # in the middle of handle_async_forcing()
             assert vinfo.gettoken(virtualizable)
@@ -1065,7 +1270,8 @@ class ResumeDataDirectReader(AbstractResumeDataReader):
             # is and stays 0.  Note the call to reset_vable_token() in
             # warmstate.py.
             assert not vinfo.gettoken(virtualizable)
-        return vinfo.write_from_resume_data_partial(virtualizable, self, numb)
+        count = vinfo.write_from_resume_data_partial(virtualizable, self)
+        return length - 1 - count
 
     def load_value_of_type(self, TYPE, tagged):
         from pypy.jit.metainterp.warmstate import specialize_value
@@ -1082,12 +1288,14 @@ class ResumeDataDirectReader(AbstractResumeDataReader):
     load_value_of_type._annspecialcase_ = 'specialize:arg(1)'
 
     def consume_vref_and_vable(self, vrefinfo, vinfo, ginfo):
-        numb = self.cur_numb
-        self.cur_numb = numb.prev
         if self.resume_after_guard_not_forced != 2:
-            end_vref = self.consume_vable_info(vinfo, numb)
-            if ginfo is not None: end_vref -= 1
-            self.consume_virtualref_info(vrefinfo, numb, end_vref)
+            length = self._start_section()
+            end_vref = self.consume_vable_info(vinfo, length)
+            if ginfo is not None:
+                self.next_item()      # skip the object with the greenfield
+                end_vref -= 1
+            self.consume_virtualref_info(vrefinfo, end_vref)
+        self._end_section()
 
     def allocate_with_vtable(self, known_class):
         from pypy.jit.metainterp.executor import exec_new_with_vtable
@@ -1241,8 +1449,8 @@ def dump_storage(storage, liveboxes):
             frameinfo = frameinfo.prev
         numb = storage.rd_numb
         while numb:
-            debug_print('\tnumb', str([untag(numb.nums[i])
-                                       for i in range(len(numb.nums))]),
+            debug_print('\tnumb', str([untag(tagged)
+                                       for tagged in unpack_numbering(numb)]),
                         'at', compute_unique_id(numb))
             numb = numb.prev
         for const in storage.rd_consts:
@@ -40,6 +40,7 @@ def _get_jitcodes(testself, CPUClass, func, values, type_system,
 
         trace_limit = sys.maxint
         enable_opts = ALL_OPTS_DICT
+        loop_counters = 0
 
     func._jit_unroll_safe_ = True
     rtyper = support.annotate(func, values, type_system=type_system)
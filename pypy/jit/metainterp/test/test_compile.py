@@ -5,7 +5,7 @@ from pypy.jit.metainterp.compile import insert_loop_token, compile_new_loop
 from pypy.jit.metainterp.compile import ResumeGuardDescr
 from pypy.jit.metainterp.compile import ResumeGuardCountersInt
 from pypy.jit.metainterp.compile import compile_tmp_callback
-from pypy.jit.metainterp import jitprof, typesystem, compile
+from pypy.jit.metainterp import jitprof, typesystem, compile, resume
 from pypy.jit.metainterp.optimizeopt.test.test_util import LLtypeMixin
 from pypy.jit.tool.oparser import parse
 from pypy.jit.metainterp.optimizeopt import ALL_OPTS_DICT
@@ -44,6 +44,7 @@ class FakeLogger(object):
 class FakeState(object):
     enable_opts = ALL_OPTS_DICT.copy()
     enable_opts.pop('unroll')
+    loop_counters = 0
 
     def attach_unoptimized_bridge_from_interp(*args):
         pass
@@ -63,6 +64,7 @@ class FakeMetaInterpStaticData(object):
     stats = Stats()
     profiler = jitprof.EmptyProfiler()
     warmrunnerdesc = None
+    virtual_info_cache = resume.VirtualInfoCache()
     def log(self, msg, event_kind=None):
         pass
 
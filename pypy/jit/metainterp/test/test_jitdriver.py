@@ -58,6 +58,82 @@ class JitDriverTests(object):
         assert sorted(called.keys()) == ['bridge', (10, 1, "entry bridge"),
                                          (10, 1, "loop")]
 
+    def test_on_new_counter(self):
+        counters = []
+        looptokens = []
+
+        class MyJitDriver(JitDriver):
+            def on_new_counter(self, kind, number, location, counter):
+                counters.append((kind, number, location, counter))
+            def on_compile(self, logger, looptoken, operations, type, n):
+                looptokens.append(looptoken)
+            def on_compile_bridge(self, logger, orig_token, operations, n):
+                pass
+
+        driver = MyJitDriver(greens = ['n'], reds = ['i', 'total'],
+                             get_printable_location = lambda n: "n=%d" % n)
+
+        def loop(n, counting):
+            driver.set_param('loop_counters', counting)
+            i = 0
+            total = 0
+            while i < 30:
+                driver.can_enter_jit(n=n, i=i, total=total)
+                driver.jit_merge_point(n=n, i=i, total=total)
+                if i >= 20:
+                    total += 2
+                total += 1
+                i += 1
+            return total
+
+        assert self.meta_interp(loop, [5, 0]) == 50
+        assert counters == []
+        assert self.meta_interp(loop, [5, 1]) == 50
+        runs = {}
+        for kind, number, location, counter in counters:
+            assert kind in ('loop', 'entry bridge', 'bridge', 'guard')
+            assert location == 'n=5'
+            runs[kind, number] = counter.i
+        [guardnumber] = [number for kind, number, _, _ in counters
+                         if kind == 'bridge']
+        # the guard of 'i >= 20' fails twice before its bridge is traced
+        # (trace_eagerness is 2 in the tests), then it goes to the bridge
+        assert runs['guard', guardnumber] == 2
+        assert runs['bridge', guardnumber] > 0
+        assert sum([n for (kind, _), n in runs.items()
+                    if kind == 'loop']) > 10
+        #
+        # the counters are marked when their loop is freed, and belong to
+        # the jitdriver from then on
+        from pypy.jit.backend.model import AbstractCPU
+        assert [c for _, _, _, c in counters if c.freed] == []
+        for looptoken in looptokens:
+            clt = looptoken.compiled_loop_token
+            AbstractCPU.free_loop_and_bridges(clt.cpu, clt)
+        assert [c for _, _, _, c in counters if not c.freed] == []
+
+    def test_is_known_hot(self):
+        def is_known_hot(n):
+            return n == 5
+
+        driver = JitDriver(greens = ['n'], reds = ['i'],
+                           is_known_hot = is_known_hot)
+
+        def loop(n):
+            driver.set_param('threshold', 1000)
+            i = 0
+            while i < 10:
+                driver.can_enter_jit(n=n, i=i)
+                driver.jit_merge_point(n=n, i=i)
+                i += 1
+            return i
+
+        # far below the threshold, but the loop is traced right away
+        assert self.meta_interp(loop, [5]) == 10
+        self.check_loop_count(1)
+        assert self.meta_interp(loop, [6]) == 10
+        self.check_loop_count(0)
+
 
 class TestLLtypeSingle(JitDriverTests, LLJitMixin):
     pass
@@ -66,7 +66,7 @@ class TestProfile(ProfilerMixin):
         assert profiler.events == expected
         assert profiler.times == [3, 2, 1, 1]
         assert profiler.counters == [1, 2, 1, 1, 3, 3, 1, 13, 2, 0, 0, 0, 0,
-                                     0, 0, 0, 0, 0]
+                                     0, 0, 0, 0, 0, 0]
 
     def test_simple_loop_with_call(self):
         @dont_look_inside
@@ -18,6 +18,28 @@ from pypy.rlib.jit import JitDriver, dont_look_inside
 
 class FakeLoopToken:
     generation = 0
+    memory_size = 0
+    compiled_loop_token = None
+
+
+class FakeCompiledLoopToken:
+    def __init__(self, size):
+        self.size = size
+
+    def get_code_size(self):
+        return self.size
+
+
+class FakeCPU:
+    def __init__(self, memmgr):
+        self.memmgr = memmgr
+
+    def get_code_memory(self):
+        # as if the loops that are not alive were freed immediately
+        used = 0
+        for token in self.memmgr.alive_loops:
+            used += token.compiled_loop_token.get_code_size()
+        return used, used + 100
 
 
 class _TestMemoryManager:
@@ -76,6 +98,84 @@ class _TestMemoryManager:
                 assert tokens[i] in memmgr.alive_loops
 
 
+    def test_memory_limit(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.cpu = FakeCPU(memmgr)
+        memmgr.set_memory_limit(1000)
+        tokens = [FakeLoopToken() for i in range(10)]
+        for token in tokens:
+            token.compiled_loop_token = FakeCompiledLoopToken(100)
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(tokens)
+        assert memmgr.alive_loops_size == 1000
+        assert memmgr.loops_evicted == 0
+        #
+        token = FakeLoopToken()
+        token.compiled_loop_token = FakeCompiledLoopToken(100)
+        memmgr.keep_loop_alive(token)
+        memmgr.keep_loop_alive(tokens[0])    # entered again
+        memmgr.next_generation()
+        # down to 3/4 of the limit, by freeing the oldest loops first
+        assert memmgr.alive_loops == dict.fromkeys(tokens[5:] + [token,
+                                                                 tokens[0]])
+        assert memmgr.alive_loops_size == 700
+        assert memmgr.loops_evicted == 4
+        assert tokens[1].memory_size == 0
+
+    def test_memory_limit_keeps_current_loops(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.cpu = FakeCPU(memmgr)
+        memmgr.set_memory_limit(100)
+        tokens = [FakeLoopToken() for i in range(3)]
+        for token in tokens:
+            token.compiled_loop_token = FakeCompiledLoopToken(1000)
+            memmgr.keep_loop_alive(token)
+        memmgr.next_generation()
+        # a loop that was just entered is never freed
+        memmgr.keep_loop_alive(tokens[2])
+        memmgr.next_generation()
+        assert memmgr.alive_loops == {tokens[2]: None}
+        assert memmgr.loops_evicted == 2
+
+    def test_memory_limit_counts_bridges(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.cpu = FakeCPU(memmgr)
+        memmgr.set_memory_limit(1000)
+        tokens = [FakeLoopToken() for i in range(2)]
+        for token in tokens:
+            token.compiled_loop_token = FakeCompiledLoopToken(300)
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        memmgr.keep_loop_alive(tokens[1])
+        # a bridge is attached to a loop already entered in this generation
+        tokens[1].compiled_loop_token.size = 800
+        memmgr.keep_loop_alive_with_bridge(tokens[1])
+        assert memmgr.alive_loops_size == 1100
+        memmgr.next_generation()
+        assert memmgr.alive_loops == {tokens[1]: None}
+        assert memmgr.alive_loops_size == 800
+        assert memmgr.loops_evicted == 1
+
+    def test_memory_stats(self):
+        from pypy.jit.metainterp.memmgr import jit_memory
+        memmgr = MemoryManager()
+        memmgr.cpu = FakeCPU(memmgr)
+        memmgr.set_memory_limit(2048)
+        token = FakeLoopToken()
+        token.compiled_loop_token = FakeCompiledLoopToken(500)
+        memmgr.keep_loop_alive(token)
+        memmgr.next_generation()
+        assert jit_memory.code_used == 500
+        assert jit_memory.code_reserved == 600
+        assert jit_memory.loops_alive == 1
+        assert jit_memory.loops_evicted == 0
+        assert jit_memory.memory_limit == 2048
+
+
 class _TestIntegration(LLJitMixin):
     # See comments in TestMemoryManager.  To get temporarily the normal
     # behavior just rename this class to TestIntegration.
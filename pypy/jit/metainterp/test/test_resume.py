@@ -145,11 +145,8 @@ def _next_section(reader, *expected):
 
 
 def Numbering(prev, nums):
-    numb = lltype.malloc(NUMBERING, len(nums))
-    numb.prev = prev or lltype.nullptr(NUMBERING)
-    for i in range(len(nums)):
-        numb.nums[i] = nums[i]
-    return numb
+    return create_numbering(encode_numbering(nums),
+                            prev or lltype.nullptr(NUMBERING))
 
 def test_simple_read():
     #b1, b2, b3 = [BoxInt(), BoxPtr(), BoxInt()]
@@ -292,6 +289,27 @@ def test_vstructinfo():
     assert reader.force_all_virtuals() == [
         FakeBuiltObject(typedescr=124, fielddescr1=tag(456, TAGINT))]
 
+def test_virtual_info_cache():
+    cache = VirtualInfoCache()
+    info1 = VStructInfo(124, ["fielddescr1"])
+    info1.fieldnums = [tag(456, TAGINT)]
+    assert cache.share(info1) is info1
+    info2 = VStructInfo(124, ["fielddescr1"])
+    info2.fieldnums = [tag(456, TAGINT)]
+    assert cache.share(info2) is info1
+    info3 = VStructInfo(124, ["fielddescr1"])
+    info3.fieldnums = [tag(0, TAGBOX)]
+    assert cache.share(info3) is info3
+    info4 = VStructInfo(125, ["fielddescr1"])
+    info4.fieldnums = [tag(456, TAGINT)]
+    assert cache.share(info4) is info4
+    info5 = VirtualInfo(ConstInt(123), ["fielddescr1"])
+    info5.fieldnums = [tag(456, TAGINT)]
+    assert cache.share(info5) is info5
+    info6 = VirtualInfo(ConstInt(123), ["fielddescr1"])
+    info6.fieldnums = [tag(456, TAGINT)]
+    assert cache.share(info6) is info5
+
 def test_varrayinfo():
     arraydescr = FakeArrayDescr()
     info = VArrayInfo(arraydescr)
@@ -403,12 +421,27 @@ def test_Numbering_create():
     l = [rffi.r_short(1), rffi.r_short(2)]
     numb = Numbering(None, l)
     assert not numb.prev
-    assert list(numb.nums) == l
+    assert unpack_numbering(numb) == l
 
     l1 = [rffi.r_short(3)]
     numb1 = Numbering(numb, l1)
     assert numb1.prev == numb
-    assert list(numb1.nums) == l1
+    assert unpack_numbering(numb1) == l1
+
+def test_encode_numbering():
+    nums = [tag(0, TAGBOX), tag(1, TAGBOX), tag(2, TAGBOX), tag(-1, TAGINT),
+            tag(1000, TAGINT), tag(-1000, TAGINT), tag(3, TAGCONST),
+            NULLREF, tag(0, TAGBOX), tag(7, TAGVIRTUAL), tag(4000, TAGBOX),
+            tag(-(1<<13), TAGINT), tag((1<<13)-1, TAGINT)]
+    code = encode_numbering(nums)
+    assert max(code) < 256 and min(code) >= 0
+    numb = create_numbering(code, lltype.nullptr(NUMBERING))
+    assert unpack_numbering(numb) == nums
+    # the numbers of the boxes in sequence and the small ints take
+    # one byte each
+    code = encode_numbering([tag(5, TAGBOX), tag(6, TAGBOX), tag(7, TAGBOX),
+                             tag(1, TAGINT), tag(-2, TAGINT)])
+    assert len(code) == 1 + 1 + 4
 
 def test_capture_resumedata():
     b1, b2, b3 = [BoxInt(), BoxPtr(), BoxInt()]
@@ -470,7 +503,7 @@ def test_capture_resumedata():
     assert frame_info_list.pc == 15
 
     snapshot = storage.rd_snapshot
-    assert snapshot.boxes == vrs + vbs      # in the same list
+    assert snapshot.boxes == vbs[::-1] + vrs      # in the same list
 
     snapshot = snapshot.prev
     assert snapshot.prev is fs[2].parent_resumedata_snapshot
@@ -480,6 +513,9 @@ def test_capture_resumedata():
 class FakeMetaInterpStaticData:
     cpu = LLtypeMixin.cpu
 
+    def __init__(self):
+        self.virtual_info_cache = VirtualInfoCache()
+
     class options:
         failargs_limit = 100
 
@@ -774,9 +810,9 @@ def test_ResumeDataLoopMemo_number():
 
     assert liveboxes == {b1: tag(0, TAGBOX), b2: tag(1, TAGBOX),
                          b3: tag(2, TAGBOX)}
-    assert list(numb.nums) == [tag(3, TAGINT), tag(2, TAGBOX), tag(0, TAGBOX),
+    assert unpack_numbering(numb) == [tag(3, TAGINT), tag(2, TAGBOX), tag(0, TAGBOX),
                                tag(1, TAGINT)]
-    assert list(numb.prev.nums) == [tag(0, TAGBOX), tag(1, TAGINT),
+    assert unpack_numbering(numb.prev) == [tag(0, TAGBOX), tag(1, TAGINT),
                                     tag(1, TAGBOX),
                                     tag(0, TAGBOX), tag(2, TAGINT)]
     assert not numb.prev.prev
@@ -787,7 +823,7 @@ def test_ResumeDataLoopMemo_number():
     assert liveboxes2 == {b1: tag(0, TAGBOX), b2: tag(1, TAGBOX),
                          b3: tag(2, TAGBOX)}
     assert liveboxes2 is not liveboxes
-    assert list(numb2.nums) == [tag(3, TAGINT), tag(2, TAGBOX), tag(0, TAGBOX),
+    assert unpack_numbering(numb2) == [tag(3, TAGINT), tag(2, TAGBOX), tag(0, TAGBOX),
                                 tag(3, TAGINT)]
     assert numb2.prev == numb.prev
 
@@ -810,7 +846,7 @@ def test_ResumeDataLoopMemo_number():
     assert v == 0
     
     assert liveboxes3 == {b1: tag(0, TAGBOX), b2: tag(1, TAGBOX)}
-    assert list(numb3.nums) == [tag(3, TAGINT), tag(4, TAGINT), tag(0, TAGBOX),
+    assert unpack_numbering(numb3) == [tag(3, TAGINT), tag(4, TAGINT), tag(0, TAGBOX),
                                 tag(3, TAGINT)]
     assert numb3.prev == numb.prev
 
@@ -823,7 +859,7 @@ def test_ResumeDataLoopMemo_number():
     
     assert liveboxes4 == {b1: tag(0, TAGBOX), b2: tag(1, TAGBOX),
                           b4: tag(0, TAGVIRTUAL)}
-    assert list(numb4.nums) == [tag(3, TAGINT), tag(0, TAGVIRTUAL),
+    assert unpack_numbering(numb4) == [tag(3, TAGINT), tag(0, TAGVIRTUAL),
                                 tag(0, TAGBOX), tag(3, TAGINT)]
     assert numb4.prev == numb.prev
 
@@ -836,10 +872,32 @@ def test_ResumeDataLoopMemo_number():
     
     assert liveboxes5 == {b1: tag(0, TAGBOX), b2: tag(1, TAGBOX),
                           b4: tag(0, TAGVIRTUAL), b5: tag(1, TAGVIRTUAL)}
-    assert list(numb5.nums) == [tag(0, TAGBOX), tag(0, TAGVIRTUAL),
+    assert unpack_numbering(numb5) == [tag(0, TAGBOX), tag(0, TAGVIRTUAL),
                                                 tag(1, TAGVIRTUAL)]
     assert numb5.prev == numb4
 
+def test_ResumeDataLoopMemo_share_numberings():
+    b1, b2, b3 = [BoxInt(), BoxInt(), BoxInt()]
+    c1 = ConstInt(1)
+    memo = ResumeDataLoopMemo(FakeMetaInterpStaticData())
+    snap = Snapshot(None, [b1, c1])
+    numb1, liveboxes1, v = memo.number({}, Snapshot(snap, [b2, b1]))
+    assert memo.nnumbreused == 0
+    # another snapshot with the same items, e.g. from the next guard
+    # of the same bytecode
+    snap2 = Snapshot(None, [b1, c1])
+    numb2, liveboxes2, v = memo.number({}, Snapshot(snap2, [b2, b1]))
+    assert numb2 == numb1
+    assert memo.nnumbreused == 2
+    # the numberings only contain the numbers of the boxes
+    numb3, liveboxes3, v = memo.number({}, Snapshot(snap, [b3, b1]))
+    assert numb3 == numb1
+    assert liveboxes3 == {b1: tag(0, TAGBOX), b3: tag(1, TAGBOX)}
+    numb4, liveboxes4, v = memo.number({}, Snapshot(snap, [b1, b2]))
+    assert numb4 != numb1
+    assert numb4.prev == numb1.prev
+    assert unpack_numbering(numb4) == [tag(0, TAGBOX), tag(1, TAGBOX)]
+
 def test_ResumeDataLoopMemo_number_boxes():
     memo = ResumeDataLoopMemo(FakeMetaInterpStaticData())
     b1, b2 = [BoxInt(), BoxInt()]
@@ -975,7 +1033,7 @@ class ResumeDataFakeReader(ResumeDataBoxReader):
         class MyInfo:
             @staticmethod
             def enumerate_vars(callback_i, callback_r, callback_f, _):
-                for index, tagged in enumerate(self.cur_numb.nums):
+                for index, tagged in enumerate(unpack_numbering(self.cur_numb)):
                     box = self.decode_box(tagged, Whatever())
                     if box.type == INT:
                         callback_i(index, index)
@@ -272,6 +272,9 @@ class TestWarmspotDirect(object):
         cls.exc_vtable = exc_vtable
 
         class FakeLoopToken:
+            compiled_loop_token = None
+            memory_size = 0
+
             def __init__(self, no):
                 self.no = no
                 self.generation = 0
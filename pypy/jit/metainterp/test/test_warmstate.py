@@ -107,6 +107,7 @@ def test_make_jitcell_getter():
     class FakeJitDriverSD:
         _green_args_spec = [lltype.Float]
         _get_jitcell_at_ptr = None
+        _is_known_hot_ptr = None
     state = WarmEnterState(None, FakeJitDriverSD())
     get_jitcell = state.make_jitcell_getter()
     cell1 = get_jitcell(True, 1.75)
@@ -151,6 +152,26 @@ def test_make_jitcell_getter_custom():
     assert get_jitcell(False, 42, 0.25) is cell4
     assert cell1 is not cell3 is not cell4 is not cell1
 
+def test_make_jitcell_getter_known_hot():
+    def is_known_hot(x, y):
+        return x == 5
+    IS_KNOWN_HOT = lltype.Ptr(lltype.FuncType(
+        [lltype.Signed, lltype.Float], lltype.Bool))
+    class FakeWarmRunnerDesc:
+        rtyper = None
+        cpu = None
+        memory_manager = None
+    class FakeJitDriverSD:
+        _green_args_spec = [lltype.Signed, lltype.Float]
+        _get_jitcell_at_ptr = None
+        _is_known_hot_ptr = llhelper(IS_KNOWN_HOT, is_known_hot)
+    state = WarmEnterState(FakeWarmRunnerDesc(), FakeJitDriverSD())
+    get_jitcell = state.make_jitcell_getter()
+    cell1 = get_jitcell(True, 5, 42.5)
+    assert cell1.counter == state.THRESHOLD_LIMIT
+    cell2 = get_jitcell(True, 6, 42.5)
+    assert cell2.counter == 0
+
 def test_make_set_future_values():
     future_values = {}
     class FakeCPU:
@@ -187,6 +208,7 @@ def test_attach_unoptimized_bridge_from_interp():
     class FakeJitDriverSD:
         _green_args_spec = [lltype.Signed, lltype.Float]
         _get_jitcell_at_ptr = None
+        _is_known_hot_ptr = None
     state = WarmEnterState(None, FakeJitDriverSD())
     get_jitcell = state.make_jitcell_getter()
     class FakeLoopToken(object):
@@ -239,6 +261,7 @@ def test_make_jitdriver_callbacks_3():
         _can_never_inline_ptr = None
         _get_jitcell_at_ptr = None
         _should_unroll_one_iteration_ptr = None
+        _is_known_hot_ptr = None
     state = WarmEnterState(FakeWarmRunnerDesc(), FakeJitDriverSD())
     state.make_jitdriver_callbacks()
     res = state.get_location_str([ConstInt(5), constfloat(42.5)])
@@ -264,6 +287,7 @@ def test_make_jitdriver_callbacks_4():
         _can_never_inline_ptr = None
         _get_jitcell_at_ptr = None
         _should_unroll_one_iteration_ptr = None
+        _is_known_hot_ptr = None
 
     state = WarmEnterState(FakeWarmRunnerDesc(), FakeJitDriverSD())
     state.make_jitdriver_callbacks()
@@ -289,6 +313,7 @@ def test_make_jitdriver_callbacks_5():
         _can_never_inline_ptr = llhelper(CAN_NEVER_INLINE, can_never_inline)
         _get_jitcell_at_ptr = None
         _should_unroll_one_iteration_ptr = None
+        _is_known_hot_ptr = None
 
     state = WarmEnterState(FakeWarmRunnerDesc(), FakeJitDriverSD())
     state.make_jitdriver_callbacks()
@@ -265,6 +265,12 @@ class WarmEnterState(object):
             self.warmrunnerdesc.memory_manager is not None):   # all for tests
             self.warmrunnerdesc.memory_manager.set_max_age(value)
 
+    def set_param_memory_limit(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.set_memory_limit(value * 1024)
+
     def set_param_retrace_limit(self, value):
         if self.warmrunnerdesc:
             if self.warmrunnerdesc.memory_manager:
@@ -275,6 +281,9 @@ class WarmEnterState(object):
             if self.warmrunnerdesc.memory_manager:
                 self.warmrunnerdesc.memory_manager.max_retrace_guards = value
 
+    def set_param_loop_counters(self, value):
+        self.loop_counters = value
+
     def disable_noninlinable_function(self, greenkey):
         cell = self.jit_cell_at_key(greenkey)
         cell.dont_trace_here = True
@@ -413,10 +422,11 @@ class WarmEnterState(object):
         if hasattr(self, 'jit_getter'):
             return self.jit_getter
         #
+        is_known_hot = self.make_is_known_hot()
         if self.jitdriver_sd._get_jitcell_at_ptr is None:
-            jit_getter = self._make_jitcell_getter_default()
+            jit_getter = self._make_jitcell_getter_default(is_known_hot)
         else:
-            jit_getter = self._make_jitcell_getter_custom()
+            jit_getter = self._make_jitcell_getter_custom(is_known_hot)
         #
         unwrap_greenkey = self.make_unwrap_greenkey()
         #
@@ -428,7 +438,19 @@ class WarmEnterState(object):
         #
         return jit_getter
 
-    def _make_jitcell_getter_default(self):
+    def make_is_known_hot(self):
+        "NOT_RPYTHON"
+        is_known_hot_ptr = self.jitdriver_sd._is_known_hot_ptr
+        if is_known_hot_ptr is None:
+            return None
+        rtyper = self.warmrunnerdesc.rtyper
+        #
+        def is_known_hot(*greenargs):
+            fn = support.maybe_on_top_of_llinterp(rtyper, is_known_hot_ptr)
+            return fn(*greenargs)
+        return is_known_hot
+
+    def _make_jitcell_getter_default(self, is_known_hot=None):
         "NOT_RPYTHON"
         jitdriver_sd = self.jitdriver_sd
         green_args_spec = unrolling_iterable(jitdriver_sd._green_args_spec)
@@ -460,11 +482,14 @@ class WarmEnterState(object):
                 if not build:
                     return None
                 cell = JitCell()
+                if is_known_hot is not None and is_known_hot(*greenargs):
+                    # trace it as soon as it is reached
+                    cell.counter = self.THRESHOLD_LIMIT
                 jitcell_dict[greenargs] = cell
             return cell
         return get_jitcell
 
-    def _make_jitcell_getter_custom(self):
+    def _make_jitcell_getter_custom(self, is_known_hot=None):
         "NOT_RPYTHON"
         rtyper = self.warmrunnerdesc.rtyper
         get_jitcell_at_ptr = self.jitdriver_sd._get_jitcell_at_ptr
@@ -492,6 +517,9 @@ class WarmEnterState(object):
                 return cell
             if cell is None:
                 cell = JitCell()
+                if is_known_hot is not None and is_known_hot(*greenargs):
+                    # trace it as soon as it is reached
+                    cell.counter = self.THRESHOLD_LIMIT
                 # <hacks>
                 if we_are_translated():
                     cellref = cast_object_to_ptr(BASEJITCELL, cell)
@@ -613,6 +641,13 @@ class WarmEnterState(object):
         else:
             jd.on_compile = lambda *args: None
             jd.on_compile_bridge = lambda *args: None
+        if hasattr(jd.jitdriver, 'on_new_counter'):
+            def on_new_counter(kind, number, location, counter):
+                return jd.jitdriver.on_new_counter(kind, number, location,
+                                                   counter)
+            jd.on_new_counter = on_new_counter
+        else:
+            jd.on_new_counter = lambda *args: None
 
         def get_assembler_token(greenkey, redboxes):
             # 'redboxes' is only used to know the types of red arguments
@@ -29,6 +29,7 @@ REGEXES = [
     (('nvirtuals',), '^nvirtuals:\s+(\d+)$'),
     (('nvholes',), '^nvholes:\s+(\d+)$'),
     (('nvreused',), '^nvreused:\s+(\d+)$'),
+    (('nnumbreused',), '^nnumbreused:\s+(\d+)$'),
     (('total_compiled_loops',),   '^Total # of loops:\s+(\d+)$'),
     (('total_compiled_bridges',), '^Total # of bridges:\s+(\d+)$'),
     (('total_freed_loops',),      '^Freed # of loops:\s+(\d+)$'),
@@ -60,6 +61,7 @@ class OutputInfo(object):
     nvirtuals = 0
     nvholes = 0
     nvreused = 0
+    nnumbreused = 0
 
     def __init__(self):
         self.ops = Ops()
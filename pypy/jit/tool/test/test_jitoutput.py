@@ -65,6 +65,7 @@ abort: force quasi-immut: 3
 nvirtuals:              13
 nvholes:                14
 nvreused:               15
+nnumbreused:            16
 Total # of loops:       100
 Total # of bridges:     300
 Freed # of loops:       99
@@ -94,3 +95,4 @@ def test_parse():
     assert info.nvirtuals == 13
     assert info.nvholes == 14
     assert info.nvreused == 15
+    assert info.nnumbreused == 16
@@ -5,7 +5,7 @@ from pypy.module.cpyext.api import (cpython_api, Py_ssize_t, CANNOT_FAIL,
 from pypy.module.cpyext.pyobject import (PyObject, PyObjectP, Py_DecRef,
     borrow_from, make_ref, from_ref)
 from pypy.module.cpyext.pyerrors import PyErr_BadInternalCall
-from pypy.objspace.std.setobject import W_SetObject, newset
+from pypy.objspace.std.setobject import W_SetObject
 from pypy.objspace.std.smalltupleobject import W_SmallTupleObject
 
 
@@ -2,7 +2,7 @@
 Implementation of the interpreter-level default import logic.
 """
 
-import sys, os, stat
+import sys, os, stat, time
 
 from pypy.interpreter.module import Module
 from pypy.interpreter.gateway import interp2app, unwrap_spec
@@ -10,11 +10,12 @@ from pypy.interpreter.typedef import TypeDef, generic_new_descr
 from pypy.interpreter.error import OperationError, operationerrfmt
 from pypy.interpreter.baseobjspace import Wrappable
 from pypy.interpreter.eval import Code
-from pypy.interpreter.pycode import PyCode
+from pypy.interpreter.pycode import PyCode, LazyCode
 from pypy.rlib import streamio, jit
 from pypy.rlib.streamio import StreamErrors
 from pypy.rlib.objectmodel import we_are_translated, specialize
 from pypy.module.sys.version import PYPY_VERSION
+from pypy.module.marshal.interp_marshal import loads_lazy_code
 
 SEARCH_ERROR = 0
 PY_SOURCE = 1
@@ -49,20 +50,23 @@ def get_so_extension(space):
 
     return '.' + soabi + SO
 
-def find_modtype(space, filepart):
+def find_modtype(space, filepart, names=None, basename=None):
     """Check which kind of module to import for the given filepart,
     which is a path without extension.  Returns PY_SOURCE, PY_COMPILED or
-    SEARCH_ERROR.
+    SEARCH_ERROR.  If 'names' is not None, it is the listing of the
+    directory containing filepart, as returned by ImportDirCache, and
+    'basename' is the last part of filepart; the files are then looked
+    up in this listing instead of on the disk.
     """
     # check the .py file
     pyfile = filepart + ".py"
-    if os.path.exists(pyfile) and case_ok(pyfile):
+    if _file_exists(pyfile, names, basename, ".py"):
         return PY_SOURCE, ".py", "U"
 
     # on Windows, also check for a .pyw file
     if CHECK_FOR_PYW:
         pyfile = filepart + ".pyw"
-        if os.path.exists(pyfile) and case_ok(pyfile):
+        if _file_exists(pyfile, names, basename, ".pyw"):
             return PY_SOURCE, ".pyw", "U"
 
     # The .py file does not exist.  By default on PyPy, lonepycfiles
@@ -73,14 +77,14 @@ def find_modtype(space, filepart):
     # check the .pyc file
     if space.config.objspace.usepycfiles and space.config.objspace.lonepycfiles:
         pycfile = filepart + ".pyc"
-        if os.path.exists(pycfile) and case_ok(pycfile):
+        if _file_exists(pycfile, names, basename, ".pyc"):
             # existing .pyc file
             return PY_COMPILED, ".pyc", "rb"
 
     if space.config.objspace.usemodules.cpyext:
         so_extension = get_so_extension(space)
         pydfile = filepart + so_extension
-        if os.path.exists(pydfile) and case_ok(pydfile):
+        if _file_exists(pydfile, names, basename, so_extension):
             return C_EXTENSION, so_extension, "rb"
 
     return SEARCH_ERROR, None, None
@@ -105,6 +109,73 @@ else:
         except OSError:
             return False
 
+def _file_exists(filename, names, basename, suffix):
+    if names is not None:
+        return (basename + suffix) in names
+    return os.path.exists(filename) and case_ok(filename)
+
+def _isdir(filename, names, basename):
+    if names is not None and basename not in names:
+        return False
+    return os.path.isdir(filename) and case_ok(filename)
+
+class DirListing(object):
+    def __init__(self, mtime, names):
+        self.mtime = mtime
+        self.names = names
+
+class ImportDirCache(object):
+    """The listings of the directories searched by imports.  With it,
+    looking for a module in a directory of sys.path costs one stat() of
+    the directory, instead of one for each possible file name.  A listing
+    is valid as long as the mtime of the directory does not change.
+    """
+    # the directories modified less than RACY_DELAY seconds before they
+    # are listed are listed again the next time, as a file could still
+    # be added to them without changing their mtime
+    RACY_DELAY = 2.0
+
+    def __init__(self, space):
+        self.listings = {}
+
+    def _freeze_(self):
+        # don't capture the directories of the translating process
+        self.listings.clear()
+        return True
+
+    def get_listing(self, directory):
+        """Return the names in the directory, as the keys of a dict, or
+        None if the directory cannot be listed."""
+        if not directory.startswith(os.sep):
+            # relative paths depend on the current directory
+            return None
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return None
+        mtime = st.st_mtime
+        listing = self.listings.get(directory, None)
+        if listing is not None and listing.mtime == mtime:
+            return listing.names
+        try:
+            names_list = os.listdir(directory)
+        except OSError:
+            return None
+        names = {}
+        for name in names_list:
+            names[name] = None
+        if time.time() - mtime >= self.RACY_DELAY:
+            self.listings[directory] = DirListing(mtime, names)
+        elif listing is not None:
+            del self.listings[directory]
+        return names
+
+    def invalidate(self):
+        self.listings.clear()
+
+def getdircache(space):
+    return space.fromcache(ImportDirCache)
+
 def try_getattr(space, w_obj, w_name):
     try:
         return space.getattr(w_obj, w_name)
@@ -502,16 +573,24 @@ def find_module(space, modulename, w_modulename, partname, w_path,
 
             path = space.str_w(w_pathitem)
             filepart = os.path.join(path, partname)
-            if os.path.isdir(filepart) and case_ok(filepart):
+            names = None
+            if space.config.objspace.cacheimportdirs:
+                names = getdircache(space).get_listing(path)
+            if _isdir(filepart, names, partname):
                 initfile = os.path.join(filepart, '__init__')
-                modtype, _, _ = find_modtype(space, initfile)
+                initnames = None
+                if names is not None:
+                    initnames = getdircache(space).get_listing(filepart)
+                modtype, _, _ = find_modtype(space, initfile,
+                                             initnames, '__init__')
                 if modtype in (PY_SOURCE, PY_COMPILED):
                     return FindInfo(PKG_DIRECTORY, filepart, None)
                 else:
                     msg = "Not importing directory " +\
                             "'%s' missing __init__.py" % (filepart,)
                     space.warn(msg, space.w_ImportWarning)
-            modtype, suffix, filemode = find_modtype(space, filepart)
+            modtype, suffix, filemode = find_modtype(space, filepart,
+                                                     names, partname)
             try:
                 if modtype in (PY_SOURCE, PY_COMPILED):
                     assert suffix is not None
@@ -905,6 +984,52 @@ def update_code_filenames(space, code_w, pathname, oldname=None):
     for const in constants:
         if const is not None and isinstance(const, PyCode):
             update_code_filenames(space, const, pathname, oldname)
+        elif isinstance(const, LazyCode) and const.co_filename == oldname:
+            # the code objects it loads are fixed by LazyCode.load()
+            const.co_filename = pathname
+
+def _relocate_path(path, oldprefix, newprefix):
+    if path.startswith(oldprefix + os.sep):
+        return newprefix + path[len(oldprefix):]
+    return None
+
+def relocate_code(code, oldprefix, newprefix):
+    """Replace the directory 'oldprefix' with 'newprefix' in the
+    co_filename of a code object.  Its nested code objects are not
+    changed: see relocate_preimported_modules() in module/sys/state.py."""
+    if isinstance(code, PyCode):
+        newname = _relocate_path(code.co_filename, oldprefix, newprefix)
+        if newname is not None:
+            code.co_filename = newname
+    elif isinstance(code, LazyCode):
+        newname = _relocate_path(code.co_filename, oldprefix, newprefix)
+        if newname is not None:
+            code.co_filename = newname
+
+def relocate_module(space, w_mod, oldprefix, newprefix):
+    """Replace the directory 'oldprefix' with 'newprefix' in the __file__
+    and __path__ of a module.  Used for the modules imported while
+    translating, when the executable runs from another directory."""
+    if not isinstance(w_mod, Module):
+        return
+    w_dict = w_mod.w_dict
+    w_file = space.finditem_str(w_dict, '__file__')
+    if w_file is not None and space.is_true(space.isinstance(w_file,
+                                                             space.w_str)):
+        newname = _relocate_path(space.str_w(w_file), oldprefix, newprefix)
+        if newname is not None:
+            space.setitem_str(w_dict, '__file__', space.wrap(newname))
+    w_path = space.finditem_str(w_dict, '__path__')
+    if w_path is not None and space.is_true(space.isinstance(w_path,
+                                                             space.w_list)):
+        paths_w = space.listview(w_path)
+        for i in range(len(paths_w)):
+            w_dir = paths_w[i]
+            if space.is_true(space.isinstance(w_dir, space.w_str)):
+                newname = _relocate_path(space.str_w(w_dir), oldprefix,
+                                         newprefix)
+                if newname is not None:
+                    space.setitem(w_path, space.wrap(i), space.wrap(newname))
 
 def _get_long(s):
     a = ord(s[0])
@@ -963,8 +1088,11 @@ def check_compiled_module(space, pycfilename, expected_mtime):
 def read_compiled_module(space, cpathname, strbuf):
     """ Read a code object from a file and check it for validity """
 
-    w_marshal = space.getbuiltinmodule('marshal')
-    w_code = space.call_method(w_marshal, 'loads', space.wrap(strbuf))
+    if space.config.objspace.lazycodeloading:
+        w_code = loads_lazy_code(space, strbuf)
+    else:
+        w_marshal = space.getbuiltinmodule('marshal')
+        w_code = space.call_method(w_marshal, 'loads', space.wrap(strbuf))
     pycode = space.interpclass_w(w_code)
     if pycode is None or not isinstance(pycode, Code):
         raise operationerrfmt(space.w_ImportError,
@@ -180,3 +180,10 @@ def release_lock(space):
 def reinit_lock(space):
     if space.config.objspace.usemodules.thread:
         importing.getimportlock(space).reinit_lock()
+
+def invalidate_caches(space):
+    """Forget the cached listings of the directories searched by imports,
+    for the files that were added without changing the mtime of their
+    directory."""
+    if space.config.objspace.cacheimportdirs:
+        importing.getdircache(space).invalidate()
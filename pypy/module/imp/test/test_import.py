@@ -665,6 +665,33 @@ class TestPycStuff:
         ret = space.int_w(w_ret)
         assert ret == 42
 
+    def test_read_compiled_module_lazy_code(self):
+        space = gettestobjspace(**{"objspace.lazycodeloading": True})
+        co = compile('def f(x):\n'
+                     '    def g():\n'
+                     '        return x + 1\n'
+                     '    return g\n', 'old.py', 'exec')
+        cpathname = _testfile(importing.get_pyc_magic(space), 12345, co)
+        stream = streamio.open_file_as_stream(cpathname, "rb")
+        try:
+            stream.seek(8, 0)
+            pycode = importing.read_compiled_module(
+                    space, cpathname, stream.readall())
+        finally:
+            stream.close()
+        assert isinstance(pycode.co_consts_w[0],
+                          pypy.interpreter.pycode.LazyCode)
+        # the .pyc file was moved
+        importing.update_code_filenames(space, pycode, 'new.py')
+        w_dic = space.newdict()
+        pycode.exec_code(space, w_dic, w_dic)
+        w_f = space.getitem(w_dic, space.wrap('f'))
+        w_g = space.call_function(w_f, space.wrap(41))
+        assert space.int_w(space.call_function(w_g)) == 42
+        w_code = space.getattr(w_g, space.wrap('func_code'))
+        w_filename = space.getattr(w_code, space.wrap('co_filename'))
+        assert space.str_w(w_filename) == 'new.py'
+
     def test_load_compiled_module(self):
         space = self.space
         mtime = 12345
@@ -1160,3 +1187,90 @@ class AppTestLonePycFile(AppTestNoPycFile):
         "objspace.usepycfiles": True,
         "objspace.lonepycfiles": True
     }
+
+
+class TestImportDirCache:
+    OLD_MTIME = 1000000000
+
+    def setup_method(self, meth):
+        self.dir = udir.ensure('dircache', meth.__name__, dir=1)
+
+    def set_old_mtime(self, p):
+        os.utime(str(p), (self.OLD_MTIME, self.OLD_MTIME))
+
+    def find(self, space, modulename, path):
+        w_path = space.newlist([space.wrap(str(path))])
+        find_info = importing.find_module(space, modulename,
+                                          space.wrap(modulename),
+                                          modulename, w_path,
+                                          use_loader=False)
+        if find_info is not None and find_info.stream is not None:
+            find_info.stream.close()
+        return find_info
+
+    def test_listing(self):
+        dircache = importing.ImportDirCache(self.space)
+        p = self.dir
+        p.join('a.py').write('')
+        self.set_old_mtime(p)
+        assert dircache.get_listing(str(p)) == {'a.py': None}
+        # the listing is kept as long as the mtime does not change
+        p.join('b.py').write('')
+        self.set_old_mtime(p)
+        assert dircache.get_listing(str(p)) == {'a.py': None}
+        os.utime(str(p), (self.OLD_MTIME + 1, self.OLD_MTIME + 1))
+        assert dircache.get_listing(str(p)) == {'a.py': None, 'b.py': None}
+        p.join('c.py').write('')
+        self.set_old_mtime(p)
+        dircache.invalidate()
+        assert len(dircache.get_listing(str(p))) == 3
+
+    def test_recently_modified_directory(self):
+        dircache = importing.ImportDirCache(self.space)
+        p = self.dir
+        p.join('a.py').write('')
+        assert dircache.get_listing(str(p)) == {'a.py': None}
+        assert str(p) not in dircache.listings
+        p.join('b.py').write('')
+        assert dircache.get_listing(str(p)) == {'a.py': None, 'b.py': None}
+
+    def test_not_listed(self):
+        dircache = importing.ImportDirCache(self.space)
+        assert dircache.get_listing(str(self.dir.join('missing'))) is None
+        assert dircache.get_listing('relative') is None
+
+    def test_find_module(self):
+        space = self.space
+        p = self.dir
+        p.join('dircache_mod.py').write('x = 42\n')
+        pkg = p.ensure('dircache_pkg', dir=1)
+        pkg.join('__init__.py').write('')
+        p.ensure('dircache_notpkg', dir=1)
+        self.set_old_mtime(pkg)
+        self.set_old_mtime(p)
+        find_info = self.find(space, 'dircache_mod', p)
+        assert find_info.modtype == importing.PY_SOURCE
+        assert find_info.filename == str(p.join('dircache_mod.py'))
+        find_info = self.find(space, 'dircache_pkg', p)
+        assert find_info.modtype == importing.PKG_DIRECTORY
+        assert self.find(space, 'dircache_notpkg', p) is None
+        assert self.find(space, 'dircache_new', p) is None
+        # a file added without changing the mtime of the directory is
+        # only found after imp.invalidate_caches()
+        p.join('dircache_new.py').write('')
+        self.set_old_mtime(p)
+        assert self.find(space, 'dircache_new', p) is None
+        space.appexec([], """():
+            import imp
+            imp.invalidate_caches()
+        """)
+        assert self.find(space, 'dircache_new', p) is not None
+
+    def test_disabled(self):
+        space = gettestobjspace(**{"objspace.cacheimportdirs": False})
+        p = self.dir
+        self.set_old_mtime(p)
+        assert self.find(space, 'dircache_new', p) is None
+        p.join('dircache_new.py').write('')
+        self.set_old_mtime(p)
+        assert self.find(space, 'dircache_new', p) is not None
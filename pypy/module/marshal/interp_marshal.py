@@ -53,6 +53,14 @@ ignored."""
     space.timer.stop("marshal loads")
     return obj
 
+def loads_lazy_code(space, data):
+    """Like loads(), but the code objects nested in other code objects
+are only unmarshalled when they are first used: they are returned as
+LazyCode objects.  Only used by the import machinery, see the
+objspace.lazycodeloading option."""
+    u = LazyCodeUnmarshaller(space, LazyCodeState(data), 0, 0)
+    return u.load_w_obj(False)
+
 
 class AbstractReaderWriter(object):
     def __init__(self, space):
@@ -351,6 +359,23 @@ class Unmarshaller(_Base):
         self.space = space
         self.reader = reader
         self.stringtable_w = []
+        self.codedepth = 0      # number of code objects being unmarshalled
+
+    def lazy_code(self):
+        """Return True if the code object starting here should be a
+        LazyCode."""
+        return False
+
+    def save_interned(self, w_str):
+        """Record an interned string and return the object that
+        TYPE_STRINGREF should refer to."""
+        self.stringtable_w.append(w_str)
+        return w_str
+
+    def get_interned(self, idx):
+        if 0 <= idx < len(self.stringtable_w):
+            return self.stringtable_w[idx]
+        return None
 
     def get(self, n):
         assert n >= 0
@@ -531,3 +556,81 @@ class StringUnmarshaller(Unmarshaller):
             return x
         else:
             self.raise_exc('bad marshal data')
+
+
+class LazyCodeState(object):
+    """The marshal data of a .pyc file, shared by all the LazyCode
+    objects built from it, together with its table of interned strings.
+    The entries of 'strings_w' are None for the strings that were only
+    skipped so far; 'string_positions' then says where to read them."""
+
+    def __init__(self, data):
+        self.data = data
+        self.strings_w = []
+        self.string_positions = []
+
+
+class LazyCodeUnmarshaller(StringUnmarshaller):
+    """Unmarshaller that builds LazyCode objects for the code objects
+    nested in the one being loaded, skipping over their data.  The
+    interned strings are numbered in the order in which they appear
+    in the data, whether they are read or skipped, so that loading a
+    LazyCode later starts again from the index it had then."""
+
+    def __init__(self, space, state, position, stringindex):
+        Unmarshaller.__init__(self, space, None)
+        self.bufstr = state.data
+        self.bufpos = position
+        self.limit = len(state.data)
+        self.state = state
+        self.stringindex = stringindex
+
+    def lazy_code(self):
+        return self.codedepth > 0
+
+    def skip(self, n):
+        assert n >= 0
+        newpos = self.bufpos + n
+        if newpos > self.limit:
+            self.raise_eof()
+        self.bufpos = newpos
+
+    def skip_interned(self):
+        position = self.bufpos
+        self.skip(self.get_lng())
+        idx = self.stringindex
+        self.stringindex = idx + 1
+        state = self.state
+        if idx == len(state.strings_w):
+            state.strings_w.append(None)
+            state.string_positions.append(position)
+
+    def save_interned(self, w_str):
+        idx = self.stringindex
+        self.stringindex = idx + 1
+        state = self.state
+        if idx == len(state.strings_w):
+            state.strings_w.append(w_str)
+            state.string_positions.append(0)     # not needed
+            return w_str
+        w_known = state.strings_w[idx]
+        if w_known is None:
+            state.strings_w[idx] = w_str
+            return w_str
+        return w_known     # already loaded: keep the same object
+
+    def get_interned(self, idx):
+        state = self.state
+        if not 0 <= idx < len(state.strings_w):
+            return None
+        w_str = state.strings_w[idx]
+        if w_str is None:
+            # only skipped so far: read it now
+            space = self.space
+            position = self.bufpos
+            self.bufpos = state.string_positions[idx]
+            w_str = space.wrap(self.get_str())
+            self.bufpos = position
+            space.call_function(space.builtin.get('intern'), w_str)
+            state.strings_w[idx] = w_str
+        return w_str
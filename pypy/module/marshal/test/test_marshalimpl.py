@@ -61,3 +61,100 @@ class AppTestMarshalSmallLong(AppTestMarshalMore):
         space = gettestobjspace(usemodules=('array',),
                                 **{"objspace.std.withsmalllong": True})
         cls.space = space
+
+
+class TestLazyCode:
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.lazycodeloading": True})
+
+    def load(self, source):
+        import marshal
+        from pypy.interpreter.pycode import PyCode
+        # the host marshal uses TYPE_INTERNED and TYPE_STRINGREF a lot
+        data = marshal.dumps(compile(source, 'mod.py', 'exec'))
+        w_code = interp_marshal.loads_lazy_code(self.space, data)
+        return self.space.interp_w(PyCode, w_code), data
+
+    def test_nested_codes_are_lazy(self):
+        from pypy.interpreter.pycode import PyCode, LazyCode
+        space = self.space
+        code, data = self.load("def f(x):\n"
+                               "    def g():\n"
+                               "        return x\n"
+                               "    return g\n"
+                               "class A:\n"
+                               "    y = 5\n")
+        lazy = [w_const for w_const in code.co_consts_w
+                        if isinstance(w_const, LazyCode)]
+        assert [c.co_name for c in lazy] == ['f', 'A']
+        assert lazy[0].loaded_code is None
+        f_code = lazy[0].load()
+        assert isinstance(f_code, PyCode)
+        assert lazy[0].load() is f_code
+        [g_code] = [w_const for w_const in f_code.co_consts_w
+                            if isinstance(w_const, LazyCode)]
+        assert g_code.nfreevars == 1
+        assert g_code.loaded_code is None
+
+    def test_same_as_eager_loading(self):
+        space = self.space
+        code, data = self.load("def f(a, b=2.5, *args):\n"
+                               "    'doc'\n"
+                               "    return (a, 1L << 70, 3j, u'\\xe9', None,\n"
+                               "            lambda: {'k': [a]}, frozenset())\n"
+                               "class A(object):\n"
+                               "    def m(self, a):\n"
+                               "        return a + f(a)\n"
+                               "x = f(A)\n")
+        w_eager = interp_marshal.loads(space, space.wrap(data))
+        assert space.eq_w(space.wrap(code), w_eager)
+        assert space.eq_w(space.getattr(space.wrap(code),
+                                        space.wrap('co_consts')),
+                          space.getattr(w_eager, space.wrap('co_consts')))
+
+    def test_strings_interned_in_skipped_code(self):
+        # 'spam' and 'eggs' are first seen in f, which is skipped; 'spam'
+        # is then referenced by the module code and 'eggs' only by g
+        space = self.space
+        code, data = self.load("def f():\n"
+                               "    return spam, eggs\n"
+                               "def g():\n"
+                               "    return eggs\n"
+                               "spam = 42\n")
+        assert 'spam' in code.co_names
+        assert 'eggs' not in code.co_names
+        strings_w = code.co_consts_w[0].state.strings_w
+        assert [space.str_w(w_s) for w_s in strings_w
+                                 if w_s is not None] == [
+            'spam', 'f', 'g', '<module>']
+        w_dict = space.newdict()
+        code.exec_code(space, w_dict, w_dict)
+        space.setitem(w_dict, space.wrap('eggs'), space.wrap(42))
+        w_g = space.getitem(w_dict, space.wrap('g'))
+        assert space.int_w(space.call_function(w_g)) == 42
+        w_f = space.getitem(w_dict, space.wrap('f'))
+        w_res = space.call_function(w_f)
+        assert space.eq_w(w_res, space.newtuple([space.wrap(42),
+                                                 space.wrap(42)]))
+
+    def test_functions_load_their_code_when_called(self):
+        from pypy.interpreter.pycode import PyCode, LazyCode
+        space = self.space
+        code, data = self.load("def f(x, y=3):\n"
+                               "    return x * y\n"
+                               "def unused():\n"
+                               "    pass\n")
+        w_dict = space.newdict()
+        code.exec_code(space, w_dict, w_dict)
+        f = space.interpclass_w(space.getitem(w_dict, space.wrap('f')))
+        unused = space.interpclass_w(space.getitem(w_dict,
+                                                   space.wrap('unused')))
+        assert isinstance(f.code, LazyCode)
+        assert space.int_w(space.call_function(space.wrap(f),
+                                               space.wrap(5))) == 15
+        assert isinstance(f.code, PyCode)
+        assert isinstance(unused.code, LazyCode)
+        assert unused.code.loaded_code is None
+        w_code = space.getattr(space.wrap(unused), space.wrap('func_code'))
+        assert space.interpclass_w(w_code) is unused.code
+        assert isinstance(unused.code, PyCode)
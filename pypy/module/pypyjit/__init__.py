@@ -8,6 +8,9 @@ class Module(MixedModule):
         'set_param':    'interp_jit.set_param',
         'residual_call': 'interp_jit.residual_call',
         'set_compile_hook': 'interp_jit.set_compile_hook',
+        'get_stats': 'interp_jit.get_stats',
+        'get_memory_usage': 'interp_jit.get_memory_usage',
+        'set_loop_cache': 'interp_loopcache.set_loop_cache',
         'DebugMergePoint': 'interp_resop.W_DebugMergePoint',
     }
 
@@ -20,3 +23,7 @@ class Module(MixedModule):
         pypyjitdriver.space = space
         w_obj = space.wrap(PARAMETERS)
         space.setattr(space.wrap(self), space.wrap('defaults'), w_obj)
+
+    def shutdown(self, space):
+        from pypy.module.pypyjit.interp_loopcache import LoopCache
+        space.fromcache(LoopCache).save()
@@ -16,8 +16,12 @@ from pypy.interpreter.gateway import unwrap_spec
 from pypy.interpreter.baseobjspace import ObjSpace, W_Root
 from opcode import opmap
 from pypy.rlib.nonconst import NonConstant
+from pypy.rpython.lltypesystem import lltype
 from pypy.jit.metainterp.resoperation import rop
+from pypy.jit.metainterp.jitprof import LOOP_COUNTER, free_loop_counter
+from pypy.jit.metainterp.memmgr import jit_memory
 from pypy.module.pypyjit.interp_resop import debug_merge_point_from_boxes
+from pypy.module.pypyjit.interp_loopcache import is_known_loop, loop_compiled
 
 PyFrame._virtualizable2_ = ['last_instr', 'pycode',
                             'valuestackdepth', 'locals_stack_w[*]',
@@ -69,13 +73,14 @@ class PyPyJitDriver(JitDriver):
         from pypy.rpython.annlowlevel import cast_base_ptr_to_instance
 
         space = self.space
+        pycode = cast_base_ptr_to_instance(PyCode, ll_pycode)
+        loop_compiled(next_instr, is_being_profiled, pycode)
         cache = space.fromcache(Cache)
         if cache.in_recursion:
             return
         if space.is_true(cache.w_compile_hook):
             logops = logger._make_log_operations()
             list_w = wrap_oplist(space, logops, operations)
-            pycode = cast_base_ptr_to_instance(PyCode, ll_pycode)
             cache.in_recursion = True
             try:
                 space.call_function(cache.w_compile_hook,
@@ -108,13 +113,18 @@ class PyPyJitDriver(JitDriver):
                 e.write_unraisable(space, "jit hook ", cache.w_compile_hook)
             cache.in_recursion = False
 
+    def on_new_counter(self, kind, number, location, counter):
+        cache = self.space.fromcache(Cache)
+        cache.add_counter(LoopCounter(kind, number, location, counter))
+
 pypyjitdriver = PyPyJitDriver(get_printable_location = get_printable_location,
                               get_jitcell_at = get_jitcell_at,
                               set_jitcell_at = set_jitcell_at,
                               confirm_enter_jit = confirm_enter_jit,
                               can_never_inline = can_never_inline,
                               should_unroll_one_iteration =
-                              should_unroll_one_iteration)
+                              should_unroll_one_iteration,
+                              is_known_hot = is_known_loop)
 
 class __extend__(PyFrame):
 
@@ -127,7 +137,10 @@ class __extend__(PyFrame):
                 pypyjitdriver.jit_merge_point(ec=ec,
                     frame=self, next_instr=next_instr, pycode=pycode,
                     is_being_profiled=is_being_profiled)
-                co_code = pycode.co_code
+                if we_are_jitted():
+                    co_code = pycode.co_code
+                else:
+                    co_code = pycode.get_code_to_dispatch()
                 self.valuestackdepth = hint(self.valuestackdepth, promote=True)
                 next_instr = self.handle_bytecode(co_code, next_instr, ec)
                 is_being_profiled = self.is_being_profiled
@@ -215,9 +228,41 @@ def residual_call(space, w_callable, __args__):
 
 class Cache(object):
     in_recursion = False
+    MIN_COUNTERS_CHECK = 1000
 
     def __init__(self, space):
         self.w_compile_hook = space.w_None
+        self.counters = []
+        self.counters_check = self.MIN_COUNTERS_CHECK
+
+    def add_counter(self, loopcounter):
+        # the loops are freed and compiled again in a long-running
+        # process: when the list doubled, drop the counters of the freed
+        # loops even if get_stats() did not report them
+        if len(self.counters) >= self.counters_check:
+            self.remove_freed_counters()
+            self.counters_check = max(self.MIN_COUNTERS_CHECK,
+                                      2 * len(self.counters))
+        self.counters.append(loopcounter)
+
+    def remove_freed_counters(self):
+        counters = []
+        for c in self.counters:
+            if c.counter.freed:
+                free_loop_counter(c.counter)
+            else:
+                counters.append(c)
+        self.counters = counters
+
+class LoopCounter(object):
+    """A counter made by the JIT when 'loop_counters' is set, see
+    JitDriver.on_new_counter()."""
+
+    def __init__(self, kind, number, location, counter):
+        self.kind = kind
+        self.number = number
+        self.location = location
+        self.counter = counter
 
 @unwrap_spec(ObjSpace, W_Root)
 def set_compile_hook(space, w_hook):
@@ -244,3 +289,56 @@ def set_compile_hook(space, w_hook):
     cache.w_compile_hook = w_hook
     cache.in_recursion = NonConstant(False)
     return space.w_None
+
+def get_stats(space):
+    """ get_stats() -> list of (kind, number, location, count)
+
+    Return the counters of the JIT, made for the loops, bridges and
+    guards compiled while the 'loop_counters' parameter is set, e.g.
+    with set_param(loop_counters=1).  The kind is 'loop', 'entry bridge',
+    'bridge' or 'guard'.  The count is the number of times the loop
+    or bridge ran, or the number of times the guard failed before a
+    bridge was attached to it; a bridge has the number of its guard.
+    The location is the bytecode of the first merge point of a loop
+    or bridge, and of the last merge point before a guard.  The counters
+    of the loops that were freed are reported one last time, and then
+    forgotten.
+    """
+    cache = space.fromcache(Cache)
+    if NonConstant(False):
+        # the JIT only calls on_new_counter() after the rest of the
+        # interpreter is rtyped: give the counters their final type here
+        pypyjitdriver.on_new_counter(NonConstant('loop'), NonConstant(-1),
+                                     NonConstant(''),
+                                     NonConstant(lltype.nullptr(LOOP_COUNTER)))
+    stats_w = []
+    for c in cache.counters:
+        stats_w.append(space.newtuple([space.wrap(c.kind),
+                                       space.wrap(c.number),
+                                       space.wrap(c.location),
+                                       space.wrap(c.counter.i)]))
+    cache.remove_freed_counters()
+    return space.newlist(stats_w)
+
+def get_memory_usage(space):
+    """ get_memory_usage() -> dict
+
+    Return the memory used by the JIT for the machine code of the loops
+    and bridges, including the guard recovery data that the backend
+    writes next to it: 'code_used' and 'code_reserved' in bytes,
+    'loops_alive' and 'loops_evicted'.  The resume data of the guards,
+    which is allocated in the GC heap, is not counted.  The
+    numbers are updated each time the JIT starts tracing.  If the
+    'memory_limit' parameter is set, e.g. with set_param(memory_limit=
+    10000) for 10000 KB, the loops that were not run for the longest time
+    are freed when more memory than that is used; 'memory_limit' is then
+    the limit in bytes.
+    """
+    w_result = space.newdict()
+    for name, value in [('code_used', jit_memory.code_used),
+                        ('code_reserved', jit_memory.code_reserved),
+                        ('loops_alive', jit_memory.loops_alive),
+                        ('loops_evicted', jit_memory.loops_evicted),
+                        ('memory_limit', jit_memory.memory_limit)]:
+        space.setitem(w_result, space.wrap(name), space.wrap(value))
+    return w_result
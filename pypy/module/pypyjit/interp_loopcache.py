@@ -0,0 +1,150 @@
+"""A cache of the loops compiled by the JIT, kept in a file from one run
+of a program to the next.  See set_loop_cache().
+
+Only the place of each loop is stored, not its trace: the bytecode hash
+of the code object and the other green arguments of the merge point.  A
+new process looks them up when the JitCell of a merge point is made, and
+for a known loop it starts tracing as soon as the loop is reached
+instead of waiting for the threshold.  The loop is then traced and
+optimized as usual, with the quasi-immutables and the type versions of
+this process, so an out-of-date entry can make the JIT start tracing a
+bit early, but never run wrong code.
+"""
+
+import os
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.rlib.objectmodel import compute_hash
+from pypy.rlib.rarithmetic import intmask
+from pypy.rlib.nonconst import NonConstant
+from pypy.rlib import streamio
+
+HEADER = 'pypy jit loop cache 2'
+
+
+def read_cache_file(filename):
+    """Return the dict {key: age} of the entries of the cache file, or
+    an empty dict if it does not exist or is not a cache."""
+    entries = {}
+    try:
+        stream = streamio.open_file_as_stream(filename, 'r')
+        try:
+            data = stream.readall()
+        finally:
+            stream.close()
+    except streamio.StreamErrors:
+        return entries       # no cache yet
+    lines = data.split('\n')
+    if lines[0] != HEADER:
+        return entries       # not a cache, or from another version
+    for i in range(1, len(lines)):
+        line = lines[i]
+        space_index = line.find(' ')
+        if space_index <= 0:
+            continue
+        try:
+            age = int(line[:space_index])
+        except ValueError:
+            continue
+        entries[line[space_index + 1:]] = age
+    return entries
+
+
+class LoopCache(object):
+    # an entry is dropped when no process compiled its loop in the last
+    # 'max_age' saves of the file; and the file keeps at most 'max_loops'
+    # entries, the most recently compiled ones
+    max_age = 50
+    max_loops = 10000
+
+    def __init__(self, space):
+        self.filename = None
+        self.known_loops = {}     # {key: age} loaded from the file
+        self.new_loops = {}       # the keys of the loops compiled here
+
+    def load(self, filename):
+        self.known_loops = read_cache_file(filename)
+
+    def merge_entries(self):
+        """Return the entries to save, by age: the loops compiled here,
+        and the entries of the cache that are not too old, including the
+        ones saved by other processes since load()."""
+        entries = read_cache_file(self.filename)
+        for key, age in self.known_loops.items():
+            if key not in entries or age < entries[key]:
+                entries[key] = age
+        by_age = [[] for i in range(self.max_age)]
+        for key in self.new_loops:
+            by_age[0].append(key)
+        for key, age in entries.items():
+            if key not in self.new_loops and 0 <= age < self.max_age - 1:
+                by_age[age + 1].append(key)
+        result = []
+        for age in range(len(by_age)):
+            for key in by_age[age]:
+                if len(result) >= self.max_loops:
+                    return result
+                result.append('%d %s' % (age, key))
+        return result
+
+    def save(self):
+        filename = self.filename
+        if filename is None:
+            return
+        lines = [HEADER] + self.merge_entries()
+        lines.append('')
+        # many processes may write the same cache: write a file of our
+        # own and rename it, to replace the cache in one step
+        tmpname = '%s.%d' % (filename, os.getpid())
+        try:
+            stream = streamio.open_file_as_stream(tmpname, 'w')
+            try:
+                stream.write('\n'.join(lines))
+            finally:
+                stream.close()
+            os.rename(tmpname, filename)
+        except streamio.StreamErrors:
+            pass         # the cache is not worth an error at exit
+
+# the arguments are the greens of the PyPyJitDriver
+
+def loop_key(next_instr, is_being_profiled, pycode):
+    return '%d %d %d' % (compute_hash(pycode.co_code), intmask(next_instr),
+                         int(is_being_profiled))
+
+def is_known_loop(next_instr, is_being_profiled, pycode):
+    cache = pycode.space.fromcache(LoopCache)
+    if not cache.known_loops:
+        return False
+    key = loop_key(next_instr, is_being_profiled, pycode)
+    return key in cache.known_loops
+
+def loop_compiled(next_instr, is_being_profiled, pycode):
+    cache = pycode.space.fromcache(LoopCache)
+    if cache.filename is not None:
+        key = loop_key(next_instr, is_being_profiled, pycode)
+        cache.new_loops[key] = True
+
+@unwrap_spec(filename='str_or_None')
+def set_loop_cache(space, filename):
+    """ set_loop_cache(filename)
+
+    Keep a cache of the loops compiled by the JIT in the given file.
+    The loops found in the file are traced as soon as they are reached,
+    instead of after 'threshold' iterations; when the interpreter exits,
+    the loops compiled in this process are added to the file.  The loops
+    that no process compiled in the last 50 exits are dropped.  The
+    file is keyed by bytecode, so that changing a function only drops
+    the loops of this function.  With None, stop using a cache.
+    """
+    cache = space.fromcache(LoopCache)
+    if NonConstant(False):
+        # the JIT only calls loop_compiled() after the rest of the
+        # interpreter is rtyped: give the dict its final type here
+        cache.new_loops[NonConstant('')] = True
+    cache.filename = filename
+    cache.new_loops.clear()
+    if filename is None:
+        cache.known_loops.clear()
+    else:
+        cache.load(filename)
+    return space.w_None
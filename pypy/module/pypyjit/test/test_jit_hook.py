@@ -2,16 +2,19 @@
 import py
 from pypy.conftest import gettestobjspace, option
 from pypy.interpreter.pycode import PyCode
-from pypy.interpreter.gateway import interp2app
+from pypy.interpreter.gateway import interp2app, ObjSpace
 from pypy.jit.metainterp.history import LoopToken
 from pypy.jit.metainterp.resoperation import ResOperation, rop
 from pypy.jit.metainterp.logger import Logger
 from pypy.rpython.annlowlevel import (cast_instance_to_base_ptr,
                                       cast_base_ptr_to_instance)
 from pypy.rpython.lltypesystem import lltype, llmemory
-from pypy.module.pypyjit.interp_jit import pypyjitdriver
+from pypy.module.pypyjit.interp_jit import pypyjitdriver, Cache
 from pypy.jit.tool.oparser import parse
 from pypy.jit.metainterp.typesystem import llhelper
+from pypy.jit.metainterp.jitprof import new_loop_counter
+from pypy.module.pypyjit.interp_loopcache import LoopCache, is_known_loop
+from pypy.tool.udir import udir
 
 class MockSD(object):
     class cpu(object):
@@ -47,8 +50,35 @@ class AppTestJitHook(object):
         def interp_on_compile_bridge():
             pypyjitdriver.on_compile_bridge(logger, LoopToken(), oplist, 0)
         
+        counter = new_loop_counter()
+        def interp_on_new_counter():
+            pypyjitdriver.on_new_counter('guard', 42, '<location>', counter)
+        def interp_count():
+            counter.i += 1
+        def interp_new_freed_counters(n):
+            for i in range(n):
+                c = new_loop_counter()
+                c.freed = True
+                pypyjitdriver.on_new_counter('loop', i, '<freed>', c)
+        def interp_num_counters(space):
+            return space.wrap(len(space.fromcache(Cache).counters))
+
+        def interp_is_known_loop():
+            return space.wrap(is_known_loop(0, False, w_f.code))
+        def interp_save_loop_cache():
+            space.fromcache(LoopCache).save()
+
         cls.w_on_compile = space.wrap(interp2app(interp_on_compile))
         cls.w_on_compile_bridge = space.wrap(interp2app(interp_on_compile_bridge))
+        cls.w_on_new_counter = space.wrap(interp2app(interp_on_new_counter))
+        cls.w_count = space.wrap(interp2app(interp_count))
+        cls.w_new_freed_counters = space.wrap(interp2app(
+            interp_new_freed_counters, unwrap_spec=[int]))
+        cls.w_num_counters = space.wrap(interp2app(
+            interp_num_counters, unwrap_spec=[ObjSpace]))
+        cls.w_is_known_loop = space.wrap(interp2app(interp_is_known_loop))
+        cls.w_save_loop_cache = space.wrap(interp2app(interp_save_loop_cache))
+        cls.w_cachefile = space.wrap(str(udir.join('jit_loop_cache')))
 
     def test_on_compile(self):
         import pypyjit
@@ -124,3 +154,62 @@ class AppTestJitHook(object):
         import pypyjit
         dmp = pypyjit.DebugMergePoint(0, 0, self.f.func_code)
         assert dmp.code is self.f.func_code 
+
+    def test_get_stats(self):
+        import pypyjit
+        assert pypyjit.get_stats() == []
+        self.on_new_counter()
+        assert pypyjit.get_stats() == [('guard', 42, '<location>', 0)]
+        self.count()
+        self.count()
+        assert pypyjit.get_stats() == [('guard', 42, '<location>', 2)]
+
+    def test_get_memory_usage(self):
+        import pypyjit
+        usage = pypyjit.get_memory_usage()
+        assert sorted(usage) == ['code_reserved', 'code_used',
+                                 'loops_alive', 'loops_evicted',
+                                 'memory_limit']
+        for value in usage.values():
+            assert value >= 0
+
+    def test_loop_cache(self):
+        import pypyjit
+        pypyjit.set_loop_cache(self.cachefile)
+        assert not self.is_known_loop()
+        self.on_compile()
+        self.save_loop_cache()
+        # as in the next process
+        pypyjit.set_loop_cache(self.cachefile)
+        assert self.is_known_loop()
+        self.save_loop_cache()    # nothing was compiled this time
+        pypyjit.set_loop_cache(self.cachefile)
+        assert self.is_known_loop()
+        pypyjit.set_loop_cache(None)
+        assert not self.is_known_loop()
+
+    def test_loop_cache_bad_file(self):
+        import pypyjit
+        f = open(self.cachefile, 'w')
+        f.write('something else\n')
+        f.close()
+        pypyjit.set_loop_cache(self.cachefile)
+        assert not self.is_known_loop()
+        pypyjit.set_loop_cache(self.cachefile + '.missing')
+        assert not self.is_known_loop()
+        pypyjit.set_loop_cache(None)
+
+    def test_get_stats_freed_loops(self):
+        import pypyjit
+        self.new_freed_counters(2)
+        stats = pypyjit.get_stats()
+        assert ('loop', 0, '<freed>', 0) in stats
+        assert ('loop', 1, '<freed>', 0) in stats
+        # reported once, then forgotten
+        stats = pypyjit.get_stats()
+        assert [s for s in stats if s[2] == '<freed>'] == []
+
+    def test_freed_counters_are_dropped(self):
+        # without calls to get_stats(), the list doesn't grow forever
+        self.new_freed_counters(5000)
+        assert self.num_counters() <= 2000
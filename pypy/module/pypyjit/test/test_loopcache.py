@@ -0,0 +1,63 @@
+from pypy.module.pypyjit.interp_loopcache import LoopCache, read_cache_file
+from pypy.tool.udir import udir
+
+
+def new_cache(filename):
+    cache = LoopCache(None)
+    cache.filename = str(filename)
+    cache.load(cache.filename)
+    return cache
+
+def test_keep_the_loops_of_other_processes():
+    filename = udir.join('loopcache_keep')
+    cache = new_cache(filename)
+    cache.new_loops['1 2 0'] = True
+    cache.save()
+    # a short process that compiles another loop
+    cache = new_cache(filename)
+    cache.new_loops['3 4 0'] = True
+    cache.save()
+    assert read_cache_file(str(filename)) == {'1 2 0': 1, '3 4 0': 0}
+
+def test_concurrent_processes():
+    filename = udir.join('loopcache_concurrent')
+    cache1 = new_cache(filename)
+    cache2 = new_cache(filename)
+    cache1.new_loops['1 2 0'] = True
+    cache1.save()
+    cache2.new_loops['3 4 0'] = True
+    cache2.save()
+    assert read_cache_file(str(filename)) == {'1 2 0': 1, '3 4 0': 0}
+
+def test_drop_old_entries():
+    filename = udir.join('loopcache_old')
+    cache = new_cache(filename)
+    cache.max_age = 3
+    cache.new_loops['1 2 0'] = True
+    cache.save()
+    for i in range(3):
+        cache = new_cache(filename)
+        cache.max_age = 3
+        assert '1 2 0' in cache.known_loops
+        cache.save()
+    assert read_cache_file(str(filename)) == {}
+    # compiling the loop again makes it young again
+    cache = new_cache(filename)
+    cache.new_loops['1 2 0'] = True
+    cache.save()
+    assert read_cache_file(str(filename)) == {'1 2 0': 0}
+
+def test_max_loops():
+    filename = udir.join('loopcache_max')
+    cache = new_cache(filename)
+    cache.new_loops['1 2 0'] = True
+    cache.new_loops['3 4 0'] = True
+    cache.save()
+    cache = new_cache(filename)
+    cache.max_loops = 3
+    cache.new_loops['5 6 0'] = True
+    cache.new_loops['7 8 0'] = True
+    cache.save()
+    entries = read_cache_file(str(filename))
+    assert len(entries) == 3
+    assert entries['5 6 0'] == entries['7 8 0'] == 0
@@ -18,6 +18,10 @@ class State:
 
         self.w_warnoptions = space.newlist([])
         self.w_argv = space.newlist([])
+        # the modules imported while translating and their code objects,
+        # see objspace.preimport
+        self.preimported_modules_w = []
+        self.preimported_codes = []
         self.setinitialpath(space) 
 
     def setinitialpath(self, space): 
@@ -26,6 +30,22 @@ class State:
         srcdir = os.path.dirname(pypydir)
         path = getinitialpath(srcdir)
         self.w_path = space.newlist([space.wrap(p) for p in path])
+        self.srcdir = srcdir
+
+    def relocate_preimported_modules(self, srcdir):
+        """The modules imported while translating were found in the
+        source tree of the translation: make their __file__ and __path__,
+        and the co_filename of all the code objects made by their import,
+        point to the same files in 'srcdir' instead."""
+        oldsrcdir = self.srcdir
+        self.srcdir = srcdir
+        if srcdir == oldsrcdir or not self.preimported_modules_w:
+            return
+        from pypy.module.imp.importing import relocate_module, relocate_code
+        for w_module in self.preimported_modules_w:
+            relocate_module(self.space, w_module, oldsrcdir, srcdir)
+        for code in self.preimported_codes:
+            relocate_code(code, oldsrcdir, srcdir)
 
 def checkdir(path):
     st = os.stat(path)
@@ -79,6 +99,7 @@ def pypy_initial_path(space, srcdir):
                                         space.wrap(srcdir))
         space.setitem(space.sys.w_dict, space.wrap('exec_prefix'),
                                         space.wrap(srcdir))
+        get(space).relocate_preimported_modules(srcdir)
         return space.newlist([space.wrap(p) for p in path])
 
 def get(space):
@@ -45,8 +45,70 @@ def bench_simple_dict(SIZE = 10000):
     count_operation("Existing key access", lambda : rand_keys(lookup_keys))
     return test_d
 
+def bench_iteration(test_d, REPEAT = 100):
+    def iterate():
+        for i in xrange(REPEAT):
+            for key in test_d:
+                pass
+            for key, value in test_d.iteritems():
+                pass
+    count_operation("Iteration", iterate)
+
+def bench_insert_delete(SIZE = 10000, REPEAT = 20):
+    keys = [get_random_string(20) for i in xrange(SIZE)]
+    objkeys = [float(i) for i in xrange(SIZE)]
+
+    def churn(keys):
+        d = {}
+        for i in xrange(REPEAT):
+            for key in keys:
+                d[key] = i
+            for key in keys[::2]:
+                del d[key]
+        return d
+
+    count_operation("Insert/delete, str keys", lambda : churn(keys))
+    count_operation("Insert/delete, object keys", lambda : churn(objkeys))
+
+def get_memory_usage():
+    # resident set size in kilobytes, or None if it cannot be measured
+    try:
+        f = open('/proc/self/statm')
+    except IOError:
+        return None
+    try:
+        pages = int(f.read().split()[1])
+    finally:
+        f.close()
+    return pages * 4
+
+def bench_memory(NUMBER = 100000, SIZE = 6):
+    # many small dicts, like instance dicts or keyword arguments
+    keys = [get_random_string(10) for i in xrange(SIZE)]
+    import gc
+    gc.collect()
+    before = get_memory_usage()
+    dicts = count_operation("Creating %d dicts of %d items" % (NUMBER, SIZE),
+                            lambda : [dict.fromkeys(keys, i)
+                                      for i in xrange(NUMBER)])
+    gc.collect()
+    after = get_memory_usage()
+    if before is not None:
+        print "Memory per dict: %.1f bytes" % ((after - before) * 1024.0 /
+                                               NUMBER)
+    return dicts
+
 if __name__ == '__main__':
+    # Run this with two pypy-c, one of them translated with
+    # --objspace-std-withcompactdicts, to compare the dict layouts.
     test_d = bench_simple_dict()
-    import __pypy__
-    print __pypy__.internal_repr(test_d)
-    print __pypy__.internal_repr(test_d.iterkeys())
+    bench_iteration(test_d)
+    bench_insert_delete()
+    bench_memory()
+    try:
+        import __pypy__
+    except ImportError:
+        pass
+    else:
+        print __pypy__.internal_repr(test_d)
+        print __pypy__.internal_repr(test_d.iterkeys())
@@ -9,10 +9,7 @@ from pypy.rlib.rstring import StringBuilder
 from pypy.rlib.debug import check_annotation
 from pypy.objspace.std import stringobject
 from pypy.objspace.std.intobject import W_IntObject
-from pypy.objspace.std.listobject import (
-    _delitem_slice_helper, _setitem_slice_helper,
-    get_positive_index
-)
+from pypy.objspace.std.listobject import get_positive_index
 from pypy.objspace.std.listtype import get_list_index
 from pypy.objspace.std.sliceobject import W_SliceObject, normalize_simple_slice
 from pypy.objspace.std.stringobject import W_StringObject
@@ -26,7 +23,6 @@ from pypy.objspace.std.bytearraytype import (
     makebytearraydata_w, getbytevalue,
     new_bytearray
 )
-from pypy.tool.sourcetools import func_with_new_name
 
 
 class W_BytearrayObject(W_Object):
@@ -114,7 +110,10 @@ def getitem__Bytearray_Slice(space, w_bytearray, w_slice):
     length = len(data)
     start, stop, step, slicelength = w_slice.indices4(space, length)
     assert slicelength >= 0
-    newdata = [data[start + i*step] for i in range(slicelength)]
+    if step == 1 and 0 <= start <= stop:
+        newdata = data[start:stop]
+    else:
+        newdata = [data[start + i*step] for i in range(slicelength)]
     return W_BytearrayObject(newdata)
 
 def contains__Bytearray_Int(space, w_bytearray, w_char):
@@ -144,14 +143,14 @@ def add__Bytearray_Bytearray(space, w_bytearray1, w_bytearray2):
     return W_BytearrayObject(data1 + data2)
 
 def add__Bytearray_ANY(space, w_bytearray1, w_other):
-    data1 = w_bytearray1.data
-    data2 = [c for c in space.bufferstr_new_w(w_other)]
-    return W_BytearrayObject(data1 + data2)
+    newdata = w_bytearray1.data[:]
+    newdata += space.bufferstr_new_w(w_other)
+    return W_BytearrayObject(newdata)
 
 def add__String_Bytearray(space, w_str, w_bytearray):
-    data2 = w_bytearray.data
-    data1 = [c for c in space.str_w(w_str)]
-    return W_BytearrayObject(data1 + data2)
+    newdata = [c for c in space.str_w(w_str)]
+    newdata += w_bytearray.data
+    return W_BytearrayObject(newdata)
 
 def mul_bytearray_times(space, w_bytearray, w_times):
     try:
@@ -180,14 +179,7 @@ def inplace_mul__Bytearray_ANY(space, w_bytearray, w_times):
     return w_bytearray
 
 def eq__Bytearray_Bytearray(space, w_bytearray1, w_bytearray2):
-    data1 = w_bytearray1.data
-    data2 = w_bytearray2.data
-    if len(data1) != len(data2):
-        return space.w_False
-    for i in range(len(data1)):
-        if data1[i] != data2[i]:
-            return space.w_False
-    return space.w_True
+    return space.newbool(w_bytearray1.data == w_bytearray2.data)
 
 def String2Bytearray(space, w_str):
     data = [c for c in space.str_w(w_str)]
@@ -369,16 +361,21 @@ def str_join__Bytearray_ANY(space, w_self, w_list):
     newdata = []
     for i in range(len(list_w)):
         w_s = list_w[i]
-        if not (space.is_true(space.isinstance(w_s, space.w_str)) or
-                space.is_true(space.isinstance(w_s, space.w_bytearray))):
+        if isinstance(w_s, W_BytearrayObject):
+            s_data = w_s.data
+            if data and i != 0:
+                newdata += data
+            newdata += s_data
+            continue
+        if not space.is_true(space.isinstance(w_s, space.w_str)):
             raise operationerrfmt(
                 space.w_TypeError,
                 "sequence item %d: expected string, %s "
                 "found", i, space.type(w_s).getname(space))
 
         if data and i != 0:
-            newdata.extend(data)
-        newdata.extend([c for c in space.bufferstr_new_w(w_s)])
+            newdata += data
+        newdata += space.bufferstr_new_w(w_s)
     return W_BytearrayObject(newdata)
 
 def str_decode__Bytearray_ANY_ANY(space, w_bytearray, w_encoding, w_errors):
@@ -587,7 +584,10 @@ def list_extend__Bytearray_Bytearray(space, w_bytearray, w_other):
     w_bytearray.data += w_other.data
 
 def list_extend__Bytearray_ANY(space, w_bytearray, w_other):
-    w_bytearray.data += makebytearraydata_w(space, w_other)
+    if space.isinstance_w(w_other, space.w_str):
+        w_bytearray.data += space.str_w(w_other)
+    else:
+        w_bytearray.data += makebytearraydata_w(space, w_other)
 
 def inplace_add__Bytearray_Bytearray(space, w_bytearray1, w_bytearray2):
     list_extend__Bytearray_Bytearray(space, w_bytearray1, w_bytearray2)
@@ -626,11 +626,81 @@ def delitem__Bytearray_Slice(space, w_bytearray, w_slice):
                                                       len(w_bytearray.data))
     delitem_slice_helper(space, w_bytearray.data, start, step, slicelength)
 
-# create new helper functions with different list type specialisation
-delitem_slice_helper = func_with_new_name(_delitem_slice_helper,
-                                          'delitem_slice_helper')
-setitem_slice_helper = func_with_new_name(_setitem_slice_helper,
-                                          'setitem_slice_helper')
+def delitem_slice_helper(space, items, start, step, slicelength):
+    if slicelength==0:
+        return
+
+    if step < 0:
+        start = start + step * (slicelength-1)
+        step = -step
+
+    if step == 1:
+        assert start >= 0
+        assert slicelength >= 0
+        del items[start:start+slicelength]
+    else:
+        n = len(items)
+        i = start
+
+        for discard in range(1, slicelength):
+            j = i+1
+            i += step
+            while j < i:
+                items[j-discard] = items[j]
+                j += 1
+
+        j = i+1
+        while j < n:
+            items[j-slicelength] = items[j]
+            j += 1
+        start = n - slicelength
+        assert start >= 0 # annotator hint
+        del items[start:]
+
+def setitem_slice_helper(space, items, start, step, slicelength, sequence2,
+                          empty_elem):
+    assert slicelength >= 0
+    oldsize = len(items)
+    len2 = len(sequence2)
+    if step == 1:  # Support list resizing for non-extended slices
+        delta = slicelength - len2
+        if delta < 0:
+            delta = -delta
+            newsize = oldsize + delta
+            # XXX support this in rlist!
+            items += [empty_elem] * delta
+            lim = start+len2
+            i = newsize - 1
+            while i >= lim:
+                items[i] = items[i-delta]
+                i -= 1
+        elif start >= 0:
+            del items[start:start+delta]
+        else:
+            assert delta==0   # start<0 is only possible with slicelength==0
+    elif len2 != slicelength:  # No resize for extended slices
+        raise operationerrfmt(space.w_ValueError, "attempt to "
+              "assign sequence of size %d to extended slice of size %d",
+              len2, slicelength)
+
+    if sequence2 is items:
+        if step > 0:
+            # Always copy starting from the right to avoid
+            # having to make a shallow copy in the case where
+            # the source and destination lists are the same list.
+            i = len2 - 1
+            start += i*step
+            while i >= 0:
+                items[start] = sequence2[i]
+                start -= step
+                i -= 1
+            return
+        else:
+            # Make a shallow copy to more easily handle the reversal case
+            sequence2 = list(sequence2)
+    for i in range(len2):
+        items[start] = sequence2[i]
+        start += step
 
 def _strip(space, w_bytearray, u_chars, left, right):
     # note: mostly copied from stringobject._strip
@@ -655,20 +725,43 @@ def _strip(space, w_bytearray, u_chars, left, right):
 # Buffer interface
 
 class BytearrayBuffer(RWBuffer):
-    def __init__(self, data):
-        self.data = data
+    """A read-write view on the storage of a bytearray.  It reads and
+    writes the current data of the bytearray, even if it was resized in
+    the meantime."""
+
+    def __init__(self, w_bytearray):
+        self.w_bytearray = w_bytearray
 
     def getlength(self):
-        return len(self.data)
+        return len(self.w_bytearray.data)
+
+    def as_str(self):
+        return ''.join(self.w_bytearray.data)
 
     def getitem(self, index):
-        return self.data[index]
+        return self.w_bytearray.data[index]
+
+    def getslice(self, start, stop, step, size):
+        if size == 0:
+            return ""
+        data = self.w_bytearray.data
+        if step == 1:
+            assert 0 <= start <= stop
+            return ''.join(data[start:stop])
+        return ''.join([data[start + i*step] for i in xrange(size)])
 
     def setitem(self, index, char):
-        self.data[index] = char
+        self.w_bytearray.data[index] = char
+
+    def setslice(self, start, string):
+        # copy the string directly into the storage, without going through
+        # setitem() for every character
+        data = self.w_bytearray.data
+        for i in range(len(string)):
+            data[start + i] = string[i]
 
 def buffer__Bytearray(space, self):
-    b = BytearrayBuffer(self.data)
+    b = BytearrayBuffer(self)
     return space.wrap(b)
 
 from pypy.objspace.std import bytearraytype
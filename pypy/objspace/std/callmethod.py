@@ -11,10 +11,12 @@ like: (on the left, without the new bytecodes; on the right, with them)
 """
 
 from pypy.interpreter import function
+from pypy.interpreter.module import Module
 from pypy.objspace.descroperation import object_getattribute
 from pypy.rlib import jit
 from pypy.objspace.std.mapdict import LOOKUP_METHOD_mapdict, \
     LOOKUP_METHOD_mapdict_fill_cache_method
+from pypy.objspace.std.celldict import LOAD_ATTR_module_caching
 
 
 # This module exports two extra methods for StdObjSpaceFrame implementing
@@ -34,6 +36,15 @@ def LOOKUP_METHOD(f, nameindex, *ignored):
     space = f.space
     w_obj = f.popvalue()
 
+    if (space.config.objspace.std.withcellcache and
+            not jit.we_are_jitted() and isinstance(w_obj, Module)):
+        # the common case 'module.function(args..)', with a cache of the
+        # module dict cell
+        w_value = LOAD_ATTR_module_caching(f.getcode(), w_obj, nameindex)
+        f.pushvalue(w_value)
+        f.pushvalue(None)
+        return
+
     if space.config.objspace.std.withmapdict and not jit.we_are_jitted():
         # mapdict has an extra-fast version of this function
         from pypy.objspace.std.mapdict import LOOKUP_METHOD_mapdict
@@ -87,6 +98,15 @@ def CALL_METHOD(f, oparg, *ignored):
         finally:
             f.dropvalues(n_args + 2)
     else:
+        if (not f.space.config.objspace.disable_call_speedhacks and
+                not jit.we_are_jitted()):
+            w_callable = f.peekvalue(n_args + (2 * n_kwargs) + 1)
+            w_result = f.call_keywords_fast(w_callable, w_self, n_args,
+                                            n_kwargs)
+            if w_result is not None:
+                f.dropvalues(n_args + (2 * n_kwargs) + 2)
+                f.pushvalue(w_result)
+                return
         keywords = [None] * n_kwargs
         keywords_w = [None] * n_kwargs
         while True:
@@ -3,10 +3,13 @@ This ensures that the function (dict, key) -> cell is pure. By itself, this
 optimization is not helping at all, but in conjunction with the JIT it can
 speed up global lookups a lot."""
 
+import weakref
 from pypy.objspace.std.dictmultiobject import IteratorImplementation
+from pypy.objspace.std.dictmultiobject import W_DictMultiObject
 from pypy.objspace.std.dictmultiobject import DictStrategy, _never_equal_to_string
 from pypy.objspace.std.dictmultiobject import ObjectDictStrategy
-from pypy.rlib import jit, rerased
+from pypy.objspace.std.dictmultiobject import EmptyDictStrategy
+from pypy.rlib import jit, rerased, objectmodel
 
 class ModuleCell(object):
     def __init__(self, w_value=None):
@@ -172,3 +175,115 @@ class ModuleDictIteratorImplementation(IteratorImplementation):
                 return (self.space.wrap(key), cell.w_value)
         else:
             return None, None
+
+# ____________________________________________________________
+# Caching of the cells in the code objects.  Not used if we_are_jitted():
+# the JIT already constant-folds the cell lookups, see getcell() above.
+
+class CellCacheEntry(object):
+    cell = None
+    builtins_cell = None
+    version_tag = None
+
+    @jit.dont_look_inside
+    def is_valid_for_dict(self, w_dict):
+        mydict = self.w_dict_wref()
+        # the cells stay attached to the dict as long as it uses the
+        # ModuleDictStrategy; this strategy is never switched back to
+        return (mydict is w_dict and
+                isinstance(mydict.strategy, ModuleDictStrategy))
+
+_invalid_cache_entry_dict = objectmodel.instantiate(W_DictMultiObject)
+_invalid_cache_entry_dict.space = None
+_invalid_cache_entry_dict.strategy = None
+_invalid_cache_entry_dict.dstorage = EmptyDictStrategy.erase(None)
+INVALID_CELL_CACHE_ENTRY = CellCacheEntry()
+INVALID_CELL_CACHE_ENTRY.w_dict_wref = weakref.ref(_invalid_cache_entry_dict)
+                                 # different from any real dict ^^^
+
+def init_cell_caches(pycode):
+    num_entries = len(pycode.co_names_w)
+    pycode._globals_caches = [INVALID_CELL_CACHE_ENTRY] * num_entries
+    pycode._module_attr_caches = [INVALID_CELL_CACHE_ENTRY] * num_entries
+
+def _get_module_dict(w_dict):
+    # returns w_dict if it is a dict using the ModuleDictStrategy
+    if (isinstance(w_dict, W_DictMultiObject) and
+            isinstance(w_dict.strategy, ModuleDictStrategy)):
+        return w_dict
+    return None
+
+@jit.dont_look_inside
+def _fill_cell_cache(caches, nameindex, w_dict, cell):
+    entry = caches[nameindex]
+    if entry is INVALID_CELL_CACHE_ENTRY:
+        entry = CellCacheEntry()
+        caches[nameindex] = entry
+    entry.w_dict_wref = weakref.ref(w_dict)
+    entry.cell = cell
+    return entry
+
+def LOAD_GLOBAL_caching(f, nameindex):
+    entry = f.getcode()._globals_caches[nameindex]
+    if entry.is_valid_for_dict(f.w_globals):
+        w_value = entry.cell.w_value
+        if w_value is not None:
+            return w_value
+        # not in the globals, now look in the built-ins
+        if _get_module_dict(f.get_builtin().w_dict) is not None:
+            w_value = entry.builtins_cell.w_value
+            if w_value is not None:
+                return w_value
+    return LOAD_GLOBAL_slowpath(f, nameindex)
+LOAD_GLOBAL_caching._always_inline_ = True
+
+def LOAD_GLOBAL_slowpath(f, nameindex):
+    pycode = f.getcode()
+    varname = f.getname_u(nameindex)
+    w_globals = _get_module_dict(f.w_globals)
+    w_builtins = _get_module_dict(f.get_builtin().w_dict)
+    if w_globals is not None and w_builtins is not None:
+        strategy = f.space.fromcache(ModuleDictStrategy)
+        # note that this creates empty cells for the missing names, which
+        # will be filled if the name is assigned to later
+        cell = strategy.getcell(w_globals, varname, True)
+        entry = _fill_cell_cache(pycode._globals_caches, nameindex,
+                                 w_globals, cell)
+        entry.builtins_cell = strategy.getcell(w_builtins, varname, True)
+    # the built-in modules load their content lazily, so an empty cell
+    # in the built-ins is not a reason to fail yet
+    return f._load_global(varname)
+LOAD_GLOBAL_slowpath._dont_inline_ = True
+
+def LOAD_ATTR_module_caching(pycode, w_module, nameindex):
+    # 'w_module' is an instance of pypy.interpreter.module.Module
+    entry = pycode._module_attr_caches[nameindex]
+    if entry.is_valid_for_dict(w_module.w_dict):
+        w_value = entry.cell.w_value
+        if (w_value is not None and
+                pycode.space.type(w_module).version_tag() is entry.version_tag):
+            return w_value
+    return LOAD_ATTR_module_slowpath(pycode, w_module, nameindex)
+LOAD_ATTR_module_caching._always_inline_ = True
+
+def LOAD_ATTR_module_slowpath(pycode, w_module, nameindex):
+    space = pycode.space
+    w_name = pycode.co_names_w[nameindex]
+    w_dict = _get_module_dict(w_module.w_dict)
+    w_type = space.type(w_module)
+    version_tag = w_type.version_tag()
+    if (w_dict is not None and version_tag is not None and
+            w_type.has_object_getattribute()):
+        name = space.str_w(w_name)
+        _, w_descr = w_type._pure_lookup_where_with_method_cache(
+            name, version_tag)
+        if w_descr is None:
+            # common case: the attribute is not in the class, so it can
+            # only come from the module dict
+            strategy = space.fromcache(ModuleDictStrategy)
+            cell = strategy.getcell(w_dict, name, True)
+            entry = _fill_cell_cache(pycode._module_attr_caches, nameindex,
+                                     w_dict, cell)
+            entry.version_tag = version_tag
+    return space.getattr(w_module, w_name)
+LOAD_ATTR_module_slowpath._dont_inline_ = True
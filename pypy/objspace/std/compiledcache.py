@@ -0,0 +1,46 @@
+"""A cache of the compiled form of format strings, used by the '%'
+operator (formatting.py) and by str.format() (newformat.py).
+
+The cache is an array indexed by the hash of the format string, so it
+has a bounded size and a collision just replaces the older entry.  The
+format strings that cannot be compiled are cached too, with None as
+their compiled form, so that they are only parsed again by the slow
+path of the caller.
+"""
+
+from pypy.rlib import jit
+from pypy.rlib.objectmodel import compute_hash
+
+
+def make_compiled_cache(compile, size_exp):
+    """Return a class for space.fromcache() and an elidable function
+    get_compiled(space, key) returning compile(key), or None if 'key'
+    cannot be compiled.  'compile' must always give the same result
+    for equal keys."""
+
+    class CompiledCache(object):
+        def __init__(self, space):
+            SIZE = 1 << size_exp
+            self.keys = [None] * SIZE
+            self.compiled = [None] * SIZE
+
+        def clear(self):
+            for i in range(len(self.keys)):
+                self.keys[i] = None
+                self.compiled[i] = None
+
+        def lookup(self, key):
+            index = compute_hash(key) & ((1 << size_exp) - 1)
+            cached_key = self.keys[index]
+            if cached_key is not None and cached_key == key:
+                return self.compiled[index]
+            compiled = compile(key)
+            self.keys[index] = key
+            self.compiled[index] = compiled
+            return compiled
+
+    @jit.elidable
+    def get_compiled(space, key):
+        return space.fromcache(CompiledCache).lookup(key)
+
+    return CompiledCache, get_compiled
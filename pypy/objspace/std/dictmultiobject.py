@@ -1,4 +1,5 @@
 import py, sys
+from collections import OrderedDict
 from pypy.objspace.std.model import registerimplementation, W_Object
 from pypy.objspace.std.register_all import register_all
 from pypy.objspace.std.settype import set_typedef as settypedef
@@ -6,7 +7,8 @@ from pypy.interpreter import gateway
 from pypy.interpreter.argument import Signature
 from pypy.interpreter.error import OperationError, operationerrfmt
 
-from pypy.rlib.objectmodel import r_dict, we_are_translated, specialize
+from pypy.rlib.objectmodel import r_dict, r_ordereddict
+from pypy.rlib.objectmodel import we_are_translated, specialize
 from pypy.rlib.debug import mark_dict_non_null
 
 from pypy.rlib import rerased
@@ -401,9 +403,13 @@ class ObjectDictStrategy(AbstractTypedStrategy, DictStrategy):
         return True
 
     def get_empty_storage(self):
-       new_dict = r_dict(self.space.eq_w, self.space.hash_w,
-                         force_non_null=True)
-       return self.erase(new_dict)
+        if self.space.config.objspace.std.withcompactdicts:
+            new_dict = r_ordereddict(self.space.eq_w, self.space.hash_w,
+                                     force_non_null=True)
+        else:
+            new_dict = r_dict(self.space.eq_w, self.space.hash_w,
+                              force_non_null=True)
+        return self.erase(new_dict)
 
     def _never_equal_to(self, w_lookup_type):
         return False
@@ -432,7 +438,10 @@ class StringDictStrategy(AbstractTypedStrategy, DictStrategy):
         return space.is_w(space.type(w_obj), space.w_str)
 
     def get_empty_storage(self):
-        res = {}
+        if self.space.config.objspace.std.withcompactdicts:
+            res = OrderedDict()
+        else:
+            res = {}
         mark_dict_non_null(res)
         return self.erase(res)
 
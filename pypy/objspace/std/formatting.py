@@ -1,13 +1,20 @@
 """
 String formatting routines.
 """
+from pypy.rlib import jit
 from pypy.rlib.unroll import unrolling_iterable
 from pypy.rlib.rarithmetic import ovfcheck
+from pypy.rlib.objectmodel import specialize
 from pypy.rlib.rfloat import formatd, DTSF_ALT, isnan, isinf
 from pypy.interpreter.error import OperationError
 from pypy.tool.sourcetools import func_with_new_name
 from pypy.rlib.rstring import StringBuilder, UnicodeBuilder
 from pypy.objspace.std.unicodetype import unicode_from_object
+from pypy.objspace.std.compiledcache import make_compiled_cache
+
+# the compiled format strings are cached in an array of this size,
+# indexed by the hash of the format string
+FORMAT_CACHE_SIZE_EXP = 8
 
 class BaseStringFormatter(object):
     def __init__(self, space, values_w, w_valuedict):
@@ -158,6 +165,128 @@ def make_formatter_subclass(do_unicode):
     else:
         const = str
 
+    class FormatDirective(object):
+        """A conversion specifier of a compiled format string, together
+        with the literal text in front of it."""
+        _immutable_fields_ = ['literal', 'key', 'f_ljust', 'f_sign',
+                              'f_blank', 'f_alt', 'f_zero', 'width', 'prec',
+                              'char', 'simple']
+
+        def __init__(self, literal, key, f_ljust, f_sign, f_blank, f_alt,
+                     f_zero, width, prec, char):
+            self.literal = literal
+            self.key = key
+            self.f_ljust = f_ljust
+            self.f_sign = f_sign
+            self.f_blank = f_blank
+            self.f_alt = f_alt
+            self.f_zero = f_zero
+            self.width = width
+            self.prec = prec
+            self.char = char
+            # no flags, width or precision
+            self.simple = not (f_ljust or f_sign or f_blank or f_alt or
+                               f_zero or width or prec >= 0)
+
+    class CompiledFormat(object):
+        _immutable_fields_ = ['directives[*]', 'tail']
+
+        def __init__(self, directives, tail):
+            self.directives = directives
+            self.tail = tail
+
+    def parse_num(fmt, i):
+        # returns (number, index after it), or (-1, -1) if the number
+        # is given as '*' or is too large
+        end = len(fmt)
+        if i < end and fmt[i] == '*':
+            return -1, -1
+        result = 0
+        while i < end:
+            n = ord(fmt[i]) - ord('0')
+            if not (0 <= n < 10):
+                break
+            try:
+                result = ovfcheck(ovfcheck(result * 10) + n)
+            except OverflowError:
+                return -1, -1
+            i += 1
+        return result, i
+
+    def compile_format(fmt):
+        """Turns 'fmt' into a CompiledFormat.  Returns None if 'fmt' is
+        invalid or uses '*' for the width or precision: these cases are
+        left to StringFormatter.format_slow()."""
+        directives = []
+        end = len(fmt)
+        i = i0 = 0
+        while True:
+            while i < end and fmt[i] != '%':
+                i += 1
+            if i == end:
+                break
+            literal = fmt[i0:i]
+            i += 1
+            key = None
+            if i < end and fmt[i] == '(':
+                i += 1
+                key_start = i
+                pcount = 1
+                while True:
+                    if i == end:
+                        return None
+                    c = fmt[i]
+                    if c == ')':
+                        pcount -= 1
+                        if pcount == 0:
+                            break
+                    elif c == '(':
+                        pcount += 1
+                    i += 1
+                key = fmt[key_start:i]
+                i += 1
+            f_ljust = f_sign = f_blank = f_alt = f_zero = False
+            while i < end:
+                c = fmt[i]
+                if c == '-':
+                    f_ljust = True
+                elif c == '+':
+                    f_sign = True
+                elif c == ' ':
+                    f_blank = True
+                elif c == '#':
+                    f_alt = True
+                elif c == '0':
+                    f_zero = True
+                else:
+                    break
+                i += 1
+            width, i = parse_num(fmt, i)
+            if i < 0:
+                return None
+            prec = -1
+            if i < end and fmt[i] == '.':
+                prec, i = parse_num(fmt, i + 1)
+                if i < 0:
+                    return None
+            if i < end and (fmt[i] == 'h' or fmt[i] == 'l' or
+                            fmt[i] == 'L'):
+                i += 1
+            if i == end:
+                return None
+            c = fmt[i]
+            i += 1
+            if c != '%' and not is_formatter_char(c):
+                return None
+            directives.append(FormatDirective(literal, key, f_ljust, f_sign,
+                                              f_blank, f_alt, f_zero, width,
+                                              prec, c))
+            i0 = i
+        return CompiledFormat(directives[:], fmt[i0:end])
+
+    FormatCache, get_compiled_format = make_compiled_cache(
+        compile_format, FORMAT_CACHE_SIZE_EXP)
+
     class StringFormatter(BaseStringFormatter):
 
         def __init__(self, space, fmt, values_w, w_valuedict):
@@ -277,6 +406,67 @@ def make_formatter_subclass(do_unicode):
             return result
 
         def format(self):
+            compiled = get_compiled_format(self.space, self.fmt)
+            if compiled is None:
+                return self.format_slow()
+            return self.format_compiled(compiled)
+
+        @jit.unroll_safe
+        def format_compiled(self, compiled):
+            lgt = len(self.fmt) + 4 * len(self.values_w) + 10
+            if do_unicode:
+                result = UnicodeBuilder(lgt)
+            else:
+                result = StringBuilder(lgt)
+            self.result = result
+            for directive in compiled.directives:
+                result.append(directive.literal)
+                self.apply_directive(directive)
+            result.append(compiled.tail)
+            self.checkconsumed()
+            return result.build()
+
+        def apply_directive(self, directive):
+            space = self.space
+            if directive.key is not None:
+                w_value = self.getmappingvalue(directive.key)
+            else:
+                w_value = None
+            self.f_ljust = directive.f_ljust
+            self.f_sign = directive.f_sign
+            self.f_blank = directive.f_blank
+            self.f_alt = directive.f_alt
+            self.f_zero = directive.f_zero
+            self.width = directive.width
+            self.prec = directive.prec
+            c = directive.char
+            if c == '%':
+                self.std_wp(const('%'))
+                return
+            if w_value is None:
+                w_value = self.nextinputvalue()
+            if directive.simple:
+                # fast paths for '%s' of a string and '%d' of an int,
+                # which are the most common cases
+                w_type = space.type(w_value)
+                if c == 's':
+                    if do_unicode:
+                        if space.is_w(w_type, space.w_unicode):
+                            self.result.append(space.unicode_w(w_value))
+                            return
+                    elif space.is_w(w_type, space.w_str):
+                        self.result.append(space.str_w(w_value))
+                        return
+                elif c == 'd' and space.is_w(w_type, space.w_int):
+                    self.result.append(const(str(space.int_w(w_value))))
+                    return
+            for c1 in FORMATTER_CHARS:
+                if c == c1:
+                    do_fmt = getattr(self, 'fmt_' + c1)
+                    do_fmt(w_value)
+                    break
+
+        def format_slow(self):
             lgt = len(self.fmt) + 4 * len(self.values_w) + 10
             if do_unicode:
                 result = UnicodeBuilder(lgt)
@@ -473,6 +663,8 @@ def make_formatter_subclass(do_unicode):
                             space.wrap("character code not in range(256)"))
                     self.std_wp(s)
 
+    StringFormatter.FormatCache = FormatCache
+    StringFormatter.get_compiled_format = staticmethod(get_compiled_format)
     return StringFormatter
 
 
@@ -490,6 +682,13 @@ FORMATTER_CHARS = unrolling_iterable(
     [_name[-1] for _name in dir(StringFormatter)
                if len(_name) == 5 and _name.startswith('fmt_')])
 
+@specialize.argtype(0)
+def is_formatter_char(c):
+    for c1 in FORMATTER_CHARS:
+        if c == c1:
+            return True
+    return False
+
 def format(space, w_fmt, values_w, w_valuedict=None, do_unicode=False):
     "Entry point"
     if not do_unicode:
@@ -3,13 +3,19 @@
 import operator
 
 from pypy.rlib.unroll import unrolling_iterable
+from pypy.rlib.rarithmetic import intmask
+from pypy.rlib import jit
 from pypy.interpreter import pyopcode, function
+from pypy.interpreter.eval import Code
+from pypy.interpreter.pycode import PyCode
 from pypy.interpreter.pyframe import PyFrame
 from pypy.interpreter.error import OperationError, operationerrfmt
 from pypy.module.__builtin__ import Module
 from pypy.objspace.std import intobject, smallintobject
 from pypy.objspace.std.multimethod import FailedToImplement
 from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+from pypy.objspace.std.dictmultiobject import StringDictStrategy
+from pypy.objspace.std.tupleobject import W_TupleObject
 from pypy.objspace.std.listobject import W_ListObject
 
 
@@ -58,7 +64,7 @@ def list_BINARY_SUBSCR(f, oparg, next_instr):
     w_1 = f.popvalue()
     if type(w_1) is W_ListObject and type(w_2) is intobject.W_IntObject:
         try:
-            w_result = w_1.wrappeditems[w_2.intval]
+            w_result = w_1.getitem(w_2.intval)
         except IndexError:
             raise OperationError(f.space.w_IndexError,
                 f.space.wrap("list index out of range"))
@@ -99,6 +105,112 @@ def fast_COMPARE_OP(f, testnum, next_instr):
     f.pushvalue(w_result)
 
 
+def fast_COMPARE_OP_POP_JUMP_IF_FALSE(f, testnum, target, next_instr):
+    # the superinstruction, see pypy/interpreter/quickening.py.  Comparing
+    # two ints jumps directly, without going through a bool object
+    w_2 = f.peekvalue(0)
+    w_1 = f.peekvalue(1)
+    if (type(w_2) is intobject.W_IntObject and
+        type(w_1) is intobject.W_IntObject and
+        testnum < len(compare_table)):
+        f.popvalue()
+        f.popvalue()
+        for i, attr in unrolling_compare_ops:
+            if i == testnum:
+                op = getattr(operator, attr)
+                if op(w_1.intval, w_2.intval):
+                    return next_instr + 3
+                return target
+        raise pyopcode.BytecodeCorruption, "bad COMPARE_OP oparg"
+    f.COMPARE_OP(testnum, next_instr)
+    f.last_instr = intmask(next_instr)
+    return f.POP_JUMP_IF_FALSE(target, next_instr + 3)
+
+
+def call_starstar_fast(f, w_function, n_args, above, extra_w, w_kwds):
+    # the call 'function(args.., *extra, **kwds)', where 'extra_w' are the
+    # items of the tuple 'extra' or None, and kwds is a dict with
+    # only string keys: the arguments are written directly into the new
+    # frame.  'above' is the number of values on the stack above the n_args
+    # positional arguments.  Returns None if this is not possible.
+    if type(w_kwds) is not W_DictMultiObject:
+        return None
+    strategy = w_kwds.strategy
+    if not isinstance(strategy, StringDictStrategy):
+        return None
+    w_self = None
+    if isinstance(w_function, function.Method):
+        w_self = w_function.w_instance
+        if w_self is None:
+            return None
+        w_function = w_function.w_function
+    if not isinstance(w_function, function.Function):
+        return None
+    code = w_function.getcode()
+    if not (code.fast_natural_arity & Code.FLATPYCALL):
+        return None
+    assert isinstance(code, PyCode)
+    start = int(w_self is not None)
+    nargs = start + n_args
+    if extra_w is not None:
+        nargs += len(extra_w)
+    co_argcount = code.co_argcount
+    if nargs > co_argcount:
+        return None
+    new_frame = f.space.createframe(code, w_function.w_func_globals,
+                                    w_function.closure)
+    locals_w = new_frame.locals_stack_w
+    if w_self is not None:
+        locals_w[0] = w_self
+    for i in range(n_args):
+        locals_w[start + i] = f.peekvalue(above + n_args - 1 - i)
+    if extra_w is not None:
+        start += n_args
+        for i in range(len(extra_w)):
+            locals_w[start + i] = extra_w[i]
+    signature = code.signature()
+    for key, w_value in strategy.unerase(w_kwds.dstorage).iteritems():
+        j = signature.find_argname(key)
+        if j < 0 or locals_w[j] is not None:
+            return None     # let the general path report the error
+        locals_w[j] = w_value
+    defs_w = w_function.defs_w
+    def_first = co_argcount - len(defs_w)
+    for j in range(nargs, co_argcount):
+        if locals_w[j] is None:
+            if j < def_first:
+                return None
+            locals_w[j] = defs_w[j - def_first]
+    return new_frame.run()
+
+def fast_CALL_FUNCTION_KW(f, oparg, next_instr):
+    if oparg >> 8 == 0 and not jit.we_are_jitted():
+        n_args = oparg & 0xff
+        w_result = call_starstar_fast(f, f.peekvalue(n_args + 1), n_args, 1,
+                                      None, f.peekvalue(0))
+        if w_result is not None:
+            f.dropvalues(n_args + 2)
+            f.pushvalue(w_result)
+            return
+    w_varkw = f.popvalue()
+    f.call_function(oparg, None, w_varkw)
+
+def fast_CALL_FUNCTION_VAR_KW(f, oparg, next_instr):
+    w_varargs = f.peekvalue(1)
+    if (oparg >> 8 == 0 and type(w_varargs) is W_TupleObject and
+            not jit.we_are_jitted()):
+        n_args = oparg & 0xff
+        w_result = call_starstar_fast(f, f.peekvalue(n_args + 2), n_args, 2,
+                                      w_varargs.wrappeditems, f.peekvalue(0))
+        if w_result is not None:
+            f.dropvalues(n_args + 3)
+            f.pushvalue(w_result)
+            return
+    w_varkw = f.popvalue()
+    w_varargs = f.popvalue()
+    f.call_function(oparg, w_varargs, w_varkw)
+
+
 def build_frame(space):
     """Consider the objspace config and return a patched frame object."""
     class StdObjSpaceFrame(BaseFrame):
@@ -116,6 +228,12 @@ def build_frame(space):
         StdObjSpaceFrame.CALL_METHOD = CALL_METHOD
     if space.config.objspace.std.optimized_comparison_op:
         StdObjSpaceFrame.COMPARE_OP = fast_COMPARE_OP
+        if space.config.objspace.superinstructions:
+            StdObjSpaceFrame.COMPARE_OP_POP_JUMP_IF_FALSE = (
+                fast_COMPARE_OP_POP_JUMP_IF_FALSE)
+    if not space.config.objspace.disable_call_speedhacks:
+        StdObjSpaceFrame.CALL_FUNCTION_KW = fast_CALL_FUNCTION_KW
+        StdObjSpaceFrame.CALL_FUNCTION_VAR_KW = fast_CALL_FUNCTION_VAR_KW
     if space.config.objspace.std.logspaceoptypes:
         assert 0, "logspaceoptypes: a few fixes a missing here"
         StdObjSpace._space_op_types = []
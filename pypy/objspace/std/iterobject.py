@@ -27,12 +27,9 @@ class W_SeqIterObject(W_AbstractSeqIterObject):
     """Sequence iterator implementation for general sequences."""
 
 class W_FastListIterObject(W_AbstractSeqIterObject):
-    """Sequence iterator specialized for lists, accessing
-    directly their RPython-level list of wrapped objects.
+    """Sequence iterator specialized for lists, accessing the
+    items directly through the list strategy.
     """
-    def __init__(w_self, w_seq, wrappeditems):
-        W_AbstractSeqIterObject.__init__(w_self, w_seq)
-        w_self.listitems = wrappeditems
 
 class W_FastTupleIterObject(W_AbstractSeqIterObject):
    """Sequence iterator specialized for tuples, accessing
@@ -102,15 +99,17 @@ def iter__FastListIter(space, w_seqiter):
     return w_seqiter
 
 def next__FastListIter(space, w_seqiter):
-    if w_seqiter.listitems is None:
+    from pypy.objspace.std.listobject import W_ListObject
+    w_seq = w_seqiter.w_seq
+    if w_seq is None:
         raise OperationError(space.w_StopIteration, space.w_None)
+    assert isinstance(w_seq, W_ListObject)
     index = w_seqiter.index
     try:
-        w_item = w_seqiter.listitems[index]
+        w_item = w_seq.getitem(index)
     except IndexError:
-        w_seqiter.listitems = None
         w_seqiter.w_seq = None
-        raise OperationError(space.w_StopIteration, space.w_None) 
+        raise OperationError(space.w_StopIteration, space.w_None)
     w_seqiter.index = index + 1
     return w_item
 
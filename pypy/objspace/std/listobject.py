@@ -5,32 +5,798 @@ from pypy.interpreter.error import OperationError, operationerrfmt
 from pypy.objspace.std.inttype import wrapint
 from pypy.objspace.std.listtype import get_list_index
 from pypy.objspace.std.sliceobject import W_SliceObject, normalize_simple_slice
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.floatobject import W_FloatObject
 
 from pypy.objspace.std import slicetype
 from pypy.interpreter import gateway, baseobjspace
-from pypy.rlib.listsort import TimSort
+from pypy.rlib.objectmodel import instantiate
+from pypy.rlib.debug import make_sure_not_resized
+from pypy.rlib.listsort import make_timsort_class
+from pypy.rlib.rfloat import isnan
+from pypy.rlib import rerased
 from pypy.interpreter.argument import Signature
+import sys
+
+def make_empty_list(space):
+    return W_ListObject(space, [])
+
+def is_W_IntObject(w_obj):
+    return type(w_obj) is W_IntObject
+
+def is_W_StringObject(space, w_obj):
+    return type(w_obj) is space.StringObjectCls
+
+def is_W_FloatObject(w_obj):
+    return type(w_obj) is W_FloatObject
+
+def get_strategy_from_list_objects(space, list_w):
+    if not space.config.objspace.std.withliststrategies:
+        return space.fromcache(ObjectListStrategy)
+
+    if not list_w:
+        return space.fromcache(EmptyListStrategy)
+
+    # check for ints
+    for w_obj in list_w:
+        if not is_W_IntObject(w_obj):
+            break
+    else:
+        return space.fromcache(IntegerListStrategy)
+
+    # check for strings
+    for w_obj in list_w:
+        if not is_W_StringObject(space, w_obj):
+            break
+    else:
+        return space.fromcache(StringListStrategy)
+
+    # check for floats
+    for w_obj in list_w:
+        if not is_W_FloatObject(w_obj):
+            break
+    else:
+        return space.fromcache(FloatListStrategy)
+
+    return space.fromcache(ObjectListStrategy)
+
 
 class W_ListObject(W_Object):
     from pypy.objspace.std.listtype import list_typedef as typedef
 
-    def __init__(w_self, wrappeditems):
-        w_self.wrappeditems = wrappeditems
+    def __init__(w_self, space, wrappeditems):
+        assert isinstance(wrappeditems, list)
+        w_self.space = space
+        w_self.strategy = get_strategy_from_list_objects(space, wrappeditems)
+        w_self.init_from_list_w(wrappeditems)
+
+    @staticmethod
+    def from_storage_and_strategy(space, storage, strategy):
+        w_self = instantiate(W_ListObject)
+        w_self.space = space
+        w_self.strategy = strategy
+        w_self.lstorage = storage
+        return w_self
 
     def __repr__(w_self):
         """ representation for debugging purposes """
-        return "%s(%s)" % (w_self.__class__.__name__, w_self.wrappeditems)
+        return "%s(%s, %s)" % (w_self.__class__.__name__, w_self.strategy,
+                               w_self.lstorage._x)
 
     def unwrap(w_list, space):
-        items = [space.unwrap(w_item) for w_item in w_list.wrappeditems]# XXX generic mixed types unwrap
+        # for tests only!
+        items = [space.unwrap(w_item) for w_item in w_list.getitems()]
         return list(items)
 
-    def append(w_list, w_item):
-        w_list.wrappeditems.append(w_item)
+    def switch_to_object_strategy(self):
+        list_w = self.getitems()
+        self.strategy = self.space.fromcache(ObjectListStrategy)
+        # XXX this is quite indirect
+        self.init_from_list_w(list_w)
+
+    def _temporarily_as_objects(self):
+        """Return a list with the same items as self but using the
+        ObjectListStrategy.  The result shares its storage with self if
+        self already uses that strategy, so it must not be mutated."""
+        if self.strategy is self.space.fromcache(ObjectListStrategy):
+            return self
+        list_w = self.getitems()
+        strategy = self.space.fromcache(ObjectListStrategy)
+        storage = strategy.erase(list_w)
+        w_objectlist = W_ListObject.from_storage_and_strategy(
+                self.space, storage, strategy)
+        return w_objectlist
+
+    # ___________________________________________________
+
+    def init_from_list_w(self, list_w):
+        """Initializes listobject by iterating through the given list of
+        wrapped items, unwrapping them if neccessary and creating a
+        new erased object as storage"""
+        self.strategy.init_from_list_w(self, list_w)
+
+    def clear(self):
+        """Makes the list empty, choosing the empty strategy again."""
+        self.strategy = get_strategy_from_list_objects(self.space, [])
+        self.init_from_list_w([])
+
+    def clone(self):
+        """Returns a clone by creating a new listobject
+        with the same strategy and a copy of the storage"""
+        return self.strategy.clone(self)
+
+    def copy_into(self, other):
+        """Used only when extending an EmptyList. Sets the EmptyLists
+        strategy and storage according to the other W_List"""
+        self.strategy.copy_into(self, other)
+
+    def contains(self, w_obj):
+        """Returns unwrapped boolean, saying wether w_obj exists
+        in the list."""
+        try:
+            self.find(w_obj)
+            return True
+        except ValueError:
+            return False
+
+    def length(self):
+        return self.strategy.length(self)
+
+    def getitem(self, index):
+        """Returns the wrapped object that is found in the
+        list at the given index. The index must be a valid one
+        (possibly negative); IndexError is raised otherwise."""
+        return self.strategy.getitem(self, index)
+
+    def getslice(self, start, stop, step, length):
+        """Returns a slice of the list defined by the arguments. Arguments
+        must be normalized (i.e. using normalize_simple_slice or
+        W_Slice.indices4). May raise IndexError."""
+        return self.strategy.getslice(self, start, stop, step, length)
+
+    def getitems(self):
+        """Returns a list of all items after wrapping them. The result can
+        share with the storage, if possible, so it must not be mutated."""
+        return self.strategy.getitems(self)
+
+    def getitems_copy(self):
+        """Returns a copy of all items in the list. Same as getitems except
+        for ObjectListStrategy."""
+        return self.strategy.getitems_copy(self)
+
+    def getitems_fixedsize(self):
+        """Returns a fixed-size list of all items after wrapping them."""
+        l = self.strategy.getitems_fixedsize(self)
+        make_sure_not_resized(l)
+        return l
+
+    def getitems_str(self):
+        """Return the items in the list as unwrapped strings. If the list
+        does not use the string strategy, return None."""
+        return self.strategy.getitems_str(self)
+
+    def getitems_int(self):
+        """Return the items in the list as unwrapped ints. If the list
+        does not use the integer strategy, return None."""
+        return self.strategy.getitems_int(self)
+
+    def getstorage_copy(self):
+        return self.strategy.getstorage_copy(self)
+
+    def append(self, w_item):
+        """Appends the wrapped item to the end of the list."""
+        self.strategy.append(self, w_item)
+
+    def inplace_mul(self, times):
+        """Alters the list by multiplying its content by the given factor."""
+        self.strategy.inplace_mul(self, times)
+
+    def deleteslice(self, start, step, length):
+        """Deletes a slice from the list. Used in delitem and delslice.
+        Arguments must be normalized (see getslice)."""
+        self.strategy.deleteslice(self, start, step, length)
+
+    def pop(self, index):
+        """Pops an item from the list. Index may be negative.
+        May raise IndexError."""
+        return self.strategy.pop(self, index)
+
+    def pop_end(self):
+        """ Pop the last element from the list."""
+        return self.strategy.pop_end(self)
+
+    def setitem(self, index, w_item):
+        """Inserts a wrapped item at the given (unnormalized) index.
+        May raise IndexError."""
+        self.strategy.setitem(self, index, w_item)
+
+    def setslice(self, start, step, slicelength, w_other):
+        """Replaces the slice of the list defined by the (normalized)
+        arguments by the items of the list w_other."""
+        self.strategy.setslice(self, start, step, slicelength, w_other)
+
+    def insert(self, index, w_item):
+        """Inserts an item at the given position. Item must be wrapped,
+        index not."""
+        self.strategy.insert(self, index, w_item)
+
+    def extend(self, w_other):
+        """Appends the items of the list w_other to the end of this list."""
+        self.strategy.extend(self, w_other)
+
+    def reverse(self):
+        """Reverses the list."""
+        self.strategy.reverse(self)
+
+    def sort(self, reverse):
+        """Sorts the list ascending or descending depending on
+        argument reverse. Only used when the items of the list are known
+        to be unwrapped and directly comparable (no cmp and no key)."""
+        self.strategy.sort(self, reverse)
+
+    def find(self, w_item, start=0, stop=sys.maxint):
+        """Find w_item in list[start:stop]. If not found, raise ValueError"""
+        return self.strategy.find(self, w_item, start, stop)
 
 registerimplementation(W_ListObject)
 
 
+class ListStrategy(object):
+
+    def __init__(self, space):
+        self.space = space
+
+    def init_from_list_w(self, w_list, list_w):
+        raise NotImplementedError
+
+    def clone(self, w_list):
+        raise NotImplementedError
+
+    def copy_into(self, w_list, w_other):
+        raise NotImplementedError
+
+    def length(self, w_list):
+        raise NotImplementedError
+
+    def getitem(self, w_list, index):
+        raise NotImplementedError
+
+    def getslice(self, w_list, start, stop, step, length):
+        raise NotImplementedError
+
+    def getitems(self, w_list):
+        raise NotImplementedError
+
+    def getitems_copy(self, w_list):
+        raise NotImplementedError
+
+    def getitems_fixedsize(self, w_list):
+        raise NotImplementedError
+
+    def getitems_str(self, w_list):
+        return None
+
+    def getitems_int(self, w_list):
+        return None
+
+    def getstorage_copy(self, w_list):
+        raise NotImplementedError
+
+    def append(self, w_list, w_item):
+        raise NotImplementedError
+
+    def inplace_mul(self, w_list, times):
+        raise NotImplementedError
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        raise NotImplementedError
+
+    def pop(self, w_list, index):
+        raise NotImplementedError
+
+    def pop_end(self, w_list):
+        return self.pop(w_list, self.length(w_list) - 1)
+
+    def setitem(self, w_list, index, w_item):
+        raise NotImplementedError
+
+    def setslice(self, w_list, start, step, slicelength, w_other):
+        raise NotImplementedError
+
+    def insert(self, w_list, index, w_item):
+        raise NotImplementedError
+
+    def extend(self, w_list, w_other):
+        raise NotImplementedError
+
+    def reverse(self, w_list):
+        raise NotImplementedError
+
+    def sort(self, w_list, reverse):
+        raise NotImplementedError
+
+    def find(self, w_list, w_item, start, stop):
+        # needs to be safe against eq_w() mutating the w_list behind our back
+        space = self.space
+        i = start
+        # len(w_list) can change while we're iterating, so we check it
+        # on every iteration
+        while i < stop and i < w_list.length():
+            if space.eq_w(w_list.getitem(i), w_item):
+                return i
+            i += 1
+        raise ValueError
+
+
+class EmptyListStrategy(ListStrategy):
+    """EmptyListStrategy is used when a W_List withouth elements is created.
+    The storage is None. When items are added to the W_List a new RPython list
+    is created and the strategy and storage of the W_List are changed depending
+    to the added item.
+    W_Lists do not switch back to EmptyListStrategy when becoming empty again.
+    """
+
+    erase, unerase = rerased.new_erasing_pair("empty")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def get_empty_storage(self):
+        return self.erase(None)
+
+    def init_from_list_w(self, w_list, list_w):
+        assert len(list_w) == 0
+        w_list.lstorage = self.erase(None)
+
+    def switch_to_correct_strategy(self, w_list, w_item):
+        space = self.space
+        if is_W_IntObject(w_item):
+            strategy = space.fromcache(IntegerListStrategy)
+        elif is_W_StringObject(space, w_item):
+            strategy = space.fromcache(StringListStrategy)
+        elif is_W_FloatObject(w_item):
+            strategy = space.fromcache(FloatListStrategy)
+        else:
+            strategy = space.fromcache(ObjectListStrategy)
+        storage = strategy.get_empty_storage()
+        w_list.strategy = strategy
+        w_list.lstorage = storage
+
+    def clone(self, w_list):
+        return W_ListObject.from_storage_and_strategy(
+                self.space, w_list.lstorage, self)
+
+    def copy_into(self, w_list, w_other):
+        pass
+
+    def length(self, w_list):
+        return 0
+
+    def getitem(self, w_list, index):
+        raise IndexError
+
+    def getslice(self, w_list, start, stop, step, length):
+        # will never be called because the empty list case is already caught in
+        # getslice__List_ANY_ANY and getitem__List_Slice
+        return W_ListObject(self.space, [])
+
+    def getitems(self, w_list):
+        return []
+
+    def getitems_copy(self, w_list):
+        return []
+
+    def getitems_fixedsize(self, w_list):
+        return []
+
+    def getstorage_copy(self, w_list):
+        return self.erase(None)
+
+    def append(self, w_list, w_item):
+        self.switch_to_correct_strategy(w_list, w_item)
+        w_list.append(w_item)
+
+    def inplace_mul(self, w_list, times):
+        return
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        pass
+
+    def pop(self, w_list, index):
+        # will not be called because IndexError was already raised in
+        # list_pop__List_ANY
+        raise IndexError
+
+    def pop_end(self, w_list):
+        raise IndexError
+
+    def setitem(self, w_list, index, w_item):
+        raise IndexError
+
+    def setslice(self, w_list, start, step, slicelength, w_other):
+        strategy = w_other.strategy
+        if strategy is self:
+            # assigning an empty sequence to a slice of an empty list
+            return
+        w_list.strategy = strategy
+        w_list.lstorage = strategy.get_empty_storage()
+        w_list.setslice(start, step, slicelength, w_other)
+
+    def insert(self, w_list, index, w_item):
+        assert index == 0
+        self.append(w_list, w_item)
+
+    def extend(self, w_list, w_other):
+        w_other.copy_into(w_list)
+
+    def reverse(self, w_list):
+        pass
+
+    def sort(self, w_list, reverse):
+        pass
+
+    def find(self, w_list, w_item, start, stop):
+        raise ValueError
+
+
+class AbstractUnwrappedStrategy(object):
+    _mixin_ = True
+
+    def wrap(self, unwrapped):
+        raise NotImplementedError
+
+    def unwrap(self, wrapped):
+        raise NotImplementedError
+
+    @staticmethod
+    def unerase(storage):
+        raise NotImplementedError("abstract base class")
+
+    @staticmethod
+    def erase(obj):
+        raise NotImplementedError("abstract base class")
+
+    def is_correct_type(self, w_obj):
+        raise NotImplementedError("abstract base class")
+
+    def list_is_correct_type(self, w_list):
+        return w_list.strategy is self
+
+    def get_empty_storage(self):
+        return self.erase([])
+
+    def init_from_list_w(self, w_list, list_w):
+        l = [self.unwrap(w_item) for w_item in list_w]
+        w_list.lstorage = self.erase(l)
+
+    def clone(self, w_list):
+        l = self.unerase(w_list.lstorage)
+        storage = self.erase(l[:])
+        return W_ListObject.from_storage_and_strategy(self.space, storage, self)
+
+    def copy_into(self, w_list, w_other):
+        w_other.strategy = self
+        items = self.unerase(w_list.lstorage)[:]
+        w_other.lstorage = self.erase(items)
+
+    def length(self, w_list):
+        return len(self.unerase(w_list.lstorage))
+
+    def getitem(self, w_list, index):
+        l = self.unerase(w_list.lstorage)
+        try:
+            r = l[index]
+        except IndexError: # make RPython raise the exception
+            raise
+        return self.wrap(r)
+
+    def getitems(self, w_list):
+        return [self.wrap(item) for item in self.unerase(w_list.lstorage)]
+
+    def getitems_copy(self, w_list):
+        return [self.wrap(item) for item in self.unerase(w_list.lstorage)]
+
+    def getitems_fixedsize(self, w_list):
+        return [self.wrap(item) for item in self.unerase(w_list.lstorage)]
+
+    def getstorage_copy(self, w_list):
+        items = self.unerase(w_list.lstorage)[:]
+        return self.erase(items)
+
+    def getslice(self, w_list, start, stop, step, length):
+        l = self.unerase(w_list.lstorage)
+        if step == 1 and 0 <= start <= stop:
+            assert start >= 0
+            assert stop >= 0
+            subitems = l[start:stop]
+        else:
+            subitems = [self._none_value] * length
+            for i in range(length):
+                subitems[i] = l[start]
+                start += step
+        storage = self.erase(subitems)
+        return W_ListObject.from_storage_and_strategy(self.space, storage, self)
+
+    def append(self, w_list, w_item):
+        if self.is_correct_type(w_item):
+            self.unerase(w_list.lstorage).append(self.unwrap(w_item))
+            return
+
+        w_list.switch_to_object_strategy()
+        w_list.append(w_item)
+
+    def insert(self, w_list, index, w_item):
+        l = self.unerase(w_list.lstorage)
+
+        if self.is_correct_type(w_item):
+            l.insert(index, self.unwrap(w_item))
+            return
+
+        w_list.switch_to_object_strategy()
+        w_list.insert(index, w_item)
+
+    def extend(self, w_list, w_other):
+        l = self.unerase(w_list.lstorage)
+        if self.list_is_correct_type(w_other):
+            l += self.unerase(w_other.lstorage)
+            return
+        elif w_other.length() == 0:
+            return
+
+        w_other = w_other._temporarily_as_objects()
+        w_list.switch_to_object_strategy()
+        w_list.extend(w_other)
+
+    def setitem(self, w_list, index, w_item):
+        l = self.unerase(w_list.lstorage)
+
+        if self.is_correct_type(w_item):
+            l[index] = self.unwrap(w_item)
+            return
+
+        w_list.switch_to_object_strategy()
+        w_list.setitem(index, w_item)
+
+    def setslice(self, w_list, start, step, slicelength, w_other):
+        assert slicelength >= 0
+        items = self.unerase(w_list.lstorage)
+
+        if self.list_is_correct_type(w_other):
+            other_items = self.unerase(w_other.lstorage)
+        elif w_other.length() == 0:
+            other_items = []
+        else:
+            w_other = w_other._temporarily_as_objects()
+            w_list.switch_to_object_strategy()
+            w_list.setslice(start, step, slicelength, w_other)
+            return
+
+        oldsize = len(items)
+        len2 = len(other_items)
+        if step == 1:  # Support list resizing for non-extended slices
+            delta = slicelength - len2
+            if delta < 0:
+                delta = -delta
+                newsize = oldsize + delta
+                # XXX support this in rlist!
+                items += [self._none_value] * delta
+                lim = start+len2
+                i = newsize - 1
+                while i >= lim:
+                    items[i] = items[i-delta]
+                    i -= 1
+            elif start >= 0:
+                del items[start:start+delta]
+            else:
+                assert delta==0   # start<0 is only possible with slicelength==0
+        elif len2 != slicelength:  # No resize for extended slices
+            raise operationerrfmt(self.space.w_ValueError, "attempt to "
+                  "assign sequence of size %d to extended slice of size %d",
+                  len2, slicelength)
+
+        if other_items is items:
+            if step > 0:
+                # Always copy starting from the right to avoid
+                # having to make a shallow copy in the case where
+                # the source and destination lists are the same list.
+                i = len2 - 1
+                start += i*step
+                while i >= 0:
+                    items[start] = other_items[i]
+                    start -= step
+                    i -= 1
+                return
+            else:
+                # Make a shallow copy to more easily handle the reversal case
+                other_items = list(other_items)
+        for i in range(len2):
+            items[start] = other_items[i]
+            start += step
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        items = self.unerase(w_list.lstorage)
+        if slicelength==0:
+            return
+
+        if step < 0:
+            start = start + step * (slicelength-1)
+            step = -step
+
+        if step == 1:
+            assert start >= 0
+            assert slicelength >= 0
+            del items[start:start+slicelength]
+        else:
+            n = len(items)
+            i = start
+
+            for discard in range(1, slicelength):
+                j = i+1
+                i += step
+                while j < i:
+                    items[j-discard] = items[j]
+                    j += 1
+
+            j = i+1
+            while j < n:
+                items[j-slicelength] = items[j]
+                j += 1
+            start = n - slicelength
+            assert start >= 0 # annotator hint
+            del items[start:]
+
+    def pop_end(self, w_list):
+        l = self.unerase(w_list.lstorage)
+        return self.wrap(l.pop())
+
+    def pop(self, w_list, index):
+        l = self.unerase(w_list.lstorage)
+        # not sure if RPython raises IndexError on pop
+        # so check again here
+        if index < 0:
+            index += len(l)
+        if index < 0 or index >= len(l):
+            raise IndexError
+        item = l.pop(index)
+        return self.wrap(item)
+
+    def inplace_mul(self, w_list, times):
+        l = self.unerase(w_list.lstorage)
+        l *= times
+
+    def reverse(self, w_list):
+        self.unerase(w_list.lstorage).reverse()
+
+    def find(self, w_list, w_obj, start, stop):
+        if self.is_correct_type(w_obj):
+            return self._safe_find(w_list, self.unwrap(w_obj), start, stop)
+        return ListStrategy.find(self, w_list, w_obj, start, stop)
+
+    def _safe_find(self, w_list, obj, start, stop):
+        l = self.unerase(w_list.lstorage)
+        for i in range(start, min(stop, len(l))):
+            val = l[i]
+            if val == obj:
+                return i
+        raise ValueError
+
+
+class ObjectListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    _none_value = None
+
+    erase, unerase = rerased.new_erasing_pair("object")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def unwrap(self, w_obj):
+        return w_obj
+
+    def wrap(self, item):
+        return item
+
+    def is_correct_type(self, w_obj):
+        return True
+
+    def init_from_list_w(self, w_list, list_w):
+        w_list.lstorage = self.erase(list_w)
+
+    def getitems(self, w_list):
+        return self.unerase(w_list.lstorage)
+
+    def find(self, w_list, w_obj, start, stop):
+        return ListStrategy.find(self, w_list, w_obj, start, stop)
+
+
+class IntegerListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    _none_value = 0
+
+    erase, unerase = rerased.new_erasing_pair("integer")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, intval):
+        return wrapint(self.space, intval)
+
+    def unwrap(self, w_int):
+        return self.space.int_w(w_int)
+
+    def is_correct_type(self, w_obj):
+        return is_W_IntObject(w_obj)
+
+    def getitems_int(self, w_list):
+        return self.unerase(w_list.lstorage)
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = IntSort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+
+class FloatListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    _none_value = 0.0
+
+    erase, unerase = rerased.new_erasing_pair("float")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, floatval):
+        return self.space.wrap(floatval)
+
+    def unwrap(self, w_float):
+        return self.space.float_w(w_float)
+
+    def is_correct_type(self, w_obj):
+        return is_W_FloatObject(w_obj)
+
+    def _safe_find(self, w_list, obj, start, stop):
+        # a nan stored in the list is only found by identity in CPython;
+        # since the float storage does not keep the boxes, treat all nans
+        # as identical to each other
+        l = self.unerase(w_list.lstorage)
+        obj_is_nan = isnan(obj)
+        for i in range(start, min(stop, len(l))):
+            val = l[i]
+            if val == obj or (obj_is_nan and isnan(val)):
+                return i
+        raise ValueError
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = FloatSort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+
+class StringListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    _none_value = None
+
+    erase, unerase = rerased.new_erasing_pair("string")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, stringval):
+        return self.space.wrap(stringval)
+
+    def unwrap(self, w_string):
+        return self.space.str_w(w_string)
+
+    def is_correct_type(self, w_obj):
+        return is_W_StringObject(self.space, w_obj)
+
+    def getitems_str(self, w_list):
+        return self.unerase(w_list.lstorage)
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = StringSort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+# _______________________________________________________
+
 init_signature = Signature(['sequence'], None, None)
 init_defaults = [None]
 
@@ -39,20 +805,17 @@ def init__List(space, w_list, __args__):
     # this is on the silly side
     w_iterable, = __args__.parse_obj(
             None, 'list', init_signature, init_defaults)
-    items_w = w_list.wrappeditems
-    del items_w[:]
+    w_list.clear()
     if w_iterable is not None:
-        # unfortunately this is duplicating space.unpackiterable to avoid
-        # assigning a new RPython list to 'wrappeditems', which defeats the
-        # W_FastSeqIterObject optimization.
         if isinstance(w_iterable, W_ListObject):
-            items_w.extend(w_iterable.wrappeditems)
+            w_iterable.copy_into(w_list)
         elif isinstance(w_iterable, W_TupleObject):
-            items_w.extend(w_iterable.wrappeditems)
+            W_ListObject.__init__(w_list, space,
+                                  w_iterable.wrappeditems[:])
         else:
-            _init_from_iterable(space, items_w, w_iterable)
+            _init_from_iterable(space, w_list, w_iterable)
 
-def _init_from_iterable(space, items_w, w_iterable):
+def _init_from_iterable(space, w_list, w_iterable):
     # in its own function to make the JIT look into init__List
     # XXX this would need a JIT driver somehow?
     w_iterator = space.iter(w_iterable)
@@ -63,69 +826,64 @@ def _init_from_iterable(space, items_w, w_iterable):
             if not e.match(space, space.w_StopIteration):
                 raise
             break  # done
-        items_w.append(w_item)
+        w_list.append(w_item)
 
 def len__List(space, w_list):
-    result = len(w_list.wrappeditems)
+    result = w_list.length()
     return wrapint(space, result)
 
 def getitem__List_ANY(space, w_list, w_index):
     try:
-        return w_list.wrappeditems[get_list_index(space, w_index)]
+        return w_list.getitem(get_list_index(space, w_index))
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list index out of range"))
 
 def getitem__List_Slice(space, w_list, w_slice):
     # XXX consider to extend rlist's functionality?
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop, step, slicelength = w_slice.indices4(space, length)
     assert slicelength >= 0
-    if step == 1 and 0 <= start <= stop:
-        return W_ListObject(w_list.wrappeditems[start:stop])
-    w_res = W_ListObject([None] * slicelength)
-    items_w = w_list.wrappeditems
-    subitems_w = w_res.wrappeditems
-    for i in range(slicelength):
-        subitems_w[i] = items_w[start]
-        start += step
-    return w_res
+    if slicelength == 0:
+        return make_empty_list(space)
+    return w_list.getslice(start, stop, step, slicelength)
 
 def getslice__List_ANY_ANY(space, w_list, w_start, w_stop):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
-    return W_ListObject(w_list.wrappeditems[start:stop])
+
+    slicelength = stop - start
+    if slicelength == 0:
+        return make_empty_list(space)
+    return w_list.getslice(start, stop, 1, stop - start)
 
 def setslice__List_ANY_ANY_ANY(space, w_list, w_start, w_stop, w_sequence):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
+    w_other = _as_list(space, w_sequence)
+    w_list.setslice(start, 1, stop-start, w_other)
 
-    sequence2 = space.listview(w_sequence)
-    items = w_list.wrappeditems
-    _setitem_slice_helper(space, items, start, 1, stop-start, sequence2,
-                          empty_elem=None)
+def _as_list(space, w_sequence):
+    if isinstance(w_sequence, W_ListObject):
+        return w_sequence
+    return W_ListObject(space, space.listview(w_sequence))
 
 def delslice__List_ANY_ANY(space, w_list, w_start, w_stop):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
-    _delitem_slice_helper(space, w_list.wrappeditems, start, 1, stop-start)
+    w_list.deleteslice(start, 1, stop-start)
 
 def contains__List_ANY(space, w_list, w_obj):
-    # needs to be safe against eq_w() mutating the w_list behind our back
-    i = 0
-    items_w = w_list.wrappeditems
-    while i < len(items_w): # intentionally always calling len!
-        if space.eq_w(items_w[i], w_obj):
-            return space.w_True
-        i += 1
-    return space.w_False
+    return space.newbool(w_list.contains(w_obj))
 
 def iter__List(space, w_list):
     from pypy.objspace.std import iterobject
-    return iterobject.W_FastListIterObject(w_list, w_list.wrappeditems)
+    return iterobject.W_FastListIterObject(w_list)
 
 def add__List_List(space, w_list1, w_list2):
-    return W_ListObject(w_list1.wrappeditems + w_list2.wrappeditems)
+    w_clone = w_list1.clone()
+    w_clone.extend(w_list2)
+    return w_clone
 
 
 def inplace_add__List_ANY(space, w_list1, w_iterable2):
@@ -148,7 +906,9 @@ def mul_list_times(space, w_list, w_times):
         if e.match(space, space.w_TypeError):
             raise FailedToImplement
         raise
-    return W_ListObject(w_list.wrappeditems * times)
+    w_clone = w_list.clone()
+    w_clone.inplace_mul(times)
+    return w_clone
 
 def mul__List_ANY(space, w_list, w_times):
     return mul_list_times(space, w_list, w_times)
@@ -163,63 +923,76 @@ def inplace_mul__List_ANY(space, w_list, w_times):
         if e.match(space, space.w_TypeError):
             raise FailedToImplement
         raise
-    w_list.wrappeditems *= times
+    w_list.inplace_mul(times)
     return w_list
 
 def eq__List_List(space, w_list1, w_list2):
     # needs to be safe against eq_w() mutating the w_lists behind our back
-    items1_w = w_list1.wrappeditems
-    items2_w = w_list2.wrappeditems
-    return equal_wrappeditems(space, items1_w, items2_w)
-
-def equal_wrappeditems(space, items1_w, items2_w):
-    if len(items1_w) != len(items2_w):
+    if w_list1.length() != w_list2.length():
         return space.w_False
+    # lists of ints and lists of strings can be compared without
+    # wrapping their items; floats can't, because of nans
+    if w_list1.strategy is w_list2.strategy:
+        strategy = space.fromcache(IntegerListStrategy)
+        if w_list1.strategy is strategy:
+            items1 = strategy.unerase(w_list1.lstorage)
+            items2 = strategy.unerase(w_list2.lstorage)
+            return space.newbool(items1 == items2)
+        strategy = space.fromcache(StringListStrategy)
+        if w_list1.strategy is strategy:
+            items1 = strategy.unerase(w_list1.lstorage)
+            items2 = strategy.unerase(w_list2.lstorage)
+            return space.newbool(items1 == items2)
+
+    # XXX in theory, this can be implemented more efficiently as well. let's
+    # not care for now
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        if not space.eq_w(items1_w[i], items2_w[i]):
+    while i < w_list1.length() and i < w_list2.length():
+        if not space.eq_w(w_list1.getitem(i), w_list2.getitem(i)):
             return space.w_False
         i += 1
     return space.w_True
 
-def lessthan_unwrappeditems(space, items1_w, items2_w):
+def lessthan_unwrappeditems(space, w_list1, w_list2):
     # needs to be safe against eq_w() mutating the w_lists behind our back
     # Search for the first index where items are different
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        w_item1 = items1_w[i]
-        w_item2 = items2_w[i]
+    # XXX in theory, this can be implemented more efficiently as well. let's
+    # not care for now
+    while i < w_list1.length() and i < w_list2.length():
+        w_item1 = w_list1.getitem(i)
+        w_item2 = w_list2.getitem(i)
         if not space.eq_w(w_item1, w_item2):
             return space.lt(w_item1, w_item2)
         i += 1
     # No more items to compare -- compare sizes
-    return space.newbool(len(items1_w) < len(items2_w))
+    return space.newbool(w_list1.length() < w_list2.length())
 
-def greaterthan_unwrappeditems(space, items1_w, items2_w):
+def greaterthan_unwrappeditems(space, w_list1, w_list2):
     # needs to be safe against eq_w() mutating the w_lists behind our back
     # Search for the first index where items are different
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        w_item1 = items1_w[i]
-        w_item2 = items2_w[i]
+    # XXX in theory, this can be implemented more efficiently as well. let's
+    # not care for now
+    while i < w_list1.length() and i < w_list2.length():
+        w_item1 = w_list1.getitem(i)
+        w_item2 = w_list2.getitem(i)
         if not space.eq_w(w_item1, w_item2):
             return space.gt(w_item1, w_item2)
         i += 1
     # No more items to compare -- compare sizes
-    return space.newbool(len(items1_w) > len(items2_w))
+    return space.newbool(w_list1.length() > w_list2.length())
 
 def lt__List_List(space, w_list1, w_list2):
-    return lessthan_unwrappeditems(space, w_list1.wrappeditems,
-        w_list2.wrappeditems)
+    return lessthan_unwrappeditems(space, w_list1, w_list2)
 
 def gt__List_List(space, w_list1, w_list2):
-    return greaterthan_unwrappeditems(space, w_list1.wrappeditems,
-        w_list2.wrappeditems)
+    return greaterthan_unwrappeditems(space, w_list1, w_list2)
 
 def delitem__List_ANY(space, w_list, w_idx):
     idx = get_list_index(space, w_idx)
     try:
-        del w_list.wrappeditems[idx]
+        w_list.pop(idx)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list deletion index out of range"))
@@ -227,103 +1000,23 @@ def delitem__List_ANY(space, w_list, w_idx):
 
 
 def delitem__List_Slice(space, w_list, w_slice):
-    start, stop, step, slicelength = w_slice.indices4(space,
-                                                      len(w_list.wrappeditems))
-    _delitem_slice_helper(space, w_list.wrappeditems, start, step, slicelength)
-
-def _delitem_slice_helper(space, items, start, step, slicelength):
-    if slicelength==0:
-        return
-
-    if step < 0:
-        start = start + step * (slicelength-1)
-        step = -step
-
-    if step == 1:
-        assert start >= 0
-        assert slicelength >= 0
-        del items[start:start+slicelength]
-    else:
-        n = len(items)
-        i = start
-
-        for discard in range(1, slicelength):
-            j = i+1
-            i += step
-            while j < i:
-                items[j-discard] = items[j]
-                j += 1
-
-        j = i+1
-        while j < n:
-            items[j-slicelength] = items[j]
-            j += 1
-        start = n - slicelength
-        assert start >= 0 # annotator hint
-        del items[start:]
+    start, stop, step, slicelength = w_slice.indices4(space, w_list.length())
+    w_list.deleteslice(start, step, slicelength)
 
 def setitem__List_ANY_ANY(space, w_list, w_index, w_any):
     idx = get_list_index(space, w_index)
     try:
-        w_list.wrappeditems[idx] = w_any
+        w_list.setitem(idx, w_any)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list index out of range"))
     return space.w_None
 
 def setitem__List_Slice_ANY(space, w_list, w_slice, w_iterable):
-    oldsize = len(w_list.wrappeditems)
+    oldsize = w_list.length()
     start, stop, step, slicelength = w_slice.indices4(space, oldsize)
-
-    sequence2 = space.listview(w_iterable)
-    items = w_list.wrappeditems
-    _setitem_slice_helper(space, items, start, step, slicelength, sequence2,
-                          empty_elem=None)
-
-def _setitem_slice_helper(space, items, start, step, slicelength, sequence2,
-                          empty_elem):
-    assert slicelength >= 0
-    oldsize = len(items)
-    len2 = len(sequence2)
-    if step == 1:  # Support list resizing for non-extended slices
-        delta = slicelength - len2
-        if delta < 0:
-            delta = -delta
-            newsize = oldsize + delta
-            # XXX support this in rlist!
-            items += [empty_elem] * delta
-            lim = start+len2
-            i = newsize - 1
-            while i >= lim:
-                items[i] = items[i-delta]
-                i -= 1
-        elif start >= 0:
-            del items[start:start+delta]
-        else:
-            assert delta==0   # start<0 is only possible with slicelength==0
-    elif len2 != slicelength:  # No resize for extended slices
-        raise operationerrfmt(space.w_ValueError, "attempt to "
-              "assign sequence of size %d to extended slice of size %d",
-              len2, slicelength)
-
-    if sequence2 is items:
-        if step > 0:
-            # Always copy starting from the right to avoid
-            # having to make a shallow copy in the case where
-            # the source and destination lists are the same list.
-            i = len2 - 1
-            start += i*step
-            while i >= 0:
-                items[start] = sequence2[i]
-                start -= step
-                i -= 1
-            return
-        else:
-            # Make a shallow copy to more easily handle the reversal case
-            sequence2 = list(sequence2)
-    for i in range(len2):
-        items[start] = sequence2[i]
-        start += step
+    w_other = _as_list(space, w_iterable)
+    w_list.setslice(start, step, slicelength, w_other)
 
 app = gateway.applevel("""
     def listrepr(currently_in_repr, l):
@@ -344,7 +1037,7 @@ app = gateway.applevel("""
 listrepr = app.interphook("listrepr")
 
 def repr__List(space, w_list):
-    if len(w_list.wrappeditems) == 0:
+    if w_list.length() == 0:
         return space.wrap('[]')
     ec = space.getexecutioncontext()
     w_currently_in_repr = ec._py_repr
@@ -354,9 +1047,9 @@ def repr__List(space, w_list):
 
 def list_insert__List_ANY_ANY(space, w_list, w_where, w_any):
     where = space.int_w(w_where)
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     index = get_positive_index(where, length)
-    w_list.wrappeditems.insert(index, w_any)
+    w_list.insert(index, w_any)
     return space.w_None
 
 def get_positive_index(where, length):
@@ -366,72 +1059,72 @@ def get_positive_index(where, length):
             where = 0
     elif where > length:
         where = length
+    assert where >= 0
     return where
 
 def list_append__List_ANY(space, w_list, w_any):
-    w_list.wrappeditems.append(w_any)
+    w_list.append(w_any)
     return space.w_None
 
 def list_extend__List_List(space, w_list, w_other):
-    w_list.wrappeditems += w_other.wrappeditems
+    w_list.extend(w_other)
     return space.w_None
 
 def list_extend__List_ANY(space, w_list, w_any):
-    w_list.wrappeditems += space.listview(w_any)
+    w_other = W_ListObject(space, space.listview(w_any))
+    w_list.extend(w_other)
     return space.w_None
 
 # note that the default value will come back wrapped!!!
 def list_pop__List_ANY(space, w_list, w_idx=-1):
-    items = w_list.wrappeditems
-    if len(items)== 0:
+    length = w_list.length()
+    if length == 0:
         raise OperationError(space.w_IndexError,
                              space.wrap("pop from empty list"))
     idx = space.int_w(w_idx)
+    if idx == -1:
+        return w_list.pop_end()
     try:
-        return items.pop(idx)
+        return w_list.pop(idx)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("pop index out of range"))
 
 def list_remove__List_ANY(space, w_list, w_any):
     # needs to be safe against eq_w() mutating the w_list behind our back
-    items = w_list.wrappeditems
-    i = 0
-    while i < len(items):
-        if space.eq_w(items[i], w_any):
-            if i < len(items): # if this is wrong the list was changed
-                del items[i]
-            return space.w_None
-        i += 1
-    raise OperationError(space.w_ValueError,
-                         space.wrap("list.remove(x): x not in list"))
+    try:
+        i = w_list.find(w_any, 0, sys.maxint)
+    except ValueError:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("list.remove(x): x not in list"))
+    if i < w_list.length(): # otherwise list was mutated
+        w_list.pop(i)
+    return space.w_None
 
 def list_index__List_ANY_ANY_ANY(space, w_list, w_any, w_start, w_stop):
     # needs to be safe against eq_w() mutating the w_list behind our back
-    items = w_list.wrappeditems
-    size = len(items)
+    size = w_list.length()
     i = slicetype.adapt_bound(space, size, w_start)
     stop = slicetype.adapt_bound(space, size, w_stop)
-    while i < stop and i < len(items):
-        if space.eq_w(items[i], w_any):
-            return space.wrap(i)
-        i += 1
-    raise OperationError(space.w_ValueError,
-                         space.wrap("list.index(x): x not in list"))
+    try:
+        i = w_list.find(w_any, i, stop)
+    except ValueError:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("list.index(x): x not in list"))
+    return space.wrap(i)
 
 def list_count__List_ANY(space, w_list, w_any):
     # needs to be safe against eq_w() mutating the w_list behind our back
     count = 0
     i = 0
-    items = w_list.wrappeditems
-    while i < len(items):
-        if space.eq_w(items[i], w_any):
+    while i < w_list.length():
+        if space.eq_w(w_list.getitem(i), w_any):
             count += 1
         i += 1
     return space.wrap(count)
 
 def list_reverse__List(space, w_list):
-    w_list.wrappeditems.reverse()
+    w_list.reverse()
     return space.w_None
 
 # ____________________________________________________________
@@ -440,6 +1133,11 @@ def list_reverse__List(space, w_list):
 # Reverse a slice of a list in place, from lo up to (exclusive) hi.
 # (used in sort)
 
+TimSort = make_timsort_class()
+IntBaseTimSort = make_timsort_class()
+FloatBaseTimSort = make_timsort_class()
+StringBaseTimSort = make_timsort_class()
+
 class KeyContainer(baseobjspace.W_Root):
     def __init__(self, w_key, w_item):
         self.w_key = w_key
@@ -454,6 +1152,18 @@ class SimpleSort(TimSort):
         space = self.space
         return space.is_true(space.lt(a, b))
 
+class IntSort(IntBaseTimSort):
+    def lt(self, a, b):
+        return a < b
+
+class FloatSort(FloatBaseTimSort):
+    def lt(self, a, b):
+        return a < b
+
+class StringSort(StringBaseTimSort):
+    def lt(self, a, b):
+        return a < b
+
 class CustomCompareSort(SimpleSort):
     def lt(self, a, b):
         space = self.space
@@ -486,6 +1196,13 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
     has_key = not space.is_w(w_keyfunc, space.w_None)
     has_reverse = space.is_true(w_reverse)
 
+    # lists of unwrapped ints, floats or strings are sorted directly,
+    # no user code can run during the comparisons
+    if (not has_cmp and not has_key and
+            w_list.strategy is not space.fromcache(ObjectListStrategy)):
+        w_list.sort(has_reverse)
+        return space.w_None
+
     # create and setup a TimSort instance
     if has_cmp:
         if has_key:
@@ -497,7 +1214,8 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
             sorterclass = CustomKeySort
         else:
             sorterclass = SimpleSort
-    items = w_list.wrappeditems
+    w_list.switch_to_object_strategy()
+    items = w_list.getitems()
     sorter = sorterclass(items, len(items))
     sorter.space = space
     sorter.w_cmp = w_cmp
@@ -506,8 +1224,8 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
         # The list is temporarily made empty, so that mutations performed
         # by comparison functions can't affect the slice of memory we're
         # sorting (allowing mutations during sorting is an IndexError or
-        # core-dump factory, since wrappeditems may change).
-        w_list.wrappeditems = []
+        # core-dump factory, since the storage may change).
+        w_list.clear()
 
         # wrap each item in a KeyContainer if needed
         if has_key:
@@ -537,10 +1255,10 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
                     sorter.list[i] = w_obj.w_item
 
         # check if the user mucked with the list during the sort
-        mucked = len(w_list.wrappeditems) > 0
+        mucked = w_list.length() > 0
 
         # put the items back into the list
-        w_list.wrappeditems = sorter.list
+        W_ListObject.__init__(w_list, space, sorter.list)
 
     if mucked:
         raise OperationError(space.w_ValueError,
@@ -2,12 +2,15 @@ import weakref
 from pypy.rlib import jit, objectmodel, debug
 from pypy.rlib.rarithmetic import intmask, r_uint
 from pypy.rlib import rerased
+from pypy.rlib.debug import make_sure_not_resized
 
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.objspace.std.dictmultiobject import W_DictMultiObject, DictStrategy, ObjectDictStrategy
 from pypy.objspace.std.dictmultiobject import IteratorImplementation
 from pypy.objspace.std.dictmultiobject import _never_equal_to_string
 from pypy.objspace.std.objectobject import W_ObjectObject
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.floatobject import W_FloatObject
 from pypy.objspace.std.typeobject import TypeCell
 
 # ____________________________________________________________
@@ -29,42 +32,48 @@ class AbstractAttribute(object):
         self.terminator = terminator
 
     def read(self, obj, selector):
-        index = self.index(selector)
-        if index < 0:
+        attr = self.find_map_attr(selector)
+        if attr is None:
             return self.terminator._read_terminator(obj, selector)
-        return obj._mapdict_read_storage(index)
+        return attr._direct_read(obj)
 
     def write(self, obj, selector, w_value):
-        index = self.index(selector)
-        if index < 0:
+        attr = self.find_map_attr(selector)
+        if attr is None:
             return self.terminator._write_terminator(obj, selector, w_value)
-        obj._mapdict_write_storage(index, w_value)
+        attr._direct_write(obj, w_value)
         return True
 
     def delete(self, obj, selector):
         return None
 
     def index(self, selector):
+        attr = self.find_map_attr(selector)
+        if attr is None:
+            return -1
+        return attr.position
+
+    def find_map_attr(self, selector):
         if jit.we_are_jitted():
             # hack for the jit:
-            # the _index method is pure too, but its argument is never
+            # the _find_map_attr method is pure too, but its argument is never
             # constant, because it is always a new tuple
-            return self._index_jit_pure(selector[0], selector[1])
+            return self._find_map_attr_jit_pure(selector[0], selector[1])
         else:
-            return self._index_indirection(selector)
+            return self._find_map_attr_indirection(selector)
 
     @jit.elidable
-    def _index_jit_pure(self, name, index):
-        return self._index_indirection((name, index))
+    def _find_map_attr_jit_pure(self, name, index):
+        return self._find_map_attr_indirection((name, index))
 
     @jit.dont_look_inside
-    def _index_indirection(self, selector):
+    def _find_map_attr_indirection(self, selector):
         if (self.space.config.objspace.std.withmethodcache):
-            return self._index_cache(selector)
-        return self._index(selector)
+            return self._find_map_attr_cache(selector)
+        return self._find_map_attr(selector)
 
     @jit.dont_look_inside
-    def _index_cache(self, selector):
+    def _find_map_attr_cache(self, selector):
         space = self.space
         cache = space.fromcache(IndexCache)
         SHIFT2 = r_uint.BITS - space.config.objspace.std.methodcachesizeexp
@@ -80,26 +89,26 @@ class AbstractAttribute(object):
         if cached_attr is self:
             cached_selector = cache.selectors[index_hash]
             if cached_selector == selector:
-                index = cache.indices[index_hash]
+                attr = cache.cached_attrs[index_hash]
                 if space.config.objspace.std.withmethodcachecounter:
                     name = selector[0]
                     cache.hits[name] = cache.hits.get(name, 0) + 1
-                return index
-        index = self._index(selector)
+                return attr
+        attr = self._find_map_attr(selector)
         cache.attrs[index_hash] = self
         cache.selectors[index_hash] = selector
-        cache.indices[index_hash] = index
+        cache.cached_attrs[index_hash] = attr
         if space.config.objspace.std.withmethodcachecounter:
             name = selector[0]
             cache.misses[name] = cache.misses.get(name, 0) + 1
-        return index
+        return attr
 
-    def _index(self, selector):
+    def _find_map_attr(self, selector):
         while isinstance(self, PlainAttribute):
             if selector == self.selector:
-                return self.position
+                return self
             self = self.back
-        return -1
+        return None
 
     def copy(self, obj):
         raise NotImplementedError("abstract base class")
@@ -120,14 +129,28 @@ class AbstractAttribute(object):
     def search(self, attrtype):
         return None
 
+    def num_unboxed(self, kind):
+        return 0
+
+    def unboxed_position(self):
+        return -1
+
     @jit.elidable
-    def _get_new_attr(self, name, index):
+    def _get_new_attr(self, name, index, kind):
         selector = name, index
         cache = self.cache_attrs
         if cache is None:
             cache = self.cache_attrs = {}
         attr = cache.get(selector, None)
         if attr is None:
+            if kind == PLAIN:
+                attr = PlainAttribute(selector, self)
+            else:
+                attr = UnboxedAttribute(selector, self, kind)
+            cache[selector] = attr
+        elif isinstance(attr, UnboxedAttribute) and attr.kind != kind:
+            # a value of another type is stored under this name: from now
+            # on, the attribute is stored boxed in all new maps
             attr = PlainAttribute(selector, self)
             cache[selector] = attr
         return attr
@@ -135,7 +158,8 @@ class AbstractAttribute(object):
     @jit.unroll_safe
     def add_attr(self, obj, selector, w_value):
         # grumble, jit needs this
-        attr = self._get_new_attr(selector[0], selector[1])
+        kind = unboxed_kind(self.space, selector, w_value)
+        attr = self._get_new_attr(selector[0], selector[1], kind)
         oldattr = obj._get_mapdict_map()
         if not jit.we_are_jitted():
             size_est = (oldattr._size_estimate + attr.size_estimate()
@@ -152,7 +176,7 @@ class AbstractAttribute(object):
         # the order is important here: first change the map, then the storage,
         # for the benefit of the special subclasses
         obj._set_mapdict_map(attr)
-        obj._mapdict_write_storage(attr.position, w_value)
+        attr._direct_add(obj, w_value)
 
     def materialize_r_dict(self, space, obj, dict_w):
         raise NotImplementedError("abstract base class")
@@ -258,14 +282,31 @@ class DevolvedDictTerminator(Terminator):
         return Terminator.set_terminator(self, obj, terminator)
 
 class PlainAttribute(AbstractAttribute):
-    _immutable_fields_ = ['selector', 'position', 'back']
+    _immutable_fields_ = ['selector', 'position', 'back', 'storage_length',
+                          'num_ints', 'num_floats', 'unboxed_storage_position',
+                          'kind', 'unboxed_index']
     def __init__(self, selector, back):
         AbstractAttribute.__init__(self, back.space, back.terminator)
         self.selector = selector
-        self.position = back.length()
         self.back = back
+        self.kind = PLAIN
+        self.unboxed_index = -1
+        self.num_ints = back.num_unboxed(UNBOXED_INT)
+        self.num_floats = back.num_unboxed(UNBOXED_FLOAT)
+        self.unboxed_storage_position = back.unboxed_position()
+        self.position = back.length()
+        self.storage_length = self.position + 1
         self._size_estimate = self.length() * NUM_DIGITS_POW2
 
+    def _direct_read(self, obj):
+        return obj._mapdict_read_storage(self.position)
+
+    def _direct_write(self, obj, w_value):
+        obj._mapdict_write_storage(self.position, w_value)
+
+    def _direct_add(self, obj, w_value):
+        obj._mapdict_write_storage(self.position, w_value)
+
     def _copy_attr(self, obj, new_obj):
         w_value = self.read(obj, self.selector)
         new_obj._get_mapdict_map().add_attr(new_obj, self.selector, w_value)
@@ -285,7 +326,15 @@ class PlainAttribute(AbstractAttribute):
         return new_obj
 
     def length(self):
-        return self.position + 1
+        return self.storage_length
+
+    def num_unboxed(self, kind):
+        if kind == UNBOXED_INT:
+            return self.num_ints
+        return self.num_floats
+
+    def unboxed_position(self):
+        return self.unboxed_storage_position
 
     def set_terminator(self, obj, terminator):
         new_obj = self.back.set_terminator(obj, terminator)
@@ -301,7 +350,7 @@ class PlainAttribute(AbstractAttribute):
         new_obj = self.back.materialize_r_dict(space, obj, dict_w)
         if self.selector[1] == DICT:
             w_attr = space.wrap(self.selector[0])
-            dict_w[w_attr] = obj._mapdict_read_storage(self.position)
+            dict_w[w_attr] = self._direct_read(obj)
         else:
             self._copy_attr(obj, new_obj)
         return new_obj
@@ -315,6 +364,113 @@ class PlainAttribute(AbstractAttribute):
     def __repr__(self):
         return "<PlainAttribute %s %s %r>" % (self.selector, self.position, self.back)
 
+class UnboxedAttribute(PlainAttribute):
+    """ An attribute whose value is an int or a float, stored unboxed.  All
+    the unboxed attributes of an instance share one storage position, which
+    holds an UnboxedStorage. """
+
+    def __init__(self, selector, back, kind):
+        PlainAttribute.__init__(self, selector, back)
+        self.kind = kind
+        self.unboxed_index = back.num_unboxed(kind)
+        if kind == UNBOXED_INT:
+            self.num_ints += 1
+        else:
+            self.num_floats += 1
+        if self.unboxed_storage_position < 0:
+            self.unboxed_storage_position = self.position
+        else:
+            # the UnboxedStorage already has a position, don't use a new one
+            self.position = self.unboxed_storage_position
+            self.storage_length = back.length()
+        self._size_estimate = self.length() * NUM_DIGITS_POW2
+
+    def _get_unboxed_storage(self, obj):
+        storage = obj._mapdict_read_storage(self.position)
+        assert isinstance(storage, UnboxedStorage)
+        return storage
+
+    def _direct_read(self, obj):
+        storage = self._get_unboxed_storage(obj)
+        return storage.read(self.space, self.kind, self.unboxed_index)
+
+    def _direct_write(self, obj, w_value):
+        if not self._store_unboxed(self._get_unboxed_storage(obj), w_value):
+            self._switch_to_boxed(obj, w_value)
+
+    def _direct_add(self, obj, w_value):
+        if self.position == self.back.length():
+            # first unboxed attribute of the instance
+            storage = UnboxedStorage(self.num_ints, self.num_floats)
+            obj._mapdict_write_storage(self.position, storage)
+        else:
+            storage = self._get_unboxed_storage(obj)
+            storage.grow(self.num_ints, self.num_floats)
+        stored = self._store_unboxed(storage, w_value)
+        assert stored # guaranteed by _get_new_attr()
+
+    def _store_unboxed(self, storage, w_value):
+        if self.kind == UNBOXED_INT:
+            if type(w_value) is W_IntObject:
+                storage.ints[self.unboxed_index] = w_value.intval
+                return True
+        else:
+            if type(w_value) is W_FloatObject:
+                storage.floats[self.unboxed_index] = w_value.floatval
+                return True
+        return False
+
+    @jit.dont_look_inside
+    def _switch_to_boxed(self, obj, w_value):
+        # a value of another type is written into the attribute: rebuild
+        # the instance with a map that stores this attribute boxed, and
+        # make sure that new instances will do the same
+        back = self.back
+        back._get_new_attr(self.selector[0], self.selector[1], PLAIN)
+        new_obj = obj._get_mapdict_map().copy(obj)
+        _become(obj, new_obj)
+        flag = obj._get_mapdict_map().write(obj, self.selector, w_value)
+        assert flag
+
+    def __repr__(self):
+        return "<UnboxedAttribute %s %s %s %s %r>" % (
+            self.selector, self.kind, self.position, self.unboxed_index,
+            self.back)
+
+class UnboxedStorage(W_Root):
+    """ The values of the unboxed attributes of an instance.  This is not an
+    application-level object. """
+
+    def __init__(self, num_ints, num_floats):
+        self.ints = make_sure_not_resized([0] * num_ints)
+        self.floats = make_sure_not_resized([0.0] * num_floats)
+
+    def read(self, space, kind, unboxed_index):
+        if kind == UNBOXED_INT:
+            return space.newint(self.ints[unboxed_index])
+        return space.newfloat(self.floats[unboxed_index])
+
+    def grow(self, num_ints, num_floats):
+        if num_ints > len(self.ints):
+            ints = [0] * num_ints
+            for i in range(len(self.ints)):
+                ints[i] = self.ints[i]
+            self.ints = make_sure_not_resized(ints)
+        if num_floats > len(self.floats):
+            floats = [0.0] * num_floats
+            for i in range(len(self.floats)):
+                floats[i] = self.floats[i]
+            self.floats = make_sure_not_resized(floats)
+
+def unboxed_kind(space, selector, w_value):
+    if space.config.objspace.std.withunboxedattrs:
+        if selector[1] != SPECIAL and w_value is not None:
+            if type(w_value) is W_IntObject:
+                return UNBOXED_INT
+            if type(w_value) is W_FloatObject:
+                return UNBOXED_FLOAT
+    return PLAIN
+
 def _become(w_obj, new_obj):
     # this is like the _become method, really, but we cannot use that due to
     # RPython reasons
@@ -327,7 +483,7 @@ class IndexCache(object):
         self.attrs = [None] * SIZE
         self._empty_selector = (None, INVALID)
         self.selectors = [self._empty_selector] * SIZE
-        self.indices = [0] * SIZE
+        self.cached_attrs = [None] * SIZE
         if space.config.objspace.std.withmethodcachecounter:
             self.hits = {}
             self.misses = {}
@@ -335,6 +491,7 @@ class IndexCache(object):
     def clear(self):
         for i in range(len(self.attrs)):
             self.attrs[i] = None
+            self.cached_attrs[i] = None
         for i in range(len(self.selectors)):
             self.selectors[i] = self._empty_selector
 
@@ -346,6 +503,11 @@ SPECIAL = 1
 INVALID = 2
 SLOTS_STARTING_FROM = 3
 
+# kinds of attributes
+PLAIN = 0
+UNBOXED_INT = 1
+UNBOXED_FLOAT = 2
+
 
 class BaseMapdictObject: # slightly evil to make it inherit from W_Root
     _mixin_ = True
@@ -722,11 +884,22 @@ class MapDictIteratorImplementation(IteratorImplementation):
 
 class CacheEntry(object):
     version_tag = None
-    index = 0
+    # where the attribute is stored; not the attribute itself, which would
+    # keep the map and the class alive
+    position = 0
+    kind = PLAIN
+    unboxed_index = -1
     w_method = None # for callmethod
     success_counter = 0
     failure_counter = 0
 
+    def read(self, space, w_obj):
+        storage = w_obj._mapdict_read_storage(self.position)
+        if self.kind == PLAIN:
+            return storage
+        assert isinstance(storage, UnboxedStorage)
+        return storage.read(space, self.kind, self.unboxed_index)
+
     def is_valid_for_obj(self, w_obj):
         map = w_obj._get_mapdict_map()
         return self.is_valid_for_map(map)
@@ -755,14 +928,17 @@ def init_mapdict_cache(pycode):
     pycode._mapdict_caches = [INVALID_CACHE_ENTRY] * num_entries
 
 @jit.dont_look_inside
-def _fill_cache(pycode, nameindex, map, version_tag, index, w_method=None):
+def _fill_cache(pycode, nameindex, map, version_tag, attr, w_method=None):
     entry = pycode._mapdict_caches[nameindex]
     if entry is INVALID_CACHE_ENTRY:
         entry = CacheEntry()
         pycode._mapdict_caches[nameindex] = entry
     entry.map_wref = weakref.ref(map)
     entry.version_tag = version_tag
-    entry.index = index
+    if attr is not None:
+        entry.position = attr.position
+        entry.kind = attr.kind
+        entry.unboxed_index = attr.unboxed_index
     entry.w_method = w_method
     if pycode.space.config.objspace.std.withmethodcachecounter:
         entry.failure_counter += 1
@@ -774,7 +950,7 @@ def LOAD_ATTR_caching(pycode, w_obj, nameindex):
     map = w_obj._get_mapdict_map()
     if entry.is_valid_for_map(map) and entry.w_method is None:
         # everything matches, it's incredibly fast
-        return w_obj._mapdict_read_storage(entry.index)
+        return entry.read(pycode.space, w_obj)
     return LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map)
 LOAD_ATTR_caching._always_inline_ = True
 
@@ -816,12 +992,13 @@ def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
                 selector = (name, DICT)
             #
             if selector[1] != INVALID:
-                index = map.index(selector)
-                if index >= 0:
+                attr = map.find_map_attr(selector)
+                if attr is not None:
                     # Note that if map.terminator is a DevolvedDictTerminator,
-                    # map.index() will always return -1 if selector[1]==DICT.
-                    _fill_cache(pycode, nameindex, map, version_tag, index)
-                    return w_obj._mapdict_read_storage(index)
+                    # map.find_map_attr() will always return None if
+                    # selector[1]==DICT.
+                    _fill_cache(pycode, nameindex, map, version_tag, attr)
+                    return attr._direct_read(w_obj)
     if space.config.objspace.std.withmethodcachecounter:
         INVALID_CACHE_ENTRY.failure_counter += 1
     return space.getattr(w_obj, w_name)
@@ -857,7 +1034,7 @@ def LOOKUP_METHOD_mapdict_fill_cache_method(space, pycode, name, nameindex,
                                                               version_tag)
     if w_method is None or isinstance(w_method, TypeCell):
         return
-    _fill_cache(pycode, nameindex, map, version_tag, -1, w_method)
+    _fill_cache(pycode, nameindex, map, version_tag, None, w_method)
 
 # XXX fix me: if a function contains a loop with both LOAD_ATTR and
 # XXX LOOKUP_METHOD on the same attribute name, it keeps trashing and
@@ -13,7 +13,7 @@ from pypy.objspace.std.register_all import register_all
 from pypy.rlib.rarithmetic import LONG_BIT, r_longlong, r_uint, intmask
 from pypy.objspace.std import model
 from pypy.interpreter.special import Ellipsis
-from pypy.interpreter.pycode import PyCode
+from pypy.interpreter.pycode import PyCode, LazyCode
 from pypy.interpreter import gateway, unicodehelper
 from pypy.rlib.rstruct import ieee
 
@@ -32,6 +32,7 @@ from pypy.objspace.std.noneobject    import W_NoneObject
 from pypy.objspace.std.unicodeobject import W_UnicodeObject
 
 from pypy.module.marshal.interp_marshal import register
+from pypy.module.marshal.interp_marshal import LazyCodeUnmarshaller
 
 TYPE_NULL      = '0'
 TYPE_NONE      = 'N'
@@ -276,7 +277,7 @@ register(TYPE_STRING, unmarshal_String)
 
 def unmarshal_interned(space, u, tc):
     w_ret = space.wrap(u.get_str())
-    u.stringtable_w.append(w_ret)
+    w_ret = u.save_interned(w_ret)
     w_intern = space.builtin.get('intern')
     space.call_function(w_intern, w_ret)
     return w_ret
@@ -284,10 +285,10 @@ register(TYPE_INTERNED, unmarshal_interned)
 
 def unmarshal_stringref(space, u, tc):
     idx = u.get_int()
-    try:
-        return u.stringtable_w[idx]
-    except IndexError:
+    w_ret = u.get_interned(idx)
+    if w_ret is None:
         raise_exception(space, 'bad marshal data')
+    return w_ret
 register(TYPE_STRINGREF, unmarshal_stringref)
 
 def marshal_w__Tuple(space, w_tuple, m):
@@ -300,7 +301,7 @@ def unmarshal_Tuple(space, u, tc):
 register(TYPE_TUPLE, unmarshal_Tuple)
 
 def marshal_w__List(space, w_list, m):
-    items = w_list.wrappeditems[:]
+    items = w_list.getitems()[:]
     m.put_tuple_w(TYPE_LIST, items)
 
 def unmarshal_List(space, u, tc):
@@ -347,7 +348,7 @@ def marshal_w_pycode(space, w_pycode, m):
     m.put_int(x.co_stacksize)
     m.put_int(x.co_flags)
     m.atom_str(TYPE_STRING, x.co_code)
-    m.put_tuple_w(TYPE_TUPLE, x.co_consts_w[:])
+    m.put_tuple_w(TYPE_TUPLE, x.get_loaded_consts_w())
     m.atom_strlist(TYPE_TUPLE, TYPE_INTERNED, [space.str_w(w_name) for w_name in x.co_names_w])
     m.atom_strlist(TYPE_TUPLE, TYPE_INTERNED, x.co_varnames)
     m.atom_strlist(TYPE_TUPLE, TYPE_INTERNED, x.co_freevars)
@@ -384,13 +385,17 @@ def unmarshal_strlist(u, tc):
     return res
 
 def unmarshal_pycode(space, u, tc):
+    if u.lazy_code():
+        return unmarshal_lazy_pycode(space, u)
     argcount    = u.get_int()
     nlocals     = u.get_int()
     stacksize   = u.get_int()
     flags       = u.get_int()
     code        = unmarshal_str(u)
     u.start(TYPE_TUPLE)
+    u.codedepth += 1
     consts_w    = u.get_tuple_w()
+    u.codedepth -= 1
     # copy in order not to merge it with anything else
     names       = unmarshal_strlist(u, TYPE_TUPLE)
     varnames    = unmarshal_strlist(u, TYPE_TUPLE)
@@ -406,6 +411,77 @@ def unmarshal_pycode(space, u, tc):
     return space.wrap(code)
 register(TYPE_CODE, unmarshal_pycode)
 
+# lazy loading of code objects, see interp_marshal.loads_lazy_code():
+# only what MAKE_FUNCTION and MAKE_CLOSURE need is read, the rest is
+# skipped and unmarshalled by LazyCode.load() when the code first runs
+
+def unmarshal_lazy_pycode(space, u):
+    assert isinstance(u, LazyCodeUnmarshaller)
+    position    = u.bufpos - 1    # the TYPE_CODE
+    assert position >= 0
+    stringindex = u.stringindex
+    u.skip(16)                    # argcount, nlocals, stacksize, flags
+    skip_w_obj(u)                 # code
+    skip_w_obj(u)                 # consts
+    skip_w_obj(u)                 # names
+    skip_w_obj(u)                 # varnames
+    nfreevars   = len(unmarshal_strlist(u, TYPE_TUPLE))
+    skip_w_obj(u)                 # cellvars
+    filename    = unmarshal_str(u)
+    name        = unmarshal_str(u)
+    u.skip(4)                     # firstlineno
+    skip_w_obj(u)                 # lnotab
+    code = LazyCode(space, u.state, position, stringindex, nfreevars,
+                    filename, name)
+    return space.wrap(code)
+
+def skip_w_obj(u):
+    """Skip one object of the marshal data; returns False for TYPE_NULL."""
+    tc = u.get1()
+    if (tc == TYPE_NONE or tc == TYPE_FALSE or tc == TYPE_TRUE or
+        tc == TYPE_STOPITER or tc == TYPE_ELLIPSIS):
+        pass
+    elif tc == TYPE_NULL:
+        return False
+    elif tc == TYPE_INT or tc == TYPE_STRINGREF:
+        u.skip(4)
+    elif tc == TYPE_INT64 or tc == TYPE_BINARY_FLOAT:
+        u.skip(8)
+    elif tc == TYPE_BINARY_COMPLEX:
+        u.skip(16)
+    elif tc == TYPE_FLOAT:
+        u.skip(ord(u.get1()))
+    elif tc == TYPE_COMPLEX:
+        u.skip(ord(u.get1()))
+        u.skip(ord(u.get1()))
+    elif tc == TYPE_LONG:
+        lng = u.get_int()
+        if lng < 0:
+            lng = -lng
+        u.skip(lng * 2)
+    elif tc == TYPE_STRING or tc == TYPE_UNICODE:
+        u.skip(u.get_lng())
+    elif tc == TYPE_INTERNED:
+        u.skip_interned()
+    elif (tc == TYPE_TUPLE or tc == TYPE_LIST or tc == TYPE_SET or
+          tc == TYPE_FROZENSET):
+        lng = u.get_lng()
+        for i in range(lng):
+            skip_w_obj(u)
+    elif tc == TYPE_DICT:
+        while skip_w_obj(u):
+            skip_w_obj(u)
+    elif tc == TYPE_CODE:
+        u.skip(16)                # argcount, nlocals, stacksize, flags
+        for i in range(8):        # code, consts, names, varnames,
+            skip_w_obj(u)         # freevars, cellvars, filename, name
+        u.skip(4)                 # firstlineno
+        skip_w_obj(u)             # lnotab
+    else:
+        u.raise_exc('bad marshal data')
+    return True
+
+
 def marshal_w__Unicode(space, w_unicode, m):
     s = unicodehelper.PyUnicode_EncodeUTF8(space, space.unicode_w(w_unicode))
     m.atom_str(TYPE_UNICODE, s)
@@ -16,6 +16,7 @@ def registerimplementation(implcls):
 
 option_to_typename = {
     "withsmalltuple" : ["smalltupleobject.W_SmallTupleObject"],
+    "withspecialisedtuple" : ["specialisedtupleobject.W_SpecialisedTupleObject"],
     "withsmallint"   : ["smallintobject.W_SmallIntObject"],
     "withsmalllong"  : ["smalllongobject.W_SmallLongObject"],
     "withstrslice"   : ["strsliceobject.W_StringSliceObject"],
@@ -73,6 +74,7 @@ class StdTypeModel:
         from pypy.objspace.std import smalllongobject
         from pypy.objspace.std import tupleobject
         from pypy.objspace.std import smalltupleobject
+        from pypy.objspace.std import specialisedtupleobject
         from pypy.objspace.std import listobject
         from pypy.objspace.std import dictmultiobject
         from pypy.objspace.std import stringobject
@@ -258,6 +260,10 @@ class StdTypeModel:
         if config.objspace.std.withsmalltuple:
             self.typeorder[smalltupleobject.W_SmallTupleObject] += [
                 (tupleobject.W_TupleObject, smalltupleobject.delegate_SmallTuple2Tuple)]
+        if config.objspace.std.withspecialisedtuple:
+            self.typeorder[specialisedtupleobject.W_SpecialisedTupleObject] += [
+                (tupleobject.W_TupleObject,
+                 specialisedtupleobject.delegate_SpecialisedTuple2Tuple)]
 
         # put W_Root everywhere
         self.typeorder[W_Root] = []
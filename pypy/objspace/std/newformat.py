@@ -3,9 +3,10 @@
 import string
 
 from pypy.interpreter.error import OperationError
-from pypy.rlib import rstring, runicode, rlocale, rarithmetic, rfloat
+from pypy.rlib import rstring, runicode, rlocale, rarithmetic, rfloat, jit
 from pypy.rlib.objectmodel import specialize
 from pypy.rlib.rfloat import copysign, formatd
+from pypy.objspace.std.compiledcache import make_compiled_cache
 
 
 @specialize.argtype(1)
@@ -30,6 +31,55 @@ def _parse_int(space, s, start, end):
     return result, i
 
 
+@specialize.argtype(0)
+def _scan_field(s, start, end):
+    """Find the end of the replacement field starting at 'start' (just after
+    its opening brace).  Returns (field_end, recursive), where field_end is
+    the index of the closing brace or -1 if there is none."""
+    nested = 1
+    i = start
+    recursive = False
+    while i < end:
+        c = s[i]
+        if c == "{":
+            recursive = True
+            nested += 1
+        elif c == "}":
+            nested -= 1
+            if not nested:
+                return i, recursive
+        i += 1
+    return -1, recursive
+
+@specialize.argtype(0)
+def _split_field(s, start, end):
+    """Split the replacement field s[start:end] into its name, conversion
+    and the start of its format spec.  Returns an error message as the
+    last item, or None."""
+    i = start
+    while i < end:
+        c = s[i]
+        if c == ":" or c == "!":
+            end_name = i
+            if c == "!":
+                i += 1
+                if i == end:
+                    return None, None, end, "expected conversion"
+                conversion = s[i]
+                i += 1
+                if i < end:
+                    if s[i] != ':':
+                        return (None, None, end,
+                                "expected ':' after format specifier")
+                    i += 1
+            else:
+                conversion = None
+                i += 1
+            return s[start:end_name], conversion, i, None
+        i += 1
+    return s[start:end], None, end, None
+
+
 # Auto number state
 ANS_INIT = 1
 ANS_AUTO = 2
@@ -52,7 +102,16 @@ class TemplateFormatter(object):
         self.args, self.kwargs = args.unpack()
         self.auto_numbering = 0
         self.auto_numbering_state = ANS_INIT
-        return self._build_string(0, len(self.template), 2)
+        if self.is_unicode:
+            compiled = get_compiled_unicode_template(self.space,
+                                                     self.template)
+        else:
+            compiled = get_compiled_str_template(self.space, self.template)
+        if compiled is None:
+            # malformed template: interpret it, to report the error only
+            # after the preceding fields have been formatted
+            return self._build_string(0, len(self.template), 2)
+        return self._build_compiled(compiled)
 
     def _build_string(self, start, end, level):
         space = self.space
@@ -91,20 +150,9 @@ class TemplateFormatter(object):
                 if not markup_follows:
                     last_literal = i
                     continue
-                nested = 1
                 field_start = i
-                recursive = False
-                while i < end:
-                    c = s[i]
-                    if c == "{":
-                        recursive = True
-                        nested += 1
-                    elif c == "}":
-                        nested -= 1
-                        if not nested:
-                            break
-                    i += 1
-                if nested:
+                i, recursive = _scan_field(s, field_start, end)
+                if i < 0:
                     raise OperationError(space.w_ValueError,
                                          space.wrap("Unmatched '{'"))
                 rendered = self._render_field(field_start, i, recursive, level)
@@ -116,33 +164,12 @@ class TemplateFormatter(object):
         return out.build()
 
     def _parse_field(self, start, end):
-        s = self.template
-        # Find ":" or "!"
-        i = start
-        while i < end:
-            c = s[i]
-            if c == ":" or c == "!":
-                end_name = i
-                if c == "!":
-                    i += 1
-                    if i == end:
-                        w_msg = self.space.wrap("expected conversion")
-                        raise OperationError(self.space.w_ValueError, w_msg)
-                    conversion = s[i]
-                    i += 1
-                    if i < end:
-                        if s[i] != ':':
-                            w_msg = self.space.wrap("expected ':' after"
-                                                    " format specifier")
-                            raise OperationError(self.space.w_ValueError,
-                                                 w_msg)
-                        i += 1
-                else:
-                    conversion = None
-                    i += 1
-                return s[start:end_name], conversion, i
-            i += 1
-        return s[start:end], None, end
+        name, conversion, spec_start, errmsg = _split_field(self.template,
+                                                            start, end)
+        if errmsg is not None:
+            raise OperationError(self.space.w_ValueError,
+                                 self.space.wrap(errmsg))
+        return name, conversion, spec_start
 
     def _get_argument(self, name):
         # First, find the argument.
@@ -318,11 +345,48 @@ class TemplateFormatter(object):
             w_obj = self._convert(w_obj, conversion)
         if recursive:
             spec = self._build_string(spec_start, end, level)
-        w_rendered = self.space.format(w_obj, self.space.wrap(spec))
+        return self._format(w_obj, spec)
+
+    def _format(self, w_obj, spec):
+        space = self.space
+        if not spec:
+            # shortcut for the common '{}' with a string argument, whose
+            # __format__() would return it unmodified
+            w_type = space.type(w_obj)
+            if self.is_unicode:
+                if space.is_w(w_type, space.w_unicode):
+                    return space.unicode_w(w_obj)
+            elif space.is_w(w_type, space.w_str):
+                return space.str_w(w_obj)
+        w_rendered = space.format(w_obj, space.wrap(spec))
         unwrapper = "unicode_w" if self.is_unicode else "str_w"
-        to_interp = getattr(self.space, unwrapper)
+        to_interp = getattr(space, unwrapper)
         return to_interp(w_rendered)
 
+    @jit.unroll_safe
+    def _build_compiled(self, compiled):
+        if self.is_unicode:
+            out = rstring.UnicodeBuilder()
+        else:
+            out = rstring.StringBuilder()
+        for index in range(len(compiled.names)):
+            out.append(compiled.literals[index])
+            w_obj = self._get_argument(compiled.names[index])
+            conversion = compiled.conversions[index]
+            if conversion is not None:
+                w_obj = self._convert(w_obj, conversion)
+            spec_start = compiled.spec_starts[index]
+            if spec_start < 0:
+                spec = compiled.specs[index]
+            else:
+                # the spec contains nested fields: render them now, one
+                # recursion level down as in _build_string()
+                spec = self._build_string(spec_start,
+                                          compiled.spec_ends[index], 1)
+            out.append(self._format(w_obj, spec))
+        out.append(compiled.literals[len(compiled.names)])
+        return out.build()
+
     def formatter_parser(self):
         self.parser_list_w = []
         self.last_end = 0
@@ -339,6 +403,112 @@ class TemplateFormatter(object):
         return space.iter(space.newlist(self.parser_list_w))
 
 
+# ____________________________________________________________
+# Compiled templates
+#
+# The format strings used with str.format() are usually constants, so
+# build() does not scan them again and again: they are split once into
+# their literal chunks and their fields, and kept in a small cache keyed
+# by the template (see compiledcache.py).  get_compiled_*_template()
+# are elidable: when the format string is a constant, the JIT removes
+# the lookup entirely and unrolls _build_compiled() over the constant
+# fields.
+
+TEMPLATE_CACHE_SIZE_EXP = 8
+
+def _make_template_cache(is_unicode):
+
+    class CompiledTemplate(object):
+        """A template split into len(names) + 1 literal chunks, with a
+        field between each of them.  For each field, spec_starts[i] is -1
+        if specs[i] is the complete format spec; otherwise the spec has
+        nested fields and must be rendered from the template between
+        spec_starts[i] and spec_ends[i]."""
+        _immutable_fields_ = ['literals[*]', 'names[*]', 'conversions[*]',
+                              'specs[*]', 'spec_starts[*]', 'spec_ends[*]']
+
+        def __init__(self, literals, names, conversions, specs,
+                     spec_starts, spec_ends):
+            self.literals = literals
+            self.names = names
+            self.conversions = conversions
+            self.specs = specs
+            self.spec_starts = spec_starts
+            self.spec_ends = spec_ends
+
+    def compile_template(s):
+        """Returns a CompiledTemplate, or None if 's' is malformed."""
+        if is_unicode:
+            literal = rstring.UnicodeBuilder()
+        else:
+            literal = rstring.StringBuilder()
+        literals = []
+        names = []
+        conversions = []
+        specs = []
+        spec_starts = []
+        spec_ends = []
+        end = len(s)
+        last_literal = i = 0
+        while i < end:
+            c = s[i]
+            i += 1
+            if c == "{" or c == "}":
+                at_end = i == end
+                markup_follows = True
+                if c == "}":
+                    if at_end or s[i] != "}":
+                        return None
+                    i += 1
+                    markup_follows = False
+                if c == "{":
+                    if at_end:
+                        return None
+                    if s[i] == "{":
+                        i += 1
+                        markup_follows = False
+                literal.append_slice(s, last_literal, i - 1)
+                if not markup_follows:
+                    last_literal = i
+                    continue
+                field_start = i
+                i, recursive = _scan_field(s, field_start, end)
+                if i < 0:
+                    return None
+                name, conversion, spec_start, errmsg = _split_field(
+                    s, field_start, i)
+                if errmsg is not None:
+                    return None
+                literals.append(literal.build())
+                if is_unicode:
+                    literal = rstring.UnicodeBuilder()
+                else:
+                    literal = rstring.StringBuilder()
+                names.append(name)
+                conversions.append(conversion)
+                specs.append(s[spec_start:i])
+                if recursive:
+                    spec_starts.append(spec_start)
+                else:
+                    spec_starts.append(-1)
+                spec_ends.append(i)
+                i += 1
+                last_literal = i
+        literal.append_slice(s, last_literal, end)
+        literals.append(literal.build())
+        return CompiledTemplate(literals[:], names[:], conversions[:],
+                                specs[:], spec_starts[:], spec_ends[:])
+
+    TemplateCache, get_compiled_template = make_compiled_cache(
+        compile_template, TEMPLATE_CACHE_SIZE_EXP)
+
+    return TemplateCache, get_compiled_template
+
+StrTemplateCache, get_compiled_str_template = _make_template_cache(False)
+UnicodeTemplateCache, get_compiled_unicode_template = _make_template_cache(
+    True)
+
+
 def str_template_formatter(space, template):
     return TemplateFormatter(space, False, template)
 
@@ -2,11 +2,14 @@ from pypy.objspace.std.model import registerimplementation, W_Object
 from pypy.objspace.std.register_all import register_all
 from pypy.rlib.objectmodel import r_dict
 from pypy.rlib.rarithmetic import intmask, r_uint
+from pypy.rlib.debug import mark_dict_non_null
+from pypy.rlib import rerased
 from pypy.interpreter.error import OperationError
 from pypy.interpreter import gateway
 from pypy.interpreter.argument import Signature
 from pypy.objspace.std.settype import set_typedef as settypedef
 from pypy.objspace.std.frozensettype import frozenset_typedef as frozensettypedef
+from pypy.objspace.std.dictmultiobject import _never_equal_to_string
 
 class W_BaseSetObject(W_Object):
     typedef = None
@@ -21,16 +24,34 @@ class W_BaseSetObject(W_Object):
         return False
 
 
-    def __init__(w_self, space, setdata):
-        """Initialize the set by taking ownership of 'setdata'."""
-        assert setdata is not None
-        w_self.setdata = setdata
+    def __init__(w_self, space, w_iterable=None):
+        """Initialize the set by taking the content of 'w_iterable'."""
+        w_self.space = space
+        set_strategy_and_setdata(space, w_self, w_iterable)
 
     def __repr__(w_self):
         """representation for debugging purposes"""
-        reprlist = [repr(w_item) for w_item in w_self.setdata.keys()]
+        reprlist = [repr(w_item) for w_item in w_self.getkeys()]
         return "<%s(%s)>" % (w_self.__class__.__name__, ', '.join(reprlist))
 
+    def from_storage_and_strategy(w_self, storage, strategy):
+        """Make a new set of the same type as 'w_self' that takes ownership
+        of 'storage'."""
+        w_obj = w_self._newobj(w_self.space, None)
+        assert isinstance(w_obj, W_BaseSetObject)
+        w_obj.strategy = strategy
+        w_obj.sstorage = storage
+        return w_obj
+
+    def switch_to_object_strategy(w_self, space):
+        d = w_self.strategy.getdict_w(w_self)
+        w_self.strategy = strategy = space.fromcache(ObjectSetStrategy)
+        w_self.sstorage = strategy.erase(d)
+
+    def switch_to_empty_strategy(w_self):
+        w_self.strategy = strategy = w_self.space.fromcache(EmptySetStrategy)
+        w_self.sstorage = strategy.get_empty_storage()
+
     _lifeline_ = None
     def getweakref(self):
         return self._lifeline_
@@ -39,184 +60,770 @@ class W_BaseSetObject(W_Object):
     def delweakref(self):
         self._lifeline_ = None
 
+def _add_indirections():
+    set_methods = "clear copy_real length add remove has_key \
+                   getdict_w get_storage_copy getkeys equals \
+                   difference difference_update \
+                   symmetric_difference symmetric_difference_update \
+                   intersect intersect_update issubset isdisjoint \
+                   update iter popitem".split()
+
+    def make_method(method):
+        def f(self, *args):
+            return getattr(self.strategy, method)(self, *args)
+        f.func_name = method
+        return f
+
+    for method in set_methods:
+        setattr(W_BaseSetObject, method, make_method(method))
+
+_add_indirections()
+
 class W_SetObject(W_BaseSetObject):
     from pypy.objspace.std.settype import set_typedef as typedef
 
-    def _newobj(w_self, space, rdict_w):
-        """Make a new set by taking ownership of 'rdict_w'."""
+    def _newobj(w_self, space, w_iterable):
+        """Make a new set by taking the content of 'w_iterable'."""
         if type(w_self) is W_SetObject:
-            return W_SetObject(space, rdict_w)
+            return W_SetObject(space, w_iterable)
         w_type = space.type(w_self)
         w_obj = space.allocate_instance(W_SetObject, w_type)
-        W_SetObject.__init__(w_obj, space, rdict_w)
+        W_SetObject.__init__(w_obj, space, w_iterable)
         return w_obj
 
 class W_FrozensetObject(W_BaseSetObject):
     from pypy.objspace.std.frozensettype import frozenset_typedef as typedef
     hash = 0
 
-    def _newobj(w_self, space, rdict_w):
-        """Make a new frozenset by taking ownership of 'rdict_w'."""
+    def _newobj(w_self, space, w_iterable):
+        """Make a new frozenset by taking the content of 'w_iterable'."""
         if type(w_self) is W_FrozensetObject:
-            return W_FrozensetObject(space, rdict_w)
+            return W_FrozensetObject(space, w_iterable)
         w_type = space.type(w_self)
         w_obj = space.allocate_instance(W_FrozensetObject, w_type)
-        W_FrozensetObject.__init__(w_obj, space, rdict_w)
+        W_FrozensetObject.__init__(w_obj, space, w_iterable)
         return w_obj
 
 registerimplementation(W_BaseSetObject)
 registerimplementation(W_SetObject)
 registerimplementation(W_FrozensetObject)
 
-class W_SetIterObject(W_Object):
-    from pypy.objspace.std.settype import setiter_typedef as typedef
+class SetStrategy(object):
+
+    def __init__(self, space):
+        self.space = space
+
+    def get_empty_storage(self):
+        raise NotImplementedError
+
+    def may_contain_equal_elements(self, strategy):
+        """Return False if no element of a set using this strategy can be
+        equal to an element of a set using 'strategy'."""
+        raise NotImplementedError
+
+
+class EmptySetStrategy(SetStrategy):
+
+    erase, unerase = rerased.new_erasing_pair("empty")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def get_empty_storage(self):
+        return self.erase(None)
+
+    def may_contain_equal_elements(self, strategy):
+        return False
+
+    def switch_to_correct_strategy(self, w_set, w_key):
+        space = self.space
+        w_type = space.type(w_key)
+        if space.is_w(w_type, space.w_int):
+            strategy = space.fromcache(IntegerSetStrategy)
+        elif space.is_w(w_type, space.w_str):
+            strategy = space.fromcache(StringSetStrategy)
+        else:
+            strategy = space.fromcache(ObjectSetStrategy)
+        w_set.strategy = strategy
+        w_set.sstorage = strategy.get_empty_storage()
+
+    def length(self, w_set):
+        return 0
+
+    def clear(self, w_set):
+        pass
+
+    def copy_real(self, w_set):
+        return w_set.from_storage_and_strategy(self.erase(None), self)
+
+    def add(self, w_set, w_key):
+        self.switch_to_correct_strategy(w_set, w_key)
+        w_set.add(w_key)
+
+    def remove(self, w_set, w_item):
+        # in case the key is unhashable, try to hash it
+        self.space.hash(w_item)
+        return False
+
+    def has_key(self, w_set, w_key):
+        # in case the key is unhashable, try to hash it
+        self.space.hash(w_key)
+        return False
+
+    def getdict_w(self, w_set):
+        return newset(self.space)
+
+    def get_storage_copy(self, w_set):
+        return w_set.sstorage
+
+    def getkeys(self, w_set):
+        return []
+
+    def equals(self, w_set, w_other):
+        return w_other.length() == 0
+
+    def difference(self, w_set, w_other):
+        return w_set.copy_real()
+
+    def difference_update(self, w_set, w_other):
+        pass
+
+    def symmetric_difference(self, w_set, w_other):
+        storage = w_other.get_storage_copy()
+        return w_set.from_storage_and_strategy(storage, w_other.strategy)
+
+    def symmetric_difference_update(self, w_set, w_other):
+        self.update(w_set, w_other)
+
+    def intersect(self, w_set, w_other):
+        return w_set.copy_real()
+
+    def intersect_update(self, w_set, w_other):
+        pass
+
+    def issubset(self, w_set, w_other):
+        return True
+
+    def isdisjoint(self, w_set, w_other):
+        return True
+
+    def update(self, w_set, w_other):
+        storage = w_other.get_storage_copy()
+        w_set.strategy = w_other.strategy
+        w_set.sstorage = storage
+
+    def iter(self, w_set):
+        return EmptyIteratorImplementation(self.space, w_set)
+
+    def popitem(self, w_set):
+        raise OperationError(self.space.w_KeyError,
+                                self.space.wrap('pop from an empty set'))
+
+
+class AbstractUnwrappedSetStrategy(object):
+    _mixin_ = True
+
+    @staticmethod
+    def erase(storage):
+        raise NotImplementedError("abstract base class")
+
+    @staticmethod
+    def unerase(obj):
+        raise NotImplementedError("abstract base class")
+
+    def wrap(self, unwrapped):
+        raise NotImplementedError
+
+    def unwrap(self, wrapped):
+        raise NotImplementedError
+
+    def is_correct_type(self, w_key):
+        raise NotImplementedError("abstract base class")
+
+    def get_empty_dict(self):
+        raise NotImplementedError("abstract base class")
+
+    def _never_equal_to(self, w_lookup_type):
+        raise NotImplementedError("abstract base class")
+
+    def get_empty_storage(self):
+        return self.erase(self.get_empty_dict())
+
+    def get_storage_from_list(self, list_w):
+        setdata = self.get_empty_dict()
+        for w_item in list_w:
+            setdata[self.unwrap(w_item)] = None
+        return self.erase(setdata)
+
+    def get_storage_from_unwrapped_list(self, items):
+        setdata = self.get_empty_dict()
+        for item in items:
+            setdata[item] = None
+        return self.erase(setdata)
+
+    def length(self, w_set):
+        return len(self.unerase(w_set.sstorage))
+
+    def clear(self, w_set):
+        w_set.switch_to_empty_strategy()
+
+    def copy_real(self, w_set):
+        storage = self.get_storage_copy(w_set)
+        return w_set.from_storage_and_strategy(storage, self)
+
+    def add(self, w_set, w_key):
+        if self.is_correct_type(w_key):
+            self.unerase(w_set.sstorage)[self.unwrap(w_key)] = None
+        else:
+            w_set.switch_to_object_strategy(self.space)
+            w_set.add(w_key)
+
+    def remove(self, w_set, w_item):
+        if self.is_correct_type(w_item):
+            d = self.unerase(w_set.sstorage)
+            try:
+                del d[self.unwrap(w_item)]
+                return True
+            except KeyError:
+                return False
+        elif self._never_equal_to(self.space.type(w_item)):
+            return False
+        else:
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.remove(w_item)
+
+    def has_key(self, w_set, w_key):
+        if self.is_correct_type(w_key):
+            return self.unwrap(w_key) in self.unerase(w_set.sstorage)
+        elif self._never_equal_to(self.space.type(w_key)):
+            return False
+        else:
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.has_key(w_key)
+
+    def getdict_w(self, w_set):
+        result = newset(self.space)
+        for key in self.unerase(w_set.sstorage).iterkeys():
+            result[self.wrap(key)] = None
+        return result
+
+    def get_storage_copy(self, w_set):
+        d = self.unerase(w_set.sstorage)
+        return self.erase(d.copy())
+
+    def getkeys(self, w_set):
+        return [self.wrap(key) for key in self.unerase(w_set.sstorage).keys()]
+
+    # The set algebra below works on the unwrapped keys directly if both
+    # sets use this strategy.  Otherwise it falls back to wrapping the keys
+    # of 'w_set' and asking 'w_other' about them, which is always correct.
+    # Note that the fallbacks iterate over a copy of the keys, because
+    # 'w_other.has_key()' can run arbitrary app-level code.
+
+    def equals(self, w_set, w_other):
+        if self.length(w_set) != w_other.length():
+            return False
+        if self.length(w_set) == 0:
+            return True
+        if self is w_other.strategy:
+            return self._issubset_unwrapped(w_set, w_other)
+        if not self.may_contain_equal_elements(w_other.strategy):
+            return False
+        return self._issubset_wrapped(w_set, w_other)
+
+    def _difference_unwrapped(self, w_set, w_other):
+        d_other = self.unerase(w_other.sstorage)
+        result = self.get_empty_dict()
+        for key in self.unerase(w_set.sstorage).iterkeys():
+            if key not in d_other:
+                result[key] = None
+        return self.erase(result)
+
+    def _difference_wrapped(self, w_set, w_other):
+        result = self.get_empty_dict()
+        for key in self.unerase(w_set.sstorage).keys():
+            if not w_other.has_key(self.wrap(key)):
+                result[key] = None
+        return self.erase(result)
+
+    def _difference_base(self, w_set, w_other):
+        if self is w_other.strategy:
+            return self._difference_unwrapped(w_set, w_other)
+        elif not self.may_contain_equal_elements(w_other.strategy):
+            return self.get_storage_copy(w_set)
+        else:
+            return self._difference_wrapped(w_set, w_other)
+
+    def difference(self, w_set, w_other):
+        storage = self._difference_base(w_set, w_other)
+        return w_set.from_storage_and_strategy(storage, self)
+
+    def difference_update(self, w_set, w_other):
+        if self is w_other.strategy:
+            d = self.unerase(w_set.sstorage)
+            d_other = self.unerase(w_other.sstorage)
+            if d is d_other:
+                d.clear()     # for the case 'a.difference_update(a)'
+                return
+            for key in d_other.iterkeys():
+                try:
+                    del d[key]
+                except KeyError:
+                    pass
+        elif not self.may_contain_equal_elements(w_other.strategy):
+            pass
+        else:
+            for w_key in w_other.getkeys():
+                w_set.remove(w_key)
+
+    def _symmetric_difference_unwrapped(self, w_set, w_other):
+        d = self.unerase(w_set.sstorage)
+        d_other = self.unerase(w_other.sstorage)
+        result = self.get_empty_dict()
+        for key in d.iterkeys():
+            if key not in d_other:
+                result[key] = None
+        for key in d_other.iterkeys():
+            if key not in d:
+                result[key] = None
+        return self.erase(result)
+
+    def _symmetric_difference_wrapped(self, w_set, w_other):
+        result = newset(self.space)
+        for w_key in w_set.getkeys():
+            if not w_other.has_key(w_key):
+                result[w_key] = None
+        for w_key in w_other.getkeys():
+            if not w_set.has_key(w_key):
+                result[w_key] = None
+        strategy = self.space.fromcache(ObjectSetStrategy)
+        return strategy.erase(result)
+
+    def _symmetric_difference_base(self, w_set, w_other):
+        if self is w_other.strategy:
+            return self._symmetric_difference_unwrapped(w_set, w_other), self
+        elif w_other.length() == 0:
+            return self.get_storage_copy(w_set), self
+        else:
+            storage = self._symmetric_difference_wrapped(w_set, w_other)
+            return storage, self.space.fromcache(ObjectSetStrategy)
+
+    def symmetric_difference(self, w_set, w_other):
+        storage, strategy = self._symmetric_difference_base(w_set, w_other)
+        return w_set.from_storage_and_strategy(storage, strategy)
+
+    def symmetric_difference_update(self, w_set, w_other):
+        storage, strategy = self._symmetric_difference_base(w_set, w_other)
+        w_set.strategy = strategy
+        w_set.sstorage = storage
+
+    def _intersect_unwrapped(self, w_set, w_other):
+        d = self.unerase(w_set.sstorage)
+        d_other = self.unerase(w_other.sstorage)
+        if len(d) > len(d_other):
+            d, d_other = d_other, d     # loop over the smaller dict
+        result = self.get_empty_dict()
+        for key in d.iterkeys():
+            if key in d_other:
+                result[key] = None
+        return self.erase(result)
+
+    def _intersect_wrapped(self, w_set, w_other):
+        result = self.get_empty_dict()
+        for key in self.unerase(w_set.sstorage).keys():
+            if w_other.has_key(self.wrap(key)):
+                result[key] = None
+        return self.erase(result)
+
+    def _intersect_base(self, w_set, w_other):
+        if self is w_other.strategy:
+            return self._intersect_unwrapped(w_set, w_other), self
+        elif not self.may_contain_equal_elements(w_other.strategy):
+            strategy = self.space.fromcache(EmptySetStrategy)
+            return strategy.get_empty_storage(), strategy
+        else:
+            return self._intersect_wrapped(w_set, w_other), self
+
+    def intersect(self, w_set, w_other):
+        storage, strategy = self._intersect_base(w_set, w_other)
+        return w_set.from_storage_and_strategy(storage, strategy)
+
+    def intersect_update(self, w_set, w_other):
+        storage, strategy = self._intersect_base(w_set, w_other)
+        w_set.strategy = strategy
+        w_set.sstorage = storage
+
+    def _issubset_unwrapped(self, w_set, w_other):
+        d_other = self.unerase(w_other.sstorage)
+        for key in self.unerase(w_set.sstorage).iterkeys():
+            if key not in d_other:
+                return False
+        return True
+
+    def _issubset_wrapped(self, w_set, w_other):
+        for key in self.unerase(w_set.sstorage).keys():
+            if not w_other.has_key(self.wrap(key)):
+                return False
+        return True
+
+    def issubset(self, w_set, w_other):
+        if self.length(w_set) == 0:
+            return True
+        if self.length(w_set) > w_other.length():
+            return False
+        if self is w_other.strategy:
+            return self._issubset_unwrapped(w_set, w_other)
+        elif not self.may_contain_equal_elements(w_other.strategy):
+            return False
+        else:
+            return self._issubset_wrapped(w_set, w_other)
+
+    def _isdisjoint_unwrapped(self, w_set, w_other):
+        d = self.unerase(w_set.sstorage)
+        d_other = self.unerase(w_other.sstorage)
+        if len(d) > len(d_other):
+            d, d_other = d_other, d     # loop over the smaller dict
+        for key in d.iterkeys():
+            if key in d_other:
+                return False
+        return True
+
+    def _isdisjoint_wrapped(self, w_set, w_other):
+        for key in self.unerase(w_set.sstorage).keys():
+            if w_other.has_key(self.wrap(key)):
+                return False
+        return True
+
+    def isdisjoint(self, w_set, w_other):
+        if w_other.length() == 0:
+            return True
+        if self is w_other.strategy:
+            return self._isdisjoint_unwrapped(w_set, w_other)
+        elif not self.may_contain_equal_elements(w_other.strategy):
+            return True
+        else:
+            return self._isdisjoint_wrapped(w_set, w_other)
+
+    def update(self, w_set, w_other):
+        if self is w_other.strategy:
+            d = self.unerase(w_set.sstorage)
+            d.update(self.unerase(w_other.sstorage))
+        elif w_other.length() == 0:
+            pass
+        else:
+            w_set.switch_to_object_strategy(self.space)
+            w_set.update(w_other)
+
+    def popitem(self, w_set):
+        d = self.unerase(w_set.sstorage)
+        try:
+            key, _ = d.popitem()
+        except KeyError:
+            raise OperationError(self.space.w_KeyError,
+                                    self.space.wrap('pop from an empty set'))
+        return self.wrap(key)
+
+
+class ObjectSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
+
+    erase, unerase = rerased.new_erasing_pair("object")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, unwrapped):
+        return unwrapped
+
+    def unwrap(self, wrapped):
+        return wrapped
 
-    def __init__(w_self, setdata):
-        w_self.content = content = setdata
-        w_self.len = len(content)
-        w_self.pos = 0
-        w_self.iterator = w_self.content.iterkeys()
+    def is_correct_type(self, w_key):
+        return True
+
+    def get_empty_dict(self):
+        return newset(self.space)
+
+    def _never_equal_to(self, w_lookup_type):
+        return False
+
+    def may_contain_equal_elements(self, strategy):
+        if strategy is self.space.fromcache(EmptySetStrategy):
+            return False
+        return True
+
+    def getdict_w(self, w_set):
+        return self.unerase(w_set.sstorage).copy()
+
+    def getkeys(self, w_set):
+        return self.unerase(w_set.sstorage).keys()
+
+    def update(self, w_set, w_other):
+        d = self.unerase(w_set.sstorage)
+        if self is w_other.strategy:
+            d.update(self.unerase(w_other.sstorage))
+        else:
+            for w_key in w_other.getkeys():
+                d[w_key] = None
+
+    def iter(self, w_set):
+        return ObjectIteratorImplementation(self.space, self, w_set)
+
+
+class IntegerSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
+
+    erase, unerase = rerased.new_erasing_pair("integer")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, unwrapped):
+        return self.space.wrap(unwrapped)
+
+    def unwrap(self, wrapped):
+        return self.space.int_w(wrapped)
+
+    def is_correct_type(self, w_key):
+        space = self.space
+        return space.is_w(space.type(w_key), space.w_int)
+
+    def get_empty_dict(self):
+        return {}
+
+    def _never_equal_to(self, w_lookup_type):
+        space = self.space
+        # XXX there are many more types
+        return (space.is_w(w_lookup_type, space.w_NoneType) or
+                space.is_w(w_lookup_type, space.w_str) or
+                space.is_w(w_lookup_type, space.w_unicode)
+                )
+
+    def may_contain_equal_elements(self, strategy):
+        space = self.space
+        if strategy is space.fromcache(StringSetStrategy):
+            return False
+        if strategy is space.fromcache(EmptySetStrategy):
+            return False
+        return True
+
+    def iter(self, w_set):
+        return IntegerIteratorImplementation(self.space, self, w_set)
+
+
+class StringSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
+
+    erase, unerase = rerased.new_erasing_pair("string")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, unwrapped):
+        return self.space.wrap(unwrapped)
+
+    def unwrap(self, wrapped):
+        return self.space.str_w(wrapped)
+
+    def is_correct_type(self, w_key):
+        space = self.space
+        return space.is_w(space.type(w_key), space.w_str)
+
+    def get_empty_dict(self):
+        res = {}
+        mark_dict_non_null(res)
+        return res
+
+    def _never_equal_to(self, w_lookup_type):
+        return _never_equal_to_string(self.space, w_lookup_type)
+
+    def may_contain_equal_elements(self, strategy):
+        space = self.space
+        if strategy is space.fromcache(IntegerSetStrategy):
+            return False
+        if strategy is space.fromcache(EmptySetStrategy):
+            return False
+        return True
+
+    def iter(self, w_set):
+        return StringIteratorImplementation(self.space, self, w_set)
+
+
+class IteratorImplementation(object):
+    def __init__(self, space, implementation):
+        self.space = space
+        self.setimplementation = implementation
+        self.len = implementation.length()
+        self.pos = 0
+
+    def next(self):
+        if self.setimplementation is None:
+            return None
+        if self.len != self.setimplementation.length():
+            self.len = -1   # Make this error state sticky
+            raise OperationError(self.space.w_RuntimeError,
+                     self.space.wrap("Set changed size during iteration"))
+        # look for the next entry
+        if self.pos < self.len:
+            result = self.next_entry()
+            self.pos += 1
+            return result
+        # no more entries
+        self.setimplementation = None
+        return None
+
+    def next_entry(self):
+        """ Purely abstract method
+        """
+        raise NotImplementedError
+
+    def length(self):
+        if self.setimplementation is not None:
+            return self.len - self.pos
+        return 0
+
+class EmptyIteratorImplementation(IteratorImplementation):
+    def next_entry(self):
+        return None
+
+class _WrappedIteratorMixin(object):
+    _mixin_ = True
+
+    def __init__(self, space, strategy, w_set):
+        IteratorImplementation.__init__(self, space, w_set)
+        self.iterator = strategy.unerase(w_set.sstorage).iterkeys()
+
+    def next_entry(self):
+        # note that this 'for' loop only runs once, at most
+        for key in self.iterator:
+            return self.space.wrap(key)
+        else:
+            return None
+
+class IntegerIteratorImplementation(_WrappedIteratorMixin,
+                                    IteratorImplementation):
+    pass
+
+class StringIteratorImplementation(_WrappedIteratorMixin,
+                                   IteratorImplementation):
+    pass
+
+class ObjectIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, strategy, w_set):
+        IteratorImplementation.__init__(self, space, w_set)
+        self.iterator = strategy.unerase(w_set.sstorage).iterkeys()
 
-    def next_entry(w_self):
-        for w_key in w_self.iterator:
+    def next_entry(self):
+        # note that this 'for' loop only runs once, at most
+        for w_key in self.iterator:
             return w_key
         else:
             return None
 
+
+class W_SetIterObject(W_Object):
+    from pypy.objspace.std.settype import setiter_typedef as typedef
+
+    def __init__(w_self, space, iterimplementation):
+        w_self.space = space
+        w_self.iterimplementation = iterimplementation
+
 registerimplementation(W_SetIterObject)
 
 def iter__SetIterObject(space, w_setiter):
     return w_setiter
 
 def next__SetIterObject(space, w_setiter):
-    content = w_setiter.content
-    if content is not None:
-        if w_setiter.len != len(content):
-            w_setiter.len = -1   # Make this error state sticky
-            raise OperationError(space.w_RuntimeError,
-                     space.wrap("Set changed size during iteration"))
-        # look for the next entry
-        w_result = w_setiter.next_entry()
-        if w_result is not None:
-            w_setiter.pos += 1
-            return w_result
-        # no more entries
-        w_setiter.content = None
+    iterimplementation = w_setiter.iterimplementation
+    w_key = iterimplementation.next()
+    if w_key is not None:
+        return w_key
     raise OperationError(space.w_StopIteration, space.w_None)
 
 # XXX __length_hint__()
 ##def len__SetIterObject(space, w_setiter):
-##    content = w_setiter.content
-##    if content is None or w_setiter.len == -1:
-##        return space.wrap(0)
-##    return space.wrap(w_setiter.len - w_setiter.pos)
+##    return space.wrap(w_setiter.iterimplementation.length())
 
 # some helper functions
 
 def newset(space):
     return r_dict(space.eq_w, space.hash_w, force_non_null=True)
 
-def make_setdata_from_w_iterable(space, w_iterable=None):
-    """Return a new r_dict with the content of w_iterable."""
+def set_strategy_and_setdata(space, w_set, w_iterable):
+    if w_iterable is None:
+        w_set.strategy = strategy = space.fromcache(EmptySetStrategy)
+        w_set.sstorage = strategy.get_empty_storage()
+        return
+
     if isinstance(w_iterable, W_BaseSetObject):
-        return w_iterable.setdata.copy()
-    data = newset(space)
-    if w_iterable is not None:
-        for w_item in space.listview(w_iterable):
-            data[w_item] = None
-    return data
+        w_set.strategy = w_iterable.strategy
+        w_set.sstorage = w_iterable.get_storage_copy()
+        return
+
+    # lists of ints or strings can be turned into sets without wrapping
+    # and unwrapping every item
+    intlist = space.listview_int(w_iterable)
+    if intlist is not None:
+        w_set.strategy = strategy = space.fromcache(IntegerSetStrategy)
+        w_set.sstorage = strategy.get_storage_from_unwrapped_list(intlist)
+        return
+
+    stringlist = space.listview_str(w_iterable)
+    if stringlist is not None:
+        w_set.strategy = strategy = space.fromcache(StringSetStrategy)
+        w_set.sstorage = strategy.get_storage_from_unwrapped_list(stringlist)
+        return
+
+    iterable_w = space.listview(w_iterable)
+    if len(iterable_w) == 0:
+        w_set.strategy = strategy = space.fromcache(EmptySetStrategy)
+        w_set.sstorage = strategy.get_empty_storage()
+        return
+
+    _pick_correct_strategy(space, w_set, iterable_w)
+
+def _pick_correct_strategy(space, w_set, iterable_w):
+    # check for integers
+    strategy = space.fromcache(IntegerSetStrategy)
+    for w_item in iterable_w:
+        if not strategy.is_correct_type(w_item):
+            break
+    else:
+        w_set.strategy = strategy
+        w_set.sstorage = strategy.get_storage_from_list(iterable_w)
+        return
+
+    # check for strings
+    strategy = space.fromcache(StringSetStrategy)
+    for w_item in iterable_w:
+        if not strategy.is_correct_type(w_item):
+            break
+    else:
+        w_set.strategy = strategy
+        w_set.sstorage = strategy.get_storage_from_list(iterable_w)
+        return
+
+    strategy = space.fromcache(ObjectSetStrategy)
+    w_set.strategy = strategy
+    w_set.sstorage = strategy.get_storage_from_list(iterable_w)
 
 def _initialize_set(space, w_obj, w_iterable=None):
-    w_obj.setdata.clear()
-    if w_iterable is not None:
-        w_obj.setdata = make_setdata_from_w_iterable(space, w_iterable)
+    w_obj.clear()
+    set_strategy_and_setdata(space, w_obj, w_iterable)
 
 def _convert_set_to_frozenset(space, w_obj):
     if space.is_true(space.isinstance(w_obj, space.w_set)):
-        return W_FrozensetObject(space,
-                                 make_setdata_from_w_iterable(space, w_obj))
+        assert isinstance(w_obj, W_BaseSetObject)
+        return W_FrozensetObject(space, w_obj)
     else:
         return None
 
-# helper functions for set operation on dicts
-
-def _is_eq(ld, rd):
-    if len(ld) != len(rd):
-        return False
-    for w_key in ld:
-        if w_key not in rd:
-            return False
-    return True
-
-def _difference_dict(space, ld, rd):
-    result = newset(space)
-    for w_key in ld:
-        if w_key not in rd:
-            result[w_key] = None
-    return result
-
-def _difference_dict_update(space, ld, rd):
-    if ld is rd:
-        ld.clear()     # for the case 'a.difference_update(a)'
-    else:
-        for w_key in rd:
-            try:
-                del ld[w_key]
-            except KeyError:
-                pass
-
-def _intersection_dict(space, ld, rd):
-    result = newset(space)
-    if len(ld) > len(rd):
-        ld, rd = rd, ld     # loop over the smaller dict
-    for w_key in ld:
-        if w_key in rd:
-            result[w_key] = None
-    return result
-
-def _isdisjoint_dict(ld, rd):
-    if len(ld) > len(rd):
-        ld, rd = rd, ld     # loop over the smaller dict
-    for w_key in ld:
-        if w_key in rd:
-            return False
-    return True
-
-def _symmetric_difference_dict(space, ld, rd):
-    result = newset(space)
-    for w_key in ld:
-        if w_key not in rd:
-            result[w_key] = None
-    for w_key in rd:
-        if w_key not in ld:
-            result[w_key] = None
-    return result
-
-def _issubset_dict(ldict, rdict):
-    if len(ldict) > len(rdict):
-        return False
-
-    for w_key in ldict:
-        if w_key not in rdict:
-            return False
-    return True
-
-
 #end helper functions
 
 def set_update__Set(space, w_left, others_w):
     """Update a set with the union of itself and another."""
-    ld = w_left.setdata
     for w_other in others_w:
         if isinstance(w_other, W_BaseSetObject):
-            ld.update(w_other.setdata)     # optimization only
+            w_left.update(w_other)     # optimization only
         else:
             for w_key in space.listview(w_other):
-                ld[w_key] = None
+                w_left.add(w_key)
 
 def inplace_or__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    ld.update(rd)
+    w_left.update(w_other)
     return w_left
 
 inplace_or__Set_Frozenset = inplace_or__Set_Set
@@ -226,10 +833,10 @@ def set_add__Set_ANY(space, w_left, w_other):
 
     This has no effect if the element is already present.
     """
-    w_left.setdata[w_other] = None
+    w_left.add(w_other)
 
 def set_copy__Set(space, w_set):
-    return w_set._newobj(space, w_set.setdata.copy())
+    return w_set.copy_real()
 
 def frozenset_copy__Frozenset(space, w_left):
     if type(w_left) is W_FrozensetObject:
@@ -238,63 +845,49 @@ def frozenset_copy__Frozenset(space, w_left):
         return set_copy__Set(space, w_left)
 
 def set_clear__Set(space, w_left):
-    w_left.setdata.clear()
+    w_left.clear()
 
 def sub__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    new_ld = _difference_dict(space, ld, rd)
-    return w_left._newobj(space, new_ld)
+    return w_left.difference(w_other)
 
 sub__Set_Frozenset = sub__Set_Set
 sub__Frozenset_Set = sub__Set_Set
 sub__Frozenset_Frozenset = sub__Set_Set
 
 def set_difference__Set(space, w_left, others_w):
-    result = w_left.setdata
-    if len(others_w) == 0:
-        result = result.copy()
-    for w_other in others_w:
-        if isinstance(w_other, W_BaseSetObject):
-            rd = w_other.setdata     # optimization only
-        else:
-            rd = make_setdata_from_w_iterable(space, w_other)
-        result = _difference_dict(space, result, rd)
-    return w_left._newobj(space, result)
+    result = w_left.copy_real()
+    set_difference_update__Set(space, result, others_w)
+    return result
 
 frozenset_difference__Frozenset = set_difference__Set
 
 
 def set_difference_update__Set(space, w_left, others_w):
-    ld = w_left.setdata
     for w_other in others_w:
         if isinstance(w_other, W_BaseSetObject):
             # optimization only
-            _difference_dict_update(space, ld, w_other.setdata)
+            w_left.difference_update(w_other)
         else:
             for w_key in space.listview(w_other):
-                try:
-                    del ld[w_key]
-                except KeyError:
-                    pass
+                w_left.remove(w_key)
 
 def inplace_sub__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    _difference_dict_update(space, ld, rd)
+    w_left.difference_update(w_other)
     return w_left
 
 inplace_sub__Set_Frozenset = inplace_sub__Set_Set
 
 def eq__Set_Set(space, w_left, w_other):
     # optimization only (the general case is eq__Set_settypedef)
-    return space.wrap(_is_eq(w_left.setdata, w_other.setdata))
+    return space.wrap(w_left.equals(w_other))
 
 eq__Set_Frozenset = eq__Set_Set
 eq__Frozenset_Frozenset = eq__Set_Set
 eq__Frozenset_Set = eq__Set_Set
 
 def eq__Set_settypedef(space, w_left, w_other):
-    rd = make_setdata_from_w_iterable(space, w_other)
-    return space.wrap(_is_eq(w_left.setdata, rd))
+    w_other_as_set = W_SetObject(space, w_other)
+    return space.wrap(w_left.equals(w_other_as_set))
 
 eq__Set_frozensettypedef = eq__Set_settypedef
 eq__Frozenset_settypedef = eq__Set_settypedef
@@ -308,15 +901,15 @@ def eq__Set_ANY(space, w_left, w_other):
 eq__Frozenset_ANY = eq__Set_ANY
 
 def ne__Set_Set(space, w_left, w_other):
-    return space.wrap(not _is_eq(w_left.setdata, w_other.setdata))
+    return space.wrap(not w_left.equals(w_other))
 
 ne__Set_Frozenset = ne__Set_Set
 ne__Frozenset_Frozenset = ne__Set_Set
 ne__Frozenset_Set = ne__Set_Set
 
 def ne__Set_settypedef(space, w_left, w_other):
-    rd = make_setdata_from_w_iterable(space, w_other)
-    return space.wrap(not _is_eq(w_left.setdata, rd))
+    w_other_as_set = W_SetObject(space, w_other)
+    return space.wrap(not w_left.equals(w_other_as_set))
 
 ne__Set_frozensettypedef = ne__Set_settypedef
 ne__Frozenset_settypedef = ne__Set_settypedef
@@ -331,12 +924,12 @@ ne__Frozenset_ANY = ne__Set_ANY
 
 def contains__Set_ANY(space, w_left, w_other):
     try:
-        return space.newbool(w_other in w_left.setdata)
+        return space.newbool(w_left.has_key(w_other))
     except OperationError, e:
         if e.match(space, space.w_TypeError):
             w_f = _convert_set_to_frozenset(space, w_other)
             if w_f is not None:
-                return space.newbool(w_f in w_left.setdata)
+                return space.newbool(w_left.has_key(w_f))
         raise
 
 contains__Frozenset_ANY = contains__Set_ANY
@@ -345,8 +938,7 @@ def set_issubset__Set_Set(space, w_left, w_other):
     # optimization only (the general case works too)
     if space.is_w(w_left, w_other):
         return space.w_True
-    ld, rd = w_left.setdata, w_other.setdata
-    return space.wrap(_issubset_dict(ld, rd))
+    return space.wrap(w_left.issubset(w_other))
 
 set_issubset__Set_Frozenset = set_issubset__Set_Set
 frozenset_issubset__Frozenset_Set = set_issubset__Set_Set
@@ -356,8 +948,8 @@ def set_issubset__Set_ANY(space, w_left, w_other):
     if space.is_w(w_left, w_other):
         return space.w_True
 
-    ld, rd = w_left.setdata, make_setdata_from_w_iterable(space, w_other)
-    return space.wrap(_issubset_dict(ld, rd))
+    w_other_as_set = W_SetObject(space, w_other)
+    return space.wrap(w_left.issubset(w_other_as_set))
 
 frozenset_issubset__Frozenset_ANY = set_issubset__Set_ANY
 
@@ -370,9 +962,7 @@ def set_issuperset__Set_Set(space, w_left, w_other):
     # optimization only (the general case works too)
     if space.is_w(w_left, w_other):
         return space.w_True
-
-    ld, rd = w_left.setdata, w_other.setdata
-    return space.wrap(_issubset_dict(rd, ld))
+    return space.wrap(w_other.issubset(w_left))
 
 set_issuperset__Set_Frozenset = set_issuperset__Set_Set
 set_issuperset__Frozenset_Set = set_issuperset__Set_Set
@@ -382,8 +972,8 @@ def set_issuperset__Set_ANY(space, w_left, w_other):
     if space.is_w(w_left, w_other):
         return space.w_True
 
-    ld, rd = w_left.setdata, make_setdata_from_w_iterable(space, w_other)
-    return space.wrap(_issubset_dict(rd, ld))
+    w_other_as_set = W_SetObject(space, w_other)
+    return space.wrap(w_other_as_set.issubset(w_left))
 
 frozenset_issuperset__Frozenset_ANY = set_issuperset__Set_ANY
 
@@ -395,7 +985,7 @@ ge__Frozenset_Frozenset = set_issuperset__Set_Set
 # automatic registration of "lt(x, y)" as "not ge(y, x)" would not give the
 # correct answer here!
 def lt__Set_Set(space, w_left, w_other):
-    if len(w_left.setdata) >= len(w_other.setdata):
+    if w_left.length() >= w_other.length():
         return space.w_False
     else:
         return le__Set_Set(space, w_left, w_other)
@@ -405,7 +995,7 @@ lt__Frozenset_Set = lt__Set_Set
 lt__Frozenset_Frozenset = lt__Set_Set
 
 def gt__Set_Set(space, w_left, w_other):
-    if len(w_left.setdata) <= len(w_other.setdata):
+    if w_left.length() <= w_other.length():
         return space.w_False
     else:
         return ge__Set_Set(space, w_left, w_other)
@@ -421,10 +1011,7 @@ def _discard_from_set(space, w_left, w_item):
     Returns True if successfully removed.
     """
     try:
-        del w_left.setdata[w_item]
-        return True
-    except KeyError:
-        return False
+        return w_left.remove(w_item)
     except OperationError, e:
         if not e.match(space, space.w_TypeError):
             raise
@@ -433,10 +1020,7 @@ def _discard_from_set(space, w_left, w_item):
             raise
 
     try:
-        del w_left.setdata[w_f]
-        return True
-    except KeyError:
-        return False
+        return w_left.remove(w_f)
     except OperationError, e:
         if not e.match(space, space.w_TypeError):
             raise
@@ -454,8 +1038,12 @@ def hash__Frozenset(space, w_set):
     if w_set.hash != 0:
         return space.wrap(w_set.hash)
     hash = 1927868237
-    hash *= (len(w_set.setdata) + 1)
-    for w_item in w_set.setdata:
+    hash *= (w_set.length() + 1)
+    iterimplementation = w_set.iter()
+    while True:
+        w_item = iterimplementation.next_entry()
+        if w_item is None:
+            break
         h = space.hash_w(w_item)
         value = ((h ^ (h << 16) ^ 89869747)  * multi)
         hash = intmask(hash ^ value)
@@ -468,71 +1056,56 @@ def hash__Frozenset(space, w_set):
     return space.wrap(hash)
 
 def set_pop__Set(space, w_left):
-    try:
-        w_key, _ = w_left.setdata.popitem()
-    except KeyError:
-        raise OperationError(space.w_KeyError,
-                                space.wrap('pop from an empty set'))
-    return w_key
+    return w_left.popitem()
 
 def and__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    new_ld = _intersection_dict(space, ld, rd)
-    return w_left._newobj(space, new_ld)
+    return w_left.intersect(w_other)
 
 and__Set_Frozenset = and__Set_Set
 and__Frozenset_Set = and__Set_Set
 and__Frozenset_Frozenset = and__Set_Set
 
 def _intersection_multiple(space, w_left, others_w):
-    result = w_left.setdata
+    result = w_left
     for w_other in others_w:
         if isinstance(w_other, W_BaseSetObject):
             # optimization only
-            result = _intersection_dict(space, result, w_other.setdata)
+            result = result.intersect(w_other)
         else:
-            result2 = newset(space)
-            for w_key in space.listview(w_other):
-                if w_key in result:
-                    result2[w_key] = None
-            result = result2
+            w_other_as_set = W_SetObject(space, w_other)
+            result = result.intersect(w_other_as_set)
     return result
 
 def set_intersection__Set(space, w_left, others_w):
     if len(others_w) == 0:
-        result = w_left.setdata.copy()
+        return w_left.copy_real()
     else:
-        result = _intersection_multiple(space, w_left, others_w)
-    return w_left._newobj(space, result)
+        return _intersection_multiple(space, w_left, others_w)
 
 frozenset_intersection__Frozenset = set_intersection__Set
 
 def set_intersection_update__Set(space, w_left, others_w):
     result = _intersection_multiple(space, w_left, others_w)
-    w_left.setdata = result
+    w_left.strategy = result.strategy
+    w_left.sstorage = result.sstorage
 
 def inplace_and__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    new_ld = _intersection_dict(space, ld, rd)
-    w_left.setdata = new_ld
+    w_left.intersect_update(w_other)
     return w_left
 
 inplace_and__Set_Frozenset = inplace_and__Set_Set
 
 def set_isdisjoint__Set_Set(space, w_left, w_other):
     # optimization only (the general case works too)
-    ld, rd = w_left.setdata, w_other.setdata
-    disjoint = _isdisjoint_dict(ld, rd)
-    return space.newbool(disjoint)
+    return space.newbool(w_left.isdisjoint(w_other))
 
 set_isdisjoint__Set_Frozenset = set_isdisjoint__Set_Set
 set_isdisjoint__Frozenset_Frozenset = set_isdisjoint__Set_Set
 set_isdisjoint__Frozenset_Set = set_isdisjoint__Set_Set
 
 def set_isdisjoint__Set_ANY(space, w_left, w_other):
-    ld = w_left.setdata
     for w_key in space.listview(w_other):
-        if w_key in ld:
+        if w_left.has_key(w_key):
             return space.w_False
     return space.w_True
 
@@ -540,9 +1113,7 @@ frozenset_isdisjoint__Frozenset_ANY = set_isdisjoint__Set_ANY
 
 def set_symmetric_difference__Set_Set(space, w_left, w_other):
     # optimization only (the general case works too)
-    ld, rd = w_left.setdata, w_other.setdata
-    new_ld = _symmetric_difference_dict(space, ld, rd)
-    return w_left._newobj(space, new_ld)
+    return w_left.symmetric_difference(w_other)
 
 set_symmetric_difference__Set_Frozenset = set_symmetric_difference__Set_Set
 set_symmetric_difference__Frozenset_Set = set_symmetric_difference__Set_Set
@@ -556,26 +1127,22 @@ xor__Frozenset_Frozenset = set_symmetric_difference__Set_Set
 
 
 def set_symmetric_difference__Set_ANY(space, w_left, w_other):
-    ld, rd = w_left.setdata, make_setdata_from_w_iterable(space, w_other)
-    new_ld = _symmetric_difference_dict(space, ld, rd)
-    return w_left._newobj(space, new_ld)
+    w_other_as_set = W_SetObject(space, w_other)
+    return w_left.symmetric_difference(w_other_as_set)
 
 frozenset_symmetric_difference__Frozenset_ANY = \
         set_symmetric_difference__Set_ANY
 
 def set_symmetric_difference_update__Set_Set(space, w_left, w_other):
     # optimization only (the general case works too)
-    ld, rd = w_left.setdata, w_other.setdata
-    new_ld = _symmetric_difference_dict(space, ld, rd)
-    w_left.setdata = new_ld
+    w_left.symmetric_difference_update(w_other)
 
 set_symmetric_difference_update__Set_Frozenset = \
                                     set_symmetric_difference_update__Set_Set
 
 def set_symmetric_difference_update__Set_ANY(space, w_left, w_other):
-    ld, rd = w_left.setdata, make_setdata_from_w_iterable(space, w_other)
-    new_ld = _symmetric_difference_dict(space, ld, rd)
-    w_left.setdata = new_ld
+    w_other_as_set = W_SetObject(space, w_other)
+    w_left.symmetric_difference_update(w_other_as_set)
 
 def inplace_xor__Set_Set(space, w_left, w_other):
     set_symmetric_difference_update__Set_Set(space, w_left, w_other)
@@ -584,34 +1151,33 @@ def inplace_xor__Set_Set(space, w_left, w_other):
 inplace_xor__Set_Frozenset = inplace_xor__Set_Set
 
 def or__Set_Set(space, w_left, w_other):
-    ld, rd = w_left.setdata, w_other.setdata
-    result = ld.copy()
-    result.update(rd)
-    return w_left._newobj(space, result)
+    w_copy = w_left.copy_real()
+    w_copy.update(w_other)
+    return w_copy
 
 or__Set_Frozenset = or__Set_Set
 or__Frozenset_Set = or__Set_Set
 or__Frozenset_Frozenset = or__Set_Set
 
 def set_union__Set(space, w_left, others_w):
-    result = w_left.setdata.copy()
+    result = w_left.copy_real()
     for w_other in others_w:
         if isinstance(w_other, W_BaseSetObject):
-            result.update(w_other.setdata)     # optimization only
+            result.update(w_other)     # optimization only
         else:
             for w_key in space.listview(w_other):
-                result[w_key] = None
-    return w_left._newobj(space, result)
+                result.add(w_key)
+    return result
 
 frozenset_union__Frozenset = set_union__Set
 
 def len__Set(space, w_left):
-    return space.newint(len(w_left.setdata))
+    return space.newint(w_left.length())
 
 len__Frozenset = len__Set
 
 def iter__Set(space, w_left):
-    return W_SetIterObject(w_left.setdata)
+    return W_SetIterObject(space, w_left.iter())
 
 iter__Frozenset = iter__Set
 
@@ -0,0 +1,232 @@
+from pypy.interpreter.error import OperationError
+from pypy.objspace.std.model import registerimplementation, W_Object
+from pypy.objspace.std.register_all import register_all
+from pypy.objspace.std.multimethod import FailedToImplement
+from pypy.objspace.std.tupleobject import W_TupleObject
+from pypy.objspace.std.sliceobject import W_SliceObject
+from pypy.objspace.std.floatobject import _hash_float
+from pypy.objspace.std.listobject import is_W_IntObject, is_W_FloatObject
+from pypy.rlib.rarithmetic import intmask
+from pypy.rlib.rfloat import isnan
+from pypy.rlib.unroll import unrolling_iterable
+
+class W_SpecialisedTupleObject(W_Object):
+    """ Base class of the tuples of length 2 or 3 whose items are all
+    ints or floats.  The items are stored unboxed, and the hash is cached. """
+    from pypy.objspace.std.tupletype import tuple_typedef as typedef
+
+    def __repr__(self):
+        """ representation for debugging purposes """
+        reprlist = [repr(value) for value in self.values()]
+        return "%s(%s)" % (self.__class__.__name__, ', '.join(reprlist))
+
+    def values(self):
+        raise NotImplementedError   # for debugging and tests only
+
+    def tolist(self, space):
+        raise NotImplementedError
+
+    def length(self):
+        raise NotImplementedError
+
+    def getitem(self, space, index):
+        raise NotImplementedError
+
+    def hash(self, space):
+        raise NotImplementedError
+
+    def eq(self, space, w_other):
+        raise NotImplementedError
+
+    def unwrap(self, space):
+        return tuple(self.values())
+
+
+def _make_value_wrapper(i, typ):
+    attr = 'value%s' % i
+    def wrap_value(self, space):
+        value = getattr(self, attr)
+        if typ is int:
+            return space.newint(value)
+        return space.newfloat(value)
+    return wrap_value
+
+def make_specialised_class(typetuple):
+    iter_n = unrolling_iterable(range(len(typetuple)))
+    iter_wrappers = unrolling_iterable(
+        [(i, _make_value_wrapper(i, typ)) for i, typ in enumerate(typetuple)])
+    n = len(typetuple)
+
+    class cls(W_SpecialisedTupleObject):
+        _immutable_fields_ = ['value%s' % i for i in range(n)]
+        # the hash is computed lazily; 0 means "not computed yet"
+        _hash_cache = 0
+
+        def __init__(self, space, list_w):
+            assert len(list_w) == n
+            for i in iter_n:
+                if typetuple[i] is int:
+                    value = space.int_w(list_w[i])
+                else:
+                    value = space.float_w(list_w[i])
+                setattr(self, 'value%s' % i, value)
+
+        def values(self):
+            return [getattr(self, 'value%s' % i) for i in range(n)]
+
+        def length(self):
+            return n
+
+        def tolist(self, space):
+            list_w = [None] * n
+            for i, wrap_value in iter_wrappers:
+                list_w[i] = wrap_value(self, space)
+            return list_w
+
+        def getitem(self, space, index):
+            for i, wrap_value in iter_wrappers:
+                if index == i:
+                    return wrap_value(self, space)
+            raise IndexError
+
+        def _compute_hash(self, space):
+            # must give the same result as tupleobject.hash_tuple()
+            mult = 1000003
+            x = 0x345678
+            z = n
+            for i in iter_n:
+                value = getattr(self, 'value%s' % i)
+                if typetuple[i] is int:
+                    y = value
+                else:
+                    y = _hash_float(space, value)
+                x = (x ^ y) * mult
+                z -= 1
+                mult += 82520 + z + z
+            x += 97531
+            return intmask(x)
+
+        def hash(self, space):
+            x = self._hash_cache
+            if x == 0:
+                x = self._compute_hash(space)
+                self._hash_cache = x
+            return space.newint(x)
+
+        def eq(self, space, w_other):
+            if w_other.length() != n:
+                return space.w_False
+            if isinstance(w_other, cls):
+                # same item types: compare the unboxed values directly
+                for i in iter_n:
+                    if (getattr(self, 'value%s' % i) !=
+                        getattr(w_other, 'value%s' % i)):
+                        return space.w_False
+                return space.w_True
+            for i, wrap_value in iter_wrappers:
+                w_item1 = wrap_value(self, space)
+                w_item2 = w_other.getitem(space, i)
+                if not space.eq_w(w_item1, w_item2):
+                    return space.w_False
+            return space.w_True
+
+    names = [typ.__name__ for typ in typetuple]
+    cls.__name__ = 'W_SpecialisedTupleObject_' + '_'.join(names)
+    cls.typetuple = typetuple
+    return cls
+
+def _make_all_classes():
+    result = []
+    for n in [2, 3]:
+        typetuples = [()]
+        for i in range(n):
+            typetuples = [t + (typ,) for t in typetuples
+                                     for typ in (int, float)]
+        for typetuple in typetuples:
+            result.append(make_specialised_class(typetuple))
+    return result
+
+specialised_classes = _make_all_classes()
+unrolling_specialised_classes = unrolling_iterable(
+    [(cls, sum([(typ is float) << i for i, typ in enumerate(cls.typetuple)]))
+     for cls in specialised_classes])
+
+def makespecialisedtuple(space, list_w):
+    """ Returns a specialised tuple for the items in list_w, or None if
+    they are not all ints and floats. """
+    n = len(list_w)
+    if n != 2 and n != 3:
+        return None
+    # compute a bit mask with the bits set for the floats
+    floatmask = 0
+    for i in range(n):
+        w_item = list_w[i]
+        if is_W_FloatObject(w_item):
+            if isnan(space.float_w(w_item)):
+                # tuples compare their items by identity first, which
+                # matters for NaNs: keep them boxed
+                return None
+            floatmask |= 1 << i
+        elif not is_W_IntObject(w_item):
+            return None
+    for cls, clsfloatmask in unrolling_specialised_classes:
+        if len(cls.typetuple) == n and clsfloatmask == floatmask:
+            return cls(space, list_w)
+    return None
+
+# ____________________________________________________________
+
+registerimplementation(W_SpecialisedTupleObject)
+
+def delegate_SpecialisedTuple2Tuple(space, w_specialised):
+    return W_TupleObject(w_specialised.tolist(space))
+
+def len__SpecialisedTuple(space, w_tuple):
+    return space.wrap(w_tuple.length())
+
+def getitem__SpecialisedTuple_ANY(space, w_tuple, w_index):
+    index = space.getindex_w(w_index, space.w_IndexError, "tuple index")
+    if index < 0:
+        index += w_tuple.length()
+    try:
+        return w_tuple.getitem(space, index)
+    except IndexError:
+        raise OperationError(space.w_IndexError,
+                             space.wrap("tuple index out of range"))
+
+def getitem__SpecialisedTuple_Slice(space, w_tuple, w_slice):
+    length = w_tuple.length()
+    start, stop, step, slicelength = w_slice.indices4(space, length)
+    assert slicelength >= 0
+    subitems = [None] * slicelength
+    for i in range(slicelength):
+        subitems[i] = w_tuple.getitem(space, start)
+        start += step
+    return space.newtuple(subitems)
+
+def mul_specialisedtuple_times(space, w_tuple, w_times):
+    try:
+        times = space.getindex_w(w_times, space.w_OverflowError)
+    except OperationError, e:
+        if e.match(space, space.w_TypeError):
+            raise FailedToImplement
+        raise
+    if times == 1 and space.type(w_tuple) == space.w_tuple:
+        return w_tuple
+    items = w_tuple.tolist(space)
+    return space.newtuple(items * times)
+
+def mul__SpecialisedTuple_ANY(space, w_tuple, w_times):
+    return mul_specialisedtuple_times(space, w_tuple, w_times)
+
+def mul__ANY_SpecialisedTuple(space, w_times, w_tuple):
+    return mul_specialisedtuple_times(space, w_tuple, w_times)
+
+def eq__SpecialisedTuple_SpecialisedTuple(space, w_tuple1, w_tuple2):
+    return w_tuple1.eq(space, w_tuple2)
+
+def hash__SpecialisedTuple(space, w_tuple):
+    return w_tuple.hash(space)
+
+from pypy.objspace.std import tupletype
+register_all(vars(), tupletype)
@@ -316,6 +316,11 @@ class AppTestBytesArray:
         assert isinstance(b, bytearray)
         raises(TypeError, b.__iadd__, u"")
 
+    def test_join_mixed(self):
+        assert bytearray(', ').join([bytearray('a'), 'b', bytearray()]) == 'a, b, '
+        assert bytearray('').join(['ab', bytearray('cd')]) == 'abcd'
+        raises(TypeError, bytearray('').join, ['ab', 1])
+
     def test_add(self):
         b1 = bytearray("abc")
         b2 = bytearray("def")
@@ -427,6 +432,35 @@ class AppTestBytesArray:
         buf[4:6] = 'EF'
         assert b == 'abcDEFghi'
 
+    def test_buffer_slices(self):
+        b = bytearray('abcdefghi')
+        buf = buffer(b)
+        assert buf[2:5] == 'cde'
+        assert buf[::2] == 'acegi'
+        assert str(buf) == 'abcdefghi'
+        buf = buffer(b, 3, 4)
+        buf[1:3] = 'XY'
+        assert b == 'abcdXYghi'
+        assert buf[:] == 'dXYg'
+
+    def test_buffer_follows_resizing(self):
+        b = bytearray('abc')
+        buf = buffer(b)
+        b.extend('def')
+        b *= 2
+        assert len(buf) == 12
+        buf[6:9] = 'xyz'
+        assert b == 'abcdefxyzdef'
+        b.__init__('12')
+        assert str(buf) == '12'
+
+    def test_pack_into(self):
+        import struct
+        b = bytearray(8)
+        struct.pack_into('!HI', b, 1, 0x4142, 0x43444546)
+        assert b == '\x00ABCDEF\x00'
+        assert struct.unpack_from('!H', b, 3) == (0x4344,)
+
     def test_decode(self):
         b = bytearray('abcdefghi')
         u = b.decode('utf-8')
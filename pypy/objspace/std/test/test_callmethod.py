@@ -122,6 +122,11 @@ class AppTestCallMethodWithGetattributeShortcut(AppTestCallMethod):
     OPTIONS["objspace.std.getattributeshortcut"] = True
 
 
+class AppTestCallMethodWithCellCache(AppTestCallMethod):
+    OPTIONS = AppTestCallMethod.OPTIONS.copy()
+    OPTIONS["objspace.std.withcellcache"] = True
+
+
 class TestCallMethod:
 
     def setup_class(cls):
@@ -67,4 +67,162 @@ class AppTestCellDict(object):
         d["a"] = 3
         del d["a"]
         d[object()] = 5
-        assert d.values() == [5]
\ No newline at end of file
+        assert d.values() == [5]
+
+class TestCellCaching(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withcellcache": True})
+
+    def test_globals_cache_filled(self):
+        space = self.space
+        w_f = space.appexec([], """():
+            import types
+            d = types.ModuleType('m').__dict__
+            exec "x = 42\\ndef f():\\n    return x + len([])\\n" in d
+            return d['f']
+        """)
+        code = w_f.code
+        assert space.int_w(space.call_function(w_f)) == 42
+        entry_x = code._globals_caches[code.co_names.index('x')]
+        entry_len = code._globals_caches[code.co_names.index('len')]
+        assert space.int_w(entry_x.cell.w_value) == 42
+        assert entry_len.cell.w_value is None
+        assert entry_len.builtins_cell.w_value is not None
+
+    def test_module_attr_cache_filled(self):
+        space = self.space
+        w_f = space.appexec([], """():
+            import sys
+            def f():
+                return sys.maxint
+            return f
+        """)
+        code = w_f.code
+        w_res = space.call_function(w_f)
+        entry = code._module_attr_caches[code.co_names.index('maxint')]
+        assert entry.cell.w_value is w_res
+        assert entry.version_tag is not None
+
+
+class AppTestCellCaching(object):
+    OPTIONS = {"objspace.std.withcellcache": True,
+               "objspace.opcodes.CALL_METHOD": True}
+
+    def test_global_changes(self):
+        import types
+        d = types.ModuleType('m').__dict__
+        exec """if 1:
+            def f():
+                return x
+        """ in d
+        for i in range(5):
+            d['x'] = i
+            assert d['f']() == i
+        del d['x']
+        raises(NameError, d['f'])
+
+    def test_builtin_shadowed(self):
+        # the same code object with different globals
+        import types
+        code = compile("len('ab')", "<string>", "eval")
+        d1 = types.ModuleType('m1').__dict__
+        d2 = types.ModuleType('m2').__dict__
+        d2['len'] = lambda x: 5
+        assert eval(code, d1) == 2
+        assert eval(code, d2) == 5
+        assert eval(code, d1) == 2
+        assert eval(code, {}) == 2
+        assert eval(code, d2) == 5
+
+    def test_exec_results(self):
+        import types
+        d = types.ModuleType('m').__dict__
+        exec """if 1:
+            def f(x):
+                return len(x)
+            results = [f('abc')]
+            len = lambda x: 42
+            results.append(f('abc'))
+            del len
+            results.append(f('abc'))
+        """ in d
+        assert d['results'] == [3, 42, 3]
+
+    def test_degenerated_globals(self):
+        import types
+        d = types.ModuleType('m').__dict__
+        exec """if 1:
+            x = 5
+            def f():
+                return x
+        """ in d
+        assert d['f']() == 5
+        d[1] = 2     # the dict no longer uses cells
+        d['x'] = 6
+        assert d['f']() == 6
+        del d['x']
+        raises(NameError, d['f'])
+
+    def test_builtin_changes(self):
+        import types, __builtin__
+        d = types.ModuleType('m').__dict__
+        exec """if 1:
+            def f():
+                return some_new_builtin
+        """ in d
+        raises(NameError, d['f'])
+        __builtin__.some_new_builtin = 5
+        try:
+            assert d['f']() == 5
+            d['some_new_builtin'] = 6
+            assert d['f']() == 6
+        finally:
+            del __builtin__.some_new_builtin
+        del d['some_new_builtin']
+        raises(NameError, d['f'])
+
+    def test_name_error(self):
+        def f():
+            return some_undefined_name
+        raises(NameError, f)
+        raises(NameError, f)
+
+    def test_module_attribute(self):
+        import types
+        mod = types.ModuleType('mod')
+        mod.x = 1
+        def f(m):
+            return m.x
+        def g(m):
+            return m.x()
+        assert f(mod) == 1
+        assert f(mod) == 1
+        mod.x = 2
+        assert f(mod) == 2
+        mod.x = lambda: 3
+        assert g(mod) == 3
+        del mod.x
+        raises(AttributeError, f, mod)
+        raises(AttributeError, g, mod)
+        mod2 = types.ModuleType('mod2')
+        mod2.x = 4
+        assert f(mod2) == 4
+        mod.__dict__.clear()
+        raises(AttributeError, f, mod)
+
+    def test_module_subclass(self):
+        import types
+        class M(types.ModuleType):
+            pass
+        mod = M('mod')
+        mod.x = 1
+        def f(m):
+            return m.x
+        assert f(mod) == 1
+        assert f(mod) == 1
+        M.x = property(lambda self: 42)
+        assert f(mod) == 42
+        del M.x
+        assert f(mod) == 1
+        M.__getattribute__ = lambda self, name: 43
+        assert f(mod) == 43
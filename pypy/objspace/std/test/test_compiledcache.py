@@ -0,0 +1,49 @@
+from pypy.objspace.std.compiledcache import make_compiled_cache
+
+
+class FakeSpace(object):
+    def __init__(self):
+        self.caches = {}
+    def fromcache(self, cls):
+        if cls not in self.caches:
+            self.caches[cls] = cls(self)
+        return self.caches[cls]
+
+def make_cache():
+    calls = []
+    def compile(key):
+        calls.append(key)
+        if '*' in key:
+            return None
+        return [key]
+    CompiledCache, get_compiled = make_compiled_cache(compile, 4)
+    return CompiledCache, get_compiled, calls
+
+def test_lookup():
+    space = FakeSpace()
+    CompiledCache, get_compiled, calls = make_cache()
+    compiled = get_compiled(space, "%s")
+    assert compiled == ["%s"]
+    assert get_compiled(space, "%s") is compiled
+    assert calls == ["%s"]
+    space.fromcache(CompiledCache).clear()
+    assert get_compiled(space, "%s") is not compiled
+    assert calls == ["%s", "%s"]
+
+def test_not_compilable_is_cached():
+    space = FakeSpace()
+    CompiledCache, get_compiled, calls = make_cache()
+    assert get_compiled(space, "%*d") is None
+    assert get_compiled(space, "%*d") is None
+    assert calls == ["%*d"]
+
+def test_collision():
+    space = FakeSpace()
+    CompiledCache, get_compiled, calls = make_cache()
+    keys = ["%d" + "x" * i for i in range(100)]
+    for key in keys:
+        assert get_compiled(space, key) == [key]
+    for key in keys:
+        assert get_compiled(space, key) == [key]
+    # the cache has 16 entries: most of the keys were compiled again
+    assert len(keys) < len(calls) <= 2 * len(keys)
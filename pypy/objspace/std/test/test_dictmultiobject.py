@@ -578,15 +578,33 @@ class AppTest_DictMultiObject(AppTest_DictObject):
         assert getattr(a, s) == 42
 
     def test_setattr_string_identify(self):
-        attrs = []
+        class StrHolder(object):
+            pass
+        holder = StrHolder()
         class A(object):
             def __setattr__(self, attr, value):
-                attrs.append(attr)
+                holder.seen = attr
 
         a = A()
         s = "abc"
         setattr(a, s, 123)
-        assert attrs[0] is s
+        assert holder.seen is s
+
+class AppTest_CompactDicts(AppTest_DictMultiObject):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withcompactdicts": True})
+
+    def test_insertion_order(self):
+        d = {}
+        for key in "hello world":
+            d[key] = ord(key)
+        del d["l"]
+        d["l"] = 0
+        assert "".join(d.keys()) == "heo wrdl"
+        d[1] = 2
+        assert d.keys() == ["h", "e", "o", " ", "w", "r", "d", "l", 1]
+        assert d.popitem() == (1, 2)
+        assert d.values()[-1] == 0
 
 class AppTestDictViews:
     def test_dictview(self):
@@ -899,6 +917,8 @@ class Config:
             withcelldict = False
             withmethodcache = False
             withidentitydict = False
+            withcompactdicts = False
+            withunboxedattrs = False
 
 FakeSpace.config = Config()
 
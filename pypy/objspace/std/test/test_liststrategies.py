@@ -0,0 +1,348 @@
+import py
+from pypy.objspace.std.listobject import W_ListObject, EmptyListStrategy, ObjectListStrategy, IntegerListStrategy, FloatListStrategy, StringListStrategy
+from pypy.conftest import gettestobjspace
+
+class TestW_ListStrategies(object):
+
+    def test_check_strategy(self):
+        space = self.space
+        w = space.wrap
+        assert isinstance(W_ListObject(space, []).strategy, EmptyListStrategy)
+        assert isinstance(W_ListObject(space, [w(1),w('a')]).strategy, ObjectListStrategy)
+        assert isinstance(W_ListObject(space, [w(1),w(2),w(3)]).strategy, IntegerListStrategy)
+        assert isinstance(W_ListObject(space, [w('a'), w('b')]).strategy, StringListStrategy)
+        assert isinstance(W_ListObject(space, [w(1.5), w(2.5)]).strategy, FloatListStrategy)
+        assert isinstance(W_ListObject(space, [w(1), w(2.5)]).strategy, ObjectListStrategy)
+
+    def test_empty_to_any(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.append(w((1,3)))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.append(w(1))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.append(w('a'))
+        assert isinstance(l.strategy, StringListStrategy)
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.append(w(1.2))
+        assert isinstance(l.strategy, FloatListStrategy)
+
+    def test_int_to_any(self):
+        l = W_ListObject(self.space, [self.space.wrap(1),self.space.wrap(2),self.space.wrap(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.append(self.space.wrap(4))
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.append(self.space.wrap('a'))
+        assert isinstance(l.strategy, ObjectListStrategy)
+        assert self.space.eq_w(l.getitem(3), self.space.wrap(4))
+        assert self.space.eq_w(l.getitem(4), self.space.wrap('a'))
+
+    def test_string_to_any(self):
+        l = W_ListObject(self.space, [self.space.wrap('a'),self.space.wrap('b'),self.space.wrap('c')])
+        assert isinstance(l.strategy, StringListStrategy)
+        l.append(self.space.wrap('d'))
+        assert isinstance(l.strategy, StringListStrategy)
+        l.append(self.space.wrap(3))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+    def test_float_to_any(self):
+        l = W_ListObject(self.space, [self.space.wrap(1.1),self.space.wrap(2.2),self.space.wrap(3.3)])
+        assert isinstance(l.strategy, FloatListStrategy)
+        l.append(self.space.wrap(4.4))
+        assert isinstance(l.strategy, FloatListStrategy)
+        l.append(self.space.wrap("a"))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+    def test_setitem(self):
+        space = self.space
+        w = space.wrap
+        # This should work if test_listobject.py passes
+        l = W_ListObject(space, [w('a'),w('b'),w('c')])
+        assert space.eq_w(l.getitem(0), w('a'))
+        l.setitem(0, w('d'))
+        assert space.eq_w(l.getitem(0), w('d'))
+
+        assert isinstance(l.strategy, StringListStrategy)
+
+        # IntStrategy to ObjectStrategy
+        l = W_ListObject(space, [w(1),w(2),w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.setitem(0, w('d'))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        # StringStrategy to ObjectStrategy
+        l = W_ListObject(space, [w('a'),w('b'),w('c')])
+        assert isinstance(l.strategy, StringListStrategy)
+        l.setitem(0, w(2))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        # FloatStrategy to ObjectStrategy
+        l = W_ListObject(space, [w(1.2),w(2.3),w(3.4)])
+        assert isinstance(l.strategy, FloatListStrategy)
+        l.setitem(0, w("a"))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+    def test_insert(self):
+        space = self.space
+        w = space.wrap
+        # no change
+        l = W_ListObject(space, [w(1),w(2),w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.insert(3, w(4))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        # StringStrategy
+        l = W_ListObject(space, [w('a'),w('b'),w('c')])
+        assert isinstance(l.strategy, StringListStrategy)
+        l.insert(3, w(2))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        # IntegerStrategy
+        l = W_ListObject(space, [w(1),w(2),w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.insert(3, w('d'))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        # FloatStrategy
+        l = W_ListObject(space, [w(1.1),w(2.2),w(3.3)])
+        assert isinstance(l.strategy, FloatListStrategy)
+        l.insert(3, w('d'))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        # EmptyStrategy
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.insert(0, w('a'))
+        assert isinstance(l.strategy, StringListStrategy)
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.insert(0, w(2))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+    def test_list_empty_after_delete(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.deleteslice(0, 1, 1)
+        assert isinstance(l.strategy, IntegerListStrategy)
+        assert l.length() == 0
+        l.append(w(1))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+    def test_setslice(self):
+        space = self.space
+        w = space.wrap
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.setslice(0, 1, 0, W_ListObject(space, [w(1), w(2), w(3)]))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        l = W_ListObject(space, [w(1), w(2), w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.setslice(0, 1, 2, W_ListObject(space, [w(4), w(5), w(6)]))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        l = W_ListObject(space, [w(1), w('b'), w(3)])
+        assert isinstance(l.strategy, ObjectListStrategy)
+        l.setslice(0, 1, 2, W_ListObject(space, [w(1), w(2), w(3)]))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        l = W_ListObject(space, [w(1), w(2), w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.setslice(0, 1, 2, W_ListObject(space, [w('a'), w('b'), w('c')]))
+        assert isinstance(l.strategy, ObjectListStrategy)
+        assert space.eq_w(l, W_ListObject(space, [w('a'), w('b'), w('c'), w(3)]))
+
+        l = W_ListObject(space, [w('a'), w('b'), w('c')])
+        assert isinstance(l.strategy, StringListStrategy)
+        l.setslice(0, 1, 2, W_ListObject(space, [w(1), w(2), w(3)]))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+    def test_setslice_List(self):
+        space = self.space
+        w = space.wrap
+
+        def wrapitems(items):
+            items_w = []
+            for i in items:
+                items_w.append(w(i))
+            return items_w
+
+        def keep_other_strategy(w_list, start, step, length, w_other):
+            other_strategy = w_other.strategy
+            w_list.setslice(start, step, length, w_other)
+            assert w_other.strategy is other_strategy
+
+        l = W_ListObject(space, wrapitems([1,2,3,4,5]))
+        other = W_ListObject(space, wrapitems(["a", "b", "c"]))
+        keep_other_strategy(l, 0, 2, other.length(), other)
+        assert l.strategy is space.fromcache(ObjectListStrategy)
+
+        l = W_ListObject(space, wrapitems([1,2,3,4,5]))
+        other = W_ListObject(space, wrapitems([6, 6, 6]))
+        keep_other_strategy(l, 0, 2, other.length(), other)
+        assert l.strategy is space.fromcache(IntegerListStrategy)
+
+        l = W_ListObject(space, wrapitems(["a","b","c","d","e"]))
+        other = W_ListObject(space, wrapitems(["a", "b", "c"]))
+        keep_other_strategy(l, 0, 2, other.length(), other)
+        assert l.strategy is space.fromcache(StringListStrategy)
+
+        l = W_ListObject(space, wrapitems([1.1, 2.2, 3.3, 4.4, 5.5]))
+        other = W_ListObject(space, [])
+        keep_other_strategy(l, 0, 1, l.length(), other)
+        assert l.strategy is space.fromcache(FloatListStrategy)
+
+        l = W_ListObject(space, wrapitems(["a",3,"c",4,"e"]))
+        other = W_ListObject(space, wrapitems(["a", "b", "c"]))
+        keep_other_strategy(l, 0, 2, other.length(), other)
+        assert l.strategy is space.fromcache(ObjectListStrategy)
+
+        l = W_ListObject(space, wrapitems(["a",3,"c",4,"e"]))
+        other = W_ListObject(space, [])
+        keep_other_strategy(l, 0, 1, l.length(), other)
+        assert l.strategy is space.fromcache(ObjectListStrategy)
+
+    def test_empty_setslice_with_objectlist(self):
+        space = self.space
+        w = space.wrap
+
+        l = W_ListObject(space, [])
+        o = W_ListObject(space, [space.wrap(1), space.wrap("2"), space.wrap(3)])
+        l.setslice(0, 1, 0, o)
+        assert l.getitems() == o.getitems()
+        l.append(space.wrap(17))
+        assert l.getitems() != o.getitems()
+
+    def test_extend(self):
+        space = self.space
+        w = space.wrap
+
+        l = W_ListObject(space, [])
+        assert isinstance(l.strategy, EmptyListStrategy)
+        l.extend(W_ListObject(space, [w(1), w(2), w(3)]))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        l = W_ListObject(space, [w(1), w(2), w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.extend(W_ListObject(space, [w('a'), w('b'), w('c')]))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        l = W_ListObject(space, [w(1), w(2), w(3)])
+        assert isinstance(l.strategy, IntegerListStrategy)
+        l.extend(W_ListObject(space, [w(4), w(5), w(6)]))
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+        l = W_ListObject(space, [w(1.1), w(2.2), w(3.3)])
+        assert isinstance(l.strategy, FloatListStrategy)
+        l.extend(W_ListObject(space, [w(4), w(5), w(6)]))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+    def test_empty_extend_with_any(self):
+        space = self.space
+        w = space.wrap
+
+        empty = W_ListObject(space, [])
+        assert isinstance(empty.strategy, EmptyListStrategy)
+        empty.extend(W_ListObject(space, [w(1), w(2), w(3)]))
+        assert isinstance(empty.strategy, IntegerListStrategy)
+
+        empty = W_ListObject(space, [])
+        assert isinstance(empty.strategy, EmptyListStrategy)
+        empty.extend(W_ListObject(space, [w("a"), w("b"), w("c")]))
+        assert isinstance(empty.strategy, StringListStrategy)
+
+        empty = W_ListObject(space, [])
+        assert isinstance(empty.strategy, EmptyListStrategy)
+        r = make_range_list(space, 1,3,7)
+        empty.extend(r)
+        assert isinstance(empty.strategy, IntegerListStrategy)
+        assert space.eq_w(empty.getitem(1), w(4))
+
+    def test_extend_other_does_not_share_storage(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [])
+        other = W_ListObject(space, [w(1), w(2)])
+        l.extend(other)
+        l.append(w(3))
+        assert other.length() == 2
+
+    def test_clone(self):
+        space = self.space
+        l1 = W_ListObject(space, [space.wrap(1), space.wrap(2), space.wrap(3)])
+        clone = l1.clone()
+        assert isinstance(clone.strategy, IntegerListStrategy)
+        clone.append(space.wrap(7))
+        assert not space.eq_w(l1, clone)
+
+    def test_getitems_does_not_unwrap_for_objects(self):
+        space = self.space
+        w_a = space.wrap((1, 2))
+        l = W_ListObject(space, [w_a, space.wrap(1)])
+        assert l.getitems()[0] is w_a
+
+    def test_getitems_str(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [w("a"), w("b")])
+        assert l.getitems_str() == ["a", "b"]
+        l = W_ListObject(space, [w(1), w(2)])
+        assert l.getitems_str() is None
+        assert space.listview_str(l) is None
+        assert space.listview_str(w("ab")) is None
+
+    def test_find(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [w(1), w(2), w(3)])
+        assert l.find(w(2)) == 1
+        assert l.find(w(2.0)) == 1
+        assert l.find(w(True)) == 0
+        py.test.raises(ValueError, l.find, w("2"))
+        py.test.raises(ValueError, l.find, w(2), 0, 1)
+        l = W_ListObject(space, [w(1.5), w(float('nan'))])
+        assert l.find(w(float('nan'))) == 1
+
+    def test_sort_unwrapped(self):
+        space = self.space
+        w = space.wrap
+        l = W_ListObject(space, [w(3), w(1), w(2)])
+        l.sort(False)
+        assert space.unwrap(l) == [1, 2, 3]
+        l.sort(True)
+        assert space.unwrap(l) == [3, 2, 1]
+        assert isinstance(l.strategy, IntegerListStrategy)
+
+def make_range_list(space, start, step, length):
+    w = space.wrap
+    return W_ListObject(space, [w(start + i * step) for i in range(length)])
+
+class TestW_ListStrategiesDisabled:
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withliststrategies" :
+                                       False})
+
+    def test_check_strategy(self):
+        assert isinstance(W_ListObject(self.space, []).strategy, ObjectListStrategy)
+        assert isinstance(W_ListObject(self.space, [self.space.wrap(1),self.space.wrap('a')]).strategy, ObjectListStrategy)
+        assert isinstance(W_ListObject(self.space, [self.space.wrap(1),self.space.wrap(2),self.space.wrap(3)]).strategy, ObjectListStrategy)
+        assert isinstance(W_ListObject(self.space, [self.space.wrap('a'), self.space.wrap('b')]).strategy, ObjectListStrategy)
+
+    def test_append(self):
+        l = W_ListObject(self.space, [])
+        l.append(self.space.wrap(1))
+        assert isinstance(l.strategy, ObjectListStrategy)
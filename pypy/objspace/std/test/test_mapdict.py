@@ -991,6 +991,26 @@ class AppTestWithMapDictAndCounters(object):
         got = x.a
         assert got == 'd'
 
+    def test_load_attr_cache_dont_keep_class_alive(self):
+        import weakref
+        import gc
+        def g(c):
+            return c.x + c.y
+        def f():
+            class C(object):
+                pass
+            c = C()
+            c.x = 40
+            c.y = 2
+            r = weakref.ref(C)
+            # fill the LOAD_ATTR cache of 'g', then read through it
+            assert g(c) == 42
+            assert g(c) == 42
+            del C, c
+            gc.collect(); gc.collect(); gc.collect()
+            assert r() is None
+        f()
+
 class AppTestGlobalCaching(AppTestWithMapDict):
     def setup_class(cls):
         cls.space = gettestobjspace(
@@ -1067,3 +1087,196 @@ class TestDictSubclassShortcutBug(object):
                 return A()
                 """)
         assert w_dict.user_overridden_class
+
+class TestUnboxedAttributes(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(
+            **{"objspace.std.withmapdict": True,
+               "objspace.std.withunboxedattrs": True})
+
+    def test_unboxed_map(self):
+        w_obj = self.space.appexec([], """():
+            class A(object):
+                pass
+            a = A()
+            a.x = 1
+            a.y = 2.5
+            a.z = 'abc'
+            a.t = 3
+            return a
+            """)
+        map = w_obj._get_mapdict_map()
+        attr_x = map.find_map_attr(("x", DICT))
+        attr_y = map.find_map_attr(("y", DICT))
+        attr_z = map.find_map_attr(("z", DICT))
+        attr_t = map.find_map_attr(("t", DICT))
+        assert isinstance(attr_x, UnboxedAttribute)
+        assert attr_x.kind == UNBOXED_INT
+        assert isinstance(attr_y, UnboxedAttribute)
+        assert attr_y.kind == UNBOXED_FLOAT
+        assert not isinstance(attr_z, UnboxedAttribute)
+        assert isinstance(attr_t, UnboxedAttribute)
+        # all the unboxed values share the first storage position
+        assert attr_x.position == attr_y.position == attr_t.position == 0
+        assert attr_z.position == 1
+        assert map.length() == 2
+        storage = w_obj._mapdict_read_storage(0)
+        assert isinstance(storage, UnboxedStorage)
+        assert storage.ints == [1, 3]
+        assert storage.floats == [2.5]
+
+    def test_write_does_not_box(self):
+        space = self.space
+        w_obj = space.appexec([], """():
+            class A(object):
+                pass
+            a = A()
+            a.x = 1
+            a.y = 2.5
+            return a
+            """)
+        map = w_obj._get_mapdict_map()
+        storage = w_obj._mapdict_read_storage(0)
+        space.setattr(w_obj, space.wrap("x"), space.wrap(42))
+        space.setattr(w_obj, space.wrap("y"), space.wrap(-0.5))
+        assert w_obj._get_mapdict_map() is map
+        assert w_obj._mapdict_read_storage(0) is storage
+        assert storage.ints == [42]
+        assert storage.floats == [-0.5]
+        assert space.int_w(space.getattr(w_obj, space.wrap("x"))) == 42
+        assert space.float_w(space.getattr(w_obj, space.wrap("y"))) == -0.5
+
+    def test_deoptimize(self):
+        space = self.space
+        w_A, w_obj = space.fixedview(space.appexec([], """():
+            class A(object):
+                pass
+            a = A()
+            a.x = 1
+            a.y = 2
+            a.z = 3.5
+            return A, a
+            """))
+        space.setattr(w_obj, space.wrap("y"), space.wrap("foo"))
+        map = w_obj._get_mapdict_map()
+        assert isinstance(map.find_map_attr(("x", DICT)), UnboxedAttribute)
+        assert not isinstance(map.find_map_attr(("y", DICT)), UnboxedAttribute)
+        assert isinstance(map.find_map_attr(("z", DICT)), UnboxedAttribute)
+        assert space.int_w(space.getattr(w_obj, space.wrap("x"))) == 1
+        assert space.str_w(space.getattr(w_obj, space.wrap("y"))) == "foo"
+        assert space.float_w(space.getattr(w_obj, space.wrap("z"))) == 3.5
+        # new instances don't store 'y' unboxed any more
+        w_obj2 = space.call_function(w_A)
+        space.setattr(w_obj2, space.wrap("x"), space.wrap(5))
+        space.setattr(w_obj2, space.wrap("y"), space.wrap(6))
+        map2 = w_obj2._get_mapdict_map()
+        assert not isinstance(map2.find_map_attr(("y", DICT)), UnboxedAttribute)
+        assert space.int_w(space.getattr(w_obj2, space.wrap("y"))) == 6
+
+
+class AppTestWithUnboxedAttrs(AppTestWithMapDict):
+    def setup_class(cls):
+        cls.space = gettestobjspace(
+            **{"objspace.std.withmapdict": True,
+               "objspace.std.withunboxedattrs": True})
+
+    def test_int_float_attributes(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 5
+        a.y = 1.5
+        a.z = 2 ** 70
+        for i in range(10):
+            a.x += 1
+            a.y *= 2
+        assert a.x == 15
+        assert a.y == 1536.0
+        assert a.z == 2 ** 70
+        assert type(a.x) is int
+        assert type(a.y) is float
+        assert type(a.z) is long
+        assert a.__dict__ == {'x': 15, 'y': 1536.0, 'z': 2 ** 70}
+
+    def test_change_type(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 5
+        a.y = 6.5
+        a.x = 7.25
+        assert a.x == 7.25
+        assert a.y == 6.5
+        a.y = None
+        assert a.y is None
+        a.x = 3
+        assert a.x == 3
+        b = A()
+        b.x = 1
+        b.y = 2.0
+        assert (b.x, b.y) == (1, 2.0)
+
+    def test_load_attr_cache_dont_keep_class_alive(self):
+        import weakref
+        import gc
+        def g(c):
+            return c.x + c.y
+        def f():
+            class C(object):
+                pass
+            c = C()
+            c.x = 40
+            c.y = 1.5
+            r = weakref.ref(C)
+            # fill the LOAD_ATTR cache of 'g', then read through it
+            assert g(c) == 41.5
+            assert g(c) == 41.5
+            c.x = 39.5     # not an int any more
+            assert g(c) == 41.0
+            del C, c
+            gc.collect(); gc.collect(); gc.collect()
+            assert r() is None
+        f()
+
+    def test_subclasses_are_not_unboxed(self):
+        class myint(int):
+            pass
+        class myfloat(float):
+            pass
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        a.y = 1.0
+        a.x = myint(2)
+        a.y = myfloat(3.0)
+        assert type(a.x) is myint
+        assert type(a.y) is myfloat
+        a.z = True
+        assert a.z is True
+
+    def test_delete_unboxed(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        a.y = 2.0
+        a.z = 3
+        del a.x
+        assert not hasattr(a, 'x')
+        assert (a.y, a.z) == (2.0, 3)
+        a.x = 4
+        assert (a.x, a.y, a.z) == (4, 2.0, 3)
+        a.__dict__.clear()
+        assert not hasattr(a, 'y')
+
+    def test_unboxed_slots(self):
+        class A(object):
+            __slots__ = ['a', 'b']
+        a = A()
+        a.a = 1
+        a.b = 2.0
+        a.a += 1
+        assert (a.a, a.b) == (2, 2.0)
+        a.b = 'x'
+        assert (a.a, a.b) == (2, 'x')
@@ -1,6 +1,38 @@
 """Test unicode/str's format method"""
 from __future__ import with_statement
 from pypy.conftest import gettestobjspace
+from pypy.objspace.std import newformat
+
+
+class TestCompiledTemplate:
+
+    def test_compile(self):
+        compiled = newformat.get_compiled_str_template(
+            self.space, "a{0}b{x!r:>5}{{c}}{1:{2}}")
+        assert compiled.literals == ["a", "b", "{c}", ""]
+        assert compiled.names == ["0", "x", "1"]
+        assert compiled.conversions == [None, "r", None]
+        assert compiled.specs == ["", ">5", "{2}"]
+        assert compiled.spec_starts == [-1, -1, 21]
+        assert compiled.spec_ends[2] == 24
+
+    def test_malformed(self):
+        for template in ["{", "}", "a{0", "{0!}", "{0!rs}"]:
+            assert newformat.get_compiled_str_template(self.space,
+                                                       template) is None
+
+    def test_cache(self):
+        cache = self.space.fromcache(newformat.StrTemplateCache)
+        cache.clear()
+        compiled = newformat.get_compiled_str_template(self.space, "x{}y")
+        again = newformat.get_compiled_str_template(self.space, "x{}y")
+        assert again is compiled
+        ucompiled = newformat.get_compiled_unicode_template(self.space,
+                                                            u"x{}y")
+        assert ucompiled.literals == [u"x", u"y"]
+        cache.clear()
+        again = newformat.get_compiled_str_template(self.space, "x{}y")
+        assert again is not compiled
 
 
 class BaseStringFormatTests:
@@ -91,6 +123,31 @@ class BaseStringFormatTests:
         raises(ValueError, self.s("{{}:s}").format)
         raises(ValueError, self.s("{:{:{}}}").format, 1, 2, 3)
 
+    def test_same_template_twice(self):
+        template = self.s("{0:>{1}}|{x!r}|{{}}")
+        for i in range(3):
+            assert template.format(i, i + 2, x=i) == self.s(
+                " " * (i + 1) + str(i) + "|" + str(i) + "|{}")
+
+    def test_error_after_previous_fields(self):
+        log = []
+        class A(object):
+            @property
+            def x(self):
+                log.append(1)
+                return 5
+        raises(ValueError, self.s("{0.x} }").format, A())
+        assert log == [1]
+        raises(ValueError, self.s("{0.x} {").format, A())
+        assert log == [1, 1]
+
+    def test_empty_spec_subclass(self):
+        class S(type(self.s())):
+            def __format__(self, spec):
+                return self.__class__.__base__("formatted")
+        assert self.s("<{}>").format(S("x")) == self.s("<formatted>")
+        assert self.s("<{}>").format(self.s("x")) == self.s("<x>")
+
     def test_presentation(self):
         assert format(self.s("blah"), "s") == self.s("blah")
         assert format(self.s("blah")) == self.s("blah")
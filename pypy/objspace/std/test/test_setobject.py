@@ -10,7 +10,6 @@ is not too wrong.
 import py.test
 from pypy.objspace.std.setobject import W_SetObject, W_FrozensetObject
 from pypy.objspace.std.setobject import _initialize_set
-from pypy.objspace.std.setobject import newset, make_setdata_from_w_iterable
 from pypy.objspace.std.setobject import and__Set_Set
 from pypy.objspace.std.setobject import set_intersection__Set
 from pypy.objspace.std.setobject import eq__Set_Set
@@ -29,12 +28,11 @@ class TestW_SetObject:
         self.false = self.space.w_False
 
     def test_and(self):
-        s = W_SetObject(self.space, newset(self.space))
+        s = W_SetObject(self.space)
         _initialize_set(self.space, s, self.word)
-        t0 = W_SetObject(self.space, newset(self.space))
+        t0 = W_SetObject(self.space)
         _initialize_set(self.space, t0, self.otherword)
-        t1 = W_FrozensetObject(self.space,
-                make_setdata_from_w_iterable(self.space, self.otherword))
+        t1 = W_FrozensetObject(self.space, self.otherword)
         r0 = and__Set_Set(self.space, s, t0)
         r1 = and__Set_Set(self.space, s, t1)
         assert eq__Set_Set(self.space, r0, r1) == self.true
@@ -42,9 +40,9 @@ class TestW_SetObject:
         assert eq__Set_Set(self.space, r0, sr) == self.true
 
     def test_compare(self):
-        s = W_SetObject(self.space, newset(self.space))
+        s = W_SetObject(self.space)
         _initialize_set(self.space, s, self.word)
-        t = W_SetObject(self.space, newset(self.space))
+        t = W_SetObject(self.space)
         _initialize_set(self.space, t, self.word)
         assert self.space.eq_w(s,t)
         u = self.space.wrap(set('simsalabim'))
@@ -381,3 +379,79 @@ class AppTestAppSetTest:
         assert s == set([2,3])
         s.difference_update(s)
         assert s == set([])
+
+    def test_mixed_types(self):
+        s = set([1, 2, 3])
+        s.add("a")
+        assert s == set([1, 2, 3, "a"])
+        s = set(["a", "b"])
+        s.add(1)
+        assert s == set(["a", "b", 1])
+        s = set()
+        s.add(1.5)
+        assert s == set([1.5])
+
+    def test_lookup_of_equal_values(self):
+        s = set([1, 2, 3])
+        assert 2.0 in s
+        assert 2L in s
+        assert True in s
+        assert "2" not in s
+        assert None not in s
+        s.discard(3.0)
+        assert s == set([1, 2])
+        raises(TypeError, "[] in s")
+        assert set() not in s
+
+    def test_algebra_mixed_strategies(self):
+        ints = set([1, 2, 3])
+        strs = set(["1", "2"])
+        objs = set([2.0, "x", None])
+        assert ints & strs == set()
+        assert ints - strs == ints
+        assert ints ^ strs == set([1, 2, 3, "1", "2"])
+        assert ints.isdisjoint(strs)
+        assert ints & objs == set([2])
+        assert ints - objs == set([1, 3])
+        assert ints ^ objs == set([1, 3, "x", None])
+        assert not ints.isdisjoint(objs)
+        assert set([2]) <= objs
+        assert frozenset(["x"]) < objs
+        assert ints | strs == set([1, 2, 3, "1", "2"])
+
+    def test_update_mixed_strategies(self):
+        s = set([1, 2, 3])
+        s |= set(["a"])
+        assert s == set([1, 2, 3, "a"])
+        s = set([1, 2, 3])
+        s &= set([2.0, "x"])
+        assert s == set([2])
+        s = set([1, 2, 3])
+        s -= set([2.0, "x"])
+        assert s == set([1, 3])
+        s = set([1, 2, 3])
+        s ^= set([2.0, "x"])
+        assert s == set([1, 3, "x"])
+
+    def test_unwrapped_iteration(self):
+        s = set(range(10))
+        assert sorted(s) == range(10)
+        s = set([str(i) for i in range(10)])
+        assert sorted(s) == [str(i) for i in range(10)]
+        s = set([1, 2, 3])
+        def f():
+            for x in s:
+                s.add(x + 10)
+        raises(RuntimeError, f)
+
+    def test_pop_unwrapped(self):
+        s = set(["a"])
+        assert s.pop() == "a"
+        raises(KeyError, s.pop)
+        s.add(5)
+        assert s.pop() == 5
+
+    def test_frozenset_hash_unwrapped(self):
+        assert hash(frozenset([1, 2, 3])) == hash(frozenset([1.0, 2, 3]))
+        assert hash(frozenset(["a", "b"])) == hash(frozenset(["b", "a"]))
+        assert frozenset([1, 2]) in set([frozenset([1, 2])])
@@ -0,0 +1,145 @@
+from pypy.objspace.std.setobject import W_SetObject, W_FrozensetObject
+from pypy.objspace.std.setobject import (EmptySetStrategy, ObjectSetStrategy,
+                                         IntegerSetStrategy, StringSetStrategy)
+
+class TestW_SetStrategies:
+
+    def wrapped(self, l):
+        return self.space.newlist([self.space.wrap(x) for x in l])
+
+    def test_from_list(self):
+        s = W_SetObject(self.space, self.wrapped([1,2,3,4,5]))
+        assert s.strategy is self.space.fromcache(IntegerSetStrategy)
+
+        s = W_SetObject(self.space, self.wrapped([1,"two",3,"four",5]))
+        assert s.strategy is self.space.fromcache(ObjectSetStrategy)
+
+        s = W_SetObject(self.space, self.wrapped(["one", "two"]))
+        assert s.strategy is self.space.fromcache(StringSetStrategy)
+
+        s = W_SetObject(self.space)
+        assert s.strategy is self.space.fromcache(EmptySetStrategy)
+
+        s = W_SetObject(self.space, self.wrapped([]))
+        assert s.strategy is self.space.fromcache(EmptySetStrategy)
+
+    def test_from_iterable(self):
+        space = self.space
+        w_tuple = space.newtuple([space.wrap(1), space.wrap(2)])
+        s = W_SetObject(space, w_tuple)
+        assert s.strategy is space.fromcache(IntegerSetStrategy)
+
+        s = W_SetObject(space, space.wrap("abc"))
+        assert s.strategy is space.fromcache(StringSetStrategy)
+
+    def test_copy_keeps_strategy(self):
+        s1 = W_SetObject(self.space, self.wrapped([1,2,3]))
+        s2 = W_FrozensetObject(self.space, s1)
+        assert s2.strategy is s1.strategy
+        s2.add(self.space.wrap("a"))
+        assert s1.length() == 3
+        assert s1.strategy is self.space.fromcache(IntegerSetStrategy)
+
+    def test_switch_to_object(self):
+        s = W_SetObject(self.space, self.wrapped([1,2,3,4,5]))
+        s.add(self.space.wrap("six"))
+        assert s.strategy is self.space.fromcache(ObjectSetStrategy)
+
+        s1 = W_SetObject(self.space, self.wrapped([1,2,3,4]))
+        s2 = W_SetObject(self.space, self.wrapped(["six", "seven"]))
+        s1.update(s2)
+        assert s1.strategy is self.space.fromcache(ObjectSetStrategy)
+        assert s1.length() == 6
+
+    def test_empty_to_typed(self):
+        s = W_SetObject(self.space)
+        s.add(self.space.wrap(1))
+        assert s.strategy is self.space.fromcache(IntegerSetStrategy)
+
+        s = W_SetObject(self.space)
+        s.add(self.space.wrap("a"))
+        assert s.strategy is self.space.fromcache(StringSetStrategy)
+
+        s = W_SetObject(self.space)
+        s.add(self.space.wrap(1.5))
+        assert s.strategy is self.space.fromcache(ObjectSetStrategy)
+
+    def test_clear(self):
+        s = W_SetObject(self.space, self.wrapped([1,2,3]))
+        s.clear()
+        assert s.strategy is self.space.fromcache(EmptySetStrategy)
+        assert s.length() == 0
+
+    def test_lookup_does_not_switch(self):
+        space = self.space
+        s = W_SetObject(space, self.wrapped([1,2,3]))
+        assert s.has_key(space.wrap(2))
+        assert not s.has_key(space.wrap("2"))
+        assert not s.has_key(space.w_None)
+        assert s.strategy is space.fromcache(IntegerSetStrategy)
+        assert not s.remove(space.wrap("2"))
+        assert s.strategy is space.fromcache(IntegerSetStrategy)
+
+    def test_lookup_of_equal_object(self):
+        space = self.space
+        s = W_SetObject(space, self.wrapped([1,2,3]))
+        assert s.has_key(space.wrap(2.0))
+        assert s.remove(space.wrap(3.0))
+        assert s.length() == 2
+
+    def test_algebra_same_strategy(self):
+        space = self.space
+        s1 = W_SetObject(space, self.wrapped([1,2,3,4,5]))
+        s2 = W_SetObject(space, self.wrapped([4,5,6,7]))
+
+        s3 = s1.intersect(s2)
+        assert s3.strategy is space.fromcache(IntegerSetStrategy)
+        assert space.eq_w(s3, W_SetObject(space, self.wrapped([4,5])))
+
+        s3 = s1.difference(s2)
+        assert s3.strategy is space.fromcache(IntegerSetStrategy)
+        assert space.eq_w(s3, W_SetObject(space, self.wrapped([1,2,3])))
+
+        s3 = s1.symmetric_difference(s2)
+        assert s3.strategy is space.fromcache(IntegerSetStrategy)
+        assert space.eq_w(s3, W_SetObject(space, self.wrapped([1,2,3,6,7])))
+
+        assert not s1.isdisjoint(s2)
+        assert not s1.issubset(s2)
+        assert s3.intersect(s1).issubset(s1)
+
+    def test_algebra_different_strategies(self):
+        space = self.space
+        s1 = W_SetObject(space, self.wrapped([1,2,3]))
+        s2 = W_SetObject(space, self.wrapped(["1","2"]))
+        assert s1.isdisjoint(s2)
+        assert s1.intersect(s2).length() == 0
+        assert space.eq_w(s1.difference(s2), s1)
+        assert s1.symmetric_difference(s2).length() == 5
+        assert not s1.equals(s2)
+
+        s3 = W_SetObject(space, self.wrapped([2.0, "x"]))
+        s4 = s1.intersect(s3)
+        assert s4.strategy is space.fromcache(IntegerSetStrategy)
+        assert space.eq_w(s4, W_SetObject(space, self.wrapped([2])))
+        assert space.eq_w(s1.difference(s3), W_SetObject(space,
+                                                       self.wrapped([1,3])))
+
+    def test_iter(self):
+        space = self.space
+        s = W_SetObject(space, self.wrapped([1,2,3]))
+        it = s.iter()
+        result = []
+        while True:
+            w_item = it.next()
+            if w_item is None:
+                break
+            result.append(space.int_w(w_item))
+        assert sorted(result) == [1,2,3]
+
+    def test_popitem(self):
+        space = self.space
+        s = W_SetObject(space, self.wrapped(["a"]))
+        w_item = s.popitem()
+        assert space.str_w(w_item) == "a"
+        assert s.length() == 0
@@ -0,0 +1,108 @@
+from pypy.objspace.std.tupleobject import W_TupleObject
+from pypy.objspace.std.specialisedtupleobject import W_SpecialisedTupleObject
+from pypy.objspace.std.test.test_tupleobject import AppTestW_TupleObject
+from pypy.conftest import gettestobjspace
+
+
+class TestW_SpecialisedTupleObject():
+
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withspecialisedtuple": True})
+
+    def test_isspecialisedtupleobject(self):
+        space = self.space
+        w_tuple = space.newtuple([space.wrap(1), space.wrap(2)])
+        assert isinstance(w_tuple, W_SpecialisedTupleObject)
+        assert w_tuple.values() == [1, 2]
+        w_tuple = space.newtuple([space.wrap(1), space.wrap(2.5),
+                                  space.wrap(3)])
+        assert isinstance(w_tuple, W_SpecialisedTupleObject)
+        assert w_tuple.values() == [1, 2.5, 3]
+
+    def test_not_specialised(self):
+        space = self.space
+        for items in [[1], [1, 2, 3, 4], [1, "a"], [1, 2L], [True, 2],
+                      [1.5, float("nan")]]:
+            w_tuple = space.newtuple([space.wrap(x) for x in items])
+            assert not isinstance(w_tuple, W_SpecialisedTupleObject)
+
+    def test_hash_against_normal_tuple(self):
+        normalspace = gettestobjspace(**{"objspace.std.withspecialisedtuple": False})
+        space = self.space
+        for items in [(1, 2), (-1, 5.5), (0.0, -0.0, 7), (2.0, 2, 2 ** 40)]:
+            w_tuple = normalspace.newtuple([normalspace.wrap(x) for x in items])
+            w_specialised = space.newtuple([space.wrap(x) for x in items])
+            assert isinstance(w_tuple, W_TupleObject)
+            assert isinstance(w_specialised, W_SpecialisedTupleObject)
+            assert space.is_true(space.eq(w_tuple, w_specialised))
+            assert (normalspace.int_w(normalspace.hash(w_tuple)) ==
+                    space.int_w(space.hash(w_specialised)))
+
+    def test_hash_is_cached(self):
+        space = self.space
+        w_tuple = space.newtuple([space.wrap(3), space.wrap(4.5)])
+        assert w_tuple._hash_cache == 0
+        h = space.int_w(space.hash(w_tuple))
+        assert w_tuple._hash_cache == h
+        assert space.int_w(space.hash(w_tuple)) == h
+
+
+class AppTestW_SpecialisedTupleObject(AppTestW_TupleObject):
+
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withspecialisedtuple": True})
+        cls.w_isspecialised = cls.space.appexec([], """():
+            import __pypy__
+            def isspecialised(obj):
+                return "SpecialisedTuple" in __pypy__.internal_repr(obj)
+            return isspecialised
+        """)
+
+    def test_specialisedtuple(self):
+        assert self.isspecialised((1, 2))
+        assert self.isspecialised((1.5, 2, 3))
+        assert not self.isspecialised((1, 'a'))
+        assert not self.isspecialised((1, 2, 3, 4))
+
+    def test_items(self):
+        t = (1, 2.5, -3)
+        assert t[0] == 1 and type(t[0]) is int
+        assert t[1] == 2.5 and type(t[1]) is float
+        assert t[-1] == -3
+        raises(IndexError, "t[3]")
+        assert t[::-1] == (-3, 2.5, 1)
+        assert t[1:] == (2.5, -3)
+        assert list(t) == [1, 2.5, -3]
+        assert len(t) == 3
+        assert t * 2 == (1, 2.5, -3, 1, 2.5, -3)
+        assert t + (4,) == (1, 2.5, -3, 4)
+        x, y, z = t
+        assert (x, y, z) == (1, 2.5, -3)
+
+    def test_eq(self):
+        assert (1, 2) == (1, 2)
+        assert (1, 2) != (1, 3)
+        assert (1, 2) == (1.0, 2)
+        assert (1, 2.5) != (1, 2.5, 3)
+        assert (1, 2) == (1, 2L)
+        assert (1, 2) != (1, 'a')
+        assert (0.0, 1) == (-0.0, 1)
+        assert (1, 2) < (1, 3)
+        assert (2, 1.5) > (2, 1)
+
+    def test_hash(self):
+        assert hash((1, 2)) == hash((1.0, 2L))
+        assert hash((1, 2, 3)) != hash((1, 3, 2))
+        d = {}
+        for i in range(10):
+            for j in range(10):
+                d[i, j * 0.5] = i + j
+        assert d[3, 2.5] == 8
+        assert d[3, 2.5] == d[3.0, 2.5]
+        assert (3, 2.5) in d
+
+    def test_nan(self):
+        nan = float('nan')
+        t = (nan, 1)
+        assert not self.isspecialised(t)
+        assert t[0] is nan
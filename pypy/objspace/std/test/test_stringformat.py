@@ -1,4 +1,35 @@
 # coding: utf-8
+from pypy.objspace.std import formatting
+
+
+class TestCompiledFormat:
+
+    def test_compile(self):
+        compiled = formatting.StringFormatter.get_compiled_format(
+            self.space, "a%sb%-05.3fc%(key)r%%d")
+        assert compiled.tail == "d"
+        d1, d2, d3, d4 = compiled.directives
+        assert (d1.literal, d1.key, d1.char, d1.simple) == ("a", None,
+                                                            "s", True)
+        assert (d2.literal, d2.width, d2.prec, d2.char) == ("b", 5, 3, "f")
+        assert d2.f_ljust and d2.f_zero and not d2.f_sign
+        assert not d2.simple
+        assert (d3.literal, d3.key, d3.char) == ("c", "key", "r")
+        assert (d4.literal, d4.char) == ("", "%")
+
+    def test_not_compiled(self):
+        for fmt in ["%", "%(a", "%*d", "%.*f", "%y", "%5",
+                    "%99999999999999999999d"]:
+            compiled = formatting.StringFormatter.get_compiled_format(
+                self.space, fmt)
+            assert compiled is None
+
+    def test_cache(self):
+        get_compiled_format = formatting.UnicodeFormatter.get_compiled_format
+        compiled = get_compiled_format(self.space, u"%s:%d")
+        assert get_compiled_format(self.space, u"%s:%d") is compiled
+        self.space.fromcache(formatting.UnicodeFormatter.FormatCache).clear()
+        assert get_compiled_format(self.space, u"%s:%d") is not compiled
 
 
 class AppTestStringObjectWithDict:
@@ -183,6 +214,30 @@ class AppTestStringObject:
         raises(TypeError, '%c'.__mod__, ("",))
         raises(TypeError, '%c'.__mod__, (['c'],))
     
+    def test_format_same_twice(self):
+        for i in range(3):
+            assert "%s:%d %r%%" % ("host", i, i) == "host:%d %d%%" % (i, i)
+            assert "%(a)s-%(b)05.1f" % {'a': i, 'b': 1.25} == "%d-001.2" % i
+
+    def test_format_subclasses(self):
+        class S(str):
+            def __str__(self):
+                return "S"
+        class I(int):
+            def __str__(self):
+                return "I"
+        assert "%s %d" % (S("x"), I(5)) == "S 5"
+        assert "%s %d" % (True, True) == "True 1"
+
+    def test_error_after_previous_items(self):
+        log = []
+        class A(object):
+            def __str__(self):
+                log.append(1)
+                return "a"
+        raises(ValueError, "%s %".__mod__, A())
+        assert log == [1]
+
     def test_broken_unicode(self):
         raises(UnicodeDecodeError, 'Názov: %s'.__mod__, u'Jerry')
 
@@ -495,7 +495,9 @@ class AppTestStringObject:
         assert "".join([]) == ""
         assert "-".join(['a', 'b']) == 'a-b'
         text = 'text'
-        assert "".join([text]) is text
+        # lists of strings don't keep the string objects (list strategies)
+        assert "".join((text,)) is text
+        assert "".join([text]) == text
         raises(TypeError, ''.join, 1)
         raises(TypeError, ''.join, [1])
         raises(TypeError, ''.join, [[1]])
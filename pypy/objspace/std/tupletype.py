@@ -12,6 +12,11 @@ def wraptuple(space, list_w):
     from pypy.objspace.std.smalltupleobject import W_SmallTupleObject6
     from pypy.objspace.std.smalltupleobject import W_SmallTupleObject7
     from pypy.objspace.std.smalltupleobject import W_SmallTupleObject8
+    if space.config.objspace.std.withspecialisedtuple:
+        from pypy.objspace.std.specialisedtupleobject import makespecialisedtuple
+        w_tuple = makespecialisedtuple(space, list_w)
+        if w_tuple is not None:
+            return w_tuple
     if space.config.objspace.std.withsmalltuple:
         if len(list_w) == 2:
             return W_SmallTupleObject2(list_w)
@@ -299,6 +299,8 @@ PARAMETERS = {'threshold': 1032, # just above 1024
               'loop_longevity': 1000,
               'retrace_limit': 5,
               'max_retrace_guards': 15,
+              'loop_counters': 0,
+              'memory_limit': 0, # in KB, 0 for no limit
               'enable_opts': 'all',
               }
 unroll_parameters = unrolling_iterable(PARAMETERS.items())
@@ -319,7 +321,8 @@ class JitDriver(object):
     def __init__(self, greens=None, reds=None, virtualizables=None,
                  get_jitcell_at=None, set_jitcell_at=None,
                  get_printable_location=None, confirm_enter_jit=None,
-                 can_never_inline=None, should_unroll_one_iteration=None):
+                 can_never_inline=None, should_unroll_one_iteration=None,
+                 is_known_hot=None):
         if greens is not None:
             self.greens = greens
         if reds is not None:
@@ -339,6 +342,7 @@ class JitDriver(object):
         self.confirm_enter_jit = confirm_enter_jit
         self.can_never_inline = can_never_inline
         self.should_unroll_one_iteration = should_unroll_one_iteration
+        self.is_known_hot = is_known_hot
 
     def _freeze_(self):
         return True
@@ -415,11 +419,23 @@ class JitDriver(object):
         for your own jitdriver if you want to do something special
         """
 
+    def on_new_counter(self, kind, number, location, counter):
+        """ A hook called when the 'loop_counters' parameter is set, for
+        each new counter.  'kind' is 'loop', 'entry bridge', 'bridge' or
+        'guard', 'number' is the loop number or the guard number and
+        'location' is the printable location of the (first) merge point.
+        'counter' is a raw jitprof.LOOP_COUNTER, in which the JIT counts
+        the runs of the loop or the failures of the guard.  The JIT sets
+        its 'freed' field when the loop is freed; the counter then belongs
+        to the jitdriver, which must call jitprof.free_loop_counter() on it.
+        """
+
     # note: if you overwrite this functions with the above signature it'll
     #       work, but the *greenargs is different for each jitdriver, so we
     #       can't share the same methods
     del on_compile
     del on_compile_bridge
+    del on_new_counter
 
     def _make_extregistryentries(self):
         # workaround: we cannot declare ExtRegistryEntries for functions
@@ -449,7 +449,7 @@ class r_dict(object):
     algorithm."""
 
     def __init__(self, key_eq, key_hash, force_non_null=False):
-        self._dict = {}
+        self._dict = self._newdict()
         self.key_eq = key_eq
         self.key_hash = key_hash
         self.force_non_null = force_non_null
@@ -484,7 +484,7 @@ class r_dict(object):
         return dk.key, value
 
     def copy(self):
-        result = r_dict(self.key_eq, self.key_hash)
+        result = self.__class__(self.key_eq, self.key_hash)
         result.update(self)
         return result
 
@@ -520,6 +520,21 @@ class r_dict(object):
     def __hash__(self):
         raise TypeError("cannot hash r_dict instances")
 
+    def _newdict(self):
+        return {}
+
+class r_ordereddict(r_dict):
+    """An r_dict that remembers the insertion order of its keys,
+    like collections.OrderedDict does for regular dicts."""
+
+    def _newdict(self):
+        from collections import OrderedDict
+        return OrderedDict()
+
+    def __repr__(self):
+        "Representation for debugging purposes."
+        return 'r_ordereddict(%r)' % (self._dict.items(),)
+
 
 class _r_dictkey(object):
     __slots__ = ['dic', 'key', 'hash']
@@ -5,6 +5,7 @@ from pypy.rlib.rfloat import isfinite
 from pypy.rlib.debug import make_sure_not_resized, check_regular_int
 from pypy.rlib.objectmodel import we_are_translated, specialize
 from pypy.rlib import jit
+from pypy.rlib.rstring import StringBuilder
 from pypy.rpython.lltypesystem import lltype, rffi
 from pypy.rpython import extregistry
 
@@ -42,6 +43,21 @@ KARATSUBA_SQUARE_CUTOFF = 2 * KARATSUBA_CUTOFF
 
 ## FIVEARY_CUTOFF = 8   disabled for now
 
+# For division, use the recursive algorithm of Burnikel and Ziegler when
+# both the divisor and the quotient have more than DIV_LIMIT digits.  It
+# turns a large division into multiplications, so it benefits from
+# Karatsuba multiplication.
+DIV_LIMIT = KARATSUBA_CUTOFF
+
+# Conversions between a bigint and a string of digits in a base that
+# is not a power of 2 use a divide-and-conquer algorithm when the bigint
+# has more than FORMAT_DC_CUTOFF digits, or the string more than
+# PARSE_DC_CUTOFF chunks of digits (see BASE_MAX).  Both algorithms use
+# the cached powers returned by _get_power().
+FORMAT_DC_CUTOFF = 2 * KARATSUBA_CUTOFF
+FORMAT_LEAF_LEVEL = 4
+PARSE_DC_CUTOFF = 2 * KARATSUBA_CUTOFF
+
 
 def _mask_digit(x):
     if not we_are_translated():
@@ -1291,6 +1307,11 @@ def _divrem(a, b):
     if size_b == 1:
         z, urem = _divrem1(a, b.digit(0))
         rem = rbigint([_store_digit(urem)], int(urem != 0))
+    elif size_b > DIV_LIMIT and size_a - size_b > DIV_LIMIT:
+        z, rem = _divmod_fast_pos(a.abs(), b.abs())
+        # make sure that we don't change the sign of a shared object below
+        z = rbigint(z._digits, z.sign)
+        rem = rbigint(rem._digits, rem.sign)
     else:
         z, rem = _x_divrem(a, b)
     # Set the signs.
@@ -1303,6 +1324,103 @@ def _divrem(a, b):
         rem.sign = - rem.sign
     return z, rem
 
+def _lower_bits(a, nbits):
+    """ Return the 'nbits' lowest bits of the non-negative 'a' """
+    wordshift = nbits // SHIFT
+    remshift = nbits - wordshift * SHIFT
+    if wordshift >= a.numdigits():
+        return a
+    newsize = wordshift
+    if remshift:
+        newsize += 1
+    if newsize == 0:
+        return rbigint()
+    z = rbigint([NULLDIGIT] * newsize, 1)
+    i = 0
+    while i < wordshift:
+        z.setdigit(i, a.digit(i))
+        i += 1
+    if remshift:
+        z.setdigit(wordshift, a.digit(wordshift) & ((1 << remshift) - 1))
+    z._normalize()
+    return z
+
+def _div2n1n(a, b, n):
+    """ Divide a 2n-bit non-negative number 'a' by the n-bit 'b', as
+    in the algorithm of Burnikel and Ziegler.  The quotient must fit
+    in n bits. """
+    if a.numdigits() - b.numdigits() <= DIV_LIMIT:
+        return _divrem(a, b)
+    pad = n & 1
+    if pad:
+        a = a.lshift(1)
+        b = b.lshift(1)
+        n += 1
+    half_n = n >> 1
+    b1 = b.rshift(half_n)
+    b2 = _lower_bits(b, half_n)
+    q1, r = _div3n2n(a.rshift(n), _lower_bits(a.rshift(half_n), half_n),
+                     b, b1, b2, half_n)
+    q2, r = _div3n2n(r, _lower_bits(a, half_n), b, b1, b2, half_n)
+    if pad:
+        r = r.rshift(1)
+    return q1.lshift(half_n).add(q2), r
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    """ Helper for _div2n1n(): divide the 3n-bit number (a12 << n) + a3
+    by the 2n-bit number b == (b1 << n) + b2. """
+    if a12.rshift(n).eq(b1):
+        one = rbigint([_store_digit(1)], 1)
+        q = one.lshift(n).sub(one)
+        r = a12.sub(b1.lshift(n)).add(b1)
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = r.lshift(n).add(a3).sub(q.mul(b2))
+    while r.sign < 0:
+        q = q.sub(rbigint([_store_digit(1)], 1))
+        r = r.add(b)
+    return q, r
+
+def _int2digits(a, n, result, start, stop):
+    """ Split the non-negative 'a' into the items result[start:stop],
+    which are chunks of n bits, the least significant one first. """
+    if start + 1 == stop:
+        result[start] = a
+        return
+    mid = (start + stop) >> 1
+    shift = (mid - start) * n
+    upper = a.rshift(shift)
+    lower = _lower_bits(a, shift)
+    _int2digits(lower, n, result, start, mid)
+    _int2digits(upper, n, result, mid, stop)
+
+def _digits2int(digits, n, start, stop):
+    """ Inverse of _int2digits() """
+    if start + 1 == stop:
+        return digits[start]
+    mid = (start + stop) >> 1
+    shift = (mid - start) * n
+    upper = _digits2int(digits, n, mid, stop)
+    return upper.lshift(shift).add(_digits2int(digits, n, start, mid))
+
+def _divmod_fast_pos(a, b):
+    """ Division with remainder of the non-negative 'a' by the positive
+    'b', in time O(M(n) log n) where M(n) is the cost of a multiplication.
+    'a' is split into chunks of the size of 'b', which are divided one
+    after the other with _div2n1n(). """
+    n = b.bit_length()
+    size = (a.bit_length() + n - 1) // n
+    a_digits = [rbigint()] * size
+    _int2digits(a, n, a_digits, 0, size)
+    q_digits = [rbigint()] * size
+    r = rbigint()
+    i = size - 1
+    while i >= 0:
+        q_digits[i], r = _div2n1n(r.lshift(n).add(a_digits[i]), b, n)
+        i -= 1
+    q = _digits2int(q_digits, n, 0, size)
+    return q, r
+
 # ______________ conversions to double _______________
 
 def _AsScaledDouble(v):
@@ -1584,6 +1702,9 @@ def _format(a, digits, prefix='', suffix=''):
     base = len(digits)
     assert base >= 2 and base <= 36
 
+    if size_a > FORMAT_DC_CUTOFF and (base & (base - 1)) != 0:
+        return _format_large(a, digits, prefix, suffix)
+
     # Compute a rough upper bound for the length of the string
     i = base
     bits = 0
@@ -1691,6 +1812,47 @@ def _format(a, digits, prefix='', suffix=''):
     return ''.join(s[p:])
 
 
+def _format_large(a, digits, prefix, suffix):
+    """
+    Convert a large bigint to a string in a base that is not a power
+    of 2, by splitting it recursively with divmod() by the cached
+    powers of the base.
+    """
+    base = len(digits)
+    x = a.abs()
+    level = 0
+    while not x.lt(_get_power(base, level + 1)):
+        level += 1
+    output = StringBuilder()
+    if a.sign < 0:
+        output.append('-')
+    output.append(prefix)
+    _format_recursive(x, level, output, digits, 0)
+    output.append(suffix)
+    return output.build()
+
+def _format_recursive(x, level, output, digits, pad):
+    # 'x' is non-negative and less than _get_power(base, level + 1).
+    # If 'pad' is not zero, the digits of 'x' are written padded with
+    # zeroes to exactly 'pad' characters.
+    if level < FORMAT_LEAF_LEVEL:
+        s = _format(x, digits)
+        if pad:
+            output.append_multiple_char(digits[0], pad - len(s))
+        output.append(s)
+        return
+    base = len(digits)
+    top, bot = x.divmod(_get_power(base, level))
+    half = BASE_MAX_DIGITS[base] << level
+    if not pad and top.sign == 0:
+        _format_recursive(bot, level - 1, output, digits, 0)
+    else:
+        if pad:
+            _format_recursive(top, level - 1, output, digits, pad - half)
+        else:
+            _format_recursive(top, level - 1, output, digits, 0)
+        _format_recursive(bot, level - 1, output, digits, half)
+
 def _bitwise(a, op, b): # '&', '|', '^'
     """ Bitwise and/or/xor operations """
 
@@ -1857,6 +2019,47 @@ BASE_MAX = [0, 0] + [digits_max_for_base(_base) for _base in range(2, 37)]
 DEC_MAX = digits_max_for_base(10)
 assert DEC_MAX == BASE_MAX[10]
 
+def _count_digits(n, base):
+    result = 0
+    while n > 1:
+        n //= base
+        result += 1
+    return result
+
+# BASE_MAX[base] == base ** BASE_MAX_DIGITS[base]
+BASE_MAX_DIGITS = [0, 0] + [_count_digits(BASE_MAX[_base], _base)
+                            for _base in range(2, 37)]
+
+# _power_cache[base][level] == BASE_MAX[base] ** (2 ** level)
+_power_cache = [[] for _base in range(37)]
+
+def _get_power(base, level):
+    powers = _power_cache[base]
+    if not powers:
+        powers.append(rbigint.fromint(BASE_MAX[base]))
+    while len(powers) <= level:
+        last = powers[-1]
+        powers.append(last.mul(last))
+    return powers[level]
+
+def _chunks_to_bigint(chunks, base, start, stop):
+    # 'chunks' are the values of groups of BASE_MAX_DIGITS[base] digits,
+    # the most significant one first
+    if stop - start <= PARSE_DC_CUTOFF:
+        a = rbigint()
+        digitmax = BASE_MAX[base]
+        for i in range(start, stop):
+            a = _muladd1(a, digitmax, chunks[i])
+        return a
+    # split the chunks such that the lower part is a power of 2
+    level = 0
+    while (2 << level) < stop - start:
+        level += 1
+    mid = stop - (1 << level)
+    high = _chunks_to_bigint(chunks, base, start, mid)
+    low = _chunks_to_bigint(chunks, base, mid, stop)
+    return high.mul(_get_power(base, level)).add(low)
+
 def _decimalstr_to_bigint(s):
     # a string that has been already parsed to be decimal and valid,
     # is turned into a bigint
@@ -1869,7 +2072,7 @@ def _decimalstr_to_bigint(s):
     elif s[p] == '+':
         p += 1
 
-    a = rbigint()
+    chunks = []
     tens = 1
     dig = 0
     ord0 = ord('0')
@@ -1877,30 +2080,34 @@ def _decimalstr_to_bigint(s):
         dig = dig * 10 + ord(s[p]) - ord0
         p += 1
         tens *= 10
-        if tens == DEC_MAX or p == lim:
-            a = _muladd1(a, tens, dig)
+        if tens == DEC_MAX and p < lim:
+            chunks.append(dig)
             tens = 1
             dig = 0
+    a = _chunks_to_bigint(chunks, 10, 0, len(chunks))
+    a = _muladd1(a, tens, dig)
     if sign and a.sign == 1:
         a.sign = -1
     return a
 
 def parse_digit_string(parser):
     # helper for objspace.std.strutil
-    a = rbigint()
     base = parser.base
     digitmax = BASE_MAX[base]
+    chunks = []
     tens, dig = 1, 0
     while True:
         digit = parser.next_digit()
-        if tens == digitmax or digit < 0:
-            a = _muladd1(a, tens, dig)
-            if digit < 0:
-                break
+        if digit < 0:
+            break
+        if tens == digitmax:
+            chunks.append(dig)
             dig = digit
             tens = base
         else:
             dig = dig * base + digit
             tens *= base
+    a = _chunks_to_bigint(chunks, base, 0, len(chunks))
+    a = _muladd1(a, tens, dig)
     a.sign *= parser.sign
     return a
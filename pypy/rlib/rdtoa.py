@@ -1,5 +1,5 @@
 from __future__ import with_statement
-from pypy.rlib import rfloat
+from pypy.rlib import rfloat, rgrisu
 from pypy.translator.tool.cbuild import ExternalCompilationInfo
 from pypy.tool.autopath import pypydir
 from pypy.rpython.lltypesystem import lltype, rffi
@@ -290,6 +290,11 @@ def dtoa_formatd(value, code, precision, flags):
         # repr format
         mode = 0
         assert precision == 0
+        if rfloat.isfinite(value):
+            # try first the faster Grisu3 algorithm, written in RPython
+            result = rgrisu.repr_shortest(value, flags)
+            if result is not None:
+                return result
     else:
         raise ValueError('Invalid mode')
 
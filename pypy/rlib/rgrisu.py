@@ -0,0 +1,299 @@
+"""
+Shortest round-trip representation of floats, with the Grisu3 algorithm
+of Florian Loitsch, "Printing Floating-Point Numbers Quickly and
+Accurately with Integers" (PLDI 2010).  This is a port of the 'shortest'
+mode of fast-dtoa.cc from the double-conversion library.
+
+Grisu3 is pure integer arithmetic on 64-bit values.  For about 0.5% of
+the doubles it cannot prove that its result is the shortest correctly
+rounded one; grisu3_shortest() returns -1 in this case and the caller
+must fall back to the dtoa.c algorithm (see rdtoa.py).
+"""
+
+import math
+from pypy.rlib.rarithmetic import r_ulonglong, intmask
+from pypy.rlib.longlong2float import float2longlong
+from pypy.rlib.rstring import StringBuilder
+from pypy.rlib import rfloat
+
+UINT64_ONE = r_ulonglong(1)
+MASK32 = r_ulonglong(0xFFFFFFFF)
+
+SIGNIFICAND_SIZE = 53
+HIDDEN_BIT = UINT64_ONE << (SIGNIFICAND_SIZE - 1)
+SIGNIFICAND_MASK = HIDDEN_BIT - 1
+EXPONENT_BIAS = 0x3FF + SIGNIFICAND_SIZE - 1
+DENORMAL_EXPONENT = -EXPONENT_BIAS + 1
+
+# the scaled value of w must have a binary exponent in this range
+MINIMAL_TARGET_EXPONENT = -60
+MAXIMAL_TARGET_EXPONENT = -32
+
+
+def _make_cached_powers():
+    "NOT_RPYTHON: the 64-bit significands and binary exponents of the "
+    "powers of ten 10**-348, 10**-340, ... 10**340, rounded to nearest"
+    significands = []
+    binary_exponents = []
+    decimal_exponents = []
+    for k in range(-348, 341, 8):
+        if k >= 0:
+            num, den = 10 ** k, 1
+        else:
+            num, den = 1, 10 ** -k
+        e = num.bit_length() - den.bit_length() - 64
+        while True:
+            if e >= 0:
+                f, rem = divmod(num, den << e)
+                half = den << e
+            else:
+                f, rem = divmod(num << -e, den)
+                half = den
+            if f < (1 << 63):
+                e -= 1
+            elif f >= (1 << 64):
+                e += 1
+            else:
+                break
+        if 2 * rem >= half:
+            f += 1
+            if f == 1 << 64:
+                f >>= 1
+                e += 1
+        significands.append(r_ulonglong(f))
+        binary_exponents.append(e)
+        decimal_exponents.append(k)
+    return significands, binary_exponents, decimal_exponents
+
+(CACHED_POWERS_SIGNIFICAND, CACHED_POWERS_BINARY_EXPONENT,
+ CACHED_POWERS_DECIMAL_EXPONENT) = _make_cached_powers()
+CACHED_POWERS_OFFSET = 348
+DECIMAL_EXPONENT_DISTANCE = 8
+D_1_LOG2_10 = 0.30102999566398114     # 1 / log2(10)
+
+POWERS_OF_TEN = [r_ulonglong(10 ** _i) for _i in range(20)]
+
+
+def _multiply(f1, f2):
+    # the 64 highest bits of the 128-bit product f1 * f2, rounded
+    a = f1 >> 32
+    b = f1 & MASK32
+    c = f2 >> 32
+    d = f2 & MASK32
+    ac = a * c
+    bc = b * c
+    ad = a * d
+    bd = b * d
+    tmp = (bd >> 32) + (ad & MASK32) + (bc & MASK32)
+    tmp += UINT64_ONE << 31
+    return ac + (ad >> 32) + (bc >> 32) + (tmp >> 32)
+
+def _normalize_shift(f):
+    # the shift that brings the highest bit of f to bit 63
+    shift = 0
+    while not (f & (r_ulonglong(0xFFC00000) << 32)):
+        f <<= 10
+        shift += 10
+    while not (f & (UINT64_ONE << 63)):
+        f <<= 1
+        shift += 1
+    return shift
+
+def _biggest_power_ten(number):
+    # returns (power, exponent_plus_one) with power == 10**exponent the
+    # biggest power of ten that is <= number, or (0, 0) if number is 0
+    if number == 0:
+        return r_ulonglong(0), 0
+    exponent_plus_one = 1
+    while (exponent_plus_one < len(POWERS_OF_TEN) and
+           POWERS_OF_TEN[exponent_plus_one] <= number):
+        exponent_plus_one += 1
+    return POWERS_OF_TEN[exponent_plus_one - 1], exponent_plus_one
+
+
+def _round_weed(digits, distance_too_high_w, unsafe_interval, rest,
+                ten_kappa, unit):
+    # Adjusts the last digit of 'digits' to get as close as possible to
+    # w, and checks that the result is safe.  Returns the adjusted
+    # digits, or -1 if the result cannot be proven correct.
+    small_distance = distance_too_high_w - unit
+    big_distance = distance_too_high_w + unit
+    while (rest < small_distance and
+           unsafe_interval - rest >= ten_kappa and
+           (rest + ten_kappa < small_distance or
+            small_distance - rest >= rest + ten_kappa - small_distance)):
+        digits -= 1
+        rest += ten_kappa
+    if (rest < big_distance and
+        unsafe_interval - rest >= ten_kappa and
+        (rest + ten_kappa < big_distance or
+         big_distance - rest > rest + ten_kappa - big_distance)):
+        return -1
+    if 2 * unit <= rest and rest <= unsafe_interval - 4 * unit:
+        return intmask(digits)
+    return -1
+
+
+def grisu3_shortest(value):
+    """Compute the shortest digits that round-trip to the positive
+    finite float 'value'.  Returns (digits, length, decpt), where the
+    integer 'digits' has 'length' decimal digits and
+    value ~= 0.<digits> * 10**decpt.  Returns digits == -1 if Grisu3
+    cannot give a result that is proven correct."""
+    # decompose the double into f * 2**e
+    bits = r_ulonglong(float2longlong(value))
+    biased_e = intmask(bits >> (SIGNIFICAND_SIZE - 1)) & 0x7FF
+    f = bits & SIGNIFICAND_MASK
+    if biased_e == 0:
+        e = DENORMAL_EXPONENT
+    else:
+        f += HIDDEN_BIT
+        e = biased_e - EXPONENT_BIAS
+
+    # the boundaries m- and m+, halfway to the neighbouring doubles
+    plus_f = (f << 1) + 1
+    plus_e = e - 1
+    shift = _normalize_shift(plus_f)
+    plus_f <<= shift
+    plus_e -= shift
+    if f == HIDDEN_BIT and biased_e > 1:
+        # the lower boundary is closer
+        minus_f = (f << 2) - 1
+        minus_e = e - 2
+    else:
+        minus_f = (f << 1) - 1
+        minus_e = e - 1
+    minus_f <<= minus_e - plus_e
+
+    # normalize w; it gets the same exponent as the boundaries
+    shift = _normalize_shift(f)
+    w_f = f << shift
+    w_e = e - shift
+    assert w_e == plus_e
+
+    # find the cached power of ten ten_mk = 10**mk such that the
+    # binary exponent of w * ten_mk is in the target range
+    min_exponent = MINIMAL_TARGET_EXPONENT - (w_e + 64)
+    k = int(math.ceil((min_exponent + 63) * D_1_LOG2_10))
+    index = ((CACHED_POWERS_OFFSET + k - 1) // DECIMAL_EXPONENT_DISTANCE
+             + 1)
+    ten_mk_f = CACHED_POWERS_SIGNIFICAND[index]
+    ten_mk_e = CACHED_POWERS_BINARY_EXPONENT[index]
+    mk = CACHED_POWERS_DECIMAL_EXPONENT[index]
+
+    # scale w and the boundaries
+    w_f = _multiply(w_f, ten_mk_f)
+    low_f = _multiply(minus_f, ten_mk_f)
+    high_f = _multiply(plus_f, ten_mk_f)
+    one_e = w_e + ten_mk_e + 64
+    assert MINIMAL_TARGET_EXPONENT <= one_e <= MAXIMAL_TARGET_EXPONENT
+
+    # generate the digits: the scaled values are only known within one
+    # unit, so generate the digits of too_high and stop as soon as the
+    # rest is within the unsafe interval
+    unit = UINT64_ONE
+    too_low = low_f - unit
+    too_high = high_f + unit
+    unsafe_interval = too_high - too_low
+    one_shift = -one_e
+    one_f = UINT64_ONE << one_shift
+    integrals = too_high >> one_shift
+    fractionals = too_high & (one_f - 1)
+    divisor, kappa = _biggest_power_ten(integrals)
+    digits = r_ulonglong(0)
+    length = 0
+    while kappa > 0:
+        digit = integrals // divisor
+        digits = digits * 10 + digit
+        length += 1
+        integrals = integrals % divisor
+        kappa -= 1
+        rest = (integrals << one_shift) + fractionals
+        if rest < unsafe_interval:
+            result = _round_weed(digits, too_high - w_f, unsafe_interval,
+                                 rest, divisor << one_shift, unit)
+            return result, length, length + kappa - mk
+        divisor = divisor // 10
+    while True:
+        fractionals *= 10
+        unit *= 10
+        unsafe_interval *= 10
+        digit = fractionals >> one_shift
+        digits = digits * 10 + digit
+        length += 1
+        fractionals &= one_f - 1
+        kappa -= 1
+        if fractionals < unsafe_interval:
+            result = _round_weed(digits, (too_high - w_f) * unit,
+                                 unsafe_interval, fractionals, one_f, unit)
+            return result, length, length + kappa - mk
+
+
+def _append_digits(builder, digits, length, start, stop):
+    # append the digits start to stop-1 of the integer 'digits'
+    i = start
+    while i < stop:
+        power = POWERS_OF_TEN[length - 1 - i]
+        digit = intmask((r_ulonglong(digits) // power) % 10)
+        builder.append(chr(ord('0') + digit))
+        i += 1
+
+def format_shortest(digits, length, decpt, sign, flags):
+    """Format the digits returned by grisu3_shortest() like
+    rdtoa.format_number() does with code 'r'."""
+    builder = StringBuilder(25)
+    # convert to exponential format at 1e16, like format_number()
+    use_exp = decpt <= -4 or decpt > 16
+    if use_exp:
+        exp = decpt - 1
+        decpt = 1
+    else:
+        exp = 0
+
+    if sign:
+        builder.append('-')
+    elif flags & rfloat.DTSF_SIGN:
+        builder.append('+')
+
+    if decpt <= 0:
+        builder.append('0.')
+        builder.append_multiple_char('0', -decpt)
+        _append_digits(builder, digits, length, 0, length)
+    elif decpt < length:
+        _append_digits(builder, digits, length, 0, decpt)
+        builder.append('.')
+        _append_digits(builder, digits, length, decpt, length)
+    else:
+        _append_digits(builder, digits, length, 0, length)
+        builder.append_multiple_char('0', decpt - length)
+        if not use_exp and flags & rfloat.DTSF_ADD_DOT_0:
+            builder.append('.0')
+        elif flags & rfloat.DTSF_ALT:
+            builder.append('.')
+
+    if use_exp:
+        builder.append('e')
+        if exp >= 0:
+            builder.append('+')
+        else:
+            builder.append('-')
+            exp = -exp
+        if exp < 10:
+            builder.append('0')
+        builder.append(str(exp))
+    return builder.build()
+
+
+def repr_shortest(value, flags):
+    """Return the formatting of the finite float 'value' with code 'r',
+    or None if Grisu3 fails and dtoa.c must be used."""
+    sign = rfloat.copysign(1.0, value) < 0.0
+    if value == 0.0:
+        return format_shortest(0, 1, 1, sign, flags)
+    digits, length, decpt = grisu3_shortest(abs(value))
+    if digits < 0:
+        return None
+    while length > 1 and digits % 10 == 0:
+        digits //= 10
+        length -= 1
+    return format_shortest(digits, length, decpt, sign, flags)
@@ -530,6 +530,49 @@ class TestInternalFunctions(object):
                 div, rem = lobj._x_divrem(f1, f2)
                 assert div.tolong(), rem.tolong() == divmod(sx, sy)
 
+    def test__divmod_fast_pos(self, monkeypatch):
+        monkeypatch.setattr(lobj, "DIV_LIMIT", 2)
+        for i in range(30):
+            x = long(randint(0, 1 << randint(1, 1500)))
+            y = long(randint(1, 1 << randint(1, 700)))
+            div, rem = lobj._divmod_fast_pos(rbigint.fromlong(x),
+                                             rbigint.fromlong(y))
+            assert (div.tolong(), rem.tolong()) == divmod(x, y)
+
+    def test_divmod_large(self, monkeypatch):
+        monkeypatch.setattr(lobj, "DIV_LIMIT", 2)
+        x = 3 ** 1000 + 17
+        y = 7 ** 200
+        for sx, sy in (1, 1), (1, -1), (-1, -1), (-1, 1):
+            div, rem = rbigint.fromlong(sx * x).divmod(rbigint.fromlong(sy * y))
+            assert (div.tolong(), rem.tolong()) == divmod(sx * x, sy * y)
+
+    def test__lower_bits(self):
+        x = 3 ** 100
+        for nbits in [0, 1, 30, 31, 32, 62, 100, 158, 159, 200]:
+            res = lobj._lower_bits(rbigint.fromlong(x), nbits)
+            assert res.tolong() == x & ((1 << nbits) - 1)
+
+    def test__format_large(self, monkeypatch):
+        monkeypatch.setattr(lobj, "FORMAT_DC_CUTOFF", 4)
+        monkeypatch.setattr(lobj, "FORMAT_LEAF_LEVEL", 1)
+        for x in [10 ** 150, 10 ** 150 - 1, -7 ** 300, 10 ** 100 * 9 + 1,
+                  long(randint(0, 1 << 3000))]:
+            assert rbigint.fromlong(x).str() == str(x)
+            assert rbigint.fromlong(x).repr() == repr(x)
+            assert (rbigint.fromlong(x).format('0123456789abc') ==
+                    lobj._format(rbigint.fromlong(x), '0123456789abc'))
+        # base 13, checked against the quadratic algorithm
+        x = rbigint.fromlong(5 ** 400)
+        res = x.format('0123456789abc')
+        monkeypatch.setattr(lobj, "FORMAT_DC_CUTOFF", 10000)
+        assert res == x.format('0123456789abc')
+
+    def test__chunks_to_bigint(self, monkeypatch):
+        monkeypatch.setattr(lobj, "PARSE_DC_CUTOFF", 2)
+        for s in ['1' * 200, '9' * 91, '1' + '0' * 300, '-' + '12345' * 37]:
+            assert rbigint.fromdecimalstr(s).tolong() == long(s)
+
     # testing Karatsuba stuff
     def test__v_iadd(self):
         f1 = bigint([lobj.MASK] * 10, 1)
@@ -626,6 +669,18 @@ class TestInternalFunctions(object):
         x = parse_digit_string(Parser(7, -1, [0, 0, 0]))
         assert x.tobool() is False
 
+    def test_parse_digit_string_large(self, monkeypatch):
+        from pypy.rlib.rbigint import parse_digit_string
+        monkeypatch.setattr(lobj, "PARSE_DC_CUTOFF", 2)
+        class Parser:
+            def __init__(self, base, sign, digits):
+                self.base = base
+                self.sign = sign
+                self.next_digit = iter(digits + [-1]).next
+        digits = [randint(0, 6) for i in range(500)]
+        x = parse_digit_string(Parser(7, -1, digits))
+        assert x.tolong() == -long(''.join([str(d) for d in digits]), 7)
+
 
 BASE = 2 ** SHIFT
 
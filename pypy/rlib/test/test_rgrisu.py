@@ -0,0 +1,63 @@
+import random, struct
+from pypy.rlib.rgrisu import grisu3_shortest, repr_shortest
+from pypy.rlib.rdtoa import dtoa, dtoa_formatd
+from pypy.rlib import rfloat
+from pypy.rpython.test.test_llinterp import interpret
+
+def check(x, flags=0):
+    res = repr_shortest(x, flags)
+    if res is not None:
+        assert res == dtoa(x, 'r', 0, 0, flags)
+    return res
+
+def test_grisu3_shortest():
+    assert grisu3_shortest(1.0) == (1, 1, 1)
+    assert grisu3_shortest(0.3) == (3, 1, 0)
+    assert grisu3_shortest(123.456) == (123456, 6, 3)
+    assert grisu3_shortest(1e-7) == (1, 1, -6)
+    assert grisu3_shortest(5e-324) == (5, 1, -323)
+    assert grisu3_shortest(1.7976931348623157e308) == (
+        17976931348623157, 17, 309)
+
+def test_repr_shortest():
+    for x in [0.0, -0.0, 1.0, -1.5, 100.0, 0.1, 0.3, 1e16, 1e17,
+              1e-4, 1e-5, 123456789.125, 5e-324, 2.2250738585072014e-308,
+              1.7976931348623157e308, 1e22, 3.14159, -2.5e-300]:
+        for flags in [0, rfloat.DTSF_ADD_DOT_0, rfloat.DTSF_SIGN,
+                      rfloat.DTSF_ALT]:
+            assert check(x, flags) is not None
+    assert repr_shortest(10.0, 0) == "10"
+    assert repr_shortest(10.0, rfloat.DTSF_ADD_DOT_0) == "10.0"
+    assert repr_shortest(1e16, rfloat.DTSF_ADD_DOT_0) == "1e+16"
+    assert repr_shortest(-0.0, rfloat.DTSF_ADD_DOT_0) == "-0.0"
+    assert repr_shortest(1.5, rfloat.DTSF_SIGN) == "+1.5"
+
+def test_random_doubles():
+    rnd = random.Random(42)
+    fallbacks = 0
+    for i in range(20000):
+        x = struct.unpack('d', struct.pack('Q', rnd.getrandbits(64)))[0]
+        if not rfloat.isfinite(x):
+            continue
+        if check(x) is None:
+            fallbacks += 1
+    assert fallbacks < 200
+
+def test_fallback():
+    # Grisu3 cannot prove the shortest result for these ones
+    for x, expected in [(4.9169361285135947e-51, '4.9169361285135947e-51'),
+                        (1e23, '1e+23'),
+                        (2e16+8, '2.000000000000001e+16')]:
+        assert grisu3_shortest(x)[0] == -1
+        assert repr_shortest(x, 0) is None
+        assert dtoa_formatd(x, 'r', 0, 0) == expected
+
+def test_translated():
+    def f(x, flags):
+        res = repr_shortest(x, flags)
+        if res is None:
+            return 'fallback'
+        return res
+    for x in [1.25, 1e100, 0.1, -7e-10]:
+        res = interpret(f, [x, rfloat.DTSF_ADD_DOT_0])
+        assert ''.join(res.chars) == repr(x)
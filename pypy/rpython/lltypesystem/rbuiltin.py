@@ -1,8 +1,10 @@
+import collections
 from pypy.tool.pairtype import pairtype
 from pypy.annotation import model as annmodel
 from pypy.rpython.lltypesystem import lltype
 from pypy.rpython.lltypesystem import rclass
 from pypy.rpython.lltypesystem.rdict import rtype_r_dict
+from pypy.rpython.lltypesystem.rordereddict import rtype_ordereddict
 from pypy.rlib import objectmodel
 from pypy.rpython.rmodel import TyperError, Constant
 from pypy.rpython.robject import pyobj_repr
@@ -66,6 +68,8 @@ BUILTIN_TYPER[isinstance] = rtype_builtin_isinstance
 BUILTIN_TYPER[hasattr] = rtype_builtin_hasattr
 BUILTIN_TYPER[__import__] = rtype_builtin___import__
 BUILTIN_TYPER[objectmodel.r_dict] = rtype_r_dict
+BUILTIN_TYPER[objectmodel.r_ordereddict] = rtype_r_dict
+BUILTIN_TYPER[collections.OrderedDict] = rtype_ordereddict
 
 # _________________________________________________________________
 # weakrefs
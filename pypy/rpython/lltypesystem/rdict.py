@@ -3,7 +3,7 @@ from pypy.annotation import model as annmodel
 from pypy.objspace.flow.model import Constant
 from pypy.rpython.rdict import AbstractDictRepr, AbstractDictIteratorRepr,\
      rtype_newdict
-from pypy.rpython.lltypesystem import lltype
+from pypy.rpython.lltypesystem import lltype, rordereddict
 from pypy.rlib.rarithmetic import r_uint, intmask, LONG_BIT
 from pypy.rlib.objectmodel import hlinvoke
 from pypy.rpython import robject
@@ -616,6 +616,9 @@ def ll_dict_lookup_clean(d, hash):
 DICT_INITSIZE = 8
 
 def ll_newdict(DICT):
+    if hasattr(DICT, 'indexes'):
+        # the compact layout of rordereddict.py
+        return rordereddict.ll_newdict(DICT)
     d = DICT.allocate()
     d.entries = DICT.entries.TO.allocate(DICT_INITSIZE)
     d.num_items = 0
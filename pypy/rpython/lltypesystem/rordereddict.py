@@ -0,0 +1,959 @@
+from pypy.tool.pairtype import pairtype
+from pypy.objspace.flow.model import Constant
+from pypy.rpython.rdict import AbstractDictRepr, AbstractDictIteratorRepr
+from pypy.rpython.lltypesystem import lltype, llmemory, rffi
+from pypy.rlib.rarithmetic import r_uint, intmask, LONG_BIT
+from pypy.rlib.objectmodel import hlinvoke
+from pypy.rlib import objectmodel, jit
+from pypy.rpython import rmodel
+
+# ____________________________________________________________
+#
+#  compact implementation of RPython dictionary, with parametric DICTKEY
+#  and DICTVALUE types.  The entries are stored densely, in insertion
+#  order, in the 'entries' array; the hash table proper is the 'indexes'
+#  array, whose items are either FREE, DELETED, or the position of an
+#  entry plus VALID_OFFSET.  Depending on the size of the dict, the items
+#  of 'indexes' are 1, 2, 4 or 8 bytes wide.
+#
+#    struct dictentry {
+#        DICTKEY key;
+#        bool f_valid;      # (optional) the entry is filled
+#        DICTVALUE value;
+#        int f_hash;        # (optional) key hash, if hard to recompute
+#    }
+#
+#    struct dicttable {
+#        int num_live_items;
+#        int num_ever_used_items;   # entries[0:num_ever_used_items] in use
+#        int resize_counter;        # number of insertions before a resize
+#        GCREF indexes;             # Array of UCHAR/USHORT/UINT/Unsigned
+#        int lookup_function_no;    # FUNC_BYTE/FUNC_SHORT/FUNC_INT/FUNC_LONG
+#        Array *entries;
+#        (Function DICTKEY, DICTKEY -> bool) *fnkeyeq;
+#        (Function DICTKEY -> int) *fnkeyhash;
+#    }
+#
+#
+
+class OrderedDictRepr(AbstractDictRepr):
+
+    def __init__(self, rtyper, key_repr, value_repr, dictkey, dictvalue,
+                 custom_eq_hash=None, force_non_null=False):
+        self.rtyper = rtyper
+        self.DICT = lltype.GcForwardReference()
+        self.lowleveltype = lltype.Ptr(self.DICT)
+        self.custom_eq_hash = custom_eq_hash is not None
+        if not isinstance(key_repr, rmodel.Repr):  # not computed yet, done by setup()
+            assert callable(key_repr)
+            self._key_repr_computer = key_repr
+        else:
+            self.external_key_repr, self.key_repr = self.pickkeyrepr(key_repr)
+        if not isinstance(value_repr, rmodel.Repr):  # not computed yet, done by setup()
+            assert callable(value_repr)
+            self._value_repr_computer = value_repr
+        else:
+            self.external_value_repr, self.value_repr = self.pickrepr(value_repr)
+        self.dictkey = dictkey
+        self.dictvalue = dictvalue
+        self.dict_cache = {}
+        self._custom_eq_hash_repr = custom_eq_hash
+        self.force_non_null = force_non_null
+        # setup() needs to be called to finish this initialization
+
+    def _externalvsinternal(self, rtyper, item_repr):
+        return rmodel.externalvsinternal(self.rtyper, item_repr)
+
+    def _setup_repr(self):
+        if 'key_repr' not in self.__dict__:
+            key_repr = self._key_repr_computer()
+            self.external_key_repr, self.key_repr = self.pickkeyrepr(key_repr)
+        if 'value_repr' not in self.__dict__:
+            self.external_value_repr, self.value_repr = self.pickrepr(self._value_repr_computer())
+        if isinstance(self.DICT, lltype.GcForwardReference):
+            self.DICTKEY = self.key_repr.lowleveltype
+            self.DICTVALUE = self.value_repr.lowleveltype
+
+            # compute the shape of the DICTENTRY structure
+            entryfields = []
+            entrymeths = {
+                'allocate': lltype.typeMethod(_ll_malloc_entries),
+                'delete': _ll_free_entries,
+                'must_clear_key':   (isinstance(self.DICTKEY, lltype.Ptr)
+                                     and self.DICTKEY._needsgc()),
+                'must_clear_value': (isinstance(self.DICTVALUE, lltype.Ptr)
+                                     and self.DICTVALUE._needsgc()),
+                }
+
+            # * the key
+            entryfields.append(("key", self.DICTKEY))
+
+            # * if NULL is not a valid ll value for the key or the value
+            #   field of the entry, it can be used as a marker for
+            #   deleted entries.  Otherwise, we need an explicit flag.
+            #   Unlike in rdict.py, no 'everused' state and no dummy
+            #   objects are needed: the 'indexes' array keeps track of
+            #   the deleted slots of the hash table.
+            s_key   = self.dictkey.s_value
+            s_value = self.dictvalue.s_value
+            nullkeymarker = not self.key_repr.can_ll_be_null(s_key)
+            nullvaluemarker = not self.value_repr.can_ll_be_null(s_value)
+            if self.force_non_null:
+                if not nullkeymarker:
+                    rmodel.warning("%s can be null, but forcing non-null in dict key" % s_key)
+                    nullkeymarker = True
+                if not nullvaluemarker:
+                    rmodel.warning("%s can be null, but forcing non-null in dict value" % s_value)
+                    nullvaluemarker = True
+
+            if nullkeymarker and isinstance(self.DICTKEY, lltype.Ptr):
+                entrymeths['valid'] = ll_valid_from_key
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_key
+                # the key is reset to NULL when the entry is deleted
+                entrymeths['must_clear_key'] = False
+            elif nullvaluemarker and isinstance(self.DICTVALUE, lltype.Ptr):
+                entrymeths['valid'] = ll_valid_from_value
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_value
+                # the value is reset to NULL when the entry is deleted
+                entrymeths['must_clear_value'] = False
+            else:
+                entryfields.append(("f_valid", lltype.Bool))
+                entrymeths['valid'] = ll_valid_from_flag
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_flag
+
+            # * the value
+            entryfields.append(("value", self.DICTVALUE))
+
+            # * the hash, if needed
+            if self.custom_eq_hash:
+                fasthashfn = None
+            else:
+                fasthashfn = self.key_repr.get_ll_fasthash_function()
+            if fasthashfn is None:
+                entryfields.append(("f_hash", lltype.Signed))
+                entrymeths['hash'] = ll_hash_from_cache
+            else:
+                entrymeths['hash'] = ll_hash_recomputed
+                entrymeths['fasthashfn'] = fasthashfn
+
+            # Build the lltype data structures
+            self.DICTENTRY = lltype.Struct("odictentry", *entryfields)
+            self.DICTENTRYARRAY = lltype.GcArray(self.DICTENTRY,
+                                                 adtmeths=entrymeths)
+            fields =          [ ("num_live_items", lltype.Signed),
+                                ("num_ever_used_items", lltype.Signed),
+                                ("resize_counter", lltype.Signed),
+                                ("indexes", llmemory.GCREF),
+                                ("lookup_function_no", lltype.Signed),
+                                ("entries", lltype.Ptr(self.DICTENTRYARRAY)) ]
+            if self.custom_eq_hash:
+                self.r_rdict_eqfn, self.r_rdict_hashfn = self._custom_eq_hash_repr()
+                fields.extend([ ("fnkeyeq", self.r_rdict_eqfn.lowleveltype),
+                                ("fnkeyhash", self.r_rdict_hashfn.lowleveltype) ])
+                adtmeths = {
+                    'keyhash':        ll_keyhash_custom,
+                    'keyeq':          ll_keyeq_custom,
+                    'r_rdict_eqfn':   self.r_rdict_eqfn,
+                    'r_rdict_hashfn': self.r_rdict_hashfn,
+                    'paranoia':       True,
+                    }
+            else:
+                # figure out which functions must be used to hash and compare
+                ll_keyhash = self.key_repr.get_ll_hash_function()
+                ll_keyeq = self.key_repr.get_ll_eq_function()  # can be None
+                ll_keyhash = lltype.staticAdtMethod(ll_keyhash)
+                if ll_keyeq is not None:
+                    ll_keyeq = lltype.staticAdtMethod(ll_keyeq)
+                adtmeths = {
+                    'keyhash':  ll_keyhash,
+                    'keyeq':    ll_keyeq,
+                    'paranoia': False,
+                    }
+            adtmeths['KEY']   = self.DICTKEY
+            adtmeths['VALUE'] = self.DICTVALUE
+            adtmeths['allocate'] = lltype.typeMethod(_ll_malloc_dict)
+            self.DICT.become(lltype.GcStruct("odicttable", adtmeths=adtmeths,
+                                             *fields))
+
+
+    def convert_const(self, dictobj):
+        # get object from bound dict methods
+        #dictobj = getattr(dictobj, '__self__', dictobj)
+        if dictobj is None:
+            return lltype.nullptr(self.DICT)
+        if not isinstance(dictobj, (dict, objectmodel.r_dict)):
+            raise TypeError("expected a dict: %r" % (dictobj,))
+        try:
+            key = Constant(dictobj)
+            return self.dict_cache[key]
+        except KeyError:
+            self.setup()
+            l_dict = ll_newdict_size(self.DICT, len(dictobj))
+            self.dict_cache[key] = l_dict
+            r_key = self.key_repr
+            if r_key.lowleveltype == llmemory.Address:
+                raise TypeError("No prebuilt dicts of address keys")
+            r_value = self.value_repr
+            if isinstance(dictobj, objectmodel.r_dict):
+                if self.r_rdict_eqfn.lowleveltype != lltype.Void:
+                    l_fn = self.r_rdict_eqfn.convert_const(dictobj.key_eq)
+                    l_dict.fnkeyeq = l_fn
+                if self.r_rdict_hashfn.lowleveltype != lltype.Void:
+                    l_fn = self.r_rdict_hashfn.convert_const(dictobj.key_hash)
+                    l_dict.fnkeyhash = l_fn
+
+                for dictkeycontainer, dictvalue in dictobj._dict.items():
+                    llkey = r_key.convert_const(dictkeycontainer.key)
+                    llvalue = r_value.convert_const(dictvalue)
+                    ll_dict_insertclean(l_dict, llkey, llvalue,
+                                        dictkeycontainer.hash)
+                return l_dict
+
+            else:
+                for dictkey, dictvalue in dictobj.items():
+                    llkey = r_key.convert_const(dictkey)
+                    llvalue = r_value.convert_const(dictvalue)
+                    ll_dict_insertclean(l_dict, llkey, llvalue,
+                                        l_dict.keyhash(llkey))
+                return l_dict
+
+    def rtype_len(self, hop):
+        v_dict, = hop.inputargs(self)
+        return hop.gendirectcall(ll_dict_len, v_dict)
+
+    def rtype_is_true(self, hop):
+        v_dict, = hop.inputargs(self)
+        return hop.gendirectcall(ll_dict_is_true, v_dict)
+
+    def make_iterator_repr(self, *variant):
+        return OrderedDictIteratorRepr(self, *variant)
+
+    def rtype_method_get(self, hop):
+        v_dict, v_key, v_default = hop.inputargs(self, self.key_repr,
+                                                 self.value_repr)
+        hop.exception_cannot_occur()
+        v_res = hop.gendirectcall(ll_get, v_dict, v_key, v_default)
+        return self.recast_value(hop.llops, v_res)
+
+    def rtype_method_setdefault(self, hop):
+        v_dict, v_key, v_default = hop.inputargs(self, self.key_repr,
+                                                 self.value_repr)
+        hop.exception_cannot_occur()
+        v_res = hop.gendirectcall(ll_setdefault, v_dict, v_key, v_default)
+        return self.recast_value(hop.llops, v_res)
+
+    def rtype_method_copy(self, hop):
+        v_dict, = hop.inputargs(self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_copy, v_dict)
+
+    def rtype_method_update(self, hop):
+        v_dic1, v_dic2 = hop.inputargs(self, self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_update, v_dic1, v_dic2)
+
+    def _rtype_method_kvi(self, hop, ll_func):
+        v_dic, = hop.inputargs(self)
+        r_list = hop.r_result
+        cLIST = hop.inputconst(lltype.Void, r_list.lowleveltype.TO)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_func, cLIST, v_dic)
+
+    def rtype_method_keys(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_keys)
+
+    def rtype_method_values(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_values)
+
+    def rtype_method_items(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_items)
+
+    def rtype_method_iterkeys(self, hop):
+        hop.exception_cannot_occur()
+        return OrderedDictIteratorRepr(self, "keys").newiter(hop)
+
+    def rtype_method_itervalues(self, hop):
+        hop.exception_cannot_occur()
+        return OrderedDictIteratorRepr(self, "values").newiter(hop)
+
+    def rtype_method_iteritems(self, hop):
+        hop.exception_cannot_occur()
+        return OrderedDictIteratorRepr(self, "items").newiter(hop)
+
+    def rtype_method_clear(self, hop):
+        v_dict, = hop.inputargs(self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_clear, v_dict)
+
+    def rtype_method_popitem(self, hop):
+        v_dict, = hop.inputargs(self)
+        r_tuple = hop.r_result
+        cTUPLE = hop.inputconst(lltype.Void, r_tuple.lowleveltype)
+        hop.exception_is_here()
+        return hop.gendirectcall(ll_popitem, cTUPLE, v_dict)
+
+class __extend__(pairtype(OrderedDictRepr, rmodel.Repr)):
+
+    def rtype_getitem((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        if not r_dict.custom_eq_hash:
+            hop.has_implicit_exception(KeyError)   # record that we know about it
+        hop.exception_is_here()
+        v_res = hop.gendirectcall(ll_dict_getitem, v_dict, v_key)
+        return r_dict.recast_value(hop.llops, v_res)
+
+    def rtype_delitem((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        if not r_dict.custom_eq_hash:
+            hop.has_implicit_exception(KeyError)   # record that we know about it
+        hop.exception_is_here()
+        return hop.gendirectcall(ll_dict_delitem, v_dict, v_key)
+
+    def rtype_setitem((r_dict, r_key), hop):
+        v_dict, v_key, v_value = hop.inputargs(r_dict, r_dict.key_repr, r_dict.value_repr)
+        if r_dict.custom_eq_hash:
+            hop.exception_is_here()
+        else:
+            hop.exception_cannot_occur()
+        hop.gendirectcall(ll_dict_setitem, v_dict, v_key, v_value)
+
+    def rtype_contains((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        hop.exception_is_here()
+        return hop.gendirectcall(ll_contains, v_dict, v_key)
+
+class __extend__(pairtype(OrderedDictRepr, OrderedDictRepr)):
+    def convert_from_to((r_dict1, r_dict2), v, llops):
+        # check that we don't convert from Dicts with
+        # different key/value types
+        if r_dict1.dictkey is None or r_dict2.dictkey is None:
+            return NotImplemented
+        if r_dict1.dictkey is not r_dict2.dictkey:
+            return NotImplemented
+        if r_dict1.dictvalue is None or r_dict2.dictvalue is None:
+            return NotImplemented
+        if r_dict1.dictvalue is not r_dict2.dictvalue:
+            return NotImplemented
+        return v
+
+# ____________________________________________________________
+#
+#  Low-level methods.  These can be run for testing, but are meant to
+#  be direct_call'ed from rtyped flow graphs, which means that they will
+#  get flowed and annotated, mostly with SomePtr.
+
+def ll_valid_from_flag(entries, i):
+    return entries[i].f_valid
+
+def ll_mark_deleted_in_flag(entries, i):
+    entries[i].f_valid = False
+
+def ll_valid_from_key(entries, i):
+    return bool(entries[i].key)
+
+def ll_mark_deleted_in_key(entries, i):
+    ENTRY = lltype.typeOf(entries).TO.OF
+    entries[i].key = lltype.nullptr(ENTRY.key.TO)
+
+def ll_valid_from_value(entries, i):
+    return bool(entries[i].value)
+
+def ll_mark_deleted_in_value(entries, i):
+    ENTRY = lltype.typeOf(entries).TO.OF
+    entries[i].value = lltype.nullptr(ENTRY.value.TO)
+
+def ll_hash_from_cache(entries, i):
+    return entries[i].f_hash
+
+def ll_hash_recomputed(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    return ENTRIES.fasthashfn(entries[i].key)
+
+@jit.dont_look_inside
+def ll_get_value(d, i):
+    return d.entries[i].value
+
+def ll_keyhash_custom(d, key):
+    DICT = lltype.typeOf(d).TO
+    return hlinvoke(DICT.r_rdict_hashfn, d.fnkeyhash, key)
+
+def ll_keyeq_custom(d, key1, key2):
+    DICT = lltype.typeOf(d).TO
+    return hlinvoke(DICT.r_rdict_eqfn, d.fnkeyeq, key1, key2)
+
+def ll_dict_len(d):
+    return d.num_live_items
+
+def ll_dict_is_true(d):
+    # check if a dict is True, allowing for None
+    return bool(d) and d.num_live_items != 0
+
+def ll_dict_getitem(d, key):
+    i = ll_dict_lookup(d, key, d.keyhash(key), FLAG_LOOKUP)
+    if i >= 0:
+        return ll_get_value(d, i)
+    else:
+        raise KeyError
+
+def ll_dict_setitem(d, key, value):
+    hash = d.keyhash(key)
+    i = ll_dict_lookup(d, key, hash, FLAG_STORE)
+    return _ll_dict_setitem_lookup_done(d, key, value, hash, i)
+
+@jit.dont_look_inside
+def _ll_dict_setitem_lookup_done(d, key, value, hash, i):
+    # 'i' is the index of the existing entry, or -1 if ll_dict_lookup()
+    # reserved the next free entry for the new key
+    if i >= 0:
+        d.entries[i].value = value
+        return
+    ENTRY = lltype.typeOf(d.entries).TO.OF
+    i = d.num_ever_used_items
+    entry = d.entries[i]
+    entry.key = key
+    entry.value = value
+    if hasattr(ENTRY, 'f_hash'):  entry.f_hash = hash
+    if hasattr(ENTRY, 'f_valid'): entry.f_valid = True
+    d.num_ever_used_items = i + 1
+    d.num_live_items += 1
+    d.resize_counter -= 1
+
+def ll_dict_insertclean(d, key, value, hash):
+    # Internal routine used by convert_const() to insert an item which is
+    # known to be absent from the dict.  This routine also assumes that
+    # there is room for one more entry.  It never calls d.keyhash() and
+    # d.keyeq(), so it cannot call back to user code.
+    ENTRY = lltype.typeOf(d.entries).TO.OF
+    i = d.num_ever_used_items
+    entry = d.entries[i]
+    entry.key = key
+    entry.value = value
+    if hasattr(ENTRY, 'f_hash'):  entry.f_hash = hash
+    if hasattr(ENTRY, 'f_valid'): entry.f_valid = True
+    ll_index_insert_clean(d, hash, i)
+    d.num_ever_used_items = i + 1
+    d.num_live_items += 1
+    d.resize_counter -= 1
+
+def ll_dict_delitem(d, key):
+    i = ll_dict_lookup(d, key, d.keyhash(key), FLAG_DELETE)
+    if i < 0:
+        raise KeyError
+    _ll_dict_del(d, i)
+
+@jit.dont_look_inside
+def _ll_dict_del(d, i):
+    # the slot in 'indexes' must already be marked as DELETED
+    d.entries.mark_deleted(i)
+    d.num_live_items -= 1
+    # clear the key and the value if they are GC pointers
+    ENTRIES = lltype.typeOf(d.entries).TO
+    ENTRY = ENTRIES.OF
+    entry = d.entries[i]
+    if ENTRIES.must_clear_key:
+        entry.key = lltype.nullptr(ENTRY.key.TO)
+    if ENTRIES.must_clear_value:
+        entry.value = lltype.nullptr(ENTRY.value.TO)
+    if i == d.num_ever_used_items - 1:
+        # the last entry can be reused by the next insertion
+        d.num_ever_used_items = i
+    num_entries = len(d.entries)
+    if (num_entries > _ll_usable(DICT_INITSIZE) and
+            d.num_live_items < num_entries / 4):
+        ll_dict_resize(d)
+
+def ll_dict_resize(d):
+    # Compact the live entries at the start of a new 'entries' array,
+    # keeping their order, and rebuild 'indexes' with a size that leaves
+    # room for as many new items as there are live items (with a minimum
+    # of DICT_INITSIZE).  This is also how the dict shrinks.
+    new_size = DICT_INITSIZE
+    while _ll_usable(new_size) <= d.num_live_items * 2:
+        new_size *= 2
+    ll_dict_reindex(d, new_size)
+
+def ll_dict_reindex(d, new_size):
+    old_entries = d.entries
+    ENTRIES = lltype.typeOf(old_entries).TO
+    ENTRY = ENTRIES.OF
+    new_entries = ENTRIES.allocate(_ll_usable(new_size))
+    num_ever_used = d.num_ever_used_items
+    i = 0
+    j = 0
+    while i < num_ever_used:
+        if old_entries.valid(i):
+            src = old_entries[i]
+            dst = new_entries[j]
+            dst.key = src.key
+            dst.value = src.value
+            if hasattr(ENTRY, 'f_hash'):  dst.f_hash = src.f_hash
+            if hasattr(ENTRY, 'f_valid'): dst.f_valid = True
+            j += 1
+        i += 1
+    d.entries = new_entries
+    d.num_ever_used_items = j
+    d.resize_counter = _ll_usable(new_size) - j
+    _ll_malloc_indexes(d, new_size)
+    i = 0
+    while i < j:
+        ll_index_insert_clean(d, new_entries.hash(i), i)
+        i += 1
+    old_entries.delete()
+
+# ------- a port of CPython's dictobject.c's lookdict implementation -------
+PERTURB_SHIFT = 5
+
+# the values stored in the 'indexes' array
+FREE = 0
+DELETED = 1
+VALID_OFFSET = 2
+
+# what ll_dict_lookup() should do with the slot of the key
+FLAG_LOOKUP = 0
+FLAG_STORE = 1
+FLAG_DELETE = 2
+
+# the possible values of 'lookup_function_no'
+FUNC_BYTE = 0
+FUNC_SHORT = 1
+FUNC_INT = 2
+FUNC_LONG = 3
+
+IS_64BIT = LONG_BIT == 64
+
+DICTINDEX_BYTE = lltype.Ptr(lltype.GcArray(rffi.UCHAR))
+DICTINDEX_SHORT = lltype.Ptr(lltype.GcArray(rffi.USHORT))
+DICTINDEX_INT = lltype.Ptr(lltype.GcArray(rffi.UINT))
+DICTINDEX_LONG = lltype.Ptr(lltype.GcArray(lltype.Unsigned))
+
+def _ll_usable(size):
+    # the number of entries that can be stored in a dict whose 'indexes'
+    # array has the given size, keeping the hash table at most 2/3 full
+    return (size * 2) // 3
+
+def _ll_malloc_indexes(d, n):
+    if n <= 256:
+        indexes = lltype.malloc(DICTINDEX_BYTE.TO, n, zero=True)
+        d.indexes = lltype.cast_opaque_ptr(llmemory.GCREF, indexes)
+        d.lookup_function_no = FUNC_BYTE
+    elif n <= 65536:
+        indexes = lltype.malloc(DICTINDEX_SHORT.TO, n, zero=True)
+        d.indexes = lltype.cast_opaque_ptr(llmemory.GCREF, indexes)
+        d.lookup_function_no = FUNC_SHORT
+    elif IS_64BIT and n <= 2 ** 32:
+        indexes = lltype.malloc(DICTINDEX_INT.TO, n, zero=True)
+        d.indexes = lltype.cast_opaque_ptr(llmemory.GCREF, indexes)
+        d.lookup_function_no = FUNC_INT
+    else:
+        indexes = lltype.malloc(DICTINDEX_LONG.TO, n, zero=True)
+        d.indexes = lltype.cast_opaque_ptr(llmemory.GCREF, indexes)
+        d.lookup_function_no = FUNC_LONG
+
+def _make_index_functions(DICTINDEX):
+    T = DICTINDEX.TO.OF
+
+    def ll_lookup(d, key, hash, store_flag):
+        entries = d.entries
+        indexes_ref = d.indexes
+        indexes = lltype.cast_opaque_ptr(DICTINDEX, indexes_ref)
+        ENTRIES = lltype.typeOf(entries).TO
+        direct_compare = not hasattr(ENTRIES, 'no_direct_compare')
+        mask = len(indexes) - 1
+        i = r_uint(hash & mask)
+        # do the first try before any looping
+        index = rffi.cast(lltype.Signed, indexes[intmask(i)])
+        if index >= VALID_OFFSET:
+            checkingkey = entries[index - VALID_OFFSET].key
+            if direct_compare and checkingkey == key:
+                if store_flag == FLAG_DELETE:
+                    indexes[intmask(i)] = rffi.cast(T, DELETED)
+                return index - VALID_OFFSET   # found the entry
+            if d.keyeq is not None and entries.hash(index - VALID_OFFSET) == hash:
+                # correct hash, maybe the key is e.g. a different pointer to
+                # an equal object
+                found = d.keyeq(checkingkey, key)
+                if d.paranoia:
+                    if (entries != d.entries or indexes_ref != d.indexes or
+                        not entries.valid(index - VALID_OFFSET) or
+                        entries[index - VALID_OFFSET].key != checkingkey):
+                        # the compare did major nasty stuff to the dict: start over
+                        return _ll_dict_lookup_restart(d, key, hash, store_flag)
+                if found:
+                    if store_flag == FLAG_DELETE:
+                        indexes[intmask(i)] = rffi.cast(T, DELETED)
+                    return index - VALID_OFFSET   # found the entry
+            deletedslot = -1
+        elif index == DELETED:
+            deletedslot = intmask(i)
+        else:
+            # pristine entry -- lookup failed
+            if store_flag == FLAG_STORE:
+                if d.resize_counter <= 0:
+                    return _ll_dict_lookup_restart(d, key, hash, store_flag)
+                indexes[intmask(i)] = rffi.cast(T, d.num_ever_used_items +
+                                                   VALID_OFFSET)
+            return -1
+
+        # In the loop, a deleted entry is by far (factor of 100s) the
+        # least likely outcome, so test for that last.
+        perturb = r_uint(hash)
+        while 1:
+            # compute the next index using unsigned arithmetic
+            i = (i << 2) + i + perturb + 1
+            i = i & mask
+            index = rffi.cast(lltype.Signed, indexes[intmask(i)])
+            if index == FREE:
+                if store_flag == FLAG_STORE:
+                    if d.resize_counter <= 0:
+                        return _ll_dict_lookup_restart(d, key, hash,
+                                                       store_flag)
+                    if deletedslot == -1:
+                        deletedslot = intmask(i)
+                    indexes[deletedslot] = rffi.cast(T,
+                                    d.num_ever_used_items + VALID_OFFSET)
+                return -1
+            elif index >= VALID_OFFSET:
+                checkingkey = entries[index - VALID_OFFSET].key
+                if direct_compare and checkingkey == key:
+                    if store_flag == FLAG_DELETE:
+                        indexes[intmask(i)] = rffi.cast(T, DELETED)
+                    return index - VALID_OFFSET   # found the entry
+                if d.keyeq is not None and entries.hash(index - VALID_OFFSET) == hash:
+                    # correct hash, maybe the key is e.g. a different pointer to
+                    # an equal object
+                    found = d.keyeq(checkingkey, key)
+                    if d.paranoia:
+                        if (entries != d.entries or indexes_ref != d.indexes or
+                            not entries.valid(index - VALID_OFFSET) or
+                            entries[index - VALID_OFFSET].key != checkingkey):
+                            # the compare did major nasty stuff to the dict:
+                            # start over
+                            return _ll_dict_lookup_restart(d, key, hash,
+                                                           store_flag)
+                    if found:
+                        if store_flag == FLAG_DELETE:
+                            indexes[intmask(i)] = rffi.cast(T, DELETED)
+                        return index - VALID_OFFSET   # found the entry
+            elif deletedslot == -1:
+                deletedslot = intmask(i)
+            perturb >>= PERTURB_SHIFT
+
+    def ll_insert_clean(d, hash, entry_index):
+        # a simplified version of ll_lookup() which assumes that the key
+        # is new, and that 'indexes' doesn't contain DELETED markers.  It
+        # stores 'entry_index' in the next free slot for the given hash.
+        indexes = lltype.cast_opaque_ptr(DICTINDEX, d.indexes)
+        mask = len(indexes) - 1
+        i = r_uint(hash & mask)
+        perturb = r_uint(hash)
+        while rffi.cast(lltype.Signed, indexes[intmask(i)]) != FREE:
+            i = (i << 2) + i + perturb + 1
+            i = i & mask
+            perturb >>= PERTURB_SHIFT
+        indexes[intmask(i)] = rffi.cast(T, entry_index + VALID_OFFSET)
+
+    def ll_delete_by_entry(d, hash, entry_index):
+        # find the slot that points to the entry 'entry_index', which
+        # must exist, and mark it as DELETED.  Used by popitem(), which
+        # must not compare keys.
+        indexes = lltype.cast_opaque_ptr(DICTINDEX, d.indexes)
+        mask = len(indexes) - 1
+        i = r_uint(hash & mask)
+        perturb = r_uint(hash)
+        target = entry_index + VALID_OFFSET
+        while rffi.cast(lltype.Signed, indexes[intmask(i)]) != target:
+            i = (i << 2) + i + perturb + 1
+            i = i & mask
+            perturb >>= PERTURB_SHIFT
+        indexes[intmask(i)] = rffi.cast(T, DELETED)
+
+    return ll_lookup, ll_insert_clean, ll_delete_by_entry
+
+(ll_dict_lookup_byte, ll_index_insert_clean_byte,
+ ll_index_delete_byte) = _make_index_functions(DICTINDEX_BYTE)
+(ll_dict_lookup_short, ll_index_insert_clean_short,
+ ll_index_delete_short) = _make_index_functions(DICTINDEX_SHORT)
+(ll_dict_lookup_int, ll_index_insert_clean_int,
+ ll_index_delete_int) = _make_index_functions(DICTINDEX_INT)
+(ll_dict_lookup_long, ll_index_insert_clean_long,
+ ll_index_delete_long) = _make_index_functions(DICTINDEX_LONG)
+
+def ll_dict_lookup(d, key, hash, store_flag):
+    # Returns the index in 'entries' of the key, or -1 if it is not in
+    # the dict.  With FLAG_STORE, a missing key gets a slot in 'indexes'
+    # pointing to the next free entry, which the caller must then fill.
+    # With FLAG_DELETE, the slot of a key that is found is marked as
+    # DELETED.
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        return ll_dict_lookup_byte(d, key, hash, store_flag)
+    elif fun == FUNC_SHORT:
+        return ll_dict_lookup_short(d, key, hash, store_flag)
+    elif IS_64BIT and fun == FUNC_INT:
+        return ll_dict_lookup_int(d, key, hash, store_flag)
+    else:
+        return ll_dict_lookup_long(d, key, hash, store_flag)
+
+def _ll_dict_lookup_restart(d, key, hash, store_flag):
+    # the dict was changed by a custom key comparison, or it needs to
+    # grow before a new key can be stored: make room, and start over
+    if store_flag == FLAG_STORE and d.resize_counter <= 0:
+        ll_dict_resize(d)
+    return ll_dict_lookup(d, key, hash, store_flag)
+
+def ll_index_insert_clean(d, hash, entry_index):
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        ll_index_insert_clean_byte(d, hash, entry_index)
+    elif fun == FUNC_SHORT:
+        ll_index_insert_clean_short(d, hash, entry_index)
+    elif IS_64BIT and fun == FUNC_INT:
+        ll_index_insert_clean_int(d, hash, entry_index)
+    else:
+        ll_index_insert_clean_long(d, hash, entry_index)
+
+def ll_index_delete(d, hash, entry_index):
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        ll_index_delete_byte(d, hash, entry_index)
+    elif fun == FUNC_SHORT:
+        ll_index_delete_short(d, hash, entry_index)
+    elif IS_64BIT and fun == FUNC_INT:
+        ll_index_delete_int(d, hash, entry_index)
+    else:
+        ll_index_delete_long(d, hash, entry_index)
+
+# ____________________________________________________________
+#
+#  Irregular operations.
+
+DICT_INITSIZE = 8
+
+def ll_newdict(DICT):
+    d = DICT.allocate()
+    _ll_dict_init(d, DICT_INITSIZE)
+    return d
+
+def ll_newdict_size(DICT, length_estimate):
+    n = DICT_INITSIZE
+    while _ll_usable(n) < length_estimate:
+        n *= 2
+    d = DICT.allocate()
+    _ll_dict_init(d, n)
+    return d
+
+def _ll_dict_init(d, n):
+    d.entries = lltype.typeOf(d).TO.entries.TO.allocate(_ll_usable(n))
+    d.num_live_items = 0
+    d.num_ever_used_items = 0
+    d.resize_counter = _ll_usable(n)
+    _ll_malloc_indexes(d, n)
+
+def _ll_malloc_dict(DICT):
+    return lltype.malloc(DICT)
+def _ll_malloc_entries(ENTRIES, n):
+    return lltype.malloc(ENTRIES, n, zero=True)
+def _ll_free_entries(entries):
+    pass
+
+
+def rtype_ordereddict(hop):
+    hop.exception_cannot_occur()
+    r_dict = hop.r_result
+    cDICT = hop.inputconst(lltype.Void, r_dict.DICT)
+    return hop.gendirectcall(ll_newdict, cDICT)
+
+# ____________________________________________________________
+#
+#  Iteration.
+
+class OrderedDictIteratorRepr(AbstractDictIteratorRepr):
+
+    def __init__(self, r_dict, variant="keys"):
+        self.r_dict = r_dict
+        self.variant = variant
+        self.lowleveltype = lltype.Ptr(lltype.GcStruct('odictiter',
+                                         ('dict', r_dict.lowleveltype),
+                                         ('index', lltype.Signed)))
+        self.ll_dictiter = ll_dictiter
+        self.ll_dictnext = ll_dictnext_group[variant]
+
+
+def ll_dictiter(ITERPTR, d):
+    iter = lltype.malloc(ITERPTR.TO)
+    iter.dict = d
+    iter.index = 0
+    return iter
+
+def _make_ll_dictnext(kind):
+    # make three versions of the following function: keys, values, items
+    def ll_dictnext(RETURNTYPE, iter):
+        # note that RETURNTYPE is None for keys and values
+        dict = iter.dict
+        if dict:
+            entries = dict.entries
+            index = iter.index
+            entries_len = dict.num_ever_used_items
+            while index < entries_len:
+                entry = entries[index]
+                is_valid = entries.valid(index)
+                index = index + 1
+                if is_valid:
+                    iter.index = index
+                    if RETURNTYPE is lltype.Void:
+                        return None
+                    elif kind == 'items':
+                        r = lltype.malloc(RETURNTYPE.TO)
+                        r.item0 = recast(RETURNTYPE.TO.item0, entry.key)
+                        r.item1 = recast(RETURNTYPE.TO.item1, entry.value)
+                        return r
+                    elif kind == 'keys':
+                        return entry.key
+                    elif kind == 'values':
+                        return entry.value
+            # clear the reference to the dict and prevent restarts
+            iter.dict = lltype.nullptr(lltype.typeOf(iter).TO.dict.TO)
+        raise StopIteration
+    return ll_dictnext
+
+ll_dictnext_group = {'keys'  : _make_ll_dictnext('keys'),
+                     'values': _make_ll_dictnext('values'),
+                     'items' : _make_ll_dictnext('items')}
+
+# _____________________________________________________________
+# methods
+
+def ll_get(dict, key, default):
+    i = ll_dict_lookup(dict, key, dict.keyhash(key), FLAG_LOOKUP)
+    if i >= 0:
+        return ll_get_value(dict, i)
+    else:
+        return default
+
+def ll_setdefault(dict, key, default):
+    hash = dict.keyhash(key)
+    i = ll_dict_lookup(dict, key, hash, FLAG_STORE)
+    if i >= 0:
+        return ll_get_value(dict, i)
+    else:
+        _ll_dict_setitem_lookup_done(dict, key, default, hash, i)
+        return default
+
+def ll_copy(dict):
+    # the copy is compacted: it contains no deleted entries
+    DICT = lltype.typeOf(dict).TO
+    ENTRY = DICT.entries.TO.OF
+    new_size = DICT_INITSIZE
+    while _ll_usable(new_size) <= dict.num_live_items:
+        new_size *= 2
+    d = DICT.allocate()
+    _ll_dict_init(d, new_size)
+    if hasattr(DICT, 'fnkeyeq'):   d.fnkeyeq   = dict.fnkeyeq
+    if hasattr(DICT, 'fnkeyhash'): d.fnkeyhash = dict.fnkeyhash
+    entries = dict.entries
+    d_entries = d.entries
+    num_ever_used = dict.num_ever_used_items
+    i = 0
+    j = 0
+    while i < num_ever_used:
+        if entries.valid(i):
+            entry = entries[i]
+            d_entry = d_entries[j]
+            d_entry.key = entry.key
+            d_entry.value = entry.value
+            if hasattr(ENTRY, 'f_hash'):  d_entry.f_hash = entry.f_hash
+            if hasattr(ENTRY, 'f_valid'): d_entry.f_valid = True
+            ll_index_insert_clean(d, entries.hash(i), j)
+            j += 1
+        i += 1
+    d.num_live_items = j
+    d.num_ever_used_items = j
+    d.resize_counter -= j
+    return d
+
+def ll_clear(d):
+    if (d.num_ever_used_items == 0 and
+            len(d.entries) == _ll_usable(DICT_INITSIZE)):
+        return
+    old_entries = d.entries
+    _ll_dict_init(d, DICT_INITSIZE)
+    old_entries.delete()
+
+def ll_update(dic1, dic2):
+    i = 0
+    while i < dic2.num_ever_used_items:
+        entries = dic2.entries
+        if entries.valid(i):
+            entry = entries[i]
+            hash = entries.hash(i)
+            key = entry.key
+            value = entry.value
+            j = ll_dict_lookup(dic1, key, hash, FLAG_STORE)
+            _ll_dict_setitem_lookup_done(dic1, key, value, hash, j)
+        i += 1
+
+# this is an implementation of keys(), values() and items()
+# in a single function.
+# note that by specialization on func, three different
+# and very efficient functions are created.
+
+def recast(P, v):
+    if isinstance(P, lltype.Ptr):
+        return lltype.cast_pointer(P, v)
+    else:
+        return v
+
+def _make_ll_keys_values_items(kind):
+    def ll_kvi(LIST, dic):
+        res = LIST.ll_newlist(dic.num_live_items)
+        entries = dic.entries
+        dlen = dic.num_ever_used_items
+        items = res.ll_items()
+        i = 0
+        p = 0
+        while i < dlen:
+            if entries.valid(i):
+                ELEM = lltype.typeOf(items).TO.OF
+                if ELEM is not lltype.Void:
+                    entry = entries[i]
+                    if kind == 'items':
+                        r = lltype.malloc(ELEM.TO)
+                        r.item0 = recast(ELEM.TO.item0, entry.key)
+                        r.item1 = recast(ELEM.TO.item1, entry.value)
+                        items[p] = r
+                    elif kind == 'keys':
+                        items[p] = recast(ELEM, entry.key)
+                    elif kind == 'values':
+                        items[p] = recast(ELEM, entry.value)
+                p += 1
+            i += 1
+        assert p == res.ll_length()
+        return res
+    return ll_kvi
+
+ll_dict_keys   = _make_ll_keys_values_items('keys')
+ll_dict_values = _make_ll_keys_values_items('values')
+ll_dict_items  = _make_ll_keys_values_items('items')
+
+def ll_contains(d, key):
+    i = ll_dict_lookup(d, key, d.keyhash(key), FLAG_LOOKUP)
+    return i >= 0
+
+@jit.dont_look_inside
+def ll_popitem(ELEM, dic):
+    # pop the most recently inserted item
+    entries = dic.entries
+    i = dic.num_ever_used_items - 1
+    while i >= 0 and not entries.valid(i):
+        i -= 1
+    if i < 0:
+        raise KeyError
+    entry = entries[i]
+    r = lltype.malloc(ELEM.TO)
+    r.item0 = recast(ELEM.TO.item0, entry.key)
+    r.item1 = recast(ELEM.TO.item1, entry.value)
+    ll_index_delete(dic, entries.hash(i), i)
+    # all the entries after 'i' are deleted; forget about them
+    dic.num_ever_used_items = i + 1
+    _ll_dict_del(dic, i)
+    return r
@@ -25,13 +25,19 @@ class __extend__(annmodel.SomeDict):
                                           rtyper.getrepr(dictkey.s_rdict_hashfn))
             else:
                 custom_eq_hash = None
-            return rtyper.type_system.rdict.DictRepr(rtyper,
-                                                     lambda: rtyper.getrepr(s_key),
-                                                     lambda: rtyper.getrepr(s_value),
-                                                     dictkey,
-                                                     dictvalue,
-                                                     custom_eq_hash,
-                                                     force_non_null)
+            DictRepr = rtyper.type_system.rdict.DictRepr
+            if rtyper.type_system.name == 'lltypesystem':
+                config = rtyper.annotator.translator.config
+                if dictkey.is_ordered or config.translation.compactdicts:
+                    from pypy.rpython.lltypesystem import rordereddict
+                    DictRepr = rordereddict.OrderedDictRepr
+            return DictRepr(rtyper,
+                            lambda: rtyper.getrepr(s_key),
+                            lambda: rtyper.getrepr(s_value),
+                            dictkey,
+                            dictvalue,
+                            custom_eq_hash,
+                            force_non_null)
 
     def rtyper_makekey(self):
         self.dictdef.dictkey  .dont_change_any_more = True
@@ -0,0 +1,290 @@
+import py
+from collections import OrderedDict
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.rpython import rint
+from pypy.rpython.lltypesystem import rordereddict
+from pypy.rpython.test.tool import LLRtypeMixin
+from pypy.rpython.test.test_llinterp import interpret
+from pypy.rpython.test.test_rdict import BaseTestRdict, not_really_random
+from pypy.rlib.objectmodel import r_ordereddict
+
+
+def get_indexes(ll_d):
+    return lltype.cast_opaque_ptr(lltype.Ptr(rordereddict.DICTINDEX_BYTE.TO),
+                                  ll_d.indexes)
+
+
+class TestCompactDicts(BaseTestRdict, LLRtypeMixin):
+    # run all the generic dict tests with the 'compactdicts' option,
+    # which makes all the dicts use the layout of rordereddict.py
+
+    def interpret(self, fn, args, **kwds):
+        kwds['compactdicts'] = True
+        return interpret(fn, args, **kwds)
+
+    def test_compact_layout(self):
+        def func(i):
+            d = {}
+            d[i] = i + 1
+            return d
+        res = self.interpret(func, [5])
+        assert lltype.typeOf(res).TO._name == 'odicttable'
+
+
+class TestOrderedDict(LLRtypeMixin):
+
+    def interpret(self, fn, args, **kwds):
+        return interpret(fn, args, **kwds)
+
+    def test_insertion_order(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[(i * 7) % n] = i
+            del d[3]
+            d[3] = -1
+            d[0] = 42     # overwriting keeps the position
+            res = 0
+            for key in d:
+                res = res * 10 + key
+            return res
+        assert func(8) == self.interpret(func, [8]) == 7654213
+
+    def test_keys_values_items_order(self):
+        def func():
+            d = OrderedDict()
+            d['c'] = 1
+            d['a'] = 2
+            d['b'] = 3
+            del d['a']
+            d['a'] = 4
+            keys = d.keys()
+            values = d.values()
+            items = d.items()
+            return (''.join(keys) + ''.join([str(v) for v in values]) +
+                    ''.join([k + str(v) for (k, v) in items]))
+        res = self.interpret(func, [])
+        assert self.ll_to_string(res) == func() == 'cba134c1b3a4'
+
+    def test_iteritems_order(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[str(n - i)] = i
+            res = 0
+            for key, value in d.iteritems():
+                res = res * 2 + (int(key) + value == n)
+            for value in d.itervalues():
+                res += value
+            return res
+        assert self.interpret(func, [10]) == func(10)
+
+    def test_popitem_is_lifo(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[i] = i * 2
+            del d[n - 2]
+            res = 0
+            while d:
+                key, value = d.popitem()
+                assert value == key * 2
+                res = res * 10 + key
+            return res
+        assert func(6) == self.interpret(func, [6]) == 53210
+
+    def test_popitem_then_insert(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[i] = i
+            for i in range(n // 2):
+                d.popitem()
+            for i in range(n):
+                d[100 + i] = i
+            return len(d) * 1000 + d.keys()[n // 2] + d[100 + n - 1]
+        assert self.interpret(func, [300]) == func(300)
+
+    def test_copy_is_compact(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[str(i)] = i
+            for i in range(0, n, 2):
+                del d[str(i)]
+            return d.copy()
+        res = self.interpret(func, [20])
+        assert res.num_live_items == res.num_ever_used_items == 10
+        keys = [res.entries[i].key for i in range(10)]
+        assert [self.ll_to_string(k) for k in keys] == [str(i) for i in
+                                                        range(1, 20, 2)]
+
+    def test_update_and_clear(self):
+        def func(n):
+            d1 = OrderedDict()
+            d2 = OrderedDict()
+            for i in range(n):
+                d1[i] = i
+                d2[n - i] = i
+            d1.update(d2)
+            res = len(d1) * 100 + d1.keys()[-1]
+            d2.clear()
+            d2[5] = 6
+            return res * 10 + len(d2)
+        assert self.interpret(func, [7]) == func(7)
+
+    def test_setdefault_and_get(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d.setdefault(i % 3, i)
+            return d.get(2, -1) * 100 + d.get(3, -1) + 10 * d.keys()[1]
+        assert self.interpret(func, [10]) == func(10)
+
+    def test_index_sizes(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[i] = i + 1
+            for i in range(n - 10):
+                del d[i]
+            return d
+        res = self.interpret(func, [10])
+        assert res.lookup_function_no == rordereddict.FUNC_BYTE
+        res = self.interpret(func, [1000])
+        assert res.lookup_function_no == rordereddict.FUNC_BYTE
+        assert len(res.entries) < 100
+        def func2(n):
+            d = func(n)
+            for i in range(n):
+                d[i] = i
+            return d
+        res = self.interpret(func2, [1000])
+        assert res.lookup_function_no == rordereddict.FUNC_SHORT
+        assert res.num_live_items == 1000
+
+    def test_indexes_content(self):
+        def func(n):
+            d = OrderedDict()
+            for i in range(n):
+                d[i] = i
+            del d[1]
+            return d
+        res = self.interpret(func, [4])
+        indexes = get_indexes(res)
+        values = sorted([rffi.cast(lltype.Signed, indexes[i])
+                         for i in range(len(indexes))])
+        OFS = rordereddict.VALID_OFFSET
+        assert values == ([rordereddict.FREE] * 4 + [rordereddict.DELETED] +
+                          [OFS + 0, OFS + 2, OFS + 3])
+
+    def test_prebuilt(self):
+        d = OrderedDict()
+        d['x'] = 1
+        d['a'] = 2
+        d['m'] = 3
+        def func(i):
+            return ''.join(d.keys()) + str(d[['x', 'a', 'm'][i]])
+        res = self.interpret(func, [1])
+        assert self.ll_to_string(res) == 'xam2'
+
+    def test_r_ordereddict(self):
+        class A(object):
+            def __init__(self, n):
+                self.n = n
+        def key_eq(a, b):
+            return a.n == b.n
+        def key_hash(a):
+            return a.n % 5
+        def func(n):
+            d = r_ordereddict(key_eq, key_hash)
+            for i in range(n):
+                d[A(n - i)] = i
+            d[A(n)] = -1
+            res = d[A(1)]
+            for key in d:
+                res = res * 10 + key.n
+            return res
+        assert func(6) == self.interpret(func, [6])
+
+    def test_prebuilt_r_ordereddict(self):
+        def key_eq(a, b):
+            return a == b
+        def key_hash(a):
+            return len(a)
+        d = r_ordereddict(key_eq, key_hash)
+        d['abc'] = 1
+        d['de'] = 2
+        d['f'] = 3
+        def func(i):
+            d[str(i)] = 4
+            return ''.join(d.keys())
+        res = self.interpret(func, [7])
+        assert self.ll_to_string(res) == 'abcdef7'
+
+    def test_mixing_ordered_and_unordered(self):
+        from pypy.annotation.annrpython import RPythonAnnotator
+        def func(flag):
+            if flag:
+                d = OrderedDict()
+            else:
+                d = {}
+            d[1] = 2
+            return d
+        a = RPythonAnnotator()
+        py.test.raises(AssertionError, a.build_types, func, [int])
+
+
+class TestStress:
+
+    def test_stress(self):
+        from pypy.annotation.dictdef import DictKey, DictValue
+        from pypy.annotation import model as annmodel
+        dictrepr = rordereddict.OrderedDictRepr(
+            None, rint.signed_repr, rint.signed_repr,
+            DictKey(None, annmodel.SomeInteger()),
+            DictValue(None, annmodel.SomeInteger()))
+        dictrepr.setup()
+        l_dict = rordereddict.ll_newdict(dictrepr.DICT)
+        referencetable = [None] * 400
+        referenceorder = []
+        value = 0
+
+        def complete_check():
+            for n, refvalue in zip(range(len(referencetable)), referencetable):
+                try:
+                    gotvalue = rordereddict.ll_dict_getitem(l_dict, n)
+                except KeyError:
+                    assert refvalue is None
+                else:
+                    assert gotvalue == refvalue
+            entries = l_dict.entries
+            keys = [entries[i].key for i in range(l_dict.num_ever_used_items)
+                    if entries.valid(i)]
+            assert keys == referenceorder
+
+        for x in not_really_random():
+            n = int(x*100.0)    # 0 <= x < 400
+            op = repr(x)[-1]
+            if op <= '2' and referencetable[n] is not None:
+                rordereddict.ll_dict_delitem(l_dict, n)
+                referencetable[n] = None
+                referenceorder.remove(n)
+            elif op <= '6':
+                rordereddict.ll_dict_setitem(l_dict, n, value)
+                if referencetable[n] is None:
+                    referenceorder.append(n)
+                referencetable[n] = value
+                value += 1
+            else:
+                try:
+                    gotvalue = rordereddict.ll_dict_getitem(l_dict, n)
+                except KeyError:
+                    assert referencetable[n] is None
+                else:
+                    assert gotvalue == referencetable[n]
+            if 1.38 <= x <= 1.39:
+                complete_check()
+                print 'current dict length:', len(referenceorder)
+            assert l_dict.num_live_items == len(referenceorder)
+        complete_check()
@@ -8,8 +8,12 @@ from pypy.translator.goal.ann_override import PyPyAnnotatorPolicy
 from pypy.config.config import Config, to_optparse, make_dict, SUPPRESS_USAGE
 from pypy.config.config import ConflictConfigError
 from pypy.tool.option import make_objspace
+from pypy.tool.ansi_print import ansi_log
 from pypy.translator.goal.nanos import setup_nanos
 
+log = py.log.Producer("preimport")
+py.log.setconsumer("preimport", ansi_log)
+
 thisdir = py.path.local(__file__).dirpath()
 
 try:
@@ -83,6 +87,52 @@ def create_entry_point(space, w_dict):
         return exitcode
     return entry_point
 
+def preimport_modules(space, modulenames):
+    """Import the given app-level modules while translating.  They are
+    then part of the prebuilt heap stored in the executable, and found
+    in sys.modules at startup without being imported again.  When the
+    executable runs from another directory, their file names are changed
+    to point there, see State.relocate_preimported_modules()."""
+    from pypy.module.sys.state import get as get_sys_state
+    w_modules = space.sys.get('modules')
+    old_names_w = space.listview(space.call_method(w_modules, 'keys'))
+    old_names = dict.fromkeys([space.str_w(w_name) for w_name in old_names_w])
+    old_codes = _find_code_objects()
+    old_code_ids = dict.fromkeys([id(code) for code in old_codes])
+    for modulename in modulenames:
+        modulename = modulename.strip()
+        if not modulename:
+            continue
+        log('pre-importing %s' % (modulename,))
+        try:
+            space.appexec([space.wrap(modulename)], """(name):
+                __import__(name)
+            """)
+        except OperationError, e:
+            raise Exception("cannot pre-import %r: %s" % (
+                modulename, e.errorstr(space)))
+    state = get_sys_state(space)
+    for w_name in space.listview(space.call_method(w_modules, 'keys')):
+        if space.str_w(w_name) not in old_names:
+            w_module = space.getitem(w_modules, w_name)
+            if not space.is_w(w_module, space.w_None):
+                state.preimported_modules_w.append(w_module)
+    # all the new code objects, wherever they are stored: in functions,
+    # properties, closures, containers...
+    for code in _find_code_objects():
+        if (id(code) not in old_code_ids and
+                code.co_filename.startswith(state.srcdir + os.sep)):
+            state.preimported_codes.append(code)
+    # the directories of sys.path are computed again at startup
+    space.call_method(space.sys.get('path_importer_cache'), 'clear')
+
+def _find_code_objects():
+    """The app-level code objects alive on the host, while translating."""
+    import gc
+    from pypy.interpreter.pycode import PyCode, LazyCode
+    return [obj for obj in gc.get_objects()
+                if isinstance(obj, (PyCode, LazyCode))]
+
 def call_finish(space):
     space.finish()
 
@@ -242,6 +292,8 @@ class PyPyTarget(object):
         app.hidden_applevel = False
         app.can_use_geninterp = False
         w_dict = app.getwdict(space)
+        if config.objspace.preimport:
+            preimport_modules(space, config.objspace.preimport.split(','))
         entry_point = create_entry_point(space, w_dict)
 
         return entry_point, None, PyPyAnnotatorPolicy(single_space = space)
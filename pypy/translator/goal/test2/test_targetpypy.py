@@ -1,6 +1,7 @@
 
-import py
+import py, os
 from pypy.translator.goal.targetpypystandalone import get_entry_point
+from pypy.translator.goal.targetpypystandalone import preimport_modules
 from pypy.config.pypyoption import get_pypy_config
 
 class TestTargetPyPy(object):
@@ -10,3 +11,112 @@ class TestTargetPyPy(object):
         space = self.space
         py.test.skip("not working so far")
         entry_point(['pypy-c' , '-S', '-c', 'print 3'])
+
+    def test_preimport_modules(self):
+        space = self.space
+        space.appexec([], """():
+            import sys
+            sys.modules.pop('colorsys', None)
+        """)
+        preimport_modules(space, ['colorsys', ' '])
+        w_found = space.appexec([], """():
+            import sys
+            return 'colorsys' in sys.modules
+        """)
+        assert space.is_true(w_found)
+        py.test.raises(Exception, preimport_modules, space,
+                       ['this_module_does_not_exist'])
+
+    def test_preimport_startup(self):
+        from pypy.tool.udir import udir
+        config = get_pypy_config(translating=False)
+        config.objspace.allworkingmodules = False
+        config.objspace.preimport = 'colorsys'
+        entry_point = get_entry_point(config)[0]
+        # as if the executable was copied to another directory, with the
+        # library next to it
+        import pypy
+        srcdir = os.path.dirname(os.path.dirname(os.path.abspath(
+            pypy.__file__)))
+        prefix = udir.ensure('preimport_prefix', dir=True)
+        libdir = prefix.ensure('lib-python', '2.7', dir=True)
+        prefix.ensure('lib-python', 'modified-2.7', dir=True)
+        prefix.ensure('lib_pypy', dir=True)
+        py.path.local(srcdir).join('lib-python', '2.7', 'colorsys.py').copy(
+            libdir.join('colorsys.py'))
+        executable = prefix.ensure('bin', 'pypy-c')
+        output = udir.join('preimport_output')
+        code = (
+            "import sys\n"
+            "found = 'colorsys' in sys.modules\n"
+            "import colorsys\n"
+            "result = [found, sys.prefix, colorsys.__file__,\n"
+            "          colorsys.hls_to_rgb.func_code.co_filename,\n"
+            "          colorsys.hls_to_rgb(0.0, 0.5, 0.0)]\n"
+            "reload(colorsys)\n"
+            "result.append(colorsys.__file__)\n"
+            "f = open(%r, 'w'); f.write(repr(result)); f.close()\n"
+            % (str(output),))
+        exitcode = entry_point([str(executable), '-S', '-c', code])
+        assert exitcode == 0
+        found, sys_prefix, filename, co_filename, rgb, reloaded = eval(
+            output.read())
+        assert found
+        assert sys_prefix == str(prefix)
+        assert filename.startswith(str(libdir.join('colorsys.py')))
+        assert co_filename == str(libdir.join('colorsys.py'))
+        assert rgb == (0.5, 0.5, 0.5)
+        assert reloaded.startswith(str(libdir.join('colorsys.py')))
+        for name in [filename, co_filename]:
+            assert not name.startswith(srcdir + os.sep)
+
+    def test_preimport_relocates_all_code_objects(self):
+        from pypy.tool.udir import udir
+        from pypy.module.sys.state import get as get_sys_state
+        space = self.space
+        state = get_sys_state(space)
+        oldsrcdir = udir.ensure('preimport_codes_src', dir=True)
+        newsrcdir = udir.ensure('preimport_codes_dst', dir=True)
+        oldsrcdir.ensure('lib_pypy', 'preimport_codes.py').write(
+            "def deco(func):\n"
+            "    def wrapper(*args):\n"
+            "        return func(*args)\n"
+            "    return wrapper\n"
+            "@deco\n"
+            "def decorated():\n"
+            "    return 42\n"
+            "class C(object):\n"
+            "    x = property(lambda self: 1)\n"
+            "handlers = {'a': [lambda: 2]}\n")
+        w_libdir = space.wrap(str(oldsrcdir.join('lib_pypy')))
+        space.appexec([w_libdir], """(libdir):
+            import sys
+            sys.path.insert(0, libdir)
+        """)
+        saved = (state.srcdir, state.preimported_modules_w[:],
+                 state.preimported_codes[:])
+        state.srcdir = str(oldsrcdir)
+        try:
+            preimport_modules(space, ['preimport_codes'])
+            state.relocate_preimported_modules(str(newsrcdir))
+            w_filenames = space.appexec([], """():
+                import preimport_codes as m
+                return [m.__file__,
+                        m.decorated.func_code.co_filename,
+                        m.decorated.func_closure[0].cell_contents
+                                                   .func_code.co_filename,
+                        m.C.x.fget.func_code.co_filename,
+                        m.handlers['a'][0].func_code.co_filename]
+            """)
+        finally:
+            state.srcdir, state.preimported_modules_w, \
+                state.preimported_codes = saved
+            space.appexec([w_libdir], """(libdir):
+                import sys
+                sys.path.remove(libdir)
+                del sys.modules['preimport_codes']
+            """)
+        filenames = space.unwrap(w_filenames)
+        newname = str(newsrcdir.join('lib_pypy', 'preimport_codes.py'))
+        assert filenames[0].startswith(newname)
+        assert filenames[1:] == [newname] * 4